@@ -2,14 +2,15 @@ import os
 import json
 import time
 import pyupbit
-import logging
 import requests
-from logging.handlers import RotatingFileHandler
-from pathlib import Path
 from datetime import datetime, timezone, timedelta
 from dataclasses import dataclass, asdict
 from typing import Optional, Dict
 from dotenv import load_dotenv
+
+from log_config import setup_logging
+from market_meta import load_market_meta
+from api_keys import ApiKey, ApiKeySettings, KeyPool
 load_dotenv()
 
 
@@ -17,21 +18,9 @@ KST = timezone(timedelta(hours=9))
 # ----------------------------------------------------------------------------
 # 로깅 설정
 # ----------------------------------------------------------------------------
-# 로거 설정
-log_path = Path("log")
-log_path.mkdir(parents=True, exist_ok=True)
-LOG_FILE_NAME = log_path / f"adjust_trading_{datetime.today().strftime('%Y%m%d')}.log"
-
-logger = logging.getLogger("TradingBotLogger")
-logger.setLevel(logging.INFO)
-# 콘솔 핸들러 추가 (디버깅 시 유용)
-# stream_handler = logging.StreamHandler()
-# logger.addHandler(stream_handler)
-# 파일 핸들러 추가
-file_handler = RotatingFileHandler(LOG_FILE_NAME, maxBytes=100*1024*1024, backupCount=5)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+# 로거 설정 (log/adjust_trading_YYYYMMDD.log)
+# coin_main과 같은 프로세스에 import 되어도 로그가 섞이거나 중복되지 않도록 별도 로거 이름 사용
+logger = setup_logging("AdjustTradingLogger", file_prefix="adjust_trading")
 
 # ----------------------------------------------------------------------------
 # 환경 설정
@@ -46,6 +35,17 @@ LOSS_LIMIT = -0.01
 ORDER_RATIO = 0.1
 MAX_CONSECUTIVE_BUYS = 5
 
+@dataclass(frozen=True)
+class BracketParams:
+    """브래킷 전략 파라미터 (기본값은 위 환경 설정 상수, 시뮬레이터에서 바꿔가며 사용)"""
+    initial_capital: float = INITIAL_CAPITAL
+    initial_buy_ratio: float = INITIAL_BUY_RATIO
+    buy_floor_drop: float = BUY_FLOOR_DROP
+    profit_target: float = PROFIT_TARGET
+    loss_limit: float = LOSS_LIMIT
+    order_ratio: float = ORDER_RATIO
+    max_consecutive_buys: int = MAX_CONSECUTIVE_BUYS
+
 # ----------------------------------------------------------------------------
 # 상태 데이터 클래스
 # ----------------------------------------------------------------------------
@@ -61,6 +61,57 @@ class OrderState:
     consecutive_buys: int = 0
     is_execute: bool = True
 
+@dataclass
+class Bracket:
+    """체결 후 새로 낼 매도/매수 주문 (None이면 해당 주문 없음)"""
+    sell_price: Optional[float] = None
+    sell_qty: Optional[float] = None
+    buy_price: Optional[float] = None
+    buy_qty: Optional[float] = None
+    sold_out: bool = False
+    skip_reason: Optional[str] = None  # 매수를 내지 않은 이유 (insufficient_cash / below_floor / max_buys)
+
+
+def initial_buy_qty(params: BracketParams, meta, cash: float, price: float) -> float:
+    """최초 매수 수량: min(예수금, 운용 자본) * 최초 매수 비율"""
+    amount = min(cash, params.initial_capital) * params.initial_buy_ratio
+    return meta.floor_qty(amount / (price * (1 + meta.taker_fee)))
+
+
+def compute_bracket(params: BracketParams, meta, state: OrderState, is_buy_fill: bool,
+                    cash: float, coin: float, avg_price: float) -> Bracket:
+    """체결 직후 잔고/평단으로 다음 매도(익절)/매수(추가 매수) 주문 계산 (API 호출 없는 순수 함수)
+
+    매수 체결이면 평단 기준 매도, 방금 체결된 매수가 기준 매수.
+    매도 체결이면 방금 체결된 매도가 기준 매도, 평단 기준 매수.
+    """
+    if is_buy_fill:
+        base_sell_p, base_buy_p = avg_price, state.buy_price
+    else:
+        base_sell_p, base_buy_p = state.sell_price, avg_price
+
+    bracket = Bracket()
+    if coin <= 0:
+        bracket.sold_out = True
+        return bracket
+    bracket.sell_price = meta.ceil_price(base_sell_p * (1 + params.profit_target))
+    bracket.sell_qty = min(meta.floor_qty((params.initial_capital * params.order_ratio) / bracket.sell_price), coin)
+
+    if state.consecutive_buys >= params.max_consecutive_buys:
+        bracket.skip_reason = "max_buys"
+        return bracket
+    buy_p = meta.floor_price(base_buy_p * (1 + params.loss_limit))
+    if cash < meta.min_notional * (1 + meta.taker_fee):
+        bracket.skip_reason = "insufficient_cash"
+        return bracket
+    if buy_p < state.buy_floor:
+        bracket.skip_reason = "below_floor"
+        return bracket
+    buy_qty = meta.floor_qty((params.initial_capital * params.order_ratio) / buy_p)
+    bracket.buy_price = buy_p
+    bracket.buy_qty = min(buy_qty, meta.floor_qty(cash / (buy_p * (1 + meta.taker_fee))))
+    return bracket
+
 # ----------------------------------------------------------------------------
 # 상태 파일 관리
 # ----------------------------------------------------------------------------
@@ -74,7 +125,7 @@ def send_discord_message(text: str):
     try:
         requests.post(discord_url, json=payload, timeout=5)
     except requests.RequestException as e:
-        logger.error(f"디스코드 메시지 전송 실패: {e}")
+        logger.error("디스코드 메시지 전송 실패: %s", e, extra={"event": "discord_error"})
 
 def load_state() -> OrderState:
     if os.path.isfile(STATE_FILE):
@@ -82,7 +133,7 @@ def load_state() -> OrderState:
             with open(STATE_FILE, 'r') as f:
                 return OrderState(**json.load(f))
         except Exception as e:
-            logger.error(f"Failed to load state: {e}")
+            logger.error("Failed to load state: %s", e, extra={"event": "state_error"})
     return OrderState()
 
 def save_state(state: OrderState):
@@ -93,11 +144,17 @@ def save_state(state: OrderState):
 # Upbit API Wrapper using pyupbit
 # ----------------------------------------------------------------------------
 class UpbitApi:
-    def __init__(self, access_key, secret_key):
-        self.upbit = pyupbit.Upbit(access_key, secret_key)
+    """조회는 API 키 풀에 분산, 주문/취소는 봇 고정 키 (키가 1개면 기존과 같음)"""
+    def __init__(self, access_key=None, secret_key=None, pool: Optional[KeyPool] = None, bot_id: str = "upbit",
+                 order_key_name: Optional[str] = None):
+        if pool is None:
+            pool = KeyPool.for_upbit([ApiKey(name="default", access_key=access_key, secret_key=secret_key)])
+        self.pool = pool
+        self.order_slot = pool.order_slot(bot_id, order_key_name)
+        self.upbit = self.order_slot.client
 
     def get_balance(self, symbol: str) -> Dict[str, float]:
-        balances = self.upbit.get_balances()
+        balances = self.pool.call("get_balances")
         # print(balances)
         krw = next((float(b['balance']) for b in balances if b['currency'] == 'KRW'), 0.0)
         coin = next((float(b['balance']) for b in balances if b['currency'] == symbol.replace("KRW-", "")), 0.0)
@@ -112,18 +169,17 @@ class UpbitApi:
         return pyupbit.get_current_price(symbol)
 
     def order(self, symbol: str, price: float, qty: float, side: str) -> Optional[str]:
-        if side == 'buy':
-            result = self.upbit.buy_limit_order(symbol, price, qty)
-        else:
-            result = self.upbit.sell_limit_order(symbol, price, qty)
+        method = "buy_limit_order" if side == 'buy' else "sell_limit_order"
+        result = self.pool.call(method, symbol, price, qty, slot=self.order_slot)
 
         if result and 'uuid' in result:
             return result['uuid']
-        logger.error(f"Order failed: {side} {qty}@{price} result={result}")
+        logger.error("Order failed: %s %s@%s result=%s", side, qty, price, result,
+                     extra={"event": "order_failed", "side": side, "price": price, "qty": qty})
         return None
 
     def check_order_status(self, order_id: str) -> tuple[bool, float]:
-        result = self.upbit.get_order(order_id)
+        result = self.pool.call("get_order", order_id)
         if result:
             filled_qty = sum(float(t['volume']) for t in result['trades']) if result['trades'] else 0.0
             total_qty = float(result['volume'])
@@ -132,17 +188,20 @@ class UpbitApi:
         return False, 0.0
 
     def cancel(self, order_id: str) -> bool:
-        result = self.upbit.cancel_order(order_id)
+        result = self.pool.call("cancel_order", order_id, slot=self.order_slot)
         return result is not None
 
 # ----------------------------------------------------------------------------
 # 거래 로직
 # ----------------------------------------------------------------------------
 class TradingBot:
-    def __init__(self, code: str, api: UpbitApi): # api: BithumbApi):
+    def __init__(self, code: str, api: UpbitApi, params: Optional[BracketParams] = None): # api: BithumbApi):
         self.code = code
         self.api = api
+        self.params = params or BracketParams()
         self.state = OrderState()
+        # 호가 단위/최소 주문 금액/수수료 (디스크 캐시, TTL 만료 시에만 API 조회)
+        self.meta = load_market_meta("upbit", code, api.upbit)
 
     def start(self):
         logger.info("Starting bot")
@@ -156,16 +215,16 @@ class TradingBot:
     def _initial_buy(self):
         bal = self.api.get_balance(self.code)
         price = INITIAL_BUY_PRICE or self.api.get_price(self.code)
-        amount = min(bal['available_krw'], INITIAL_CAPITAL) * INITIAL_BUY_RATIO
-        qty = round(amount / price, 6)
+        qty = initial_buy_qty(self.params, self.meta, bal['available_krw'], price)
         order_id = self.api.order(self.code, price, qty, 'buy')
-        logger.info(f"Inital Buy ID: {order_id}, price: {price}, qty: {qty}")
-        send_discord_message(f"Inital Buy ID: {order_id}, price: {price}, qty: {qty}")
+        logger.info("Inital Buy ID: %s, price: %s, qty: %s", order_id, price, qty,
+                    extra={"event": "order_submitted", "side": "buy", "order_id": order_id, "price": price, "qty": qty})
+        send_discord_message("Inital Buy ID: %s, price: %s, qty: %s" % (order_id, price, qty))
         if order_id:
             self.state.buy_id = order_id
             self.state.buy_price = price
             self.state.buy_qty = qty
-            self.state.buy_floor = price * (1 + BUY_FLOOR_DROP)
+            self.state.buy_floor = price * (1 + self.params.buy_floor_drop)
             save_state(self.state)
             self._await_fill(order_id, "buy")
 
@@ -173,18 +232,20 @@ class TradingBot:
         while True:
             filled, qty = self.api.check_order_status(order_id)
             if filled:
-                logger.info(f"{side.upper()} order fully filled: {qty} units")
-                send_discord_message(f"{side.upper()} order fully filled: {qty} units")
+                logger.info("%s order fully filled: %s units", side.upper(), qty,
+                            extra={"event": "fill", "side": side, "order_id": order_id, "qty": qty})
+                send_discord_message("%s order fully filled: %s units" % (side.upper(), qty))
                 break
             elif qty > 0:
-                logger.info(f"{side.upper()} order partially filled: {qty} units")
+                logger.info("%s order partially filled: %s units", side.upper(), qty,
+                            extra={"event": "partial_fill", "side": side, "order_id": order_id, "qty": qty})
             else:
-                logger.info("Waiting for fill...")
+                logger.info("Waiting for fill...", extra={"event": "no_fill", "order_id": order_id})
             time.sleep(5)
 
     def _main_loop(self):
-        logger.info(f"Main Loop Started: {self.code}")
-        send_discord_message(f"Main Loop Started: {self.code}")
+        logger.info("Main Loop Started: %s", self.code)
+        send_discord_message("Main Loop Started: %s" % (self.code,))
         while True:
             if not self.state.is_execute:
                 break
@@ -194,8 +255,10 @@ class TradingBot:
                 filled, qty = self.api.check_order_status(self.state.sell_id)
                 # print(f"Checking sell status:{self.state.sell_id} ")
                 if filled:
-                    logger.info(f"Sold:{self.state.sell_id}, price: {self.state.sell_price}, qty: {qty} ")
-                    send_discord_message(f"Sold:{self.state.sell_id}, price: {self.state.sell_price}, qty: {qty} ")
+                    logger.info("Sold:%s, price: %s, qty: %s ", self.state.sell_id, self.state.sell_price, qty,
+                                extra={"event": "fill", "side": "sell", "order_id": self.state.sell_id,
+                                       "price": self.state.sell_price, "qty": qty})
+                    send_discord_message("Sold:%s, price: %s, qty: %s " % (self.state.sell_id, self.state.sell_price, qty))
                     self.state.sell_id = None
                     self.state.consecutive_buys = 0
                     save_state(self.state)
@@ -205,8 +268,10 @@ class TradingBot:
                 filled, qty = self.api.check_order_status(self.state.buy_id)
                 print(f"Checking buy status:{self.state.buy_id} ")
                 if filled:
-                    logger.info(f"Bought:{self.state.buy_id}, price: {self.state.buy_price}, qty: {qty} ")
-                    send_discord_message(f"Bought:{self.state.buy_id}, price: {self.state.buy_price}, qty: {qty} ")
+                    logger.info("Bought:%s, price: %s, qty: %s ", self.state.buy_id, self.state.buy_price, qty,
+                                extra={"event": "fill", "side": "buy", "order_id": self.state.buy_id,
+                                       "price": self.state.buy_price, "qty": qty})
+                    send_discord_message("Bought:%s, price: %s, qty: %s " % (self.state.buy_id, self.state.buy_price, qty))
                     self.state.buy_id = None
                     self.state.consecutive_buys += 1
                     save_state(self.state)
@@ -217,74 +282,64 @@ class TradingBot:
 
     def _place_bracket_orders(self, is_buy_fill: bool):
         if self.state.sell_id:
-            logger.info(f"Cancel sell:{self.state.sell_id} ")
+            logger.info("Cancel sell:%s ", self.state.sell_id, extra={"event": "cancel", "order_id": self.state.sell_id})
             self.api.cancel(self.state.sell_id)
             self.state.sell_id = None
         if self.state.buy_id:
-            logger.info(f"Cancel buy:{self.state.buy_id} ")
+            logger.info("Cancel buy:%s ", self.state.buy_id, extra={"event": "cancel", "order_id": self.state.buy_id})
             self.api.cancel(self.state.buy_id)
             self.state.buy_id = None
 
         bal = self.api.get_balance(self.code)
-        cash = bal['available_krw']
-        qty = bal['total_coin']
-        avg_price = bal['avg_price'] #self.state.buy_price
-
-        if is_buy_fill:
-            base_sell_p = avg_price
-            base_buy_p = self.state.buy_price
-        else:
-            base_sell_p = self.state.sell_price
-            base_buy_p = avg_price
+        bracket = compute_bracket(self.params, self.meta, self.state, is_buy_fill,
+                                  bal['available_krw'], bal['total_coin'], bal['avg_price'])
 
-        if qty > 0:
-            sell_p = round(base_sell_p * (1 + PROFIT_TARGET))
-            sell_qty = round((INITIAL_CAPITAL * ORDER_RATIO) / sell_p, 6)
-            sell_qty = min(sell_qty, qty)
+        if not bracket.sold_out:
+            sell_p, sell_qty = bracket.sell_price, bracket.sell_qty
             sid = self.api.order(self.code, sell_p, sell_qty, 'sell')
-            logger.info(f"Order New Sell:{sid}, sell price:{sell_p}, sell qty:{sell_qty} ")
-            send_discord_message(f"Order New Sell:{sid}, sell price:{sell_p}, sell qty:{sell_qty} ")
+            logger.info("Order New Sell:%s, sell price:%s, sell qty:%s ", sid, sell_p, sell_qty,
+                        extra={"event": "order_submitted", "side": "sell", "order_id": sid, "price": sell_p, "qty": sell_qty})
+            send_discord_message("Order New Sell:%s, sell price:%s, sell qty:%s " % (sid, sell_p, sell_qty))
             if sid:
                 self.state.sell_id = sid
                 self.state.sell_price = sell_p
                 self.state.sell_qty = sell_qty
         else:
-            logger.info(f"All Coins were sold out !!! ")
-            send_discord_message(f"All Coins were sold out !!! ")
+            logger.info("All Coins were sold out !!! ")
+            send_discord_message("All Coins were sold out !!! ")
             self.state.is_execute = False
 
             if self.state.sell_id:
-                logger.info(f"Termination: Cancel sell:{self.state.sell_id} ")
+                logger.info("Termination: Cancel sell:%s ", self.state.sell_id,
+                            extra={"event": "cancel", "order_id": self.state.sell_id})
                 self.api.cancel(self.state.sell_id)
                 self.state.sell_id = None
             if self.state.buy_id:
-                logger.info(f"Termination: Cancel buy:{self.state.buy_id} ")
+                logger.info("Termination: Cancel buy:%s ", self.state.buy_id,
+                            extra={"event": "cancel", "order_id": self.state.buy_id})
                 self.api.cancel(self.state.buy_id)
                 self.state.buy_id = None
 
             return
 
-        if self.state.consecutive_buys < MAX_CONSECUTIVE_BUYS:
-            buy_p = round(base_buy_p * (1 + LOSS_LIMIT))
-
-            if cash <= 5000:
-                logger.info(f"{cash} is insufficient !! ")
-                send_discord_message(f"{cash} is insufficient !! ")
-                return
-
-            if buy_p >= self.state.buy_floor:
-                buy_qty = round((INITIAL_CAPITAL * ORDER_RATIO) / buy_p, 6)
-                buy_qty = min(buy_qty, round(cash / buy_p, 6))
-                bid = self.api.order(self.code, buy_p, buy_qty, 'buy')
-                logger.info(f"Order New Buy:{bid}, buy price:{buy_p}, buy qty:{buy_qty} ")
-                send_discord_message(f"Order New Buy:{bid}, buy price:{buy_p}, buy qty:{buy_qty} ")
-                if bid:
-                    self.state.buy_id = bid
-                    self.state.buy_price = buy_p
-                    self.state.buy_qty = buy_qty
-        else:
-            logger.info(f"MAX_CONSECUTIVE_BUYS: {self.state.consecutive_buys} reached !!!")
-            send_discord_message(f"MAX_CONSECUTIVE_BUYS: {self.state.consecutive_buys} reached !!!")
+        if bracket.skip_reason == "max_buys":
+            logger.info("MAX_CONSECUTIVE_BUYS: %s reached !!!", self.state.consecutive_buys)
+            send_discord_message("MAX_CONSECUTIVE_BUYS: %s reached !!!" % (self.state.consecutive_buys,))
+        elif bracket.skip_reason == "insufficient_cash":
+            cash = bal['available_krw']
+            logger.info("%s is insufficient !! ", cash)
+            send_discord_message("%s is insufficient !! " % (cash,))
+            return
+        elif bracket.buy_price is not None:
+            buy_p, buy_qty = bracket.buy_price, bracket.buy_qty
+            bid = self.api.order(self.code, buy_p, buy_qty, 'buy')
+            logger.info("Order New Buy:%s, buy price:%s, buy qty:%s ", bid, buy_p, buy_qty,
+                        extra={"event": "order_submitted", "side": "buy", "order_id": bid, "price": buy_p, "qty": buy_qty})
+            send_discord_message("Order New Buy:%s, buy price:%s, buy qty:%s " % (bid, buy_p, buy_qty))
+            if bid:
+                self.state.buy_id = bid
+                self.state.buy_price = buy_p
+                self.state.buy_qty = buy_qty
         save_state(self.state)
 
     def stop(self):
@@ -298,15 +353,14 @@ class TradingBot:
 # 실행
 # ----------------------------------------------------------------------------
 if __name__ == '__main__':
-    ConnKey = os.getenv("UPBIT_ACCESS_KEY")
-    SecKey = os.getenv("UPBIT_SECRET_KEY")
-
-    bot = TradingBot("KRW-XRP", UpbitApi(ConnKey, SecKey))
+    # UPBIT_API_KEYS(키 풀) 또는 UPBIT_ACCESS_KEY/UPBIT_SECRET_KEY
+    pool = KeyPool.for_upbit(ApiKeySettings().keys("upbit"))
+    bot = TradingBot("KRW-XRP", UpbitApi(pool=pool, bot_id="KRW-XRP"))
     try:
         bot.start()
     except KeyboardInterrupt:
         bot.stop()
     except Exception as e:
-        logger.critical(f"Unexpected error: {e}", exc_info=True)
+        logger.critical("Unexpected error: %s", e, exc_info=True, extra={"event": "error"})
         bot.stop()
 
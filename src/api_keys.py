@@ -0,0 +1,278 @@
+import time
+import zlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from pydantic import BaseModel, Field
+from pydantic_settings import BaseSettings
+
+from order_registry import fetch_open_orders, fetch_recent_fills
+
+logger = logging.getLogger("TradingBotLogger").getChild("keys")
+
+# 요청 한도 초과로 보이는 거래소 응답 (pybithumb은 HTTP 오류도 응답 dict를 그대로 돌려줌)
+RATE_LIMIT_STATUSES = {"5900", "429"}
+RATE_LIMIT_COOLDOWN_SEC = 1.0
+
+
+class ApiKey(BaseModel):
+    """API 키 1개 (같은 거래소 계정의 키여야 함: 조회는 아무 키로나, 주문은 그리드마다 고정 키로 나감)"""
+    name: str = Field(..., min_length=1, description="키 이름 (그리드 설정 api_key로 지정)")
+    access_key: str = Field(..., min_length=1, description="API access key")
+    secret_key: str = Field(..., min_length=1, description="API secret key")
+    rate_limit: float = Field(default=10, gt=0, description="이 키로 보낼 초당 요청 수 (거래소 한도보다 약간 낮게)")
+    burst: Optional[int] = Field(default=None, ge=1, description="순간 최대 요청 수 (기본: rate_limit)")
+    orders: bool = Field(default=True, description="주문에 배정할 수 있는 키인지 (False면 조회 전용)")
+
+    class Config:
+        extra = "forbid"
+
+
+class ApiKeySettings(BaseSettings):
+    """거래소 API 키 설정 (.env / 환경 변수)
+
+    *_API_KEYS에 JSON 목록으로 키 풀을 주면 그것을 쓰고, 없으면 기존 단일 키
+    (*_ACCESS_KEY / *_SECRET_KEY) 1개짜리 풀로 동작한다.
+    예) BITHUMB_API_KEYS='[{"name": "k1", "access_key": "...", "secret_key": "..."}, ...]'
+    """
+    BITHUMB_ACCESS_KEY: Optional[str] = Field(default=None, description="빗썸 단일 API access key")
+    BITHUMB_SECRET_KEY: Optional[str] = Field(default=None, description="빗썸 단일 API secret key")
+    BITHUMB_API_KEYS: list[ApiKey] = Field(default_factory=list, description="빗썸 API 키 풀 (JSON 목록)")
+    BITHUMB_RATE_LIMIT: float = Field(default=10, gt=0, description="단일 키 사용 시 초당 요청 수")
+
+    UPBIT_ACCESS_KEY: Optional[str] = Field(default=None, description="업비트 단일 API access key")
+    UPBIT_SECRET_KEY: Optional[str] = Field(default=None, description="업비트 단일 API secret key")
+    UPBIT_API_KEYS: list[ApiKey] = Field(default_factory=list, description="업비트 API 키 풀 (JSON 목록)")
+    UPBIT_RATE_LIMIT: float = Field(default=8, gt=0, description="단일 키 사용 시 초당 요청 수")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        case_sensitive = True
+        extra = "ignore"
+
+    def keys(self, exchange: str) -> list[ApiKey]:
+        prefix = exchange.upper()
+        pool = getattr(self, f"{prefix}_API_KEYS")
+        if pool:
+            names = [k.name for k in pool]
+            if len(set(names)) != len(names):
+                raise ValueError(f"{prefix}_API_KEYS에 중복된 키 이름이 있습니다: {names}")
+            return pool
+        access, secret = getattr(self, f"{prefix}_ACCESS_KEY"), getattr(self, f"{prefix}_SECRET_KEY")
+        if not access or not secret:
+            raise ValueError(f"{prefix} API 키가 없습니다 ({prefix}_API_KEYS 또는 {prefix}_ACCESS_KEY/SECRET_KEY)")
+        return [ApiKey(name="default", access_key=access, secret_key=secret,
+                       rate_limit=getattr(self, f"{prefix}_RATE_LIMIT"))]
+
+
+class RateBucket:
+    """키 1개의 요청 한도 (토큰 버킷: 초당 rate개 충전, 최대 burst개)"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = float(burst or max(1, int(rate)))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.used = 0
+        self.waits = 0
+        self.rate_limited = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self, now: Optional[float] = None) -> float:
+        """지금 쓸 수 있는 토큰 수 (한도 초과 응답 후 쉬는 중이면 음수)"""
+        now = now or time.monotonic()
+        with self._lock:
+            self._refill(now)
+            if now < self._blocked_until:
+                return -(self._blocked_until - now) * self.rate
+            return self._tokens
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        now = now or time.monotonic()
+        with self._lock:
+            self._refill(now)
+            blocked = max(0.0, self._blocked_until - now)
+            return max(blocked, (1.0 - self._tokens) / self.rate if self._tokens < 1.0 else 0.0)
+
+    def take(self):
+        """토큰 1개 사용 (모자라도 사용: 호출 전에 wait_time만큼 기다렸다는 전제)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1.0
+            self.used += 1
+
+    def penalize(self, seconds: float):
+        """거래소가 한도 초과로 거절: seconds 동안 이 키로 보내지 않음"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+            self.rate_limited += 1
+
+
+@dataclass
+class KeySlot:
+    key: ApiKey
+    client: Any
+    bucket: RateBucket = field(repr=False)
+
+
+class KeyPool:
+    """API 키 풀: 조회는 여유가 가장 많은 키로 분산하고, 주문은 그리드마다 고정된 키로 보낸다
+
+    - 조회 요청은 키마다 토큰 버킷으로 초당 요청 수를 추적해, 남은 토큰이 가장 많은 키를 고른다.
+      모든 키가 바닥이면 가장 빨리 풀리는 키를 max_wait초까지 기다린다 (조회 처리량 = 키 수 x 키당 한도).
+    - 주문(매수/매도/취소)은 grid_client()에서 정한 키 1개로만 나간다: 같은 그리드의 주문 순서와
+      거래소 쪽 주문 내역이 한 키에 모이도록. 주문도 그 키의 버킷을 소모한다.
+    - 버킷은 프로세스 안에서만 공유된다. 같은 키를 여러 그리드 프로세스가 쓰면 rate_limit를 나눠 잡을 것.
+    """
+
+    def __init__(self, keys: list[ApiKey], client_factory: Callable[[ApiKey], Any], max_wait: float = 2.0):
+        if not keys:
+            raise ValueError("API 키가 비어 있습니다")
+        self.slots = [KeySlot(k, client_factory(k), RateBucket(k.rate_limit, k.burst)) for k in keys]
+        self.max_wait = max_wait
+        self._by_name = {slot.key.name: slot for slot in self.slots}
+
+    @classmethod
+    def for_bithumb(cls, keys: list[ApiKey], **kwargs) -> "KeyPool":
+        from pybithumb import Bithumb
+        return cls(keys, lambda k: Bithumb(k.access_key, k.secret_key), **kwargs)
+
+    @classmethod
+    def for_upbit(cls, keys: list[ApiKey], **kwargs) -> "KeyPool":
+        import pyupbit
+        return cls(keys, lambda k: pyupbit.Upbit(k.access_key, k.secret_key), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def order_slot(self, grid_id: str, name: Optional[str] = None) -> KeySlot:
+        """그리드의 주문용 키: name이 있으면 그 키, 없으면 grid_id 해시로 고정 배정 (재시작해도 같음)"""
+        if name is not None:
+            if name not in self._by_name:
+                raise ValueError(f"API 키 풀에 없는 키 이름입니다: {name} (있는 키: {list(self._by_name)})")
+            return self._by_name[name]
+        order_slots = [s for s in self.slots if s.key.orders] or self.slots
+        return order_slots[zlib.crc32(grid_id.encode()) % len(order_slots)]
+
+    def acquire(self, slot: Optional[KeySlot] = None) -> KeySlot:
+        """요청 1건을 보낼 키 선택 (slot을 주면 그 키) 후 토큰 사용. 필요하면 한도가 풀릴 때까지 대기"""
+        if slot is None:
+            now = time.monotonic()
+            slot = max(self.slots, key=lambda s: s.bucket.available(now))
+        wait = slot.bucket.wait_time()
+        if wait > 0:
+            slot.bucket.waits += 1
+            time.sleep(min(wait, self.max_wait))
+        slot.bucket.take()
+        return slot
+
+    def observe(self, slot: KeySlot, response):
+        """응답이 한도 초과면 해당 키를 잠시 쉬게 함"""
+        if isinstance(response, dict) and (str(response.get("status")) in RATE_LIMIT_STATUSES
+                                           or "too many" in str(response.get("message", "")).lower()):
+            slot.bucket.penalize(RATE_LIMIT_COOLDOWN_SEC)
+            logger.warning("API 키 요청 한도 초과: %s (%.1f초 쉼)", slot.key.name, RATE_LIMIT_COOLDOWN_SEC,
+                           extra={"event": "rate_limited", "key": slot.key.name})
+        return response
+
+    def call(self, method: str, *args, slot: Optional[KeySlot] = None, **kwargs):
+        slot = self.acquire(slot)
+        try:
+            response = getattr(slot.client, method)(*args, **kwargs)
+        except Exception as e:
+            # pyupbit은 한도 초과를 예외(TooManyRequests)로 던짐
+            if "toomany" in type(e).__name__.lower():
+                self.observe(slot, {"status": "429", "message": str(e)})
+            raise
+        return self.observe(slot, response)
+
+    def grid_client(self, grid_id: str, order_key_name: Optional[str] = None) -> "PooledBithumb":
+        slot = self.order_slot(grid_id, order_key_name)
+        logger.info("그리드 주문 키 배정: %s -> %s (키 풀 %d개)", grid_id, slot.key.name, len(self.slots),
+                    extra={"event": "key_assigned", "grid_id": grid_id, "key": slot.key.name, "pool": len(self.slots)})
+        return PooledBithumb(self, slot)
+
+    def stats(self) -> list[dict]:
+        return [{"key": s.key.name, "rate_limit": s.key.rate_limit, "used": s.bucket.used,
+                 "waits": s.bucket.waits, "rate_limited": s.bucket.rate_limited,
+                 "available": round(s.bucket.available(), 2)} for s in self.slots]
+
+
+class PooledBithumb:
+    """pybithumb Bithumb과 같은 메서드로 KeyPool을 쓰는 클라이언트 (coin_main/allocator/market_meta용)"""
+
+    def __init__(self, pool: KeyPool, order_slot: KeySlot):
+        self.pool = pool
+        self.order_slot = order_slot
+
+    # --- 공개 API (키 불필요, IP 단위 한도) ---
+    def get_current_price(self, ticker: str, *args, **kwargs):
+        return self.order_slot.client.get_current_price(ticker, *args, **kwargs)
+
+    # --- 조회: 키 풀에 분산 ---
+    def get_balance(self, ticker: str):
+        return self.pool.call("get_balance", ticker)
+
+    def get_order_completed(self, order_desc):
+        return self.pool.call("get_order_completed", order_desc)
+
+    def get_trading_fee(self, ticker: str, *args, **kwargs):
+        return self.pool.call("get_trading_fee", ticker, *args, **kwargs)
+
+    def get_open_orders(self, ticker: str) -> list[dict]:
+        # 목록 조회는 pybithumb 메서드가 아니라 pool.call을 못 거치므로, 응답을 직접 observe에 넘겨 한도 초과를 반영
+        slot = self.pool.acquire()
+        return fetch_open_orders(slot.client, ticker, observe=lambda resp: self.pool.observe(slot, resp))
+
+    def get_recent_fills(self, ticker: str, side: str, since: float) -> list[dict]:
+        slot = self.pool.acquire()
+        return fetch_recent_fills(slot.client, ticker, side, since, observe=lambda resp: self.pool.observe(slot, resp))
+
+    # --- 주문: 그리드 고정 키 ---
+    def buy_limit_order(self, ticker: str, price: float, unit: float, *args, **kwargs):
+        return self.pool.call("buy_limit_order", ticker, price, unit, *args, slot=self.order_slot, **kwargs)
+
+    def sell_limit_order(self, ticker: str, price: float, unit: float, *args, **kwargs):
+        return self.pool.call("sell_limit_order", ticker, price, unit, *args, slot=self.order_slot, **kwargs)
+
+    def cancel_order(self, order_desc):
+        return self.pool.call("cancel_order", order_desc, slot=self.order_slot)
+
+    @property
+    def api(self):
+        """pybithumb 내부 API 직접 호출용 (주문 키)"""
+        return self.order_slot.client.api
+
+
+def bithumb_client(grid_id: str, order_key_name: Optional[str] = None,
+                   settings: Optional[ApiKeySettings] = None) -> PooledBithumb:
+    """설정(.env)의 빗썸 키 풀로 그리드용 클라이언트 생성"""
+    settings = settings or ApiKeySettings()
+    return KeyPool.for_bithumb(settings.keys("bithumb")).grid_client(grid_id, order_key_name)
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description="API 키 풀 확인 (키 값은 출력하지 않음)")
+    parser.add_argument("exchange", choices=["bithumb", "upbit"])
+    parser.add_argument("--grid", action="append", default=[], help="주문 키 배정을 확인할 grid_id (여러 번)")
+    args = parser.parse_args()
+
+    keys = ApiKeySettings().keys(args.exchange)
+    pool = KeyPool(keys, lambda k: None)
+    print(json.dumps({
+        "keys": [{"name": k.name, "rate_limit": k.rate_limit, "orders": k.orders} for k in keys],
+        "query_capacity_per_sec": sum(k.rate_limit for k in keys),
+        "order_keys": {grid: pool.order_slot(grid).key.name for grid in args.grid},
+    }, ensure_ascii=False, indent=2))
@@ -0,0 +1,287 @@
+import os
+import csv
+import json
+import math
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, replace
+from typing import Optional
+
+import numpy as np
+
+from adjust_trading import BracketParams, OrderState, compute_bracket, initial_buy_qty
+from market_meta import MarketMeta, load_market_meta
+
+# 연율 드리프트/변동성 (코인 원화 마켓 대략치). 시뮬레이션 구간별 시나리오 비교용
+REGIMES = {
+    "sideways": {"drift": 0.0, "vol": 0.6},
+    "bull": {"drift": 1.0, "vol": 0.7},
+    "bear": {"drift": -1.0, "vol": 0.8},
+    "volatile": {"drift": 0.0, "vol": 1.5},
+}
+YEAR_SEC = 365 * 24 * 3600
+
+
+@dataclass
+class PathConfig:
+    """가격 경로 생성 설정 (GBM 또는 과거 수익률 블록 부트스트랩)"""
+    steps: int = 30 * 24 * 60        # 경로 길이 (스텝 수)
+    step_sec: float = 60.0           # 스텝 간격 (초)
+    start_price: float = 1000.0
+    drift: float = 0.0               # 연율 드리프트
+    vol: float = 0.6                 # 연율 변동성
+    t_df: Optional[float] = None     # 지정하면 정규분포 대신 자유도 t_df의 t분포 (두꺼운 꼬리)
+    returns: Optional[np.ndarray] = None  # 부트스트랩할 스텝 로그수익률 (있으면 GBM 대신 사용)
+    block: int = 60                  # 부트스트랩 블록 길이 (자기상관/변동성 군집 유지)
+
+
+def generate_paths(cfg: PathConfig, n: int, rng: np.random.Generator) -> np.ndarray:
+    """(n, steps) 가격 경로를 한 번에 생성 (경로별 파이썬 루프 없음)"""
+    if cfg.returns is not None:
+        blocks = math.ceil(cfg.steps / cfg.block)
+        starts = rng.integers(0, len(cfg.returns) - cfg.block, size=(n, blocks))
+        idx = (starts[:, :, None] + np.arange(cfg.block)).reshape(n, -1)[:, :cfg.steps]
+        log_ret = cfg.returns[idx]
+    else:
+        dt = cfg.step_sec / YEAR_SEC
+        if cfg.t_df:
+            z = rng.standard_t(cfg.t_df, size=(n, cfg.steps)) * math.sqrt((cfg.t_df - 2) / cfg.t_df)
+        else:
+            z = rng.standard_normal((n, cfg.steps))
+        log_ret = (cfg.drift - 0.5 * cfg.vol ** 2) * dt + cfg.vol * math.sqrt(dt) * z
+    log_ret[:, 0] = 0.0
+    np.cumsum(log_ret, axis=1, out=log_ret)
+    return cfg.start_price * np.exp(log_ret, out=log_ret)
+
+
+def load_returns(path: str, step_sec: float, record_dir: Optional[str] = None) -> tuple[np.ndarray, float]:
+    """과거 가격에서 step_sec 간격 로그수익률과 마지막 가격을 읽음
+
+    path: CSV(price[, ts] 열) 또는 Parquet 파일. record_dir가 있으면 path는 "TICKER" 또는 "TICKER:일수"로
+    MarketRecorder 기록(ticker 종류)을 읽는다.
+    """
+    if record_dir:
+        from market_recorder import MarketDataReader
+        ticker, _, days = path.partition(":")
+        end = time.time()
+        table = MarketDataReader(record_dir).read(ticker, "ticker", end - float(days or 30) * 86400, end)
+        ts, prices = table.column("ts").to_numpy(), table.column("price").to_numpy()
+    elif path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        prices = table.column("price").to_numpy()
+        ts = table.column("ts").to_numpy() if "ts" in table.column_names else None
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        prices = np.array([float(r["price"]) for r in rows])
+        ts = np.array([float(r["ts"]) for r in rows]) if rows and "ts" in rows[0] else None
+    if ts is not None:
+        # step_sec 구간마다 마지막 가격만 남김 (틱 단위 기록 -> 스텝 가격)
+        bucket = (ts // step_sec).astype(np.int64)
+        last = np.flatnonzero(np.diff(bucket, append=bucket[-1] + 1))
+        prices = prices[last]
+    if len(prices) < 2:
+        raise ValueError(f"수익률을 만들 가격이 부족합니다: {path}")
+    return np.diff(np.log(prices)), float(prices[-1])
+
+
+# --- 경로 1개 시뮬레이션 ---
+def _first_cross(path: np.ndarray, i: int, sell: float, buy: float) -> int:
+    """i 이후 처음으로 매도가 이상/매수가 이하에 닿는 스텝 (없으면 -1). 창을 2배씩 넓혀가며 벡터 검색"""
+    n, width = len(path), 256
+    while i < n:
+        seg = path[i:i + width]
+        hit = (seg >= sell) | (seg <= buy)
+        k = int(hit.argmax())
+        if hit[k]:
+            return i + k
+        i += width
+        width = min(width * 2, 1 << 16)
+    return -1
+
+
+def simulate_path(path: np.ndarray, params: BracketParams, meta: MarketMeta, step_sec: float = 60.0) -> dict:
+    """adjust_trading의 체결 -> compute_bracket -> 재주문 흐름을 가격 경로 1개에 적용
+
+    - 지정가는 가격이 닿으면 전량 체결 (매도 먼저 확인, 봇 루프와 같은 순서), 수수료는 taker_fee
+    - 최소 주문 금액 미만 주문은 거래소가 거절한 것으로 보고 내지 않음
+    - 평단은 업비트처럼 매수 체결가 가중평균 (매도는 평단을 바꾸지 않음)
+    """
+    fee = meta.taker_fee
+    capital = params.initial_capital
+    cash = capital
+    p0 = float(path[0])
+    qty = initial_buy_qty(params, meta, cash, p0)
+    cash -= p0 * qty * (1 + fee)
+    coin, avg = qty, p0
+    state = OrderState(buy_price=p0, buy_qty=qty, buy_floor=p0 * (1 + params.buy_floor_drop), consecutive_buys=1)
+    buys, sells, sellout_step = 1, 0, None
+    lockup_sum, lockup_max = 0.0, coin * avg / capital
+    peak, max_dd = cash + coin * p0, 0.0
+    is_buy_fill, i, n = True, 1, len(path)
+
+    while True:
+        bracket = compute_bracket(params, meta, state, is_buy_fill, cash, coin, avg)
+        if bracket.sold_out:
+            sellout_step = i - 1
+            break
+        sell_p, sell_q = bracket.sell_price, bracket.sell_qty
+        if sell_p * sell_q < meta.min_notional:
+            sell_p = math.inf
+        buy_p, buy_q = bracket.buy_price, bracket.buy_qty
+        if buy_p is None or buy_p * buy_q < meta.min_notional:
+            buy_p = -math.inf
+
+        j = _first_cross(path, i, sell_p, buy_p)
+        end = n if j < 0 else j + 1
+        equity = cash + coin * path[i:end]
+        running = np.maximum.accumulate(np.maximum(equity, peak))
+        max_dd = max(max_dd, float(((running - equity) / running).max()))
+        peak = float(running[-1])
+        lockup_sum += coin * avg / capital * (end - i)
+        if j < 0:
+            break
+
+        if path[j] >= sell_p:
+            cash += sell_p * sell_q * (1 - fee)
+            coin -= sell_q
+            if coin <= 1e-12:
+                coin, avg = 0.0, 0.0
+            state.sell_price = sell_p
+            state.consecutive_buys = 0
+            sells += 1
+            is_buy_fill = False
+        else:
+            cost = buy_p * buy_q
+            cash -= cost * (1 + fee)
+            avg = (avg * coin + cost) / (coin + buy_q)
+            coin += buy_q
+            state.buy_price = buy_p
+            state.consecutive_buys += 1
+            buys += 1
+            is_buy_fill = True
+            lockup_max = max(lockup_max, coin * avg / capital)
+        i = j + 1
+
+    last = float(path[-1] if sellout_step is None else path[sellout_step])
+    return {
+        "pnl": cash + coin * last - capital,
+        "pnl_pct": (cash + coin * last - capital) / capital,
+        "lockup_avg": lockup_sum / max(n - 1, 1),
+        "lockup_max": lockup_max,
+        "max_drawdown": max_dd,
+        "sellout_hours": None if sellout_step is None else sellout_step * step_sec / 3600,
+        "buys": buys,
+        "sells": sells,
+        "end_coin_value": coin * last,
+    }
+
+
+def _run_chunk(args) -> list[dict]:
+    """프로세스 풀 작업 단위: 경로 chunk개를 워커 안에서 생성해 시뮬레이션 (큰 배열을 프로세스 간에 보내지 않음)"""
+    path_cfg, params, meta_dict, n, seed = args
+    meta = MarketMeta(**meta_dict)
+    rng = np.random.default_rng(seed)
+    paths = generate_paths(path_cfg, n, rng)
+    return [simulate_path(p, params, meta, path_cfg.step_sec) for p in paths]
+
+
+def run_simulation(path_cfg: PathConfig, params: BracketParams, meta: MarketMeta, n_paths: int,
+                   workers: Optional[int] = None, chunk: int = 100, seed: int = 0) -> list[dict]:
+    """n_paths개 경로를 chunk개씩 나눠 프로세스 풀로 실행"""
+    seeds = np.random.SeedSequence(seed).spawn(math.ceil(n_paths / chunk))
+    jobs = [(path_cfg, params, meta.to_dict(), min(chunk, n_paths - k * chunk), s) for k, s in enumerate(seeds)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [r for job in jobs for r in _run_chunk(job)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [r for rows in pool.map(_run_chunk, jobs) for r in rows]
+
+
+def summarize(results: list[dict]) -> dict:
+    """경로별 결과를 분포 요약 (평균/백분위, 손실 확률, 전량 매도 비율)"""
+    def dist(values) -> dict:
+        arr = np.asarray(values, dtype=float)
+        if not len(arr):
+            return {}
+        q = np.percentile(arr, [5, 25, 50, 75, 95])
+        return {"mean": float(arr.mean()), "p5": float(q[0]), "p25": float(q[1]), "p50": float(q[2]),
+                "p75": float(q[3]), "p95": float(q[4])}
+
+    sellouts = [r["sellout_hours"] for r in results if r["sellout_hours"] is not None]
+    return {
+        "paths": len(results),
+        "pnl_pct": dist([r["pnl_pct"] for r in results]),
+        "loss_prob": float(np.mean([r["pnl"] < 0 for r in results])),
+        "lockup_avg": dist([r["lockup_avg"] for r in results]),
+        "lockup_max": dist([r["lockup_max"] for r in results]),
+        "max_drawdown": dist([r["max_drawdown"] for r in results]),
+        "sellout_rate": len(sellouts) / max(len(results), 1),
+        "sellout_hours": dist(sellouts),
+        "fills": dist([r["buys"] + r["sells"] for r in results]),
+    }
+
+
+def _print_summary(name: str, summary: dict):
+    print(f"=== {name} ({summary['paths']} paths) ===")
+    print(f"  손실 확률 {summary['loss_prob']:.1%}, 전량 매도 비율 {summary['sellout_rate']:.1%}")
+    for key, label, fmt in (("pnl_pct", "손익률", "{:+.2%}"), ("lockup_avg", "평균 묶인 자본", "{:.1%}"),
+                            ("lockup_max", "최대 묶인 자본", "{:.1%}"), ("max_drawdown", "최대 낙폭", "{:.1%}"),
+                            ("sellout_hours", "전량 매도까지(시간)", "{:.1f}"), ("fills", "체결 수", "{:.0f}")):
+        d = summary[key]
+        if d:
+            print(f"  {label:<14} mean {fmt.format(d['mean'])} | p5 {fmt.format(d['p5'])} p50 {fmt.format(d['p50'])} "
+                  f"p95 {fmt.format(d['p95'])}")
+
+
+if __name__ == "__main__":
+    defaults = BracketParams()
+    parser = argparse.ArgumentParser(description="adjust_trading 브래킷 전략 몬테카를로 시뮬레이터")
+    parser.add_argument("--paths", type=int, default=10_000)
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--step-sec", type=float, default=60)
+    parser.add_argument("--start-price", type=float, default=1000)
+    parser.add_argument("--regimes", default="sideways,bull,bear,volatile",
+                        help=f"GBM 시나리오 목록 ({','.join(REGIMES)}), --history가 있으면 무시")
+    parser.add_argument("--t-df", type=float, default=None, help="t분포 자유도 (두꺼운 꼬리, 예: 4)")
+    parser.add_argument("--history", help="부트스트랩할 과거 가격 (CSV/Parquet, --record-dir와 쓰면 TICKER[:일수])")
+    parser.add_argument("--record-dir", help="MarketRecorder 기록 디렉터리")
+    parser.add_argument("--block", type=int, default=60, help="부트스트랩 블록 길이 (스텝)")
+    parser.add_argument("--ticker", default="KRW-XRP", help="호가 단위/수수료를 가져올 마켓 (캐시/기본값, API 호출 없음)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=100, help="프로세스 작업당 경로 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="경로별 결과 CSV")
+    parser.add_argument("--json", action="store_true", help="요약을 JSON으로 출력")
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    params = replace(defaults, **{k: getattr(args, k) for k in asdict(defaults)})
+    meta = load_market_meta("upbit", args.ticker)
+    base = PathConfig(steps=int(args.days * 86400 / args.step_sec), step_sec=args.step_sec,
+                      start_price=args.start_price, t_df=args.t_df, block=args.block)
+    if args.history:
+        returns, last_price = load_returns(args.history, args.step_sec, args.record_dir)
+        scenarios = {"bootstrap": replace(base, returns=returns, start_price=last_price)}
+    else:
+        scenarios = {name: replace(base, **REGIMES[name]) for name in args.regimes.split(",")}
+
+    summaries, rows = {}, []
+    for name, path_cfg in scenarios.items():
+        started = time.monotonic()
+        results = run_simulation(path_cfg, params, meta, args.paths, args.workers, args.chunk, args.seed)
+        summaries[name] = {**summarize(results), "elapsed_sec": round(time.monotonic() - started, 1)}
+        rows.extend({"scenario": name, **r} for r in results)
+        if not args.json:
+            _print_summary(f"{name} ({summaries[name]['elapsed_sec']}s)", summaries[name])
+
+    if args.json:
+        print(json.dumps({"params": asdict(params), "scenarios": summaries}, ensure_ascii=False, indent=2))
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
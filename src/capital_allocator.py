@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import signal
+import socket
+import logging
+import itertools
+import threading
+import socketserver
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+logger = logging.getLogger("TradingBotLogger").getChild("allocator")
+
+KRW = "KRW"
+
+
+@dataclass
+class Reservation:
+    """주문 1건을 위해 잡아둔 자금 (남은 금액만 유지)"""
+    res_id: str
+    grid_id: str
+    asset: str
+    amount: float
+
+
+class CapitalAllocator:
+    """여러 그리드가 같은 거래소 잔고(KRW/코인)를 나눠 쓰도록 예약을 원자적으로 관리
+
+    - reserve(): 주문 전 필요한 금액을 예약 (여유분이 없으면 None)
+    - consume(): 체결된 만큼 예약과 총 잔고를 함께 차감 (다음 대사 전까지 잔고를 정확히 유지)
+    - credit(): 체결로 생긴 반대 자산(매수 -> 코인, 매도 -> KRW)을 총 잔고에 더함
+    - release(): 주문 종료 시 남은 예약 해제
+    - reconcile(): 거래소 잔고로 총 잔고를 보정 (주기적으로만 호출, 주문 경로에서는 API 호출 없음)
+
+    여유분 = 총 잔고 - max(우리 예약 합계, 거래소 거래중 잔고). 거래중 잔고가 예약보다 크면
+    다른 프로그램/수동 주문이 잡고 있는 금액으로 보고 함께 제외한다.
+    """
+
+    def __init__(self, reconcile_interval: float = 30.0):
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._totals: dict[str, float] = defaultdict(float)
+        self._in_use: dict[str, float] = defaultdict(float)
+        self._reserved: dict[str, float] = defaultdict(float)
+        self._reservations: dict[str, Reservation] = {}
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid()}-{int(time.time())}"
+        self._last_reconcile = 0.0
+
+    def _free_locked(self, asset: str) -> float:
+        return self._totals[asset] - max(self._reserved[asset], self._in_use[asset])
+
+    def free(self, asset: str) -> float:
+        with self._lock:
+            return self._free_locked(asset)
+
+    def reserve(self, grid_id: str, asset: str, amount: float) -> Optional[str]:
+        with self._lock:
+            if amount <= 0 or self._free_locked(asset) < amount:
+                return None
+            res_id = f"{self._prefix}-{next(self._ids)}"
+            self._reservations[res_id] = Reservation(res_id, grid_id, asset, amount)
+            self._reserved[asset] += amount
+            return res_id
+
+    def consume(self, res_id: Optional[str], asset: str, amount: float):
+        with self._lock:
+            res = self._reservations.get(res_id) if res_id else None
+            if res is not None:
+                used = min(amount, res.amount)
+                res.amount -= used
+                self._reserved[asset] -= used
+            self._totals[asset] -= amount
+
+    def credit(self, asset: str, amount: float):
+        with self._lock:
+            self._totals[asset] += amount
+
+    def release(self, res_id: Optional[str]):
+        if not res_id:
+            return
+        with self._lock:
+            res = self._reservations.pop(res_id, None)
+            if res is not None:
+                self._reserved[res.asset] -= res.amount
+
+    def release_grid(self, grid_id: str) -> int:
+        """그리드 재시작 시 이전 프로세스가 남긴 예약 일괄 해제"""
+        with self._lock:
+            stale = [r for r in self._reservations.values() if r.grid_id == grid_id]
+            for res in stale:
+                del self._reservations[res.res_id]
+                self._reserved[res.asset] -= res.amount
+            return len(stale)
+
+    def reconcile(self, balances: dict[str, tuple[float, float]]):
+        """거래소 잔고 {자산: (총 잔고, 거래중 잔고)} 로 보정"""
+        with self._lock:
+            for asset, (total, in_use) in balances.items():
+                self._totals[asset] = float(total)
+                self._in_use[asset] = float(in_use)
+            self._last_reconcile = time.monotonic()
+
+    def maybe_reconcile(self, fetch_balances: Callable[[], dict]):
+        """reconcile_interval이 지났을 때만 잔고 조회 후 보정"""
+        if time.monotonic() - self._last_reconcile < self.reconcile_interval:
+            return
+        try:
+            self.reconcile(fetch_balances())
+        except Exception as e:
+            self._last_reconcile = time.monotonic()  # 실패해도 매 루프 재시도하지 않음
+            logger.error("잔고 대사 실패: %s", e, extra={"event": "reconcile_error"})
+
+    def status(self) -> dict:
+        with self._lock:
+            assets = set(self._totals) | set(self._reserved)
+            return {
+                asset: {
+                    "total": self._totals[asset],
+                    "in_use": self._in_use[asset],
+                    "reserved": self._reserved[asset],
+                    "free": self._free_locked(asset),
+                }
+                for asset in sorted(assets)
+            }
+
+
+def bithumb_balances(client, ticker: str) -> dict[str, tuple[float, float]]:
+    """pybithumb get_balance 결과 (총코인, 거래중코인, 총원화, 거래중원화) 를 allocator 형식으로 변환"""
+    bal = client.get_balance(ticker)
+    return {ticker: (float(bal[0]), float(bal[1])), KRW: (float(bal[2]), float(bal[3]))}
+
+
+# --- Unix 소켓 데몬 (여러 그리드 프로세스가 하나의 allocator를 공유) ---
+class _AllocatorRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        allocator: CapitalAllocator = self.server.allocator
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+                op = req.pop("op")
+                if op not in ("reserve", "consume", "credit", "release", "release_grid", "free", "status"):
+                    raise ValueError(f"unknown op: {op}")
+                resp = {"ok": True, "result": getattr(allocator, op)(**req)}
+            except Exception as e:
+                resp = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(resp).encode() + b"\n")
+            self.wfile.flush()
+
+
+class AllocatorServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, allocator: CapitalAllocator):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        self.allocator = allocator
+        super().__init__(socket_path, _AllocatorRequestHandler)
+
+
+class RemoteAllocator:
+    """AllocatorServer 클라이언트 (CapitalAllocator와 같은 인터페이스)
+
+    대사는 데몬이 직접 수행하므로 maybe_reconcile()은 아무것도 하지 않는다.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 2.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+
+    def _call(self, op: str, **kwargs):
+        payload = json.dumps({"op": op, **kwargs}).encode() + b"\n"
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                try:
+                    self._sock.sendall(payload)
+                except OSError:
+                    # 데몬 재시작 등으로 끊긴 연결: 요청이 전달되지 않았으므로 한 번만 재연결 후 재전송
+                    self.close()
+                    self._connect()
+                    self._sock.sendall(payload)
+                line = self._reader.readline()
+                if not line:
+                    raise ConnectionError("allocator 연결 종료")
+            except OSError:
+                self.close()
+                raise
+        resp = json.loads(line)
+        if not resp["ok"]:
+            raise RuntimeError(resp["error"])
+        return resp["result"]
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._reader = None
+
+    def reserve(self, grid_id: str, asset: str, amount: float) -> Optional[str]:
+        return self._call("reserve", grid_id=grid_id, asset=asset, amount=amount)
+
+    def consume(self, res_id: Optional[str], asset: str, amount: float):
+        self._call("consume", res_id=res_id, asset=asset, amount=amount)
+
+    def credit(self, asset: str, amount: float):
+        self._call("credit", asset=asset, amount=amount)
+
+    def release(self, res_id: Optional[str]):
+        if res_id:
+            self._call("release", res_id=res_id)
+
+    def release_grid(self, grid_id: str) -> int:
+        return self._call("release_grid", grid_id=grid_id)
+
+    def free(self, asset: str) -> float:
+        return self._call("free", asset=asset)
+
+    def status(self) -> dict:
+        return self._call("status")
+
+    def maybe_reconcile(self, fetch_balances: Callable[[], dict]):
+        return None
+
+
+def serve(socket_path: str, tickers: list[str], reconcile_interval: float):
+    """allocator 데몬 실행: 소켓으로 예약 요청을 받고, reconcile_interval마다 빗썸 잔고로 보정
+
+    보통 supervisor가 워커보다 먼저 띄우고 SIGTERM으로 종료한다 (소켓 파일 정리).
+    """
+    from dotenv import load_dotenv
+    from log_config import setup_logging
+    from api_keys import bithumb_client
+
+    load_dotenv()
+    setup_logging("TradingBotLogger", file_prefix="allocator")
+    client = bithumb_client("allocator")  # 잔고 조회만 하므로 키 풀에 분산
+    allocator = CapitalAllocator(reconcile_interval)
+
+    def fetch_all() -> dict:
+        balances = {}
+        for ticker in tickers:
+            balances.update(bithumb_balances(client, ticker))
+        return balances
+
+    allocator.maybe_reconcile(fetch_all)  # 조회가 실패해도 데몬은 뜨고 (예약은 거절) 다음 주기에 재시도
+    server = AllocatorServer(socket_path, allocator)
+    threading.Thread(target=server.serve_forever, name="AllocatorServer", daemon=True).start()
+    logger.info("allocator 데몬 시작: %s (tickers=%s)", socket_path, tickers, extra={"event": "allocator_start"})
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.wait(1):
+            allocator.maybe_reconcile(fetch_all)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="그리드 공용 자금 배분 데몬")
+    parser.add_argument("command", choices=["serve", "status"])
+    parser.add_argument("--socket", default="run/allocator.sock")
+    parser.add_argument("--tickers", default="DOGE", help="대사할 티커 목록 (쉼표 구분)")
+    parser.add_argument("--interval", type=float, default=30.0, help="잔고 대사 주기 (초)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.socket, [t.strip() for t in args.tickers.split(",") if t.strip()], args.interval)
+    else:
+        print(json.dumps(RemoteAllocator(args.socket).status(), indent=2))
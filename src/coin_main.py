@@ -1,43 +1,69 @@
 # 필요한 패키지를 설치하세요: python-dotenv, pybithumb, requests
 import os
 import time
-import logging
 import json
+import math
+import logging
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
 from pathlib import Path
 import requests
 import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pybithumb import Bithumb
 from dotenv import load_dotenv
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import Optional
 from datetime import datetime, timezone, timedelta
 
+from grid_config import GridConfig, GridConfigWatcher, load_grid_config, diff_grid_config
+from log_config import setup_logging, queue_backlog
+from trade_ledger import TradeLedger, Fill, RoundTrip, parse_contracts
+from capital_allocator import CapitalAllocator, RemoteAllocator, bithumb_balances, KRW
+from price_watermark import PriceWatermark
+from volatility import CandleAggregator, SpacingPolicy
+from risk_guard import RiskGuard
+from market_recorder import MarketRecorder
+from orderbook import OrderBook, OrderBookFeed, buy_fill_gap
+from sim_exchange import SimulatedExchange
+from status_server import StatusBoard, StatusServer
+from diagnostics import DiagnosticSignals, ResourceTracker
+from order_registry import OrderRegistry, InFlight, order_key, fetch_open_orders, fetch_recent_fills, match_fills
+from market_meta import MarketMeta, PriceLadder, load_market_meta
+from price_ticks import TickScale
+from api_keys import bithumb_client as api_bithumb_client
+from venue_router import build_routed_client
+
 # --- 상수 정의 ---
 # 거래 상태
 STANDBY = 'STANDBY'  # 대기
 BUYING = 'BUYING'  # 매수 주문 진행 중
+BUY_PARTIAL = 'BUY_PARTIAL'  # 매수 주문 일부 체결 (잔량 대기, 체결분은 바로 매도)
 ACTIVE = 'ACTIVE'  # 매수 완료 (매도 대기)
 SELLING = 'SELLING'  # 매도 주문 진행 중
+SELL_PARTIAL = 'SELL_PARTIAL'  # 매도 주문 일부 체결
+
+QTY_EPS = 1e-9  # 수량 비교 오차
+UNIT_SCALE = TickScale()  # 그리드 밖에서 만든 레벨용 (1틱 = 1원)
+PARTIAL_SELL_MIN_KRW = 1000  # 부분 체결분 선매도 최소 금액 (거래소 최소 주문 금액보다 작으면 최소 주문 금액)
+PARTIAL_POLL_BASE_SEC = 3  # 부분 체결 후 변화 없는 주문의 재조회 간격 (2배씩 증가)
+PARTIAL_POLL_MAX_SEC = 60
+GUARD_CANCEL_WORKERS = 8  # 리스크 가드 발동 시 매수 대기 주문을 동시에 취소할 스레드 수
+FEE_BUFFER_RATIO = 0.001  # 마켓 메타가 없을 때(단독 테스트 등) 매수 예약 수수료 버퍼 (0.1%)
 
 KST = timezone(timedelta(hours=9))
 
 # --- 환경 설정 ---
 load_dotenv()
 
-# 로거 설정
-log_path = Path("log")
-log_path.mkdir(parents=True, exist_ok=True)
-LOG_FILE_NAME = log_path / f"trading_{datetime.today().strftime('%Y%m%d')}.log"
-
-logger = logging.getLogger("TradingBotLogger")
-logger.setLevel(logging.INFO)
-file_handler = RotatingFileHandler(LOG_FILE_NAME, maxBytes=100 * 1024 * 1024, backupCount=5, encoding="utf-8")
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+# 로거 설정 (log/trading_YYYYMMDD.log, JSON-lines, 파일 기록은 별도 스레드)
+logger = setup_logging("TradingBotLogger", file_prefix="trading")
+loop_logger = logger.getChild("loop")          # 루프별 현재가 등 고빈도 로그
+strategy_logger = logger.getChild("strategy")  # 레벨별 주문/체결 상태 전이
+shadow_logger = logger.getChild("shadow")      # 섀도(모의) 그리드 (기본 WARNING, LOG_LEVELS로 조정)
+if shadow_logger.level == logging.NOTSET:
+    shadow_logger.setLevel(logging.WARNING)
 
 
 # --- 유틸리티 함수 ---
@@ -51,7 +77,7 @@ def send_discord_message(text: str):
     try:
         requests.post(discord_url, json=payload, timeout=5)
     except requests.RequestException as e:
-        logger.error(f"디스코드 메시지 전송 실패: {e}")
+        logger.error("디스코드 메시지 전송 실패: %s", e, extra={"event": "discord_error"})
 
 def save_strategies_snapshot(strategies, filepath: str):
     """전략 리스트를 JSON으로 저장"""
@@ -60,12 +86,123 @@ def save_strategies_snapshot(strategies, filepath: str):
         snapshot_dir.mkdir(parents=True, exist_ok=True)
 
         data = [s.to_dict() for s in strategies]
-        with open(filepath, "w", encoding="utf-8") as f:
+        # 임시 파일에 쓴 뒤 교체: 저장 도중 프로세스가 죽어도 기존 스냅샷은 온전히 남음
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
 
-        logger.info(f"전략 스냅샷 저장: {filepath} (개수: {len(data)})")
+        logger.info("전략 스냅샷 저장: %s (개수: %d)", filepath, len(data),
+                    extra={"event": "snapshot", "path": str(filepath), "count": len(data)})
     except Exception as e:
-        logger.error(f"전략 스냅샷 저장 실패: {e}")
+        logger.error("전략 스냅샷 저장 실패: %s", e, extra={"event": "snapshot_error", "path": str(filepath)})
+
+def load_strategies_snapshot(filepath: str, ctx: Optional["GridContext"] = None) -> list:
+    """save_strategies_snapshot으로 저장한 JSON에서 전략 리스트 복원 (파일이 없으면 빈 리스트)"""
+    if not os.path.isfile(filepath):
+        return []
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    known = {f.name for f in Strategy.__dataclass_fields__.values() if not f.name.startswith("_") and f.name != "ctx"}
+    strategies = []
+    for item in data:
+        kwargs = {k: v for k, v in item.items() if k in known}
+        if kwargs.get("last_action_at"):
+            kwargs["last_action_at"] = datetime.fromisoformat(kwargs["last_action_at"])
+        if isinstance(kwargs.get("order_id"), list):
+            kwargs["order_id"] = tuple(kwargs["order_id"])
+        for child in kwargs.get("child_sells", []):
+            if isinstance(child.get("order_id"), list):
+                child["order_id"] = tuple(child["order_id"])
+            child["reservation"] = None  # 예약은 프로세스마다 새로 잡음 (거래중 잔고로 대사됨)
+        strategies.append(Strategy(**kwargs, ctx=ctx))
+    return strategies
+
+
+def touch_heartbeat(path: Optional[str]):
+    """슈퍼바이저 생존 확인용 heartbeat 파일 mtime 갱신 (루프마다 호출, 내용은 쓰지 않음)"""
+    if path:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(str(os.getpid()))
+
+
+def lease_valid(path: Optional[str]) -> bool:
+    """클러스터 모드: supervisor가 기록한 임대 유효 시각(epoch)이 지났으면 False
+
+    supervisor가 죽어 갱신이 멈추면 다른 노드가 넘겨받기 전에 스스로 멈추기 위한 확인.
+    """
+    if not path:
+        return True
+    try:
+        return time.time() < float(Path(path).read_text())
+    except (OSError, ValueError):
+        return False
+
+
+# --- 그리드 런타임 컨텍스트 ---
+@dataclass
+class GridContext:
+    """그리드 단위로 공유하는 런타임 객체 (스냅샷에는 저장하지 않음)"""
+    grid_id: str
+    ticker: str = ""
+    ledger: Optional[TradeLedger] = None
+    allocator: Optional[CapitalAllocator | RemoteAllocator] = None
+    # 주문번호 -> 레벨 색인과 응답을 못 받은 주문 (섀도 그리드는 None)
+    registry: Optional[OrderRegistry] = None
+    # 마켓 주문 규칙 (호가 단위/최소 주문 금액/수수료) 과 그리드 가격대의 유효 호가 사다리
+    meta: Optional[MarketMeta] = None
+    prices: Optional[PriceLadder] = None
+    # 가격/수량 고정소수점 단위: 레벨 가격/간격/현재가는 정수 틱, 원화 값은 주문/금액 계산 때만 변환
+    scale: TickScale = field(default_factory=TickScale)
+    recorder: Optional[MarketRecorder] = None
+    # 웹소켓 호가창 (있으면 매도 최우선가 기준으로 매수 주문 시점 판단) 과 그 설정값
+    book: Optional[OrderBook] = None
+    book_fill_ticks: int = 1
+    book_max_age: float = 5.0
+    book_deferred: int = 0  # 호가창 기준으로 매수 주문을 미룬 횟수
+
+    # 체결 조회 생략 판단용: 이번 틱의 가격 구간과 안전용 주기 조회 간격
+    watermark: Optional[PriceWatermark] = None
+    tick_low: float = math.inf
+    tick_high: float = -math.inf
+    status_sweep_interval: float = 60.0
+    status_queries: int = 0
+    status_skipped: int = 0
+    last_order_reconcile: float = -math.inf  # 마지막 미체결 주문 대사 (monotonic)
+
+    # 추적(trailing) 모드에서 현재 레벨 창의 최상단 매수가 (고정 그리드면 None)
+    anchor: Optional[int] = None
+    # 고정 그리드에서 위로 추가한 레벨 수 / 다음에 추가할 위 레벨 매수가 (None이면 start_buy_price + buy_interval)
+    up_created: int = 0
+    next_up_price: Optional[int] = None
+
+    # 틱 가격으로 증분 계산하는 캔들/변동성 지표와, 그걸 읽어 새 레벨 간격을 정하는 정책
+    candles: Optional[CandleAggregator] = None
+    spacing: Optional[SpacingPolicy] = None
+
+    # 프로세스 공용 가격 이상 감지 (켜져 있으면 모든 그리드가 같은 객체) 와 이 그리드가 처리한 마지막 발동 번호
+    guard: Optional[RiskGuard] = None
+    guard_seen: int = 0
+    guard_cancel_ms: Optional[float] = None  # 마지막 발동의 감지 -> 매수 취소 완료 지연
+
+    # 실현 손익 누적 (이 프로세스 실행 이후)
+    round_trips: int = 0
+    realized_pnl: float = 0.0
+
+    # 레벨 로그/알림 대상 (섀도 그리드는 별도 로거 + 디스코드 알림 끔)
+    log: logging.Logger = field(default=strategy_logger, repr=False)
+    notify_discord: bool = True
+
+    def notify(self, text: str, *args):
+        """디스코드 알림. args가 있으면 로그처럼 text % args (알림을 끈 그리드는 문자열을 만들지 않음)"""
+        if self.notify_discord:
+            send_discord_message(text % args if args else text)
+
 
 # --- 핵심 로직: Strategy 클래스 ---
 @dataclass
@@ -79,6 +216,38 @@ class Strategy:
     status: str = STANDBY
     order_id: Optional[str] = None
     last_action_at: datetime = field(default_factory=lambda: datetime.now(KST))
+    retiring: bool = False  # 설정 변경으로 제거 예정 (보유분 매도 완료 후 삭제)
+
+    # 이번 사이클(매수 -> 매도) 수량 추적
+    filled_qty: float = 0.0        # 매수 체결 누적 수량
+    sold_qty: float = 0.0          # 매도 체결 누적 수량
+    order_placed_qty: float = 0.0  # 현재 order_id 주문 수량
+    order_filled: float = 0.0      # 현재 order_id 체결 수량
+    order_contracts: int = 0       # 현재 order_id에서 이미 반영한 contract 개수
+    # 부분 매수 체결분에 대해 먼저 낸 매도 주문들: [{"order_id", "qty", "filled", "contracts"}]
+    child_sells: list = field(default_factory=list)
+
+    # 체결 금액 누적 (매도 완료 시 실현 손익 계산용)
+    entry_cost: float = 0.0
+    entry_fee_krw: float = 0.0
+    entry_at: Optional[float] = None
+    exit_proceeds: float = 0.0
+    exit_fee_krw: float = 0.0
+    # 최소 주문 금액 미만이라 팔 수 없던 잔량과 그 매수 원가 (다음 매수 체결 때 보유분에 합쳐 함께 매도)
+    carry_qty: float = 0.0
+    carry_cost: float = 0.0
+
+    ctx: Optional[GridContext] = field(default=None, repr=False, compare=False)
+    # 부분 체결 주문 재조회 백오프 (체결 수량이 그대로면 조회 간격을 늘림)
+    _next_poll_at: float = field(default=0.0, repr=False, compare=False)
+    _idle_polls: int = field(default=0, repr=False, compare=False)
+    _reservation: Optional[str] = field(default=None, repr=False, compare=False)  # 현재 주문의 자금 예약 id
+    # 마지막 체결 조회 이후 관측된 최저/최고가 (지정가에 닿지 않았으면 조회 생략)
+    _seen_low: float = field(default=math.inf, repr=False, compare=False)
+    _seen_high: float = field(default=-math.inf, repr=False, compare=False)
+    _last_buy_query_at: float = field(default=0.0, repr=False, compare=False)
+    _last_sell_query_at: float = field(default=0.0, repr=False, compare=False)
+    _errors: int = field(default=0, repr=False, compare=False)  # 연속 update 오류 횟수
 
     def to_dict(self) -> dict:
         return {
@@ -89,189 +258,1337 @@ class Strategy:
             "status": self.status,
             "order_id": self.order_id,
             "last_action_at": self.last_action_at.isoformat(),
+            "retiring": self.retiring,
+            "filled_qty": self.filled_qty,
+            "sold_qty": self.sold_qty,
+            "order_placed_qty": self.order_placed_qty,
+            "order_filled": self.order_filled,
+            "order_contracts": self.order_contracts,
+            "child_sells": self.child_sells,
+            "entry_cost": self.entry_cost,
+            "entry_fee_krw": self.entry_fee_krw,
+            "entry_at": self.entry_at,
+            "exit_proceeds": self.exit_proceeds,
+            "exit_fee_krw": self.exit_fee_krw,
+            "carry_qty": self.carry_qty,
+            "carry_cost": self.carry_cost,
         }
 
     def _print(self):
         print(
-            f"strategy_id: {self.strategy_id}, buy_price: {self.buy_price}, sell_price: {self.sell_price}, order_qty: {self.order_qty}, status: {self.status}, order_id: {self.order_id}, last_action_at: {self.last_action_at}")
+            f"strategy_id: {self.strategy_id}, buy_price: {self._scale.format_price(self.buy_price)}, sell_price: {self._scale.format_price(self.sell_price)}, order_qty: {self.order_qty}, status: {self.status}, order_id: {self.order_id}, last_action_at: {self.last_action_at}")
 
-    def update(self, current_price, client: Bithumb, ticker: str, buy_margin, buy_interval, cancel_depth: int):
+    @property
+    def _log(self) -> logging.Logger:
+        return self.ctx.log if self.ctx is not None else strategy_logger
+
+    @property
+    def _scale(self) -> TickScale:
+        return self.ctx.scale if self.ctx is not None else UNIT_SCALE
+
+    def _notify(self, text: str, *args):
+        if self.ctx is not None:
+            self.ctx.notify(text, *args)
+        else:
+            send_discord_message(text % args if args else text)
+
+    @property
+    def held_qty(self) -> float:
+        """보유 중인(아직 팔리지 않은) 수량"""
+        return max(self.filled_qty - self.sold_qty, 0.0)
+
+    def _unplaced_sell_qty(self) -> float:
+        """보유 수량 중 아직 매도 주문이 걸리지 않은 수량"""
+        outstanding = sum(c["qty"] - c["filled"] for c in self.child_sells)
+        if self.order_id and self.status in (SELLING, SELL_PARTIAL):
+            outstanding += self.order_placed_qty - self.order_filled
+        return max(self.held_qty - outstanding, 0.0)
+
+    def update(self, current_price: int, client: Bithumb, ticker: str, buy_margin: int, buy_interval: int,
+               cancel_depth: int):
+        """레벨 1개 처리. current_price와 가격 설정값은 모두 정수 틱"""
         try:
             if self.status == STANDBY:
-                # 현재가가 (매수가 + 마진) 이하면 지정가 매수
-                if current_price <= (self.buy_price + buy_margin):
+                # 제거 예정 레벨은 신규 매수하지 않음
+                if self.retiring:
+                    return
+                # 현재가가 (매수가 + 마진) 이하면 지정가 매수 (호가창이 있으면 매도 최우선가 기준)
+                if self._buy_triggered(current_price, buy_margin):
                     self._place_order(client, 'buy', ticker)
 
-            elif self.status == BUYING:
+            elif self.status in (BUYING, BUY_PARTIAL):
                 # 현재가보다 5개 전략(= buy_interval * 5) 이상 '밑'에 있는 매수 대기 주문은 취소하여 예수금 확보
                 threshold_price = current_price - (buy_interval * cancel_depth)
                 if self.buy_price <= threshold_price:
                     if self._cancel_open_order(client):
-                        msg = (f"[Strategy {self.strategy_id}] 매수 대기 주문 취소(예수금 확보): "
-                               f"buy={self.buy_price}, 현재가={current_price}, 기준={threshold_price}")
-                        logger.info(msg)
-                        send_discord_message(msg)
+                        px = self._scale.to_price
+                        msg = "[Strategy %s] 매수 대기 주문 취소(예수금 확보): buy=%s, 현재가=%s, 기준=%s"
+                        args = (self.strategy_id, px(self.buy_price), px(current_price), px(threshold_price))
+                        self._log.info(msg, *args, extra={"event": "cancel", "strategy_id": self.strategy_id,
+                                                          "reason": "cancel_depth", "price": args[2]})
+                        self._notify(msg, *args)
                     return
-                self._check_order_completion(client, 'buy')
+                self._check_order_completion(client, 'buy', ticker)
 
             elif self.status == ACTIVE:
-                # 즉시 매도 지정가 진입 (전략 의도 유지)
-                self._place_order(client, 'sell', ticker)
+                # 즉시 매도 지정가 진입 (전략 의도 유지). 부분 체결분 매도가 이미 걸려 있으면 나머지만
+                if self._unplaced_sell_qty() > 0 and self._below_min_sell():
+                    # 최소 주문 금액 미만 잔량: 걸린 매도가 없으면 다음 사이클로 넘기고, 있으면 끝날 때까지 대기
+                    if self.order_id or self.child_sells:
+                        self.status = SELLING
+                        self._check_order_completion(client, 'sell', ticker)
+                    else:
+                        self._carry_dust()
+                elif self._unplaced_sell_qty() > 0:
+                    self._place_order(client, 'sell', ticker)
+                else:
+                    self.status = SELLING
+                    self._check_order_completion(client, 'sell', ticker)
 
-            elif self.status == SELLING:
-                self._check_order_completion(client, 'sell')
+            elif self.status in (SELLING, SELL_PARTIAL):
+                self._check_order_completion(client, 'sell', ticker)
 
         except Exception as e:
-            logger.error(f"[Strategy {self.strategy_id}] 업데이트 오류: {e}")
-            send_discord_message(f" [Strategy {self.strategy_id}] 오류: {e}")
-            # 상태를 단순 리셋하지 않고, 미체결이 있으면 취소 후 STANDBY로
-            try:
-                self._cancel_open_order(client)
-            finally:
-                self.status = STANDBY
-                self.order_id = None
+            # 주문 id/보유 수량/부분 체결분 매도는 그대로 두고 다음 틱에 다시 처리한다.
+            # (STANDBY로 초기화하면 걸려 있는 주문이 고아가 되고 보유분을 잃어버림)
+            self._errors += 1
+            self._log.error("[Strategy %s] 업데이트 오류(%d회 연속): %s", self.strategy_id, self._errors, e,
+                            extra={"event": "strategy_error", "strategy_id": self.strategy_id,
+                                   "errors": self._errors})
+            if self._errors == 1:
+                self._notify(" [Strategy %s] 오류: %s", self.strategy_id, e)
+            self._force_query('buy' if self.status in (BUYING, BUY_PARTIAL) else 'sell')
+        else:
+            self._errors = 0
+
+    def _buy_triggered(self, current_price, buy_margin) -> bool:
+        """매수 주문을 낼 시점인지
+
+        호가창이 최신이면 매도 최우선가가 매수가에서 book_fill_ticks 호가 이내일 때만 (곧 체결될 주문만) 낸다.
+        마지막 체결가만 보면 위로 튄 체결 한 건에도 주문을 내고, 체결되지 않는 주문을 계속 조회/취소하게 된다.
+        호가창이 없거나 오래됐으면 기존 규칙 (현재가 <= 매수가 + buy_margin).
+        """
+        book = self.ctx.book if self.ctx else None
+        if book is not None:
+            # 호가창은 원화 가격이므로 매수가와 호가 단위를 원화로 바꿔 비교
+            price = self.ctx.scale.to_price(self.buy_price)
+            tick = self.ctx.meta.tick_at(price) if self.ctx.meta is not None else self.ctx.scale.to_price(1)
+            gap = buy_fill_gap(book, price, tick, self.ctx.book_max_age)
+            if gap is not None:
+                if gap <= self.ctx.book_fill_ticks:
+                    return True
+                if current_price <= self.buy_price + buy_margin:
+                    self.ctx.book_deferred += 1  # 현재가 규칙이었다면 냈을 주문
+                return False
+        return current_price <= (self.buy_price + buy_margin)
 
     def _place_order(self, client: Bithumb, order_type: str, ticker: str):
+        # 리스크 가드 정지 중에는 신규 매수 금지 (보유분 매도는 계속)
+        if order_type == 'buy' and self.ctx is not None and self.ctx.guard is not None and self.ctx.guard.halted:
+            return
         price = self.buy_price if order_type == 'buy' else self.sell_price
-        qty = self.order_qty
+        qty = self.order_qty if order_type == 'buy' else self._unplaced_sell_qty()
 
         # 안전장치
         if order_type == 'sell' and price <= self.buy_price:
-            logger.warning(f"[Strategy {self.strategy_id}] 비정상 호가(매도가<=매수가). 매도 생략: {price} <= {self.buy_price}")
+            self._log.warning("[Strategy %s] 비정상 호가(매도가<=매수가). 매도 생략: %s <= %s",
+                              self.strategy_id, self._scale.format_price(price), self._scale.format_price(self.buy_price),
+                              extra={"event": "order_skipped", "strategy_id": self.strategy_id})
             return
 
-        # 예수금(보유 KRW) 부족 체크: BUY일 때만 --> 확인 필요
-        if order_type == 'buy':
-            try:
-                bal = client.get_balance(ticker)
-                # 기대 형태: [보유코인, 거래중코인, 보유원화, 거래중원화, ...]
-                krw_avail = None
-                if isinstance(bal, dict) and len(bal) >= 3:
-                    krw_avail = float(bal[2])
-                # 필요 원화 = 가격 * 수량 (+ 수수료/버퍼 약간)
-                need_krw = float(price) * float(qty)
-                fee_buffer_ratio = 0.001  # 0.1% 정도 버퍼(원하면 조정/환경변수화)
-                need_krw *= (1.0 + fee_buffer_ratio)
-
-                if krw_avail is not None and krw_avail < need_krw:
-                    msg = (f"[Strategy {self.strategy_id}] 예수금 부족으로 매수 보류: "
-                        f"필요 {need_krw:,.0f} KRW > 보유 {krw_avail:,.0f} KRW "
-                        f"(price={price}, qty={qty})")
-                    logger.warning(msg)
-                    send_discord_message(msg)
-                    return
-            except Exception as e:
-                # 잔고 조회 실패 시, 안전을 위해 주문을 진행하지 않고 경고만 남김
-                warn = f"[Strategy {self.strategy_id}] 잔고 조회 실패로 매수 보류: {e}"
-                logger.warning(warn)
-                send_discord_message(warn)
-                return
+        # 접수 여부를 모르는 이전 주문이 대사로 확인될 때까지 재주문하지 않음 (재시도 시 중복 주문 방지)
+        registry = self._registry()
+        if registry is not None and registry.blocked(self.strategy_id):
+            return
+
+        # 호가 단위/수량 자릿수/최소 주문 금액 보정 (거절될 주문은 내지 않음). 여기부터는 원화 가격
+        ticks, qty = self._normalize_order(order_type, price, qty)
+        if ticks is None:
+            return
+        price = self._scale.to_price(ticks)
+
+        # 예수금/보유코인 확보: 공용 allocator에서 예약 (거래소 잔고 API는 주기적 대사에만 사용)
+        need = float(price) * float(qty) * (1.0 + self._fee_buffer()) if order_type == 'buy' else float(qty)
+        reservation = self._reserve(client, order_type, ticker, need, price, qty)
+        if reservation is False:
+            return
 
+        tag = registry.begin(self.strategy_id, order_type, price, qty, reservation) if registry is not None else None
+        error = None
         try:
             if order_type == 'buy':
                 order_id = client.buy_limit_order(ticker, float(price), float(qty))
             else:
                 order_id = client.sell_limit_order(ticker, float(price), float(qty))
         except Exception as e:
-            logger.error(f"[Strategy {self.strategy_id}] {order_type.upper()} 주문 예외: {e}")
-            send_discord_message(f" [Strategy {self.strategy_id}] {order_type.upper()} 주문 실패(예외): {e}")
+            order_id, error = None, e
+
+        # pybithumb은 성공 시 주문 id 튜플, 거절 시 거래소 응답(dict), 요청 자체가 실패하면 None을 반환
+        if isinstance(order_id, tuple):
+            if registry is not None:
+                registry.commit(tag, order_id, self)
+            self._on_order_placed(order_type, order_id, price, qty, reservation)
+        elif order_id is None and tag is not None:
+            self._on_order_inflight(order_type, tag, error)
+        else:
+            if registry is not None:
+                registry.abort(tag)
+            msg = "[Strategy %s] %s 주문 실패(%s: %s)"
+            args = (self.strategy_id, order_type.upper(), *(("예외", error) if error is not None
+                                                             else ("응답 비정상", order_id)))
+            self._log.error(msg, *args, extra={"event": "order_failed", "strategy_id": self.strategy_id,
+                                               "side": order_type})
+            self._notify(" " + msg, *args)
+            self._release(reservation)
+
+    def _on_order_placed(self, order_type: str, order_id, price, qty, reservation: Optional[str]):
+        """주문 접수 확정 (주문 응답을 받았거나, 응답을 못 받은 주문이 미체결 대사에서 확인됨)"""
+        self.order_id = order_id
+        self._reservation = reservation
+        self.order_placed_qty = float(qty)
+        self.order_filled = 0.0
+        self.order_contracts = 0
+        self._idle_polls = 0
+        self._next_poll_at = 0.0
+        self._mark_queried(order_type)
+        self.status = BUYING if order_type == 'buy' else SELLING
+        self.last_action_at = datetime.now(KST)
+        msg = "[Strategy %s] %s 주문 제출: price=%s, qty=%s, id=%s"
+        args = (self.strategy_id, order_type.upper(), price, qty, order_id)
+        self._log.info(msg, *args, extra={"event": "order_submitted", "strategy_id": self.strategy_id,
+                                          "side": order_type, "price": price, "qty": qty, "order_id": order_id})
+        self._notify(msg, *args)
+
+    def _on_order_inflight(self, order_type: str, tag: str, error: Optional[Exception]):
+        """응답을 못 받은 주문 (타임아웃/연결 끊김): 거래소에 접수됐을 수 있으므로 예약을 유지한 채
+        in-flight로 남기고, 미체결 대사(reconcile_orders)에서 확인될 때까지 이 레벨은 재주문하지 않는다."""
+        msg = "[Strategy %s] %s 주문 응답 없음(%s): 접수 여부 확인 전까지 재주문 보류 (tag=%s)"
+        args = (self.strategy_id, order_type.upper(), error or 'None', tag)
+        self._log.warning(msg, *args, extra={"event": "order_inflight", "strategy_id": self.strategy_id,
+                                             "side": order_type, "tag": tag})
+        self._notify(msg, *args)
+
+    def _registry(self) -> Optional[OrderRegistry]:
+        return self.ctx.registry if self.ctx else None
+
+    def _fee_buffer(self) -> float:
+        meta = self.ctx.meta if self.ctx else None
+        return meta.taker_fee if meta is not None else FEE_BUFFER_RATIO
+
+    def _normalize_order(self, order_type: str, price: int, qty) -> tuple:
+        """거래소 규칙에 맞춘 (가격 틱, 수량). 최소 주문 금액 미만이면 (None, None)
+
+        매수가는 내림, 매도가는 올림으로 유효 호가에 맞춘다 (레벨 간격/수익 폭이 줄지 않는 방향).
+        시작 시 캐시에서 읽은 메타와 미리 계산한 사다리만 쓰므로 API 호출이 없고, 계산은 모두 정수 틱이다.
+        """
+        meta = self.ctx.meta if self.ctx else None
+        if meta is None:
+            return price, qty
+        scale = self.ctx.scale
+        prices = self.ctx.prices
+        if prices is not None:
+            snapped = prices.floor(price) if order_type == 'buy' else prices.ceil(price)
+        else:
+            snapped = meta.floor_ticks(price, scale) if order_type == 'buy' else meta.ceil_ticks(price, scale)
+        qty = meta.floor_qty(qty)
+        if not meta.meets_min_notional(scale.to_price(snapped), qty):
+            self._log.warning("[Strategy %s] 최소 주문 금액 미만으로 %s 생략: %s x %s < %s", self.strategy_id,
+                              order_type.upper(), scale.format_price(snapped), qty, meta.min_notional,
+                              extra={"event": "order_skipped", "strategy_id": self.strategy_id, "reason": "min_notional"})
+            return None, None
+        return snapped, qty
+
+    def _allocator(self):
+        return self.ctx.allocator if self.ctx else None
+
+    def _reserve(self, client: Bithumb, order_type: str, ticker: str, need: float, price, qty):
+        """주문에 필요한 KRW(매수)/코인(매도)을 예약. 예약 id(allocator 없으면 None), 보류해야 하면 False 반환"""
+        allocator = self._allocator()
+        asset = KRW if order_type == 'buy' else ticker
+        try:
+            if allocator is None:
+                if order_type == 'sell':
+                    return None
+                bal = client.get_balance(ticker)
+                # 기대 형태: (보유코인, 거래중코인, 보유원화, 거래중원화)
+                free = float(bal[2]) - float(bal[3])
+                reservation = None if free >= need else False
+            else:
+                reservation = allocator.reserve(self.ctx.grid_id, asset, need)
+                free = None if reservation else allocator.free(asset)
+                reservation = reservation or False
+        except Exception as e:
+            # 잔고/예약 조회 실패 시, 안전을 위해 주문을 진행하지 않고 경고만 남김
+            warn, args = "[Strategy %s] 잔고 조회 실패로 %s 보류: %s", (self.strategy_id, order_type.upper(), e)
+            self._log.warning(warn, *args, extra={"event": "order_deferred", "strategy_id": self.strategy_id,
+                                                  "reason": "balance_error"})
+            self._notify(warn, *args)
+            return False
+
+        if reservation is False:
+            label = "예수금" if order_type == 'buy' else "보유코인"
+            msg = "[Strategy %s] %s 부족으로 %s 보류: 필요 %.4f %s > 여유 %.4f %s (price=%s, qty=%s)"
+            args = (self.strategy_id, label, order_type.upper(), need, asset, free, asset, price, qty)
+            self._log.warning(msg, *args, extra={"event": "order_deferred", "strategy_id": self.strategy_id,
+                                                 "reason": "insufficient_" + asset, "need": need, "free": free})
+            self._notify(msg, *args)
+        return reservation
+
+    def _release(self, reservation: Optional[str]):
+        allocator = self._allocator()
+        if allocator is not None and reservation:
+            try:
+                allocator.release(reservation)
+            except Exception as e:
+                self._log.error("[Strategy %s] 자금 예약 해제 실패: %s", self.strategy_id, e,
+                                extra={"event": "allocator_error", "strategy_id": self.strategy_id})
+
+    def _below_min_sell(self) -> bool:
+        """아직 매도 주문이 걸리지 않은 보유분이 거래소 최소 주문 금액 미만인지 (메타가 없으면 False)"""
+        meta = self.ctx.meta if self.ctx else None
+        if meta is None:
+            return False
+        prices = self.ctx.prices
+        ticks = prices.ceil(self.sell_price) if prices is not None else meta.ceil_ticks(self.sell_price, self._scale)
+        return not meta.meets_min_notional(self._scale.to_price(ticks), meta.floor_qty(self._unplaced_sell_qty()))
+
+    def _carry_dust(self):
+        """팔 수 없는 잔량을 carry로 옮기고 사이클 종료 -> STANDBY (다음 매수 체결분과 합쳐 매도)
+
+        매수 일부 체결 후 취소되면 잔량이 최소 주문 금액에 못 미쳐 매도가 계속 생략되고, 레벨이 ACTIVE에
+        머물러 다시 매수하지 못한다. 잔량과 그 원가는 레벨에 남겨 두므로 코인/손익이 사라지지 않는다.
+        """
+        dust = self.held_qty
+        cost = self.entry_cost * dust / self.filled_qty if self.filled_qty > 0 else 0.0
+        self.filled_qty -= dust
+        self.entry_cost -= cost
+        self.carry_qty += dust
+        self.carry_cost += cost
+        msg = "[Strategy %s] 최소 주문 금액 미만 잔량 %s 매도 보류: 다음 매수 체결분과 함께 매도 (누적 %s)"
+        args = (self.strategy_id, dust, self.carry_qty)
+        self._log.warning(msg, *args, extra={"event": "dust_carried", "strategy_id": self.strategy_id,
+                                             "qty": dust, "carry_qty": self.carry_qty})
+        self._notify(msg, *args)
+        self._finish_cycle_if_done()
+
+    def _place_partial_sell(self, client: Bithumb, ticker: str):
+        """부분 매수 체결분만큼 바로 매도 주문 (매수 잔량은 그대로 대기)"""
+        qty = self._unplaced_sell_qty()
+        meta = self.ctx.meta if self.ctx else None
+        min_krw = max(PARTIAL_SELL_MIN_KRW, meta.min_notional) if meta is not None else PARTIAL_SELL_MIN_KRW
+        if qty <= 0 or qty * self._scale.to_price(self.sell_price) < min_krw:
             return
-
-        if order_id:
-            self.order_id = order_id
-            self.status = BUYING if order_type == 'buy' else SELLING
-            self.last_action_at = datetime.now(KST)
-            msg = f"[Strategy {self.strategy_id}] {order_type.upper()} 주문 제출: price={price}, qty={qty}, id={order_id}"
-            logger.info(msg)
-            send_discord_message(msg)
+        ticks, qty = self._normalize_order('sell', self.sell_price, qty)
+        if ticks is None:
+            return
+        price = self._scale.to_price(ticks)
+        registry = self._registry()
+        if registry is not None and registry.blocked(self.strategy_id):
+            return
+        reservation = self._reserve(client, 'sell', ticker, qty, price, qty)
+        if reservation is False:
+            return
+        tag = registry.begin(self.strategy_id, 'sell', price, qty, reservation, child=True) \
+            if registry is not None else None
+        try:
+            order_id = client.sell_limit_order(ticker, float(price), float(qty))
+        except Exception as e:
+            order_id, error = None, e
+        else:
+            error = None
+        if isinstance(order_id, tuple):
+            if registry is not None:
+                registry.commit(tag, order_id, self)
+            self._on_child_sell_placed(order_id, qty, reservation)
+        elif order_id is None and tag is not None:
+            self._on_order_inflight('sell', tag, error)
         else:
-            msg = f"[Strategy {self.strategy_id}] {order_type.upper()} 주문 실패(응답 비정상): {order_id}"
-            logger.error(msg)
-            send_discord_message(f" {msg}")
+            if registry is not None:
+                registry.abort(tag)
+            self._log.error("[Strategy %s] 부분 체결분 매도 주문 실패: %s", self.strategy_id, error or order_id,
+                            extra={"event": "order_failed", "strategy_id": self.strategy_id, "side": "sell"})
+            self._release(reservation)
+
+    def _on_child_sell_placed(self, order_id, qty: float, reservation: Optional[str]):
+        self.child_sells.append({"order_id": order_id, "qty": float(qty), "filled": 0.0, "contracts": 0,
+                                 "reservation": reservation})
+        self._mark_queried('sell')
+        price = self._scale.to_price(self.sell_price)
+        msg = "[Strategy %s] SELL 주문 제출(부분 체결분): price=%s, qty=%s, id=%s"
+        args = (self.strategy_id, price, qty, order_id)
+        self._log.info(msg, *args, extra={"event": "order_submitted", "strategy_id": self.strategy_id, "side": "sell",
+                                          "price": price, "qty": qty, "order_id": order_id, "partial": True})
+        self._notify(msg, *args)
+
+    def _query_order(self, client: Bithumb, order_id) -> Optional[dict]:
+        """체결 조회 후 data(dict) 반환. 조회 실패/응답 비정상이면 None"""
+        try:
+            result = client.get_order_completed(order_id)
+        except Exception as e:
+            self._log.error("[Strategy %s] 체결 조회 실패: %s", self.strategy_id, e,
+                            extra={"event": "query_error", "strategy_id": self.strategy_id})
+            return None
+
+        # 기대 형태: {"status":"0000","data":{...}}
+        if not isinstance(result, dict) or result.get("status") != "0000":
+            self._log.error("[Strategy %s] 체결 응답 비정상: %s", self.strategy_id, result,
+                            extra={"event": "query_error", "strategy_id": self.strategy_id})
+            return None
 
-    def _check_order_completion(self, client: Bithumb, order_type: str):
+        data = result.get("data")
+        if not isinstance(data, dict) or not data:
+            self._log.info("[Strategy %s] 체결 내역 없음(대기 중일 수 있음): %s", self.strategy_id, result,
+                           extra={"event": "no_fill", "strategy_id": self.strategy_id})
+            return None
+        return data
+
+    def _absorb_contracts(self, order_type: str, order_id, contracts: list, seen: int,
+                          reservation: Optional[str] = None) -> float:
+        """새로 생긴 contract만 원장/누적 금액/자금 예약에 반영하고, 새로 체결된 수량을 반환"""
+        parsed = parse_contracts(contracts[seen:], fallback_ts=time.time())
+        registry = self._registry()
+        if registry is not None:
+            registry.note_fills(order_type, contracts[seen:])
+        ledger = self.ctx.ledger if self.ctx else None
+        allocator = self._allocator()
+        new_units = 0.0
+        for price, units, fee_krw, ts in parsed:
+            new_units += units
+            if allocator is not None:
+                if order_type == 'buy':
+                    allocator.consume(reservation, KRW, price * units + fee_krw)
+                    allocator.credit(self.ctx.ticker, units)
+                else:
+                    allocator.consume(reservation, self.ctx.ticker, units)
+                    allocator.credit(KRW, price * units - fee_krw)
+            if order_type == 'buy':
+                if self.carry_qty > 0:
+                    # 이전 사이클에서 넘어온 잔량을 이번 보유분에 합침
+                    self.filled_qty += self.carry_qty
+                    self.entry_cost += self.carry_cost
+                    self.carry_qty = self.carry_cost = 0.0
+                self.filled_qty += units
+                self.entry_cost += price * units
+                self.entry_fee_krw += fee_krw
+                if self.entry_at is None:
+                    self.entry_at = ts
+            else:
+                self.sold_qty += units
+                self.exit_proceeds += price * units
+                self.exit_fee_krw += fee_krw
+            if ledger is not None:
+                ledger.record_fill(Fill(
+                    grid_id=self.ctx.grid_id, strategy_id=self.strategy_id, level_price=self._scale.to_price(self.buy_price),
+                    side=order_type, price=price, units=units, fee_krw=fee_krw,
+                    order_id=order_key(order_id), ts=ts))
+        return new_units
+
+    def _check_child_sells(self, client: Bithumb):
+        """부분 체결분 매도 주문들의 체결 확인 (완료/취소된 주문은 목록에서 제거)"""
+        for child in list(self.child_sells):
+            data = self._query_order(client, child["order_id"])
+            if data is None:
+                continue
+            contracts = data.get("contract") or []
+            new_units = self._absorb_contracts('sell', child["order_id"], contracts, child["contracts"],
+                                               child.get("reservation"))
+            child["contracts"] = len(contracts)
+            child["filled"] += new_units
+            if self._scale.to_lots(child["filled"]) >= self._scale.to_lots(child["qty"]) \
+                    or data.get("order_status") in ('Completed', 'Cancel'):
+                self._release(child.get("reservation"))
+                self.child_sells.remove(child)
+
+    def _observe_tick(self):
+        """이번 틱의 가격 구간을 마지막 조회 이후 최저/최고 관측가에 누적"""
+        if self.ctx is not None:
+            self._seen_low = min(self._seen_low, self.ctx.tick_low)
+            self._seen_high = max(self._seen_high, self.ctx.tick_high)
+
+    def _mark_queried(self, side: str):
+        """해당 방향 주문을 방금 조회(또는 제출)했으므로 관측 구간을 현재 틱부터 다시 시작"""
+        if side == 'buy':
+            self._seen_low = math.inf
+            self._last_buy_query_at = time.monotonic()
+        else:
+            self._seen_high = -math.inf
+            self._last_sell_query_at = time.monotonic()
+        self._observe_tick()
+
+    def _sweep_due(self, side: str) -> bool:
+        """스트림 누락 대비 안전용 주기 조회 시점인지 (워터마크가 있을 때만, _force_query 후에도 True)"""
+        if self.ctx is None or self.ctx.watermark is None:
+            return False
+        last_query_at = self._last_buy_query_at if side == 'buy' else self._last_sell_query_at
+        return time.monotonic() - last_query_at >= self.ctx.status_sweep_interval
+
+    def _touched(self, side: str) -> bool:
+        """마지막 조회 이후 지정가에 가격이 닿았는지 (워터마크가 없으면 항상 True)"""
+        if self.ctx is None or self.ctx.watermark is None:
+            return True
+        if self._sweep_due(side):
+            return True
+        if side == 'buy':
+            return self._seen_low <= self.buy_price
+        return self._seen_high >= self.sell_price
+
+    def _check_order_completion(self, client: Bithumb, order_type: str, ticker: Optional[str] = None):
+        self._observe_tick()
+        if self.child_sells and self._touched('sell'):
+            self._check_child_sells(client)
+            self._mark_queried('sell')
         if not self.order_id:
+            if order_type == 'sell':
+                self._finish_cycle_if_done()
+            return
+
+        # 부분 체결 후 변화가 없던 주문은 백오프 간격 동안 재조회하지 않음. 부분 체결 주문은 보통 지정가에
+        # 걸쳐 있어 워터마크로는 매 틱 '닿음'이므로 워터마크와 상관없이 먼저 확인 (주기 조회/_force_query만 예외)
+        partial = self.status in (BUY_PARTIAL, SELL_PARTIAL)
+        if partial and time.monotonic() < self._next_poll_at and not self._sweep_due(order_type):
+            if self.ctx is not None:
+                self.ctx.status_skipped += 1
+            return
+        if not self._touched(order_type):
+            self.ctx.status_skipped += 1
+            return
+        data = self._query_order(client, self.order_id)
+        self._mark_queried(order_type)
+        if self.ctx is not None:
+            self.ctx.status_queries += 1
+        if data is None:
             return
         try:
-            result = client.get_order_completed(self.order_id)
+            order_qty = float(data.get("order_qty", 0) or 0)
+            contracts = data.get("contract") or []
+            new_units = self._absorb_contracts(order_type, self.order_id, contracts, self.order_contracts,
+                                               self._reservation)
         except Exception as e:
-            logger.error(f"[Strategy {self.strategy_id}] 체결 조회 실패: {e}")
+            self._log.error("[Strategy %s] 체결 데이터 파싱 실패: %s / raw=%s", self.strategy_id, e, data,
+                            extra={"event": "query_error", "strategy_id": self.strategy_id})
             return
+        self.order_contracts = len(contracts)
+        self.order_filled += new_units
+        order_status = data.get("order_status")
 
-        # 기대 형태: {"status":"0000","data":[{...}]}
-        if not isinstance(result, dict) or result.get("status") != "0000":
-            logger.error(f"[Strategy {self.strategy_id}] 체결 응답 비정상: {result}")
-            return
-        
-        data = result.get("data")
+        # 상태 문자열이 Completed여도 부분 체결일 수 있으므로 수량 비교로 판단 (체결 누적 합의 오차가 없도록 lot 단위)
+        if order_status == 'Completed' and self._scale.to_lots(order_qty) == self._scale.to_lots(self.order_filled):
+            self._idle_polls = 0
+            if order_type == 'buy':
+                self.status = ACTIVE
+                msg = " [Strategy %s] 매수 완전 체결! -> 매도 대기 (id=%s, qty=%s)"
+            else:
+                msg = " [Strategy %s] 매도 완전 체결! -> 초기화 (id=%s, qty=%s)"
+            args = (self.strategy_id, self.order_id, order_qty)
+            self._log.info(msg, *args, extra={"event": "fill", "strategy_id": self.strategy_id, "side": order_type,
+                                              "order_id": self.order_id, "qty": order_qty})
+            self._notify(msg, *args)
+            self.order_id = None
+            self._release(self._reservation)
+            self._reservation = None
+            self.last_action_at = datetime.now(KST)
+            if order_type == 'sell':
+                self._finish_cycle_if_done()
+        elif order_status == 'Cancel':
+            # 거래소/수동 취소: 체결분은 유지하고 나머지는 다시 정리
+            self._log.warning("[Strategy %s] 주문이 외부에서 취소됨: id=%s, filled=%s", self.strategy_id,
+                              self.order_id, self.order_filled,
+                              extra={"event": "cancel", "strategy_id": self.strategy_id, "reason": "external"})
+            self.order_id = None
+            self._release(self._reservation)
+            self._reservation = None
+            self._after_order_closed()
+        elif self.order_filled > 0:
+            self.status = BUY_PARTIAL if order_type == 'buy' else SELL_PARTIAL
+            if new_units > 0:
+                self._idle_polls = 0
+                self._log.info("[Strategy %s] 부분 체결 진행 중: filled=%s, ordered=%s, remain=%s",
+                               self.strategy_id, self.order_filled, order_qty,
+                               max(order_qty - self.order_filled, 0.0),
+                               extra={"event": "partial_fill", "strategy_id": self.strategy_id, "side": order_type,
+                                      "filled": self.order_filled, "ordered": order_qty})
+                if order_type == 'buy' and ticker:
+                    self._place_partial_sell(client, ticker)
+            else:
+                self._idle_polls += 1
+            backoff = min(PARTIAL_POLL_BASE_SEC * (2 ** self._idle_polls), PARTIAL_POLL_MAX_SEC)
+            self._next_poll_at = time.monotonic() + (backoff if self._idle_polls else 0.0)
+
+    def _after_order_closed(self):
+        """주문이 체결 완료 외의 이유로 닫혔을 때 보유 수량 기준으로 다음 상태 결정"""
+        if self.held_qty > QTY_EPS:
+            self.status = ACTIVE if self._unplaced_sell_qty() > QTY_EPS else SELLING
+        elif self.child_sells:
+            self.status = SELLING
+        else:
+            self._reset_cycle()
+        self.last_action_at = datetime.now(KST)
 
-        if not isinstance(data, dict) or not data :
-            logger.info(f"[Strategy {self.strategy_id}] 체결 내역 없음(대기 중일 수 있음): {result}")
+    def _finish_cycle_if_done(self):
+        """매도 주문(부분 체결분 포함)이 모두 끝나면 실현 손익 기록 후 STANDBY로"""
+        if self.order_id or self.child_sells:
+            return
+        if self.held_qty > QTY_EPS:
+            self.status = ACTIVE  # 남은 보유분 재매도
             return
+        if self.ctx is not None and self.sold_qty > 0 and self.filled_qty > 0:
+            trip = RoundTrip(
+                grid_id=self.ctx.grid_id, strategy_id=self.strategy_id, level_price=self._scale.to_price(self.buy_price),
+                units=self.sold_qty, buy_price=self.entry_cost / self.filled_qty,
+                sell_price=self.exit_proceeds / self.sold_qty, fee_krw=self.entry_fee_krw + self.exit_fee_krw,
+                opened_at=self.entry_at or time.time(), closed_at=time.time())
+            self.ctx.round_trips += 1
+            self.ctx.realized_pnl += trip.pnl_krw
+            if self.ctx.ledger is not None:
+                self.ctx.ledger.record_round_trip(trip)
+        self._reset_cycle()
+
+    def _reset_cycle(self):
+        self.status = STANDBY
+        self.order_id = None
+        self.filled_qty = self.sold_qty = 0.0
+        self.order_placed_qty = self.order_filled = 0.0
+        self.order_contracts = 0
+        self.entry_cost = self.entry_fee_krw = self.exit_proceeds = self.exit_fee_krw = 0.0
+        self.entry_at = None
+        self._idle_polls = 0
+        self._next_poll_at = 0.0
+
+    def _force_query(self, side: str):
+        """다음 틱에 해당 방향 주문을 워터마크/백오프와 상관없이 바로 체결 조회하도록 표시"""
+        if side == 'buy':
+            self._last_buy_query_at = -math.inf
+        else:
+            self._last_sell_query_at = -math.inf
+        self._next_poll_at = 0.0
 
-        if data.get("order_status") == 'Completed':
-            try:
-                order_qty = float(data.get("order_qty", 0) or 0)
-                contracts = data.get("contract") or []
-                filled_qty = sum(float(c.get("units", 0) or 0) for c in contracts)
-                # 상태 문자열이 Completed여도 부분 체결일 수 있으므로 수량 비교로 판단
-                eps = 1e-12
-                full_filled = abs(order_qty - filled_qty) <= eps
-            except Exception as e:
-                logger.error(f"[Strategy {self.strategy_id}] 체결 데이터 파싱 실패: {e} / raw={data}")
-                return
-            
-            if full_filled:
-                if order_type == 'buy':
-                    self.status = ACTIVE
-                    msg = f" [Strategy {self.strategy_id}] 매수 완전 체결! -> 매도 대기 (id={self.order_id}, qty={order_qty})"
-                else:
-                    self.status = STANDBY
-                    msg = f" [Strategy {self.strategy_id}] 매도 완전 체결! -> 초기화 (id={self.order_id}, qty={order_qty})"
-                logger.info(msg)
-                send_discord_message(msg)
-                self.order_id = None
-                self.last_action_at = datetime.now(KST)
-            else:
-                # 부분 체결 진행 중 (잔량은 참고용 로그)
-                remain = max(order_qty - filled_qty, 0.0)
-                logger.info(
-                    f"[Strategy {self.strategy_id}] 부분 체결 진행 중: filled={filled_qty}, "
-                    f"ordered={order_qty}, remain={remain}"
-                )
+    def _adopt_inflight(self, inflight: InFlight, order_id):
+        """응답을 못 받은 주문이 미체결 목록에서 확인됨: 받은 것처럼 이어서 추적"""
+        if inflight.child:
+            self._on_child_sell_placed(order_id, inflight.qty, inflight.reservation)
+        else:
+            self._on_order_placed(inflight.side, order_id, inflight.price, inflight.qty, inflight.reservation)
+
+    def _settle_inflight(self, inflight: InFlight, fills: list):
+        """미체결 목록에 없는 in-flight 주문 정리
+
+        체결 내역(fills)이 있으면 즉시 전량 체결된 주문으로 보고 반영하고,
+        없으면 접수되지 않은 것으로 보고 예약만 풀어 다음 틱에 다시 주문하게 한다.
+        """
+        if fills:
+            units = self._absorb_contracts(inflight.side, None, fills, 0, inflight.reservation)
+            msg = "[Strategy %s] 응답 없던 %s 주문이 체결된 것으로 확인: qty=%s (tag=%s)"
+            args = (self.strategy_id, inflight.side.upper(), units, inflight.tag)
+        else:
+            msg = "[Strategy %s] 응답 없던 %s 주문은 접수되지 않음: 재주문 허용 (tag=%s)"
+            args = (self.strategy_id, inflight.side.upper(), inflight.tag)
+        self._release(inflight.reservation)
+        self._log.warning(msg, *args, extra={"event": "inflight_settled", "strategy_id": self.strategy_id,
+                                             "side": inflight.side, "tag": inflight.tag, "filled": bool(fills)})
+        self._notify(msg, *args)
+        if not fills or inflight.child:
+            return
+        if inflight.side == 'buy':
+            self._after_order_closed()
+        else:
+            self._finish_cycle_if_done()
 
     def _cancel_open_order(self, client: Bithumb) -> bool:
-        if self.status in [BUYING] and self.order_id:
+        if self.status in (BUYING, BUY_PARTIAL) and self.order_id:
             try:
                 client.cancel_order(self.order_id)
-                logger.info(f"[Strategy {self.strategy_id}] 미체결 주문 취소: id={self.order_id}")
+                self._log.info("[Strategy %s] 미체결 주문 취소: id=%s", self.strategy_id, self.order_id,
+                               extra={"event": "cancel", "strategy_id": self.strategy_id, "order_id": self.order_id})
             except Exception as e:
-                logger.error(f"[Strategy {self.strategy_id}] 주문 취소 실패: {e}")
+                self._log.error("[Strategy %s] 주문 취소 실패: %s", self.strategy_id, e,
+                                extra={"event": "cancel_error", "strategy_id": self.strategy_id})
                 return False
-            finally:
-                # BUYING 취소면 다시 STANDBY, SELLING 취소면 다시 ACTIVE로 되돌림
-                self.status = STANDBY if self.status == BUYING else ACTIVE
-                self.order_id = None
-                self.last_action_at = datetime.now(KST)
+
+            # 취소 직전에 체결된 수량까지 반영 (체결분은 버리지 않고 매도로 넘김)
+            data = self._query_order(client, self.order_id)
+            if data is None:
+                # 조회 실패 시 주문을 놓으면 취소 전 체결분을 잃으므로, 주문 id를 유지하고 다음 틱에 다시 처리
+                self._force_query('buy')
+                return True
+            contracts = data.get("contract") or []
+            self.order_filled += self._absorb_contracts('buy', self.order_id, contracts, self.order_contracts,
+                                                        self._reservation)
+            self.order_contracts = len(contracts)
+            self.order_id = None
+            self._release(self._reservation)
+            self._reservation = None
+            self._after_order_closed()
             return True
         return False
 
 
+# --- 설정 핫 리로드 ---
+def apply_grid_config(strategies: list, current_cfg: dict, new_cfg: dict, client: Bithumb,
+                      ctx: Optional[GridContext] = None) -> dict:
+    """검증된 새 설정을 실행 중인 그리드에 반영하고, 실제 적용된 설정을 반환
+
+    - 반영 가능한 값(HOT_RELOADABLE_KEYS)만 적용하고 나머지 변경은 경고 후 무시
+    - divide_count 증가: 없는 하단 레벨만 추가 (기존 레벨/주문은 건드리지 않음)
+    - divide_count 감소: 범위를 벗어난 하단 레벨만 정리
+      (STANDBY는 즉시 삭제, 매수 대기는 취소 후 삭제, 보유분이 있으면 매도 완료 후 삭제)
+    """
+    safe, unsafe = diff_grid_config(current_cfg, new_cfg)
+    if unsafe:
+        msg = f"재시작이 필요한 설정 변경은 무시합니다: {unsafe}"
+        logger.warning(msg, extra={"event": "config_rejected"})
+        send_discord_message(msg)
+    if not safe:
+        return current_cfg
+
+    applied = dict(current_cfg)
+    for key, (_, new_value) in safe.items():
+        applied[key] = new_value
+
+    if "divide_count" in safe:
+        px = (ctx.scale if ctx is not None else UNIT_SCALE).to_price
+        start = ctx.anchor if ctx is not None and ctx.anchor is not None else applied["start_buy_price"]
+        interval = applied["buy_interval"]
+        lowest = start - interval * (applied["divide_count"] - 1)
+        by_price = {s.buy_price: s for s in strategies}
+
+        # 하단 레벨 추가 (제거 예정이던 레벨은 되살림)
+        for i in range(applied["divide_count"]):
+            buy_price = start - interval * i
+            existing = by_price.get(buy_price)
+            if existing is not None:
+                existing.retiring = False
+                continue
+            new_id = max([s.strategy_id for s in strategies]) + 1 if strategies else 0
+            new_strategy = Strategy(
+                strategy_id=new_id,
+                buy_price=buy_price,
+                sell_price=buy_price + applied["sell_interval"],
+                order_qty=applied["order_qty"],
+                ctx=ctx
+            )
+            strategies.append(new_strategy)
+            logger.info("[Strategy %s] 설정 변경으로 하단 레벨 추가: buy=%s", new_id, px(buy_price),
+                        extra={"event": "level_added", "strategy_id": new_id, "buy_price": px(buy_price)})
+
+        # 범위를 벗어난 하단 레벨 정리 (위쪽 추가 레벨은 대상 아님)
+        for s in strategies:
+            if s.buy_price >= lowest:
+                continue
+            if s.status in (BUYING, BUY_PARTIAL):
+                s._cancel_open_order(client)
+            s.retiring = True
+            logger.info("[Strategy %s] 설정 변경으로 레벨 제거 예정: buy=%s, status=%s", s.strategy_id, px(s.buy_price),
+                        s.status, extra={"event": "level_retired", "strategy_id": s.strategy_id,
+                                         "buy_price": px(s.buy_price)})
+        strategies[:] = [s for s in strategies if not (s.retiring and s.status == STANDBY)]
+
+    if ctx is not None:
+        ctx.status_sweep_interval = applied["status_sweep_interval"]
+        ctx.book_fill_ticks, ctx.book_max_age = applied["book_fill_ticks"], applied["book_max_age"]
+
+    msg = f"설정 변경 반영: {safe}"
+    logger.info(msg, extra={"event": "config_reload"})
+    send_discord_message(msg)
+    return applied
+
+
+def level_intervals(cfg: dict, ctx: GridContext, price: int) -> tuple[int, int]:
+    """새로 만드는 레벨의 (매수 간격, 매도 간격) 틱: dynamic_spacing이면 변동성 정책, 아니면 설정값"""
+    if ctx.spacing is None:
+        return cfg["buy_interval"], cfg["sell_interval"]
+    step = ctx.meta.step_ticks(price, ctx.scale) if ctx.meta is not None else 1
+    intervals = ctx.spacing.intervals(cfg, step, ctx.scale.to_price(1))
+    if intervals != ctx.spacing.last:
+        if ctx.spacing.last is not None or intervals != (cfg["buy_interval"], cfg["sell_interval"]):
+            ctx.log.info("레벨 간격 변경: buy %s, sell %s (ATR=%s)", intervals[0], intervals[1],
+                         ctx.spacing.candles.atr(cfg["spacing_window"]),
+                         extra={"event": "spacing_changed", "buy_interval": intervals[0],
+                                "sell_interval": intervals[1]})
+        ctx.spacing.last = intervals
+    return intervals
+
+
+def _fill_window(strategies: list, cfg: dict, ctx: GridContext) -> list:
+    """추적 모드: 현재 창(anchor부터 divide_count개)에 없는 레벨을 STANDBY로 추가 (API 호출 없음)
+
+    위 레벨 추가와 같은 이유로, 매도 대기 중인 레벨의 매도가와 겹치는 레벨은 매도가 끝날 때까지 보류한다.
+    """
+    existing = {s.buy_price for s in strategies}
+    sell_busy = {s.sell_price for s in strategies if s.status != STANDBY}
+    added = []
+    sell_interval = None
+    for i in range(cfg["divide_count"]):
+        buy_price = ctx.anchor - cfg["buy_interval"] * i
+        if buy_price in existing or buy_price in sell_busy:
+            continue
+        if sell_interval is None:
+            # 추적 창의 레벨 격자는 buy_interval 고정, 변동성 간격은 새 레벨의 매도 간격에만 반영
+            _, sell_interval = level_intervals(cfg, ctx, ctx.anchor)
+        new_id = max([s.strategy_id for s in strategies]) + 1 if strategies else 0
+        strategies.append(Strategy(strategy_id=new_id, buy_price=buy_price, sell_price=buy_price + sell_interval,
+                                   order_qty=cfg["order_qty"], ctx=ctx))
+        added.append(buy_price)
+    return added
+
+
+def recenter_grid(strategies: list, cfg: dict, current_price: int, client: Bithumb, ctx: GridContext) -> Optional[dict]:
+    """추적 모드: 가격이 창 밖으로 trail_trigger 레벨 이상 벗어나면 창을 현재가 기준으로 옮김
+
+    전체 취소/재주문 대신 창에서 빠지는 레벨만 정리한다.
+    - 빠지는 STANDBY 레벨: 즉시 삭제 (API 호출 없음)
+    - 빠지는 매수 대기 레벨: 취소 후 삭제 (보유분이 생겼으면 매도 완료 후 삭제)
+    - 빠지는 보유 레벨: 매도 주문을 그대로 두고 매도 완료 후 삭제
+    - 새로 들어오는 레벨: STANDBY로 추가 -> 평소처럼 update()가 가격이 닿을 때 매수
+    따라서 재배치 비용은 옮겨진 레벨 수에 비례한다. 하락 방향은 trail_floor_price와 창 밖 보유 레벨 수
+    (max_up_strategies 이하)로 제한한다. 재배치했으면 결과 요약을, 아니면 None을 반환.
+    """
+    interval = cfg["buy_interval"]
+    bottom = ctx.anchor - interval * (cfg["divide_count"] - 1)
+    trigger = interval * cfg["trail_trigger"]
+    if bottom - trigger < current_price < ctx.anchor + trigger:
+        # 창 안: 매도 대기 때문에 보류했던 레벨만 채움
+        _fill_window(strategies, cfg, ctx)
+        return None
+
+    # 원래 그리드 간격에 맞춘, 현재가 이하의 가장 가까운 레벨을 새 최상단으로
+    # 아래로는 창 최하단이 trail_floor_price 밑으로 내려가지 않게 (기본: 처음 창 최하단 = 기존 그리드와 같은 손실 한도)
+    start = cfg["start_buy_price"]
+    new_anchor = start + interval * ((current_price - start) // interval)
+    floor_price = cfg["trail_floor_price"] or start - interval * (cfg["divide_count"] - 1)
+    lowest_anchor = floor_price + interval * (cfg["divide_count"] - 1)
+    new_anchor = max(new_anchor, start - interval * ((start - lowest_anchor) // interval))
+    if new_anchor == ctx.anchor:
+        _fill_window(strategies, cfg, ctx)
+        return None
+    desired = {new_anchor - interval * i for i in range(cfg["divide_count"])}
+    if new_anchor < ctx.anchor:
+        # 하락 추적은 창 밖에 남는 보유 레벨이 max_up_strategies개 이하일 때만 (고정 그리드의 최대 보유 레벨 수와 같게)
+        held_outside = sum(1 for s in strategies if s.buy_price not in desired and s.status != STANDBY)
+        if held_outside > cfg["max_up_strategies"]:
+            ctx.log.debug("하락 재배치 보류: 창 밖 보유 레벨 %d개 > %d", held_outside, cfg["max_up_strategies"],
+                          extra={"event": "recenter_deferred", "price": ctx.scale.to_price(current_price)})
+            _fill_window(strategies, cfg, ctx)
+            return None
+    removed, cancelled, draining = 0, 0, 0
+    for s in strategies:
+        if s.buy_price in desired:
+            s.retiring = False
+            continue
+        if s.retiring:
+            continue
+        if s.status in (BUYING, BUY_PARTIAL):
+            s._cancel_open_order(client)
+            cancelled += 1
+        s.retiring = True
+        if s.status == STANDBY:
+            removed += 1
+        else:
+            draining += 1
+    strategies[:] = [s for s in strategies if not (s.retiring and s.status == STANDBY)]
+
+    old_anchor, ctx.anchor = ctx.anchor, new_anchor
+    added = _fill_window(strategies, cfg, ctx)
+    result = {"old_anchor": old_anchor, "new_anchor": new_anchor, "added": len(added), "removed": removed,
+              "cancelled": cancelled, "draining": draining}
+    px = ctx.scale.to_price
+    msg = " **그리드 재배치** %s -> %s (현재가 %s): 추가 %d, 삭제 %d, 매수취소 %d, 매도 후 삭제 %d"
+    args = (px(old_anchor), px(new_anchor), px(current_price), len(added), removed, cancelled, draining)
+    ctx.log.info(msg, *args, extra={"event": "recenter", "price": args[2], **result})
+    ctx.notify(msg, *args)
+    return result
+
+
+def expand_up_levels(strategies: list, cfg: dict, current_price: int, client: Bithumb, ctx: GridContext):
+    """고정 그리드: 상승 시 위쪽 전략을 하나씩 추가하며 즉시 매수, 최대 max_up_strategies까지
+
+    위 레벨 간격은 추가할 때마다 level_intervals()로 정한다 (dynamic_spacing이면 변동성에 따라 넓히거나 좁힘).
+    """
+    while True:
+        if ctx.up_created > cfg["max_up_strategies"]:
+            break
+
+        if ctx.next_up_price is None:
+            ctx.next_up_price = cfg["start_buy_price"] + level_intervals(cfg, ctx, cfg["start_buy_price"])[0]
+        target_level = ctx.next_up_price
+        if current_price < target_level:
+            break  # 아직 다음 위 레벨을 돌파하지 않음
+
+        # 같은 레벨의 전략이 이미 있으면(중복 생성 방지) 생성 보류
+        already_exists = any(s.buy_price == target_level for s in strategies)
+        if already_exists:
+            break  # 다음 루프에서 다시 확인
+
+        # 해당 레벨에 '매도 대기/매도 진행' 전략이 있으면 충돌 방지 위해 생성/매수 보류
+        sell_conflict = any(
+            (s.sell_price == target_level) and (s.status in (ACTIVE, SELLING, SELL_PARTIAL, BUYING, BUY_PARTIAL)) for s in strategies)
+        if sell_conflict:
+            break  # 326 매도 체결 완료될 때까지 대기
+
+        buy_interval, sell_interval = level_intervals(cfg, ctx, target_level)
+        new_id = max([s.strategy_id for s in strategies]) + 1 if strategies else 0
+        new_buy = target_level
+        new_sell = target_level + sell_interval
+        new_strategy = Strategy(
+            strategy_id=new_id,
+            buy_price=new_buy,
+            sell_price=new_sell,
+            order_qty=cfg["order_qty"],
+            ctx=ctx
+        )
+        strategies.append(new_strategy)
+
+        px = ctx.scale.to_price
+        add_msg = "[Strategy %s] 위 레벨 전략 추가: buy=%s, sell=%s, 현재가=%s (다음 레벨 +%s)"
+        args = (new_id, px(new_buy), px(new_sell), px(current_price), px(buy_interval))
+        ctx.log.info(add_msg, *args, extra={"event": "level_added", "strategy_id": new_id, "buy_price": args[1]})
+        ctx.notify(add_msg, *args)
+
+        # 즉시 매수는 '충돌 없을 때만' 진행 (위의 가드 통과 시에만 여기 도달)
+        try:
+            new_strategy._place_order(client, 'buy', cfg["ticker"])
+        except Exception as e:
+            ctx.log.error("[Strategy %s] 즉시 매수 제출 실패: %s", new_id, e,
+                          extra={"event": "order_failed", "strategy_id": new_id, "side": "buy"})
+
+        ctx.up_created += 1
+        ctx.next_up_price = new_buy + buy_interval
+
+
+def grid_tick(strategies: list, cfg: dict, current_price: int, client: Bithumb, ctx: GridContext):
+    """한 틱 분량의 그리드 처리 (실거래/섀도 그리드 공용). current_price는 ctx.scale 정수 틱"""
+    # (1) 추적 모드: 가격이 창을 벗어나면 창을 옮김 (옮겨지는 레벨만 정리/추가)
+    #     고정 그리드: 상승 시 위 레벨 추가
+    if cfg["trailing"]:
+        recenter_grid(strategies, cfg, current_price, client, ctx)
+    else:
+        expand_up_levels(strategies, cfg, current_price, client, ctx)
+
+    # [핵심] 모든 전략을 한번에 업데이트
+    for strategy in strategies:
+        strategy.update(current_price, client, cfg["ticker"], cfg["buy_margin"], cfg["buy_interval"],
+                        cfg["cancel_depth"])
+
+    # 제거 예정 레벨 중 보유분 정리가 끝난 레벨 삭제
+    if any(s.retiring and s.status == STANDBY for s in strategies):
+        strategies[:] = [s for s in strategies if not (s.retiring and s.status == STANDBY)]
+
+
+def reconcile_orders(strategies: list, client: Bithumb, ctx: GridContext):
+    """미체결 주문 목록 1회 조회로 그리드 전체 주문 대사 (레벨마다 조회하지 않음)
+
+    - 응답을 못 받은 주문이 목록에 있으면 해당 레벨이 이어받고, 없으면 체결 내역으로 즉시 체결/미접수를 판단
+    - 우리 주문인데 목록에서 사라진 주문은 해당 레벨이 다음 틱에 바로 체결 조회 (워터마크 생략 무시)
+    """
+    registry = ctx.registry
+    try:
+        open_orders = fetch_open_orders(client, ctx.ticker)
+    except Exception as e:
+        logger.error("미체결 주문 조회 실패: %s", e, extra={"event": "reconcile_error"})
+        return
+    result = registry.reconcile(open_orders)
+    by_id = {s.strategy_id: s for s in strategies}
+
+    for inflight, order in result.adopted:
+        strategy = by_id.get(inflight.strategy_id)
+        order_id = ('bid' if inflight.side == 'buy' else 'ask', ctx.ticker, order["order_id"], "KRW")
+        if strategy is None:
+            # 응답을 기다리는 사이 레벨이 정리됨 (재배치/설정 변경): 주인 없는 주문으로 남기지 않고 취소
+            registry.resolve(inflight)
+            logger.warning("정리된 레벨의 주문 취소: strategy_id=%s, id=%s", inflight.strategy_id, order["order_id"],
+                           extra={"event": "cancel", "strategy_id": inflight.strategy_id, "reason": "orphan"})
+            try:
+                client.cancel_order(order_id)
+            except Exception as e:
+                logger.error("주문 취소 실패: %s", e, extra={"event": "cancel_error", "strategy_id": inflight.strategy_id})
+            if ctx.allocator is not None and inflight.reservation:
+                ctx.allocator.release(inflight.reservation)
+            continue
+        registry.commit(inflight.tag, order_id, strategy)
+        strategy._adopt_inflight(inflight, order_id)
+
+    closing_sides = set()
+    for strategy, key in result.closed:
+        side = 'buy' if strategy.status in (BUYING, BUY_PARTIAL) and order_key(strategy.order_id) == key else 'sell'
+        strategy._force_query(side)
+        closing_sides.add(side)
+
+    fills_by_side: dict[str, list] = {}
+    for inflight in result.unresolved:
+        # 같은 방향에 아직 체결을 반영하지 않은 닫힌 주문이 있으면, 그 체결을 in-flight 주문 것으로 오인하지
+        # 않도록 해당 레벨들이 조회를 마친 다음 대사에서 정리
+        if inflight.side in closing_sides:
+            continue
+        strategy = by_id.get(inflight.strategy_id)
+        if inflight.side not in fills_by_side:
+            since = min(i.started_at for i in result.unresolved if i.side == inflight.side) - registry.clock_skew
+            try:
+                fills_by_side[inflight.side] = fetch_recent_fills(client, ctx.ticker, inflight.side, since)
+            except Exception as e:
+                logger.error("체결 내역 조회 실패: %s", e, extra={"event": "reconcile_error"})
+                continue  # in-flight로 남겨 다음 대사에서 재시도
+        fills = match_fills(inflight, fills_by_side[inflight.side], registry.clock_skew, registry.known_fills())
+        registry.resolve(inflight)
+        if strategy is not None:
+            strategy._settle_inflight(inflight, fills)
+        elif ctx.allocator is not None and inflight.reservation:
+            ctx.allocator.release(inflight.reservation)
+
+    logger.info("주문 대사: 미체결 %d건, 이어받음 %d, 닫힘 %d, 미확인 정리 %d, 외부 주문 %d",
+                len(open_orders), len(result.adopted), len(result.closed), len(result.unresolved), result.unknown,
+                extra={"event": "order_reconcile", "open": len(open_orders), "adopted": len(result.adopted),
+                       "closed": len(result.closed), "unresolved": len(result.unresolved),
+                       "unknown": result.unknown, "inflight": len(registry.inflight())})
+
+
+def settle_resumed_levels(strategies: list, client: Bithumb, ctx: GridContext, since: float) -> int:
+    """재시작 직후: 스냅샷 저장(since) 뒤에 나가서 체결된 매도를 ACTIVE 레벨에 반영하고, 보유 합계를 잔고로 제한
+
+    스냅샷에는 매도 전(ACTIVE)이었던 레벨이 죽기 전에 매도를 내고 체결됐으면, 그 주문은 스냅샷에도 미체결
+    목록에도 없어 reconcile_orders가 찾지 못한다. 그대로 두면 레벨이 이미 팔린 코인을 다시 팔려고 한다.
+    1) since 이후 매도 체결 내역을 레벨 매도가로 맞춰 체결로 반영 (주문이 걸려 있는 다른 레벨 매도가의 체결은 제외)
+    2) 그래도 레벨 보유 합계가 거래소 코인보다 많으면 남는 만큼 ACTIVE 레벨 보유분을 덜어냄 (경고)
+    반영/조정한 레벨 수를 반환. 레벨 상태만 바꾸고 주문은 내지 않는다 (첫 틱에서 정상 처리).
+    """
+    pending = [s for s in strategies
+               if s.status == ACTIVE and not s.order_id and not s.child_sells and s.held_qty > QTY_EPS]
+    if not pending:
+        return 0
+    settled = 0
+    px = ctx.scale.to_price
+    registry = ctx.registry
+    try:
+        fills = fetch_recent_fills(client, ctx.ticker, 'sell', since - registry.clock_skew)
+    except Exception as e:
+        logger.error("재시작 후 매도 체결 내역 조회 실패: %s", e, extra={"event": "reconcile_error"})
+        fills = []
+    busy = {float(px(s.sell_price)) for s in strategies if s not in pending and s.status in (SELLING, SELL_PARTIAL)}
+    fills = [f for f in fills if float(f["price"]) not in busy]
+    for s in sorted(pending, key=lambda s: s.sell_price):
+        inflight = InFlight(f"resume-{s.strategy_id}", s.strategy_id, 'sell', px(s.sell_price), s.held_qty, since)
+        matched = match_fills(inflight, fills, registry.clock_skew, registry.known_fills())
+        if matched:
+            s._settle_inflight(inflight, matched)
+            settled += 1
+
+    try:
+        coin = float(client.get_balance(ctx.ticker)[0])
+    except Exception as e:
+        logger.error("재시작 후 잔고 조회 실패: %s", e, extra={"event": "reconcile_error"})
+        return settled
+    excess = sum(s.held_qty + s.carry_qty for s in strategies) - coin
+    for s in sorted(pending, key=lambda s: s.sell_price, reverse=True):
+        if excess <= QTY_EPS:
+            break
+        if s.status != ACTIVE or s.held_qty <= QTY_EPS:
+            continue
+        take = min(excess, s.held_qty)
+        s.entry_cost -= s.entry_cost * take / s.filled_qty
+        s.filled_qty -= take
+        excess -= take
+        settled += 1
+        s._log.warning("[Strategy %s] 보유 수량이 거래소 잔고보다 많아 %s 덜어냄 (스냅샷 이후 팔린 것으로 봄, 잔고 %s)",
+                       s.strategy_id, take, coin,
+                       extra={"event": "held_capped", "strategy_id": s.strategy_id, "qty": take, "coin": coin})
+        s._finish_cycle_if_done()
+    return settled
+
+
+def cancel_buys(strategies: list, client: Bithumb, ctx: GridContext, trip: dict) -> int:
+    """리스크 가드 발동: 이 그리드의 매수 대기 주문을 GUARD_CANCEL_WORKERS개 스레드로 동시에 취소
+
+    레벨마다 다른 주문이라 서로 겹치지 않고, 루프 스레드는 끝날 때까지 기다리므로 레벨 상태를 동시에 건드리지 않는다.
+    """
+    targets = [s for s in strategies if s.status in (BUYING, BUY_PARTIAL) and s.order_id]
+    cancelled = 0
+    if targets:
+        with ThreadPoolExecutor(min(len(targets), GUARD_CANCEL_WORKERS), thread_name_prefix="GuardCancel") as pool:
+            cancelled = sum(pool.map(lambda s: s._cancel_open_order(client), targets))
+    cancel_ms = (time.perf_counter() - trip["detected_at"]) * 1000
+    ctx.guard_cancel_ms = round(cancel_ms, 1)
+    msg = (f" **리스크 가드 발동 ({trip['reason']})**: 신규 매수 정지 {trip['halt_ms']:.1f}ms, "
+           f"매수 대기 {cancelled}/{len(targets)}건 취소 완료 {cancel_ms:.0f}ms")
+    ctx.log.critical(msg, extra={"event": "risk_cancel", "seq": trip["seq"], "reason": trip["reason"],
+                                 "cancelled": cancelled, "targets": len(targets), "cancel_ms": round(cancel_ms, 1)})
+    ctx.notify(msg)
+    return cancelled
+
+
+def guard_tick(strategies: list, client: Bithumb, ctx: GridContext):
+    """리스크 가드 새 발동이 있으면 매수 대기 주문 취소, 없으면 정지 해제 조건 확인 (실거래/섀도 그리드 공용)"""
+    if ctx.guard is None:
+        return
+    trip = ctx.guard.take_cancel(ctx.guard_seen)
+    if trip is not None:
+        ctx.guard_seen = trip["seq"]
+        cancel_buys(strategies, client, ctx, trip)
+    else:
+        ctx.guard.maybe_resume()
+
+
+def tick_window(scale: TickScale, low: float, high: float) -> tuple:
+    """워터마크 가격 구간(원)을 틱으로: 아래는 내림, 위는 올림 (체결 조회 생략이 닿은 주문을 놓치지 않는 방향)"""
+    return (low if math.isinf(low) else scale.floor_ticks(low),
+            high if math.isinf(high) else scale.ceil_ticks(high))
+
+
+def trade_tick(strategies: list, cfg: dict, client: Bithumb, ctx: GridContext, loop_count: int) -> Optional[float]:
+    """루프 1회분 거래 처리 (잔고 대사 -> 현재가 -> 주문 대사 -> 그리드 갱신). 현재가를 못 받으면 None"""
+    # 리스크 가드: 가격이 끊겼는지 확인하고, 발동돼 있으면 다른 API 호출보다 먼저 매수 취소
+    if ctx.guard is not None:
+        ctx.guard.check_stale()
+        guard_tick(strategies, client, ctx)
+
+    # 자금 배분기 잔고 대사 (balance_reconcile_interval 마다만 잔고 API 호출)
+    ctx.allocator.maybe_reconcile(lambda: bithumb_balances(client, cfg["ticker"]))
+
+    # 현재가 조회
+    current_price = client.get_current_price(cfg["ticker"])
+    if not current_price:
+        loop_logger.warning("현재가를 가져올 수 없습니다. 다음 루프에서 재시도합니다.", extra={"event": "no_price"})
+        return None
+
+    if ctx.guard is not None and ctx.guard.observe(current_price) is not None:
+        guard_tick(strategies, client, ctx)
+
+    # 직전 틱 이후 가격 구간 (체결 스트림이 있으면 그 가격들도 포함)
+    ctx.watermark.observe(current_price)
+    low, high = ctx.watermark.drain()
+    if ctx.candles is not None:
+        ctx.candles.update(current_price, low, high)
+    ctx.tick_low, ctx.tick_high = tick_window(ctx.scale, low, high)
+    if ctx.recorder is not None:
+        ctx.recorder.record_ticker(cfg["ticker"], current_price)
+
+    loop_logger.info("--- [Loop %d] 현재가: %s KRW, New created: %d ---", loop_count, current_price, ctx.up_created,
+                     extra={"event": "loop", "loop": loop_count, "price": current_price, "up_created": ctx.up_created})
+
+    # 미체결 주문 대사 (order_reconcile_interval 마다 목록 1회 조회)
+    if time.monotonic() - ctx.last_order_reconcile >= cfg["order_reconcile_interval"]:
+        reconcile_orders(strategies, client, ctx)
+        ctx.last_order_reconcile = time.monotonic()
+
+    # 레벨 추가/재배치 + 모든 전략 업데이트 (그리드 안에서는 정수 틱)
+    grid_tick(strategies, cfg, ctx.scale.to_ticks(current_price), client, ctx)
+    return current_price
+
+
+class ErrorBackoff:
+    """메인 루프 오류 후 대기 시간: 연속 오류마다 base부터 2배씩 늘려 maximum까지, 정상 틱이면 초기화
+
+    일시적인 타임아웃/5xx는 다음 루프 주기 안에 바로 재시도하고, 장애가 이어질 때만 간격을 늘린다.
+    """
+
+    def __init__(self, base: float, maximum: float):
+        self.base = base
+        self.maximum = maximum
+        self.streak = 0
+        self.started_at: Optional[float] = None
+
+    def failure(self) -> float:
+        """오류 1회 기록 후 대기할 초"""
+        if self.streak == 0:
+            self.started_at = time.monotonic()
+        self.streak += 1
+        return min(self.base * (2 ** (self.streak - 1)), self.maximum)
+
+    def success(self) -> Optional[tuple[int, float]]:
+        """정상 틱 기록. 직전까지 오류가 이어졌으면 (연속 오류 수, 장애 시간 초) 반환"""
+        if self.streak == 0:
+            return None
+        recovered = (self.streak, time.monotonic() - self.started_at)
+        self.streak, self.started_at = 0, None
+        return recovered
+
+
+def grid_scale(cfg: dict, meta: Optional[MarketMeta] = None) -> TickScale:
+    """그리드의 고정소수점 단위: 가격은 price_unit 틱, 수량은 마켓 수량 자릿수 lot (메타가 없으면 8자리)"""
+    return TickScale(cfg["price_unit"], meta.qty_decimals if meta is not None else 8)
+
+
+def grid_price_ladder(cfg: dict, meta: MarketMeta, scale: TickScale) -> PriceLadder:
+    """그리드가 쓸 가격대 (최하단 ~ 위 레벨 추가 한도 + 매도 간격) 의 유효 호가 사다리 (정수 틱)"""
+    lowest = cfg["start_buy_price"] - cfg["buy_interval"] * (cfg["divide_count"] - 1)
+    low = min(lowest, cfg["trail_floor_price"] or lowest)
+    high = cfg["start_buy_price"] + cfg["buy_interval"] * (cfg["max_up_strategies"] + cfg["divide_count"]) \
+        + cfg["sell_interval"]
+    return PriceLadder(meta, scale, low, high)
+
+
+def check_level_prices(strategies: list, ctx: GridContext) -> list:
+    """호가 단위에 맞지 않는 레벨 가격(틱) 목록 (주문 시 매수가는 내림, 매도가는 올림으로 보정됨)"""
+    invalid = sorted({p for s in strategies for p in (s.buy_price, s.sell_price) if not ctx.prices.is_valid(p)})
+    if invalid:
+        logger.warning("호가 단위에 맞지 않는 레벨 가격 %d개 (주문 시 보정): %s", len(invalid),
+                       [ctx.scale.format_price(p) for p in invalid[:10]],
+                       extra={"event": "off_tick_levels", "count": len(invalid)})
+    return invalid
+
+
+def build_levels(cfg: dict, ctx: GridContext) -> list:
+    """start_buy_price부터 아래로 divide_count개의 기본 레벨 생성"""
+    return [
+        Strategy(
+            strategy_id=i,
+            buy_price=cfg["start_buy_price"] - (cfg["buy_interval"] * i),
+            sell_price=cfg["start_buy_price"] - (cfg["buy_interval"] * i) + cfg["sell_interval"],
+            order_qty=cfg["order_qty"],
+            ctx=ctx
+        )
+        for i in range(cfg["divide_count"])
+    ]
+
+
+class ShadowGrid:
+    """실거래 그리드와 같은 시세로 돌리는 모의(섀도) 그리드
+
+    실거래 설정에 overrides만 덮어쓴 후보 설정을, 거래소 대신 로컬 SimulatedExchange로 체결한다.
+    시세는 실거래 루프가 이미 조회한 현재가를 tick()으로 넘겨받으므로 거래소 요청이 추가되지 않고,
+    틱당 비용은 레벨 수만큼의 상태 확인 + 체결 힙 처리뿐이다.
+    """
+
+    def __init__(self, live_cfg: dict, shadow: dict, ledger: Optional[TradeLedger] = None,
+                 meta: Optional[MarketMeta] = None, prices: Optional[PriceLadder] = None,
+                 book: Optional[OrderBook] = None, candles: Optional[CandleAggregator] = None):
+        raw = {**live_cfg, **shadow["overrides"], "grid_id": f"shadow:{shadow['name']}", "shadows": [],
+               "record_dir": None}
+        self.cfg = GridConfig.model_validate(raw).model_dump()
+        self.exchange = SimulatedExchange(self.cfg["ticker"], krw=shadow["initial_krw"], coin=shadow["initial_coin"],
+                                          fee_rate=shadow["fee_rate"])
+        self.initial_krw = shadow["initial_krw"]
+        self.initial_coin = shadow["initial_coin"]
+        allocator = CapitalAllocator(self.cfg["balance_reconcile_interval"])
+        allocator.reconcile(bithumb_balances(self.exchange, self.cfg["ticker"]))
+        self.ctx = GridContext(grid_id=self.cfg["grid_id"], ticker=self.cfg["ticker"], ledger=ledger,
+                               allocator=allocator, watermark=PriceWatermark(),
+                               status_sweep_interval=self.cfg["status_sweep_interval"],
+                               log=shadow_logger.getChild(shadow["name"]), notify_discord=False)
+        # 실거래 호가창을 읽기만 공유 (book_fill_ticks 등을 overrides로 바꿔 비교 가능)
+        self.ctx.book = book
+        self.ctx.book_fill_ticks, self.ctx.book_max_age = self.cfg["book_fill_ticks"], self.cfg["book_max_age"]
+        # 실거래 루프가 갱신하는 변동성 지표를 읽기만 공유 (spacing_* 를 overrides로 바꿔 비교 가능)
+        if candles is not None:
+            self.ctx.candles, self.ctx.spacing = candles, SpacingPolicy(candles)
+        self.ctx.scale = grid_scale(self.cfg, meta)
+        if meta is not None:
+            # 실거래와 같은 호가 규칙, 수수료만 모의 체결 수수료율
+            self.ctx.meta = replace(meta, maker_fee=shadow["fee_rate"], taker_fee=shadow["fee_rate"])
+            self.ctx.prices = prices
+        self.strategies = build_levels(self.cfg, self.ctx)
+        if self.cfg["trailing"]:
+            self.ctx.anchor = self.cfg["start_buy_price"]
+        self.first_price: Optional[float] = None
+
+    def tick(self, price: float):
+        if self.first_price is None:
+            self.first_price = price
+        self.exchange.on_price(price)
+        self.ctx.watermark.observe(price)
+        self.ctx.tick_low, self.ctx.tick_high = tick_window(self.ctx.scale, *self.ctx.watermark.drain())
+        self.ctx.allocator.maybe_reconcile(lambda: bithumb_balances(self.exchange, self.cfg["ticker"]))
+        guard_tick(self.strategies, self.exchange, self.ctx)
+        grid_tick(self.strategies, self.cfg, self.ctx.scale.to_ticks(price), self.exchange, self.ctx)
+
+    def summary(self, price: float) -> dict:
+        """실현 손익과, 시작 시점 자산(같은 가격으로 평가) 대비 평가 손익"""
+        start_equity = self.initial_krw + self.initial_coin * price
+        return {
+            "grid_id": self.ctx.grid_id,
+            "round_trips": self.ctx.round_trips,
+            "realized_pnl": self.ctx.realized_pnl,
+            "held_levels": sum(1 for s in self.strategies if s.held_qty > QTY_EPS),
+            "equity_pnl": self.exchange.equity(price) - start_equity,
+        }
+
+
+def _book_status(ctx: GridContext) -> Optional[dict]:
+    if ctx.book is None:
+        return None
+    quote = ctx.book.quote() or (None, None)
+    return {"bid": quote[0], "ask": quote[1], "age": ctx.book.age(), "crossed": ctx.book.crossed,
+            "deferred": ctx.book_deferred}
+
+
+def publish_status(board: StatusBoard, strategies: list, cfg: dict, ctx: GridContext, current_price: float,
+                   loop_count: int, shadows: list):
+    """상태 API용 스냅샷 게시 (새 dict/list만 만들어 교체, 게시 후에는 수정하지 않음)"""
+    levels, orders = [], []
+    to_price = ctx.scale.to_price
+    for s in strategies:
+        buy, sell = to_price(s.buy_price), to_price(s.sell_price)
+        levels.append({"strategy_id": s.strategy_id, "buy_price": buy, "sell_price": sell,
+                       "status": s.status, "held_qty": s.held_qty, "retiring": s.retiring})
+        if s.order_id:
+            side = 'buy' if s.status in (BUYING, BUY_PARTIAL) else 'sell'
+            orders.append({"strategy_id": s.strategy_id, "side": side, "order_id": order_key(s.order_id),
+                           "price": buy if side == 'buy' else sell,
+                           "qty": s.order_placed_qty, "filled": s.order_filled})
+        for c in s.child_sells:
+            orders.append({"strategy_id": s.strategy_id, "side": 'sell', "order_id": order_key(c["order_id"]),
+                           "price": sell, "qty": c["qty"], "filled": c["filled"]})
+    # 프로세스 내 allocator만 (공용 데몬은 소켓 왕복이 생기므로 allocator status CLI로 조회)
+    balances = ctx.allocator.status() if isinstance(ctx.allocator, CapitalAllocator) else {"remote": cfg["allocator_socket"]}
+    board.publish(
+        grid={"grid_id": ctx.grid_id, "ticker": ctx.ticker, "price": current_price, "loop": loop_count,
+              "trailing": cfg["trailing"], "anchor": None if ctx.anchor is None else to_price(ctx.anchor),
+              "up_created": ctx.up_created,
+              "round_trips": ctx.round_trips, "realized_pnl": ctx.realized_pnl,
+              "status_queries": ctx.status_queries, "status_skipped": ctx.status_skipped,
+              "book": _book_status(ctx), "volatility": ctx.candles.snapshot(),
+              "spacing": [to_price(v) for v in ctx.spacing.last or (cfg["buy_interval"], cfg["sell_interval"])],
+              "risk": None if ctx.guard is None else {**ctx.guard.status(), "cancel_ms": ctx.guard_cancel_ms}},
+        levels=levels, orders=orders, balances=balances,
+        shadows=[shadow.summary(current_price) for shadow in shadows],
+    )
+
+
 # --- 메인 ---
 class GracefulKiller:
     def __init__(self):
-        self.stop = False
+        self._event = threading.Event()
+        self._wake = threading.Event()
         signal.signal(signal.SIGINT, self.exit_gracefully)
         signal.signal(signal.SIGTERM, self.exit_gracefully)
 
+    @property
+    def stop(self) -> bool:
+        return self._event.is_set()
+
     def exit_gracefully(self, *args):
-        self.stop = True
+        self._event.set()
+        self._wake.set()
+
+    def wake(self):
+        """종료 없이 대기 중인 루프만 바로 깨움 (리스크 가드 발동 등)"""
+        self._wake.set()
+
+    def wait(self, seconds: float) -> bool:
+        """seconds 동안 대기하되 종료 신호나 wake()가 오면 즉시 깨어남 (종료 요청 여부 반환)"""
+        self._wake.wait(seconds)
+        self._wake.clear()
+        return self._event.is_set()
 
 
 # --- 메인 실행 로직 ---
-def main(trading_cfg: dict | None):
-    """메인 트레이딩 봇 로직"""
+def main(trading_cfg: dict | None, config_path: str | Path | None = None,
+         heartbeat_path: Optional[str] = None, resume: Optional[bool] = None,
+         lease_path: Optional[str] = None, allocator_socket: Optional[str] = None):
+    """메인 트레이딩 봇 로직
+
+    config_path가 주어지면 YAML/TOML 설정 파일을 읽고, 실행 중 파일 변경을 감시해 반영한다.
+    heartbeat_path가 주어지면 루프마다 파일 mtime을 갱신한다 (supervisor 생존 확인용).
+    resume이 True면 (None이면 설정의 resume_from_snapshot) 스냅샷에서 레벨 상태/주문을 이어받는다.
+    lease_path가 주어지면 (클러스터 모드) 임대 유효 시각이 지나는 즉시 주문을 정리하고 종료한다.
+    allocator_socket이 주어지면 (supervisor가 띄운 공용 자금 배분 데몬) 설정의 allocator_socket 대신 쓴다.
+    """
     # --- 거래 설정 ---
+    config_watcher = None
+    if config_path is not None:
+        try:
+            trading_cfg = load_grid_config(config_path).model_dump()
+        except Exception as e:
+            logger.critical("설정 파일 로드 실패: %s / %s", config_path, e, extra={"event": "config_error"})
+            return
+        config_watcher = GridConfigWatcher(config_path, trading_cfg["reload_check_interval"]).start()
 
     if trading_cfg is None:
         TRADING_CONFIG = {
@@ -291,170 +1608,310 @@ def main(trading_cfg: dict | None):
         }
     else:
         TRADING_CONFIG = trading_cfg
+    # dict로 넘어온 설정도 동일한 스키마로 검증 (누락값은 기본값으로 채움)
+    TRADING_CONFIG = GridConfig.model_validate(TRADING_CONFIG).model_dump()
+    if allocator_socket:
+        TRADING_CONFIG["allocator_socket"] = allocator_socket
 
-    # Bithumb 클라이언트 초기화
+    # Bithumb 클라이언트 초기화: 조회는 API 키 풀에 분산, 주문은 그리드 고정 키 (키가 1개면 기존과 같음)
     try:
-        connect_key = os.getenv("BITHUMB_ACCESS_KEY")
-        secret_key = os.getenv("BITHUMB_SECRET_KEY")
-        bithumb_client = Bithumb(connect_key, secret_key)
+        bithumb_client = api_bithumb_client(TRADING_CONFIG["grid_id"], TRADING_CONFIG["api_key"])
     except Exception as e:
-        logger.critical(f"Bithumb 클라이언트 초기화 실패: {e}")
+        logger.critical("Bithumb 클라이언트 초기화 실패: %s", e, extra={"event": "client_error"})
         return
 
-    # 전략 리스트 생성
-    strategies = [
-        Strategy(
-            strategy_id=i,
-            buy_price=TRADING_CONFIG["start_buy_price"] - (TRADING_CONFIG["buy_interval"] * i),
-            sell_price=TRADING_CONFIG["start_buy_price"] - (TRADING_CONFIG["buy_interval"] * i) + TRADING_CONFIG[
-                "sell_interval"],
-            order_qty=TRADING_CONFIG["order_qty"]
-        )
-        for i in range(TRADING_CONFIG["divide_count"])
-    ]
+    # 그리드 공용 런타임 (체결 원장 등)
+    if TRADING_CONFIG["allocator_socket"]:
+        allocator = RemoteAllocator(TRADING_CONFIG["allocator_socket"])
+    else:
+        # 프로세스 내 배분은 이 그리드 예약만 알므로 계정 잔고를 이 그리드 혼자 쓸 때만 안전
+        logger.warning("공용 자금 배분 데몬 없이 실행: 같은 계정으로 다른 그리드를 함께 돌리면 잔고를 이중 예약합니다",
+                       extra={"event": "allocator_local"})
+        allocator = CapitalAllocator(TRADING_CONFIG["balance_reconcile_interval"])
+    ctx = GridContext(grid_id=TRADING_CONFIG["grid_id"], ticker=TRADING_CONFIG["ticker"],
+                      ledger=TradeLedger(TRADING_CONFIG["ledger_path"]), allocator=allocator,
+                      registry=OrderRegistry(TRADING_CONFIG["grid_id"]),
+                      watermark=PriceWatermark(), status_sweep_interval=TRADING_CONFIG["status_sweep_interval"])
+    ctx.candles = CandleAggregator(TRADING_CONFIG["spacing_candle_sec"], tuple(TRADING_CONFIG["spacing_windows"]))
+    ctx.spacing = SpacingPolicy(ctx.candles)
+    if TRADING_CONFIG["risk_guard"]:
+        ctx.guard = RiskGuard(TRADING_CONFIG["risk_max_jump"], TRADING_CONFIG["risk_max_move"],
+                              TRADING_CONFIG["risk_move_window"], TRADING_CONFIG["risk_stale_after"],
+                              TRADING_CONFIG["risk_cooldown"])
+    if TRADING_CONFIG["record_dir"]:
+        # 루프가 이미 조회한 현재가를 그대로 기록 (추가 API 호출 없음)
+        ctx.recorder = MarketRecorder(TRADING_CONFIG["record_dir"], source=ctx.grid_id,
+                                      roll_interval=TRADING_CONFIG["record_roll_interval"])
+    book_feed = None
+    if TRADING_CONFIG["orderbook_feed"]:
+        # 웹소켓 호가창 (수신은 별도 스레드, 루프는 로컬 호가창만 읽음)
+        ctx.book = OrderBook(TRADING_CONFIG["ticker"])
+        ctx.book_fill_ticks, ctx.book_max_age = TRADING_CONFIG["book_fill_ticks"], TRADING_CONFIG["book_max_age"]
+        try:
+            book_feed = OrderBookFeed(ctx.book, watermark=ctx.watermark, guard=ctx.guard).start()
+        except Exception as e:
+            logger.error("호가창 피드 시작 실패 (현재가 규칙으로 동작): %s", e, extra={"event": "book_error"})
+            ctx.book = None
+    # 마켓 주문 규칙: 디스크 캐시가 market_meta_ttl 이내면 API 호출 없음 (주문 경로는 캐시/사다리만 사용)
+    ctx.meta = load_market_meta("bithumb", TRADING_CONFIG["ticker"], bithumb_client,
+                                TRADING_CONFIG["market_meta_path"], TRADING_CONFIG["market_meta_ttl"])
+    ctx.scale = grid_scale(TRADING_CONFIG, ctx.meta)
+    ctx.prices = grid_price_ladder(TRADING_CONFIG, ctx.meta, ctx.scale)
+    venue_feeds = []
+    if len(TRADING_CONFIG["venues"]) > 1:
+        # 거래소 라우팅: 레벨 주문마다 거래소 선택, 조회/취소는 주문번호 접두어로 해당 거래소에 (잔고는 합산)
+        try:
+            bithumb_client, venue_feeds = build_routed_client(TRADING_CONFIG, bithumb_client, ctx)
+        except Exception as e:
+            logger.critical("거래소 라우팅 초기화 실패: %s", e, extra={"event": "client_error"})
+            return
+    try:
+        # 이전 프로세스가 남긴 예약 정리
+        allocator.release_grid(ctx.grid_id)
+    except Exception as e:
+        logger.error("자금 배분기 연결 실패: %s", e, extra={"event": "allocator_error"})
+
+    # 전략 리스트 생성 (재시작이면 스냅샷에서 이어받기)
+    if resume is None:
+        resume = TRADING_CONFIG["resume_from_snapshot"]
+    strategies = []
+    snapshot_at = None
+    if resume:
+        try:
+            snapshot_at = os.path.getmtime(TRADING_CONFIG["snapshot_path"])
+            strategies = load_strategies_snapshot(TRADING_CONFIG["snapshot_path"], ctx)
+            logger.info("스냅샷에서 전략 복원: %s (개수: %d)", TRADING_CONFIG["snapshot_path"], len(strategies),
+                        extra={"event": "resume", "count": len(strategies)})
+        except Exception as e:
+            logger.error("스냅샷 복원 실패, 새로 시작합니다: %s", e, extra={"event": "resume_error"})
+            strategies, snapshot_at = [], None
+    strategies = strategies or build_levels(TRADING_CONFIG, ctx)
+    check_level_prices(strategies, ctx)
+    # 복원한 주문번호로 색인을 만들고, 재시작 사이에 닫힌 주문은 첫 틱에 바로 조회
+    ctx.registry.rebuild(strategies)
+    reconcile_orders(strategies, bithumb_client, ctx)
+    ctx.last_order_reconcile = time.monotonic()
+    if snapshot_at is not None:
+        settle_resumed_levels(strategies, bithumb_client, ctx, snapshot_at)
+
+    # 위로 추가된 전략 관리 상태값 (복원한 경우 기존 위 레벨 개수부터, 다음 레벨은 최상단 + buy_interval)
+    up_prices = [s.buy_price for s in strategies if s.buy_price > TRADING_CONFIG["start_buy_price"]]
+    ctx.up_created = len(up_prices)
+    ctx.next_up_price = max(up_prices, default=TRADING_CONFIG["start_buy_price"]) + TRADING_CONFIG["buy_interval"]
+
+    # 섀도(모의) 그리드: 같은 현재가로 로컬 모의 체결 (거래소 요청 없음)
+    shadows = []
+    for shadow_cfg in TRADING_CONFIG["shadows"]:
+        try:
+            shadows.append(ShadowGrid(TRADING_CONFIG, shadow_cfg, ctx.ledger, ctx.meta, ctx.prices, ctx.book,
+                                      ctx.candles))
+            shadows[-1].ctx.guard = ctx.guard  # 가드 발동은 프로세스 안 모든 그리드에 적용
+        except Exception as e:
+            logger.error("섀도 그리드 생성 실패: %s / %s", shadow_cfg.get("name"), e, extra={"event": "shadow_error"})
+    if shadows:
+        logger.info("섀도 그리드 %d개 실행: %s", len(shadows), [sg.ctx.grid_id for sg in shadows],
+                    extra={"event": "shadow_start", "count": len(shadows)})
+
+    # 상태 API (루프는 틱마다 스냅샷만 게시, HTTP 처리는 별도 스레드)
+    status_board, status_server = None, None
+    if TRADING_CONFIG["status_port"]:
+        status_board = StatusBoard()
+        try:
+            status_server = StatusServer(status_board, TRADING_CONFIG["status_host"], TRADING_CONFIG["status_port"],
+                                         stale_after=TRADING_CONFIG["loop_interval"] * 10 + 60).start()
+        except OSError as e:
+            logger.error("상태 API 시작 실패: %s", e, extra={"event": "status_error"})
+            status_board = None
 
-    # 위로 추가된 전략 관리 상태값
-    up_created = 0
-    next_up_offset = 1  # start_buy_price + buy_interval * 1 부터 시작
+    # 추적 모드: 창 최상단 (복원한 경우 제거 예정이 아닌 레벨 중 최상단)
+    if TRADING_CONFIG["trailing"]:
+        ctx.anchor = max((s.buy_price for s in strategies if not s.retiring), default=TRADING_CONFIG["start_buy_price"])
 
     # 트레이딩 시작 알림
-    my_balance = bithumb_client.get_balance(TRADING_CONFIG["ticker"])
-    start_msg = (
-        f" **트레이딩 봇 시작**\n"
-        f" - 티커: {TRADING_CONFIG['ticker']}\n"
-        f" - 보유수량: {my_balance[0]}\n"
-        f" - 거래중수량: {my_balance[1]}\n"
-        f" - 보유원화: {my_balance[2]:,.0f} KRW\n"
-        f" - 거래중원화: {my_balance[3]:,.0f} KRW"
-    )
-    logger.info(start_msg.replace('\n', ' '))
+    try:
+        my_balance = bithumb_client.get_balance(TRADING_CONFIG["ticker"])
+        start_msg = (
+            f" **트레이딩 봇 시작**\n"
+            f" - 티커: {TRADING_CONFIG['ticker']}\n"
+            f" - 보유수량: {my_balance[0]}\n"
+            f" - 거래중수량: {my_balance[1]}\n"
+            f" - 보유원화: {my_balance[2]:,.0f} KRW\n"
+            f" - 거래중원화: {my_balance[3]:,.0f} KRW"
+        )
+    except Exception as e:
+        # 잔고 조회 장애로 시작 자체가 죽지 않도록 (잔고는 루프의 대사에서 다시 맞춤)
+        start_msg = f" **트레이딩 봇 시작**\n - 티커: {TRADING_CONFIG['ticker']}\n - 잔고 조회 실패: {e}"
+    logger.info(start_msg.replace('\n', ' '), extra={"event": "start", "ticker": TRADING_CONFIG["ticker"]})
     send_discord_message(start_msg)
 
+    # 장기 실행 누수 감시: resource_interval마다 RSS/FD/스레드/GC 일시정지와 그리드 크기를 로그로
+    tracker = None
+    if TRADING_CONFIG["resource_interval"] > 0:
+        tracker = ResourceTracker(TRADING_CONFIG["resource_interval"], trace=TRADING_CONFIG["resource_tracemalloc"]).start()
+        tracker.gauge("levels", lambda: len(strategies)).gauge("orders_indexed", lambda: len(ctx.registry))
+        tracker.gauge("log_backlog", queue_backlog)
+
     killer = GracefulKiller()
+    if ctx.guard is not None:
+        # 웹소켓 체결로 발동하면 루프 대기를 끊고 바로 매수 취소 (다음 루프 주기까지 기다리지 않음)
+        ctx.guard.on_trip(lambda trip: killer.wake())
+    # kill -USR1 <pid>: profile_duration초 프로파일링, kill -USR2 <pid>: 스레드 스택 덤프 (log/ 에 저장)
+    DiagnosticSignals(log_dir="log", duration=TRADING_CONFIG["profile_duration"]).install()
+    backoff = ErrorBackoff(TRADING_CONFIG["loop_interval"], TRADING_CONFIG["error_backoff_max"])
     loop_count = 0
     while not killer.stop:
         try:
             loop_count += 1
-
-            # 현재가 조회
-            current_price = bithumb_client.get_current_price(TRADING_CONFIG["ticker"])
-            if not current_price:
-                logger.warning("현재가를 가져올 수 없습니다. 다음 루프에서 재시도합니다.")
-                time.sleep(TRADING_CONFIG["loop_interval"])
+            tick_started = time.monotonic()
+            touch_heartbeat(heartbeat_path)
+            if not lease_valid(lease_path):
+                logger.critical("그리드 임대 만료 (supervisor 응답 없음): 주문 정리 후 종료",
+                                extra={"event": "lease_expired", "lease_file": lease_path})
+                break
+
+            # 설정 파일 변경분 반영 (검증은 감시 스레드에서 끝난 상태)
+            if config_watcher is not None:
+                new_cfg = config_watcher.poll()
+                if new_cfg is not None:
+                    new_cfg = new_cfg.model_dump()
+                    if allocator_socket:
+                        new_cfg["allocator_socket"] = allocator_socket  # 명령행 지정값은 파일 변경으로 바뀌지 않음
+                    TRADING_CONFIG = apply_grid_config(strategies, TRADING_CONFIG, new_cfg, bithumb_client, ctx)
+
+            current_price = trade_tick(strategies, TRADING_CONFIG, bithumb_client, ctx, loop_count)
+            if current_price is None:
+                killer.wait(TRADING_CONFIG["loop_interval"])
                 continue
 
-            logger.info(f"--- [Loop {loop_count}] 현재가: {current_price:,} KRW, New created: {up_created:,} ---")
-
-            # (1) 상승 시 위쪽 전략을 하나씩 추가하며 즉시 매수, 최대 max_up_strategies까지
-            while True:
-                if up_created > TRADING_CONFIG["max_up_strategies"]:
-                    break
-
-                target_level = TRADING_CONFIG["start_buy_price"] + (TRADING_CONFIG["buy_interval"] * next_up_offset)
-                if current_price < target_level:
-                    break  # 아직 다음 위 레벨을 돌파하지 않음
-
-                # 같은 레벨의 전략이 이미 있으면(중복 생성 방지) 생성 보류
-                already_exists = any(s.buy_price == target_level for s in strategies)
-                if already_exists:
-                    break  # 다음 루프에서 다시 확인
-
-                # 해당 레벨에 '매도 대기/매도 진행' 전략이 있으면 충돌 방지 위해 생성/매수 보류
-                sell_conflict = any(
-                    (s.sell_price == target_level) and (s.status in (ACTIVE, SELLING, BUYING)) for s in strategies)
-                if sell_conflict:
-                    break  # 326 매도 체결 완료될 때까지 대기
-
-                new_id = max([s.strategy_id for s in strategies]) + 1 if strategies else 0
-                new_buy = target_level
-                new_sell = target_level + TRADING_CONFIG["sell_interval"]
-                new_strategy = Strategy(
-                    strategy_id=new_id,
-                    buy_price=new_buy,
-                    sell_price=new_sell,
-                    order_qty=TRADING_CONFIG["order_qty"]
-                )
-                strategies.append(new_strategy)
-
-                add_msg = (f"[Strategy {new_id}] 위 레벨 전략 추가: "
-                           f"buy={new_buy}, sell={new_sell}, 현재가={current_price} (offset={next_up_offset})")
-                logger.info(add_msg)
-                send_discord_message(add_msg)
-
-                # 즉시 매수는 '충돌 없을 때만' 진행 (위의 가드 통과 시에만 여기 도달)
+            for shadow in shadows:
                 try:
-                    new_strategy._place_order(bithumb_client, 'buy', TRADING_CONFIG["ticker"])
+                    shadow.tick(current_price)
                 except Exception as e:
-                    logger.error(f"[Strategy {new_id}] 즉시 매수 제출 실패: {e}")
-
-                up_created += 1
-                next_up_offset += 1
-
-            # [핵심] 모든 전략을 한번에 업데이트
-            for strategy in strategies:
-                strategy.update(current_price, bithumb_client, TRADING_CONFIG["ticker"], TRADING_CONFIG["buy_margin"],
-                                TRADING_CONFIG["buy_interval"], TRADING_CONFIG["cancel_depth"])
+                    shadow.ctx.log.error("섀도 그리드 처리 오류: %s", e, exc_info=True, extra={"event": "shadow_error"})
 
             # 주기적 리포트
             if loop_count % TRADING_CONFIG["report_interval_loops"] == 0:
                 report_text = f"** 생존 신고 (Loop {loop_count})**\n - 현재가: {current_price:,} KRW\n"
                 active_strategies = []
+                fmt = ctx.scale.format_price  # 레벨 가격은 정수 틱
                 for s in strategies:
                     if s.status != STANDBY:
                         active_strategies.append(
-                            f" - ID {s.strategy_id}: {s.status}, 매수 {s.buy_price}, 매도 {s.sell_price}")
+                            f" - ID {s.strategy_id}: {s.status}, 매수 {fmt(s.buy_price)}, 매도 {fmt(s.sell_price)}")
 
                 if active_strategies:
                     report_text += "**[진행중인 전략]**\n" + "\n".join(active_strategies)
                 else:
                     report_text += " - 모든 전략 대기 중"
 
+                if shadows:
+                    # 섀도 그리드 결과를 실거래 결과 옆에 비교
+                    lines = [f" - live: 왕복 {ctx.round_trips}회, 실현 {ctx.realized_pnl:+,.0f} KRW"]
+                    for shadow in shadows:
+                        summary = shadow.summary(current_price)
+                        lines.append(f" - {summary['grid_id']}: 왕복 {summary['round_trips']}회, "
+                                     f"실현 {summary['realized_pnl']:+,.0f} KRW, 평가 {summary['equity_pnl']:+,.0f} KRW, "
+                                     f"보유 레벨 {summary['held_levels']}")
+                        logger.info("섀도 그리드 결과: %s", summary["grid_id"], extra={"event": "shadow_report", **summary})
+                    report_text += "\n**[섀도 비교]**\n" + "\n".join(lines)
+
                 send_discord_message(report_text)
-                logger.info("주기적 리포트 전송 완료.")
+                logger.info("주기적 리포트 전송 완료. (체결 조회 %d회, 생략 %d회, 호가창 매수 보류 %d회)",
+                            ctx.status_queries, ctx.status_skipped, ctx.book_deferred,
+                            extra={"event": "report", "loop": loop_count, "status_queries": ctx.status_queries,
+                                   "status_skipped": ctx.status_skipped, "book_deferred": ctx.book_deferred})
 
             # 스냅샷 주기 저장
             if loop_count % TRADING_CONFIG["save_interval_loops"] == 0:
                 save_strategies_snapshot(strategies, TRADING_CONFIG["snapshot_path"])
 
-            time.sleep(TRADING_CONFIG["loop_interval"])
+            if status_board is not None:
+                status_board.record_loop_time(time.monotonic() - tick_started)
+                publish_status(status_board, strategies, TRADING_CONFIG, ctx, current_price, loop_count, shadows)
+            if tracker is not None:
+                tracker.maybe_sample()
+
+            recovered = backoff.success()
+            if recovered is not None:
+                msg = f" 메인 루프 복구: 연속 오류 {recovered[0]}회, 장애 {recovered[1]:.1f}초"
+                logger.warning(msg, extra={"event": "loop_recovered", "errors": recovered[0],
+                                           "downtime_sec": recovered[1]})
+                send_discord_message(msg)
+
+            killer.wait(TRADING_CONFIG["loop_interval"])
 
         except Exception as e:
-            logger.critical(f"메인 루프에서 예측하지 못한 오류 발생: {e}")
-            send_discord_message(f" **치명적 오류 발생**: {e}\n봇을 확인해야 합니다.")
-            time.sleep(60)  # 오류 발생 시 잠시 대기
+            # 연속 오류마다 대기를 늘리고 (loop_interval -> error_backoff_max), 알림은 장애 시작 시 1회만
+            backoff.base, backoff.maximum = TRADING_CONFIG["loop_interval"], TRADING_CONFIG["error_backoff_max"]
+            delay = backoff.failure()
+            logger.critical("메인 루프에서 예측하지 못한 오류 발생 (%d회 연속, %.1f초 후 재시도): %s",
+                            backoff.streak, delay, e, exc_info=True,
+                            extra={"event": "loop_error", "errors": backoff.streak, "retry_in": delay})
+            if backoff.streak == 1:
+                send_discord_message(f" **치명적 오류 발생**: {e}\n봇을 확인해야 합니다.")
+            killer.wait(delay)  # 종료 신호가 오면 바로 정리 단계로
+
+    if config_watcher is not None:
+        config_watcher.stop()
+    if tracker is not None:
+        tracker.stop()
+    if status_server is not None:
+        status_server.stop()
+    if book_feed is not None:
+        book_feed.stop()
+    for feed in venue_feeds:
+        feed.stop()
 
     # 트레이딩 종료 처리
-    logger.info("최대 루프 횟수에 도달하여 트레이딩을 종료합니다. 미체결 주문을 취소합니다.")
+    logger.info("최대 루프 횟수에 도달하여 트레이딩을 종료합니다. 미체결 주문을 취소합니다.", extra={"event": "stopping"})
     send_discord_message(" **트레이딩 종료 중...**\n미체결된 매수/매도 주문을 취소합니다.")
-    # ⬇️ 종료 전 스냅샷
-    save_strategies_snapshot(strategies, TRADING_CONFIG["snapshot_path"])
-
     cancelled_count = 0
     for strategy in strategies:
         if strategy._cancel_open_order(bithumb_client):
             cancelled_count += 1
 
+    # ⬇️ 종료 전 스냅샷 (부분 체결 매수 취소 후 보유분 상태까지 반영)
+    save_strategies_snapshot(strategies, TRADING_CONFIG["snapshot_path"])
+
+    ctx.ledger.close()
+    if ctx.recorder is not None:
+        ctx.recorder.close()
+
     end_msg = f" **트레이딩 봇 종료**\n - 총 {cancelled_count}개의 주문을 취소했습니다."
-    logger.info(end_msg)
+    logger.info(end_msg, extra={"event": "stop", "cancelled": cancelled_count})
     send_discord_message(end_msg)
 
 
 if __name__ == "__main__":
-    TRADING_CONFIG = {
-        "ticker": "DOGE",
-        "start_buy_price": 325,
-        "divide_count": 20,
-        "order_qty": 250,
-        "buy_interval": 1,
-        "sell_interval": 1,
-        "buy_margin": 2,  # 현재가가 매수가보다 이만큼 높아도 매수 시도 (기존 로직: buyInterval * 2)
-        "loop_interval": 3,  # (초)
-        "report_interval_loops": 300,
-        "cancel_depth": 5,
-        "max_up_strategies": 10,
-        "save_interval_loops": 60,                       # 몇 루프마다 저장할지
-        "snapshot_path": "snapshots/strategies.json",     # 저장 경로        
-    }
-    main(TRADING_CONFIG)
-
-
+    import argparse
+
+    parser = argparse.ArgumentParser(description="분할매매 그리드 봇")
+    parser.add_argument("--config", help="그리드 설정 파일 (YAML/TOML). 실행 중 수정하면 재시작 없이 반영")
+    parser.add_argument("--heartbeat", help="루프마다 mtime을 갱신할 heartbeat 파일 (supervisor용)")
+    parser.add_argument("--resume", action="store_true", default=None,
+                        help="스냅샷에서 레벨 상태/미체결 주문을 이어받아 시작 (재시작용)")
+    parser.add_argument("--lease-file", help="임대 유효 시각 파일 (클러스터 supervisor용, 지나면 정리 후 종료)")
+    parser.add_argument("--allocator-socket", help="공용 자금 배분 데몬 소켓 (supervisor가 넘김, 설정보다 우선)")
+    args = parser.parse_args()
+
+    if args.config:
+        main(None, config_path=args.config, heartbeat_path=args.heartbeat, resume=args.resume,
+             lease_path=args.lease_file, allocator_socket=args.allocator_socket)
+    else:
+        TRADING_CONFIG = {
+            "ticker": "DOGE",
+            "start_buy_price": 325,
+            "divide_count": 20,
+            "order_qty": 250,
+            "buy_interval": 1,
+            "sell_interval": 1,
+            "buy_margin": 2,  # 현재가가 매수가보다 이만큼 높아도 매수 시도 (기존 로직: buyInterval * 2)
+            "loop_interval": 3,  # (초)
+            "report_interval_loops": 300,
+            "cancel_depth": 5,
+            "max_up_strategies": 10,
+            "save_interval_loops": 60,                       # 몇 루프마다 저장할지
+            "snapshot_path": "snapshots/strategies.json",     # 저장 경로
+        }
+        main(TRADING_CONFIG, heartbeat_path=args.heartbeat, resume=args.resume, lease_path=args.lease_file,
+             allocator_socket=args.allocator_socket)
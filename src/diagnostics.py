@@ -0,0 +1,348 @@
+import gc
+import os
+import sys
+import time
+import signal
+import pstats
+import logging
+import cProfile
+import threading
+import traceback
+import tracemalloc
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger("TradingBotLogger").getChild("diag")
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """sys._current_frames()를 interval 초마다 읽어 스레드별 호출 스택을 집계하는 샘플링 프로파일러
+
+    대상 코드에 훅을 걸지 않으므로 켜 둔 동안의 부하는 샘플링 스레드 하나뿐이다.
+    결과는 flamegraph용 folded 형식(스레드;함수;...;함수 횟수)과 함수별 self/누적 상위 목록으로 저장한다.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = 0.0
+
+    def start(self):
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(tid, str(tid)))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def write(self, path_prefix: Path) -> list[Path]:
+        folded = path_prefix.with_suffix(".folded")
+        with open(folded, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[f"{frames[0]} | {frames[-1]}"] += count
+            for label in set(frames[1:]):
+                total_counts[f"{frames[0]} | {label}"] += count
+        summary = path_prefix.with_suffix(".txt")
+        with open(summary, "w", encoding="utf-8") as f:
+            f.write(f"samples={self.samples} interval={self.interval}s "
+                    f"duration={time.time() - self.started_at:.1f}s\n\n[self]\n")
+            for label, count in self_counts.most_common(40):
+                f.write(f"{count / max(self.samples, 1):7.1%}  {count:7d}  {label}\n")
+            f.write("\n[inclusive]\n")
+            for label, count in total_counts.most_common(40):
+                f.write(f"{count / max(self.samples, 1):7.1%}  {count:7d}  {label}\n")
+        return [folded, summary]
+
+
+def dump_thread_stacks(out_dir: str | Path = "log") -> Path:
+    """모든 스레드의 현재 호출 스택을 파일로 기록"""
+    path = Path(out_dir) / f"stacks_{os.getpid()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    names = {t.ident: (t.name, t.daemon) for t in threading.enumerate()}
+    with open(path, "w", encoding="utf-8") as f:
+        for tid, frame in sys._current_frames().items():
+            name, daemon = names.get(tid, ("?", None))
+            f.write(f"--- Thread {name} (ident={tid}, daemon={daemon}) ---\n")
+            f.write("".join(traceback.format_stack(frame)))
+            f.write("\n")
+    return path
+
+
+class DiagnosticSignals:
+    """GracefulKiller처럼 시그널로 켜고 끄는 운영 중 진단 도구
+
+    - SIGUSR1: 프로파일러 시작, duration 초 뒤 자동 종료 (실행 중에 다시 보내면 즉시 종료) 후 결과 저장
+    - SIGUSR2: 전체 스레드 스택 덤프
+    mode="sample"(기본)은 SamplingProfiler, mode="cprofile"은 cProfile로 메인(트레이딩 루프) 스레드를
+    함수 단위로 정확히 측정한다. cProfile은 켠 스레드에서만 끌 수 있으므로, 자동 종료 타이머는
+    메인 스레드에 SIGUSR1을 다시 보내는 방식으로 끈다. 결과 파일은 log_dir(로그 옆)에 쓴다.
+    """
+
+    def __init__(self, log_dir: str | Path = "log", duration: float = 30.0, mode: Optional[str] = None,
+                 interval: float = 0.01):
+        self.log_dir = Path(log_dir)
+        self.duration = duration
+        self.mode = mode or os.getenv("DIAG_PROFILER", "sample")
+        self.interval = interval
+        self._active = None
+        self._timer: Optional[threading.Timer] = None
+
+    def install(self):
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        signal.signal(signal.SIGUSR1, self._toggle_profiler)
+        signal.signal(signal.SIGUSR2, self._dump_stacks)
+        return self
+
+    def _prefix(self) -> Path:
+        return self.log_dir / f"profile_{os.getpid()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    def _toggle_profiler(self, *args):
+        if self._active is None:
+            self._start()
+        else:
+            self._finish()
+
+    def _start(self):
+        if self.mode == "cprofile":
+            prof = cProfile.Profile()
+            prof.enable()
+        else:
+            prof = SamplingProfiler(self.interval)
+            prof.start()
+        self._active = prof
+        main_id = threading.main_thread().ident
+        self._timer = threading.Timer(self.duration, signal.pthread_kill, args=(main_id, signal.SIGUSR1))
+        self._timer.daemon = True
+        self._timer.start()
+        logger.warning("프로파일러 시작 (mode=%s, %ss)", self.mode, self.duration,
+                       extra={"event": "profile_start", "mode": self.mode})
+
+    def _finish(self):
+        prof, self._active = self._active, None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        prefix = self._prefix()
+        try:
+            if isinstance(prof, cProfile.Profile):
+                prof.disable()
+                prof.dump_stats(prefix.with_suffix(".pstats"))
+                with open(prefix.with_suffix(".txt"), "w", encoding="utf-8") as f:
+                    pstats.Stats(prof, stream=f).sort_stats("cumulative").print_stats(60)
+                paths = [prefix.with_suffix(".pstats"), prefix.with_suffix(".txt")]
+            else:
+                prof.stop()
+                paths = prof.write(prefix)
+        except Exception as e:
+            logger.error("프로파일 결과 저장 실패: %s", e, extra={"event": "profile_error"})
+            return
+        logger.warning("프로파일러 종료: %s", [str(p) for p in paths], extra={"event": "profile_stop"})
+
+    def _dump_stacks(self, *args):
+        try:
+            path = dump_thread_stacks(self.log_dir)
+        except Exception as e:
+            logger.error("스레드 스택 덤프 실패: %s", e, extra={"event": "stack_dump_error"})
+            return
+        logger.warning("스레드 스택 덤프: %s", path, extra={"event": "stack_dump", "path": str(path)})
+
+
+def _rss_bytes() -> Optional[int]:
+    """현재 RSS (/proc이 없으면 ru_maxrss 최대치로 대신)"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _open_fds() -> Optional[int]:
+    for path in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(path)) - 1  # listdir 자신이 연 디렉터리 fd 제외
+        except OSError:
+            continue
+    return None
+
+
+class ResourceTracker:
+    """프로세스 자원 사용량을 주기적으로 재서 로그 이벤트(event=resources)로 남기는 장기 실행 감시
+
+    - rss / fds / threads: 현재 RSS, 열린 파일 디스크립터 수, 살아 있는 스레드 수
+    - gc: 구간 내 세대별 수집 횟수와 일시정지 합/최대 (gc.callbacks로 측정, 전체 누적도 보관)
+    - tracemalloc (trace=True일 때만, 부하가 있어 누수 조사용): 추적 중인 메모리와 직전 샘플 대비
+      증가량 상위 top개 위치
+    - gauge(): 호출자가 등록한 크기 값 (레벨 수, 주문 색인 크기 등)
+    maybe_sample()은 루프에서 매 틱 불러도 interval이 지나지 않았으면 시각 비교만 한다.
+    샘플은 history에 남기고 growth()로 지표별 시간당 증가율(최소제곱 기울기)을 계산한다.
+    now를 넘기면 그 시각 기준으로 잰다 (soak 테스트의 가상 시각).
+    """
+
+    def __init__(self, interval: float = 300.0, trace: bool = False, top: int = 10, frames: int = 1,
+                 history: int = 1000):
+        self.interval = interval
+        self.trace = trace
+        self.top = top
+        self.frames = frames
+        self.history: deque = deque(maxlen=history)
+        self._gauges: dict = {}
+        self._next_at: Optional[float] = None
+        self._gc_started: Optional[float] = None
+        self._gc_window = self._gc_empty()
+        self.gc_total = self._gc_empty()
+        self._prev_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._started_trace = False
+
+    @staticmethod
+    def _gc_empty() -> dict:
+        return {"runs": [0, 0, 0], "collected": 0, "pause_ms": 0.0, "max_pause_ms": 0.0}
+
+    def start(self):
+        gc.callbacks.append(self._on_gc)
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_trace = True
+        return self
+
+    def stop(self):
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        if self._started_trace:
+            tracemalloc.stop()
+            self._started_trace = False
+        self._prev_snapshot = None
+
+    def gauge(self, name: str, fn):
+        """샘플마다 fn()을 불러 name으로 기록 (예: lambda: len(strategies))"""
+        self._gauges[name] = fn
+        return self
+
+    def _on_gc(self, phase: str, info: dict):
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+            return
+        if self._gc_started is None:
+            return
+        pause_ms = (time.perf_counter() - self._gc_started) * 1000
+        self._gc_started = None
+        for stats in (self._gc_window, self.gc_total):
+            stats["runs"][info["generation"]] += 1
+            stats["collected"] += info["collected"]
+            stats["pause_ms"] += pause_ms
+            stats["max_pause_ms"] = max(stats["max_pause_ms"], pause_ms)
+
+    def maybe_sample(self, now: Optional[float] = None) -> Optional[dict]:
+        now = time.monotonic() if now is None else now
+        if self._next_at is None:
+            self._next_at = now + self.interval
+            return None
+        if now < self._next_at:
+            return None
+        self._next_at = now + self.interval
+        return self.sample(now)
+
+    def _top_allocations(self) -> list[dict]:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        if self._prev_snapshot is None:
+            stats = [(s, s.size, s.count) for s in snapshot.statistics("lineno")[:self.top]]
+        else:
+            stats = [(s, s.size_diff, s.count_diff) for s in snapshot.compare_to(self._prev_snapshot, "lineno")[:self.top]]
+        self._prev_snapshot = snapshot
+        top = []
+        for stat, diff, count in stats:
+            frame = stat.traceback[0]
+            top.append({"where": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                        "size_kb": round(stat.size / 1024, 1), "diff_kb": round(diff / 1024, 1), "count_diff": count})
+        return top
+
+    def sample(self, now: Optional[float] = None) -> dict:
+        now = time.monotonic() if now is None else now
+        rss = _rss_bytes()
+        gc_window, self._gc_window = self._gc_window, self._gc_empty()
+        sample = {
+            "t": now,
+            "rss_mb": None if rss is None else round(rss / 1024 / 1024, 2),
+            "fds": _open_fds(),
+            "threads": threading.active_count(),
+            "gc_objects": len(gc.get_objects()),
+            "gc_runs": gc_window["runs"],
+            "gc_pause_ms": round(gc_window["pause_ms"], 3),
+            "gc_max_pause_ms": round(gc_window["max_pause_ms"], 3),
+        }
+        for name, fn in self._gauges.items():
+            try:
+                sample[name] = fn()
+            except Exception as e:
+                sample[name] = None
+                logger.debug("gauge 측정 실패: %s / %s", name, e)
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            sample["traced_mb"] = round(current / 1024 / 1024, 2)
+            sample["traced_peak_mb"] = round(peak / 1024 / 1024, 2)
+            sample["top_alloc"] = self._top_allocations()
+        self.history.append(sample)
+        logger.info("자원 사용량: rss=%sMB fds=%s threads=%d gc_pause=%.1fms(max %.1fms)",
+                    sample["rss_mb"], sample["fds"], sample["threads"], sample["gc_pause_ms"],
+                    sample["gc_max_pause_ms"], extra={"event": "resources", **sample})
+        return sample
+
+    def growth(self, skip: int = 1) -> dict:
+        """지표별 {first, last, max, per_hour} (앞의 skip개 샘플은 워밍업으로 제외)"""
+        samples = list(self.history)[skip:]
+        result = {}
+        if len(samples) < 2:
+            return result
+        keys = [k for k, v in samples[-1].items() if k != "t" and isinstance(v, (int, float))]
+        for key in keys:
+            points = [(s["t"], s[key]) for s in samples if isinstance(s.get(key), (int, float))]
+            if len(points) < 2:
+                continue
+            n = len(points)
+            mean_t = sum(t for t, _ in points) / n
+            mean_v = sum(v for _, v in points) / n
+            var_t = sum((t - mean_t) ** 2 for t, _ in points)
+            slope = sum((t - mean_t) * (v - mean_v) for t, v in points) / var_t if var_t else 0.0
+            result[key] = {"first": points[0][1], "last": points[-1][1], "max": max(v for _, v in points),
+                           "per_hour": round(slope * 3600, 4)}
+        return result
@@ -0,0 +1,512 @@
+import os
+import json
+import time
+import random
+import signal
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+import coin_main as cm
+from capital_allocator import CapitalAllocator, bithumb_balances
+from grid_config import GridConfig
+from market_meta import KRW_TICK_TABLE, MarketMeta
+from order_registry import OrderRegistry, order_key
+from price_watermark import PriceWatermark
+from risk_guard import RiskGuard
+from sim_exchange import SimulatedExchange
+
+# 장애 종류별 pybithumb 쪽에서 보이는 모습
+# - timeout: 요청이 거래소에 닿기 전에 끊김 (requests 예외)
+# - timeout_after: 거래소는 처리했지만 응답을 못 받음 (주문/취소는 실제로 반영됨)
+# - http_5xx: 응답 본문이 JSON이 아님 -> pybithumb은 None 반환
+# - rate_limit: 거래소가 요청을 거절 (상태 코드만 있는 응답)
+# - malformed: get_order_completed가 형식이 깨진 응답 반환
+FAULT_KINDS = ("timeout", "timeout_after", "http_5xx", "rate_limit", "malformed")
+ORDER_METHODS = {"buy_limit_order", "sell_limit_order", "cancel_order"}
+QUERY_METHODS = {"get_current_price", "get_balance", "get_order_completed", "get_open_orders", "get_recent_fills"}
+
+MALFORMED_ORDER_RESPONSES = (
+    {"status": "0000", "data": None},
+    {"status": "0000", "data": {"order_status": "Completed", "contract": "oops"}},
+    {"status": "0000", "data": {"order_status": "Completed", "order_qty": "x", "contract": [{"price": "?"}]}},
+    {"status": "0000"},
+    "<html>502 Bad Gateway</html>",
+)
+
+
+@dataclass
+class Fault:
+    kind: str
+    methods: set
+    rate: float = 1.0
+
+
+class FaultyExchange(SimulatedExchange):
+    """SimulatedExchange에 장애를 주입하는 가짜 거래소 클라이언트 (pybithumb 인터페이스)
+
+    active가 켜져 있는 동안 faults의 메서드 호출마다 rate 확률로 장애를 낸다. 주입 횟수는 injected에 집계.
+    latency를 주면 모든 API 호출이 그만큼 (거래소 잠금 밖에서) 지연된다 (왕복 시간 흉내).
+    """
+
+    def __init__(self, *args, seed: int = 0, latency: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latency = latency
+        self.faults: list[Fault] = []
+        self.active = False
+        self.injected: Counter = Counter()
+        self._rng = random.Random(seed)
+
+    def _pick(self, method: str) -> Optional[Fault]:
+        if not self.active:
+            return None
+        for fault in self.faults:
+            if method in fault.methods and self._rng.random() < fault.rate:
+                self.injected[f"{method}:{fault.kind}"] += 1
+                return fault
+        return None
+
+    def _faulty(self, method: str, call, *args):
+        if self.latency:
+            time.sleep(self.latency)
+        fault = self._pick(method)
+        if fault is None:
+            return call(*args)
+        if fault.kind == "timeout":
+            raise requests.exceptions.ReadTimeout(f"{method}: read timed out")
+        if fault.kind == "timeout_after":
+            call(*args)
+            raise requests.exceptions.ReadTimeout(f"{method}: read timed out")
+        if method in ("get_open_orders", "get_recent_fills"):
+            raise RuntimeError(f"{method}: {fault.kind}")  # fetch_open_orders/fetch_recent_fills가 내는 예외
+        if fault.kind == "http_5xx" or (fault.kind == "rate_limit" and method == "get_current_price"):
+            return None
+        if fault.kind == "rate_limit":
+            return {"status": "5900", "message": "Too Many Requests"}
+        if fault.kind == "malformed" and method == "get_order_completed":
+            return self._rng.choice(MALFORMED_ORDER_RESPONSES)
+        return call(*args)
+
+    def get_current_price(self, ticker):
+        return self._faulty("get_current_price", super().get_current_price, ticker)
+
+    def get_balance(self, ticker):
+        return self._faulty("get_balance", super().get_balance, ticker)
+
+    def buy_limit_order(self, ticker, price, unit, payment_currency="KRW"):
+        return self._faulty("buy_limit_order", super().buy_limit_order, ticker, price, unit, payment_currency)
+
+    def sell_limit_order(self, ticker, price, unit, payment_currency="KRW"):
+        return self._faulty("sell_limit_order", super().sell_limit_order, ticker, price, unit, payment_currency)
+
+    def cancel_order(self, order_desc):
+        return self._faulty("cancel_order", super().cancel_order, order_desc)
+
+    def get_order_completed(self, order_desc):
+        return self._faulty("get_order_completed", super().get_order_completed, order_desc)
+
+    def get_open_orders(self, ticker):
+        return self._faulty("get_open_orders", super().get_open_orders, ticker)
+
+    def get_recent_fills(self, ticker, side, since):
+        return self._faulty("get_recent_fills", super().get_recent_fills, ticker, side, since)
+
+
+@dataclass
+class Scenario:
+    name: str
+    faults: list = field(default_factory=list)
+    description: str = ""
+    restart: bool = False  # 장애 구간 끝에 프로세스 재시작 (stale 스냅샷에서 --resume)
+
+
+SCENARIOS = {
+    "baseline": Scenario("baseline", [], "장애 없음 (비교 기준)"),
+    "timeout": Scenario("timeout", [Fault("timeout", ORDER_METHODS | QUERY_METHODS, 0.3)],
+                        "요청 30%가 거래소 도달 전 타임아웃"),
+    "timeout_after": Scenario("timeout_after", [Fault("timeout_after", ORDER_METHODS, 0.5)],
+                              "주문/취소 50%가 처리된 뒤 응답 유실"),
+    "http_5xx": Scenario("http_5xx", [Fault("http_5xx", ORDER_METHODS | QUERY_METHODS, 0.3)],
+                         "요청 30%가 5xx (pybithumb None)"),
+    "rate_limit": Scenario("rate_limit", [Fault("rate_limit", ORDER_METHODS | QUERY_METHODS, 0.5)],
+                           "요청 50%가 요청 한도 초과로 거절"),
+    "malformed": Scenario("malformed", [Fault("malformed", {"get_order_completed"}, 0.5)],
+                          "체결 조회 50%가 깨진 응답"),
+    "outage": Scenario("outage", [Fault("timeout", ORDER_METHODS | QUERY_METHODS, 1.0)],
+                       "거래소 전면 장애 (모든 요청 타임아웃)"),
+    "restart": Scenario("restart", [], "장애 구간 끝에 kill -9 후 마지막 스냅샷으로 재시작", restart=True),
+}
+
+
+def price_path(ticks: int, start: int, seed: int) -> list[int]:
+    """그리드 구간 안에서 오르내리는 정수 가격 경로 (체결이 자주 나도록)"""
+    rng = random.Random(seed)
+    prices, price = [], start
+    for _ in range(ticks):
+        price += rng.choice((-1, 0, 1))
+        price = min(max(price, start - 12), start + 4)
+        prices.append(price)
+    return prices
+
+
+def tracked_keys(strategies: list) -> set:
+    keys = set()
+    for s in strategies:
+        if s.order_id:
+            keys.add(order_key(s.order_id))
+        keys.update(order_key(c["order_id"]) for c in s.child_sells)
+    return keys
+
+
+def grid_health(exchange: SimulatedExchange, strategies: list, ctx: cm.GridContext) -> dict:
+    """거래소 실제 상태와 그리드가 아는 상태 비교
+
+    - orphaned: 거래소에 걸려 있지만 어느 레벨도 추적하지 않는 주문
+    - duplicates: 같은 레벨 매수가에 2건 이상 걸린 매수, 레벨 보유분보다 많이 걸린 매도
+    - untracked_coin: 거래소 코인 - 레벨 보유 수량 합 (양수면 그리드가 잊은 보유분)
+    """
+    open_orders = exchange.get_open_orders(exchange.ticker)
+    known = tracked_keys(strategies)
+    orphaned = [o for o in open_orders if o["order_id"] not in known]
+    buys = Counter(o["price"] for o in open_orders if o["side"] == "buy")
+    sell_qty = Counter()
+    for o in open_orders:
+        if o["side"] == "sell":
+            sell_qty[o["price"]] += o["remaining"]
+    held = {float(ctx.scale.to_price(s.sell_price)): s.held_qty for s in strategies}
+    duplicates = sum(n - 1 for n in buys.values() if n > 1)
+    duplicates += sum(1 for price, qty in sell_qty.items() if qty > held.get(price, 0.0) + cm.QTY_EPS)
+    coin = exchange.get_balance(exchange.ticker)[0]
+    return {
+        "orphaned": len(orphaned),
+        "duplicates": duplicates,
+        "inflight": len(ctx.registry.inflight()),
+        "untracked_coin": round(coin - sum(s.held_qty for s in strategies), 8),
+    }
+
+
+def _grid(cfg: dict, exchange: SimulatedExchange, inflight_timeout: float,
+          strategies: Optional[list] = None) -> tuple[list, cm.GridContext]:
+    allocator = CapitalAllocator(cfg["balance_reconcile_interval"])
+    allocator.reconcile(bithumb_balances(exchange, cfg["ticker"]))
+    ctx = cm.GridContext(grid_id=cfg["grid_id"], ticker=cfg["ticker"], allocator=allocator,
+                         registry=OrderRegistry(cfg["grid_id"], inflight_timeout=inflight_timeout),
+                         watermark=PriceWatermark(), status_sweep_interval=cfg["status_sweep_interval"],
+                         notify_discord=False)
+    ctx.scale = cm.grid_scale(cfg)
+    if strategies is None:
+        strategies = cm.build_levels(cfg, ctx)
+    for s in strategies:
+        s.ctx = ctx
+    ctx.registry.rebuild(strategies)
+    return strategies, ctx
+
+
+def run_scenario(scenario: Scenario, ticks: int = 300, fault_start: int = 60, fault_end: int = 160,
+                 interval: float = 0.01, seed: int = 0, save_every: int = 60, settle_ticks: int = 3,
+                 max_settle_ticks: int = 200) -> dict:
+    """그리드 루프(trade_tick + ErrorBackoff)를 가짜 거래소로 돌리며 장애 구간 전후를 측정
+
+    시간 관련 설정은 interval(실제 loop_interval 대신) 기준으로 줄여서 돌리고, 복구 시간은 초와
+    loop 주기 배수(recover_loops)로 함께 보고한다. 복구 = 장애 구간 이후 처음으로 틱이 오류 없이 끝나고
+    in-flight/고아/중복 주문과 untracked_coin이 모두 0인 시점이고, 복구 시간은 장애 구간의 첫 루프 오류(ErrorBackoff가 잰
+    연속 오류 시작 시각)부터 잰다. 루프 오류 없이 지나간 장애(깨진 응답, 재시작)는 장애 구간 끝부터.
+    downtime_sec은 ErrorBackoff.success()가 보고한 가장 긴 연속 오류 구간. 최종 상태는 마지막 가격에서
+    settle_ticks번 더 돌린 뒤 잰다 (마지막 틱에 난 체결을 레벨이 다음 틱에 조회하기 전이라 생기는 차이 제외).
+    그때도 in-flight나 untracked_coin이 남아 있으면 (잔고 대사 전이라 보류된 매도 등) 최대 max_settle_ticks까지
+    마지막 가격으로 더 돌리고, 그래도 남으면 복구 실패로 본다.
+    """
+    exchange = FaultyExchange("DOGE", krw=5_000_000, fee_rate=0.0004, seed=seed)
+    exchange.faults = scenario.faults
+    cfg = GridConfig.model_validate({
+        "ticker": "DOGE", "start_buy_price": 300, "divide_count": 10, "order_qty": 100, "buy_interval": 1,
+        "sell_interval": 2, "buy_margin": 0, "max_up_strategies": 3, "loop_interval": interval,
+        "order_reconcile_interval": interval * 10, "status_sweep_interval": interval * 20,
+        "balance_reconcile_interval": interval * 50, "error_backoff_max": interval * 20,
+    }).model_dump()
+    inflight_timeout = interval * 5
+    strategies, ctx = _grid(cfg, exchange, inflight_timeout)
+    backoff = cm.ErrorBackoff(cfg["loop_interval"], cfg["error_backoff_max"])
+    prices = price_path(ticks, 296, seed)
+    snapshot_path = Path(tempfile.mkdtemp()) / "strategies.json"
+
+    errors, recovered_at, fault_end_time, tick_ok = 0, None, None, False
+    first_error_at, downtime = None, (0, 0.0)  # 장애 구간 첫 루프 오류 시각, 가장 긴 (연속 오류 수, 초)
+    for tick, price in enumerate(prices + prices[-1:] * settle_ticks):
+        exchange.active = fault_start <= tick < fault_end
+        if tick == fault_end:
+            fault_end_time = time.monotonic()
+            if scenario.restart:
+                # kill -9: 메모리 상태를 버리고 마지막 주기 스냅샷에서 재시작 (거래소 주문은 그대로 남음)
+                strategies, ctx = _grid(cfg, exchange, inflight_timeout,
+                                        cm.load_strategies_snapshot(str(snapshot_path)))
+                cm.reconcile_orders(strategies, exchange, ctx)
+                ctx.last_order_reconcile = time.monotonic()
+                cm.settle_resumed_levels(strategies, exchange, ctx, snapshot_path.stat().st_mtime)
+        exchange.on_price(price)
+        try:
+            tick_ok = cm.trade_tick(strategies, cfg, exchange, ctx, tick) is not None
+            outage = backoff.success()
+            if outage is not None and outage[1] > downtime[1]:
+                downtime = outage
+            delay = interval
+        except Exception:
+            errors += 1
+            tick_ok = False
+            delay = backoff.failure()
+            if first_error_at is None and fault_start <= tick:
+                first_error_at = backoff.started_at
+        if tick % save_every == 0:
+            cm.save_strategies_snapshot(strategies, str(snapshot_path))
+        if fault_end_time is not None and recovered_at is None and tick_ok:
+            health = grid_health(exchange, strategies, ctx)
+            if not (health["orphaned"] or health["duplicates"] or health["inflight"] or health["untracked_coin"]):
+                recovered_at = time.monotonic()
+        time.sleep(delay)
+
+    health = grid_health(exchange, strategies, ctx)
+    settled = settle_ticks
+    while (health["untracked_coin"] or health["inflight"]) and settled < max_settle_ticks:
+        exchange.on_price(prices[-1])
+        try:
+            cm.trade_tick(strategies, cfg, exchange, ctx, len(prices) + settled)
+        except Exception:
+            errors += 1
+        settled += 1
+        time.sleep(interval)
+        health = grid_health(exchange, strategies, ctx)
+    recover_sec = None if recovered_at is None else recovered_at - (first_error_at or fault_end_time)
+    return {
+        "scenario": scenario.name,
+        "description": scenario.description,
+        # 끝까지 레벨 보유 합계가 거래소 코인과 맞지 않으면 (잊은 보유분/없는 코인 매도) 복구 실패
+        "recovered": recovered_at is not None and not health["untracked_coin"],
+        "recover_sec": None if recover_sec is None else round(recover_sec, 3),
+        "recover_loops": None if recover_sec is None else round(recover_sec / interval, 1),
+        "downtime_sec": round(downtime[1], 3),
+        "downtime_loops": downtime[0],
+        "settle_loops": settled,
+        "loop_errors": errors,
+        "injected": sum(exchange.injected.values()),
+        "orders_placed": exchange.calls.get("buy_limit_order", 0) + exchange.calls.get("sell_limit_order", 0),
+        "round_trips": ctx.round_trips,
+        **health,
+    }
+
+
+# --- 급락 시 리스크 가드 ---
+def run_flash_crash(workers: Optional[int] = None, levels: int = 20, latency: float = 0.05, step_ms: float = 40,
+                    interval: float = 1.0, guard: bool = True) -> dict:
+    """웹소켓 체결로 급락이 들어올 때 이상 감지 -> 신규 매수 정지 -> 매수 대기 취소 완료까지의 지연과 물린 매수 수
+
+    levels개 레벨이 모두 매수 대기인 상태에서, 루프가 interval초 대기하는 동안 체결가가 step_ms마다 1원씩
+    레벨 전체 아래까지 떨어진다. 거래소 호출마다 latency초 왕복 지연. workers는 동시 취소 스레드 수
+    (1이면 레벨마다 차례로 블로킹 취소), guard=False면 가드 없이 기존 동작 (cancel_depth만).
+    """
+    start = 300
+    exchange = FaultyExchange("DOGE", krw=50_000_000, fee_rate=0.0004, latency=latency)
+    cfg = GridConfig.model_validate({
+        "ticker": "DOGE", "start_buy_price": start, "divide_count": levels, "order_qty": 100, "sell_interval": 2,
+        "buy_margin": levels + 1, "max_up_strategies": 0, "loop_interval": interval,
+        "order_reconcile_interval": 3600, "status_sweep_interval": 3600, "balance_reconcile_interval": 3600,
+    }).model_dump()
+    strategies, ctx = _grid(cfg, exchange, inflight_timeout=30)
+    ctx.guard = RiskGuard(max_jump=0.05, max_move=0.03, move_window=10, stale_after=60, cooldown=3600) if guard else None
+    exchange.on_price(start + 1)
+    cm.trade_tick(strategies, cfg, exchange, ctx, 0)  # 모든 레벨 매수 주문
+    initial = [s for s in strategies if s.status == cm.BUYING]
+
+    wake, stop = threading.Event(), threading.Event()
+    if ctx.guard is not None:
+        ctx.guard.on_trip(lambda trip: wake.set())
+
+    def loop():
+        tick = 0
+        while not stop.is_set():
+            wake.wait(interval)
+            wake.clear()
+            tick += 1
+            cm.trade_tick(strategies, cfg, exchange, ctx, tick)
+
+    saved_workers = cm.GUARD_CANCEL_WORKERS
+    cm.GUARD_CANCEL_WORKERS = workers or saved_workers
+    thread = threading.Thread(target=loop, name="flash-loop", daemon=True)
+    thread.start()
+    bottom = start - levels - 5
+    began = time.perf_counter()
+    try:
+        for price in range(start, bottom - 1, -1):
+            exchange.on_price(price)
+            if ctx.guard is not None:
+                ctx.guard.observe(price, source="trade")
+            time.sleep(step_ms / 1000)
+        time.sleep(interval + latency * levels * 2)  # 진행 중인 취소/틱이 끝나도록
+    finally:
+        stop.set()
+        wake.set()
+        thread.join()
+        cm.GUARD_CANCEL_WORKERS = saved_workers
+    trip = ctx.guard.last_trip if ctx.guard is not None else None
+    filled = [s for s in initial if s.held_qty > cm.QTY_EPS]
+    return {
+        "scenario": "flash_crash",
+        "description": ("가드 없음" if not guard else f"가드, 취소 스레드 {cm.GUARD_CANCEL_WORKERS if workers is None else workers}개")
+                       + f" (레벨 {levels}, 왕복 {latency * 1000:.0f}ms, {step_ms:.0f}ms/원 하락)",
+        "resting_buys": len(initial),
+        "filled_buys": len(filled),
+        # 감지 가격보다 아래에서 체결된 매수 = 가드가 막았어야 할 몫 (가드 없음이면 감지 가격이 없으므로 생략)
+        "filled_after_trip": None if trip is None else sum(1 for s in filled if ctx.scale.to_price(s.buy_price) < trip["price"]),
+        "trip_price": None if trip is None else trip["price"],
+        "trip_after_ms": None if trip is None else round((trip["detected_at"] - began) * 1000, 1),
+        "halt_ms": None if trip is None else trip["halt_ms"],
+        "cancel_ms": ctx.guard_cancel_ms,
+        "open_buys_left": sum(1 for s in strategies if s.status in (cm.BUYING, cm.BUY_PARTIAL)),
+    }
+
+
+# --- 부분 체결 후 취소로 남은 최소 주문 금액 미만 잔량 ---
+def run_dust(min_notional: float = 500, order_qty: float = 10, partial_units: float = 1, ticks: int = 6) -> dict:
+    """매수가 일부만 체결된 뒤 cancel_depth로 취소되어 매도할 수 없는 잔량이 남았을 때 레벨이 다시 도는지 확인
+
+    300원 레벨 1개가 order_qty 매수 대기 중 partial_units만 체결되고, 가격이 올라 나머지가 취소된다.
+    잔량(partial_units * 302원)이 min_notional 미만이면 매도가 생략되는데, 레벨이 ACTIVE에 멈추지 않고
+    STANDBY로 돌아가 다음 매수 체결분과 합쳐 (order_qty + partial_units) 매도해야 한다.
+    """
+    exchange = SimulatedExchange("DOGE", krw=1_000_000, fee_rate=0.0004)
+    cfg = GridConfig.model_validate({
+        "ticker": "DOGE", "start_buy_price": 300, "divide_count": 1, "order_qty": order_qty, "buy_interval": 1,
+        "sell_interval": 2, "buy_margin": 2, "max_up_strategies": 0, "cancel_depth": 1,
+        "order_reconcile_interval": 3600, "status_sweep_interval": 3600, "balance_reconcile_interval": 3600,
+    }).model_dump()
+    strategies, ctx = _grid(cfg, exchange, inflight_timeout=30)
+    ctx.meta = MarketMeta("bithumb", "DOGE", KRW_TICK_TABLE, min_notional, 0.0004, 0.0004, 4)
+    level = strategies[0]
+    tick = 0
+
+    def run(price: int, count: int = 1):
+        nonlocal tick
+        for _ in range(count):
+            exchange.on_price(price)
+            cm.trade_tick(strategies, cfg, exchange, ctx, tick)
+            tick += 1
+
+    run(302)  # 매수 대기 (300원)
+    exchange.fill_partial(level.order_id, partial_units)
+    run(305, ticks)  # 기준가(305 - 1) 아래라 나머지 취소 -> 잔량만 보유
+    after_cancel = {"status": level.status, "held_qty": level.held_qty, "carry_qty": level.carry_qty}
+    run(302)  # 다시 매수 대기
+    run(300, 2)  # 매수 전량 체결 -> 잔량 합쳐 매도 주문
+    sell_qty = level.order_placed_qty if level.status in (cm.SELLING, cm.SELL_PARTIAL) else None
+    run(302, 2)  # 매도 체결
+    return {
+        "scenario": "dust", "description": f"{order_qty:g}개 중 {partial_units:g}개 체결 후 취소, 최소 주문 {min_notional:g}원",
+        "after_cancel": after_cancel["status"], "carried": after_cancel["carry_qty"],
+        "stuck": after_cancel["status"] != cm.STANDBY,
+        "next_sell_qty": sell_qty, "final_status": level.status, "round_trips": ctx.round_trips,
+        "untracked_coin": grid_health(exchange, strategies, ctx)["untracked_coin"],
+    }
+
+
+# --- 스냅샷 저장 중 kill ---
+def _snapshot_writer(path: str, count: int):
+    strategies = [cm.Strategy(strategy_id=i, buy_price=1000 - i, sell_price=1001 - i, order_qty=10) for i in range(count)]
+    version = 0
+    while True:
+        version += 1
+        for s in strategies:
+            s.filled_qty = float(version)
+        cm.save_strategies_snapshot(strategies, path)
+
+
+def run_snapshot_kill(trials: int = 20, count: int = 2000, seed: int = 0) -> dict:
+    """스냅샷을 계속 저장하는 프로세스를 임의 시점에 SIGKILL하고, 남은 스냅샷이 온전히 읽히는지 확인"""
+    rng = random.Random(seed)
+    path = str(Path(tempfile.mkdtemp()) / "strategies.json")
+    corrupted, missing, versions = 0, 0, []
+    for _ in range(trials):
+        proc = multiprocessing.Process(target=_snapshot_writer, args=(path, count), daemon=True)
+        proc.start()
+        time.sleep(rng.uniform(0.05, 0.3))
+        os.kill(proc.pid, signal.SIGKILL)
+        proc.join()
+        try:
+            loaded = cm.load_strategies_snapshot(path)
+        except Exception:
+            corrupted += 1
+            continue
+        if len(loaded) != count or len({s.filled_qty for s in loaded}) != 1:
+            corrupted += 1 if loaded else 0
+            missing += 0 if loaded else 1
+        else:
+            versions.append(loaded[0].filled_qty)
+    return {"scenario": "snapshot_kill", "description": f"저장 중 SIGKILL {trials}회 ({count}레벨)",
+            "corrupted": corrupted, "missing": missing, "intact": len(versions)}
+
+
+def _format_row(result: dict) -> str:
+    if result["scenario"] == "flash_crash":
+        return (f"{result['scenario']:<14} filled {result['filled_buys']}/{result['resting_buys']} "
+                f"(after trip {result['filled_after_trip']}) "
+                f"halt {result['halt_ms']}ms cancel {result['cancel_ms']}ms (trip at {result['trip_price']}, "
+                f"+{result['trip_after_ms']}ms) open_buys {result['open_buys_left']}  ({result['description']})")
+    if result["scenario"] == "dust":
+        return (f"{result['scenario']:<14} after cancel {result['after_cancel']} (carried {result['carried']:g}, "
+                f"stuck {result['stuck']}) next sell {result['next_sell_qty']} final {result['final_status']} "
+                f"trips {result['round_trips']} untracked_coin {result['untracked_coin']:g}  ({result['description']})")
+    if result["scenario"] == "snapshot_kill":
+        return (f"{result['scenario']:<14} intact {result['intact']}, corrupted {result['corrupted']}, "
+                f"missing {result['missing']}  ({result['description']})")
+    recover = "never" if not result["recovered"] else f"{result['recover_sec']:.2f}s/{result['recover_loops']:.0f}loops"
+    return (f"{result['scenario']:<14} recover {recover:<16} down {result['downtime_sec']:.2f}s/"
+            f"{result['downtime_loops']}errs orphaned {result['orphaned']} "
+            f"dup {result['duplicates']} inflight {result['inflight']} untracked_coin {result['untracked_coin']:g} "
+            f"errors {result['loop_errors']} injected {result['injected']} placed {result['orders_placed']} "
+            f"trips {result['round_trips']}  ({result['description']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="그리드 루프 장애 주입 하네스 (가짜 거래소, 실제 주문 없음)")
+    parser.add_argument("scenarios", nargs="*", help=f"실행할 시나리오 (기본: 전체). {', '.join(SCENARIOS)}, snapshot_kill, flash_crash, dust")
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--fault-start", type=int, default=60)
+    parser.add_argument("--fault-end", type=int, default=160)
+    parser.add_argument("--interval", type=float, default=0.01, help="loop_interval 대신 쓸 주기 (초)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-every", type=int, default=60, help="스냅샷 저장 주기 (루프, save_interval_loops)")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="봇 로그 출력")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+    names = args.scenarios or [*SCENARIOS, "snapshot_kill", "flash_crash", "dust"]
+    results = []
+    for name in names:
+        if name == "snapshot_kill":
+            runs = [run_snapshot_kill(seed=args.seed)]
+        elif name == "dust":
+            runs = [run_dust()]
+        elif name == "flash_crash":
+            # 동시 취소 / 차례로 취소 / 가드 없음 비교
+            runs = [run_flash_crash(), run_flash_crash(workers=1), run_flash_crash(guard=False)]
+        else:
+            runs = [run_scenario(SCENARIOS[name], args.ticks, args.fault_start, args.fault_end, args.interval, args.seed,
+                                 args.save_every)]
+        for result in runs:
+            results.append(result)
+            if not args.json:
+                print(_format_row(result), flush=True)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    # 장애 구간 뒤 정상 상태로 돌아오지 못한 시나리오가 있으면 실패로 종료
+    stuck = [r["scenario"] for r in results if r.get("recovered") is False or r.get("stuck")]
+    if stuck:
+        raise SystemExit(f"복구 실패: {', '.join(stuck)}")
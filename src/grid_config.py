@@ -0,0 +1,202 @@
+import os
+import logging
+import threading
+import tomllib
+from pathlib import Path
+from typing import Literal, Optional
+
+import yaml
+from pydantic import BaseModel, Field, ValidationError, model_validator
+
+from price_ticks import TickScale
+
+logger = logging.getLogger("TradingBotLogger").getChild("config")
+
+# 실행 중인 그리드에 재시작 없이 반영 가능한 항목 (기존 주문을 다시 내지 않아도 되는 값들)
+HOT_RELOADABLE_KEYS = {
+    "divide_count",
+    "max_up_strategies",
+    "cancel_depth",
+    "buy_margin",
+    "book_fill_ticks",
+    "book_max_age",
+    "loop_interval",
+    "error_backoff_max",
+    "report_interval_loops",
+    "save_interval_loops",
+    "status_sweep_interval",
+    "order_reconcile_interval",
+    "trail_trigger",
+    "trail_floor_price",
+    "dynamic_spacing",
+    "spacing_window",
+    "spacing_atr_mult",
+    "spacing_min_scale",
+    "spacing_max_scale",
+}
+
+
+class ShadowConfig(BaseModel):
+    """섀도(모의) 그리드 1개: 실거래 그리드 설정에 overrides만 바꿔 로컬 모의 체결로 실행"""
+    name: str = Field(..., min_length=1, description="섀도 그리드 이름 (원장 grid_id: shadow:{name})")
+    overrides: dict = Field(default_factory=dict, description="실거래 설정 대비 바꿀 값 (예: {buy_margin: 3})")
+    initial_krw: float = Field(default=10_000_000, ge=0, description="모의 계좌 시작 원화")
+    initial_coin: float = Field(default=0, ge=0, description="모의 계좌 시작 코인")
+    fee_rate: float = Field(default=0.0004, ge=0, description="모의 체결 수수료율")
+
+    class Config:
+        extra = "forbid"
+
+
+class GridConfig(BaseModel):
+    """그리드 1개의 설정 스키마 (기존 TRADING_CONFIG dict와 같은 키)"""
+    grid_id: Optional[str] = Field(default=None, description="그리드 식별자 (기본값: {ticker}_{start_buy_price})")
+    ticker: str = Field(..., min_length=1, description="거래 티커 (예: DOGE)")
+    price_unit: float = Field(default=1, gt=0, description="가격 1틱의 원화 값. 가격/간격 설정(start_buy_price, buy_interval, sell_interval, buy_margin, trail_floor_price)은 모두 이 단위의 정수 (원 미만 호가 마켓은 0.1, 0.001 등)")
+    start_buy_price: int = Field(..., gt=0, description="기준 매수가 (최상단 기본 레벨, price_unit 틱)")
+    divide_count: int = Field(..., ge=1, description="기본 레벨 개수")
+    order_qty: int = Field(..., gt=0, description="레벨당 주문 수량")
+    buy_interval: int = Field(default=1, gt=0, description="레벨 간 매수가 간격")
+    sell_interval: int = Field(default=1, gt=0, description="매수가 대비 매도가 간격")
+    buy_margin: int = Field(default=2, ge=0, description="현재가가 매수가보다 이만큼 높아도 매수 시도")
+    orderbook_feed: bool = Field(default=False, description="빗썸 웹소켓으로 로컬 호가창을 유지해 매수 주문 시점 판단에 사용")
+    book_fill_ticks: int = Field(default=1, ge=0, description="호가창 사용 시 매도 최우선가가 매수가에서 이 호가 수 이내일 때만 매수 주문")
+    book_max_age: float = Field(default=5, gt=0, description="호가창이 이 시간(초) 넘게 갱신되지 않으면 현재가(buy_margin) 규칙으로 대체")
+    venues: list[Literal["bithumb", "upbit"]] = Field(default_factory=lambda: ["bithumb"], min_length=1, description="주문을 보낼 거래소 (첫 번째는 빗썸, 2개 이상이면 주문마다 호가/수수료/지연으로 선택)")
+    route_price_tolerance: float = Field(default=0.0002, ge=0, description="거래소별 예상 체결 금액 차이가 이 비율 이내면 지연이 짧은 거래소로")
+    loop_interval: float = Field(default=3, gt=0, description="루프 주기 (초)")
+    error_backoff_max: float = Field(default=60, gt=0, description="메인 루프 연속 오류 시 최대 재시도 대기 (초, loop_interval부터 2배씩)")
+    report_interval_loops: int = Field(default=300, ge=1, description="디스코드 리포트 주기 (루프)")
+    cancel_depth: int = Field(default=5, ge=1, description="현재가 아래 몇 레벨부터 매수 대기 주문을 취소할지")
+    max_up_strategies: int = Field(default=5, ge=0, description="위쪽으로 추가할 최대 전략 수")
+    save_interval_loops: int = Field(default=60, ge=1, description="스냅샷 저장 주기 (루프)")
+    snapshot_path: str = Field(default="snapshots/strategies.json", description="스냅샷 저장 경로")
+    ledger_path: str = Field(default="ledger/trades.db", description="체결/손익 원장(SQLite) 경로")
+    market_meta_path: str = Field(default="cache/market_meta.json", description="마켓 메타(호가 단위/최소 주문 금액/수수료) 캐시 파일")
+    market_meta_ttl: float = Field(default=86400, gt=0, description="마켓 메타 캐시 유효 시간 (초, 지나면 시작 시 1회 재조회)")
+    api_key: Optional[str] = Field(default=None, description="주문에 쓸 API 키 이름 (키 풀의 name, 없으면 grid_id로 고정 배정)")
+    allocator_socket: Optional[str] = Field(default=None, description="공용 자금 배분 데몬 소켓 (supervisor 실행 시 자동 지정). 없으면 프로세스 내 배분: 계정 잔고를 이 그리드 혼자 쓸 때만 사용")
+    balance_reconcile_interval: float = Field(default=30, gt=0, description="거래소 잔고 대사 주기 (초)")
+    status_sweep_interval: float = Field(default=60, gt=0, description="가격이 닿지 않은 주문도 확인하는 안전용 체결 조회 주기 (초)")
+    order_reconcile_interval: float = Field(default=60, gt=0, description="미체결 주문 목록 1회 조회로 그리드 전체 주문을 대사하는 주기 (초)")
+    trailing: bool = Field(default=False, description="추적 모드: 가격을 따라 레벨 창(divide_count개)을 옮김 (위 레벨 추가 대신)")
+    trail_trigger: int = Field(default=2, ge=1, description="창 밖으로 몇 레벨 벗어나면 재배치할지")
+    trail_floor_price: Optional[int] = Field(default=None, gt=0, description="추적 모드에서 창 최하단이 내려갈 수 있는 최저 매수가 (기본: 처음 창 최하단)")
+    shadows: list[ShadowConfig] = Field(default_factory=list, description="같은 시세로 함께 돌릴 섀도(모의) 그리드")
+    status_port: Optional[int] = Field(default=None, gt=0, lt=65536, description="읽기 전용 상태 API 포트 (없으면 끔)")
+    status_host: str = Field(default="127.0.0.1", description="상태 API 바인드 주소")
+    profile_duration: float = Field(default=30, gt=0, description="SIGUSR1로 켠 프로파일러의 자동 종료 시간 (초)")
+    record_dir: Optional[str] = Field(default=None, description="시세 기록(Parquet) 디렉터리 (없으면 기록 안 함)")
+    record_roll_interval: float = Field(default=600, gt=0, description="시세 기록 파일 교체 주기 (초)")
+    resume_from_snapshot: bool = Field(default=False, description="시작 시 스냅샷에서 레벨 상태/미체결 주문을 이어받을지")
+    dynamic_spacing: bool = Field(default=False, description="변동성(ATR)에 맞춰 새로 만드는 레벨의 매수/매도 간격을 넓히거나 좁힘")
+    spacing_candle_sec: float = Field(default=60, gt=0, description="변동성 지표용 캔들 주기 (초)")
+    spacing_windows: list[int] = Field(default_factory=lambda: [14, 60], min_length=1, description="ATR/실현 변동성을 계산할 캔들 수 창 (여러 개 가능)")
+    spacing_window: int = Field(default=14, ge=1, description="간격 계산에 쓸 ATR 창 (spacing_windows 중 하나)")
+    spacing_atr_mult: float = Field(default=0.5, gt=0, description="목표 매수 간격 = ATR * 이 배수")
+    spacing_min_scale: float = Field(default=0.5, gt=0, description="동적 간격 하한 (buy_interval 대비 배율)")
+    spacing_max_scale: float = Field(default=3.0, gt=0, description="동적 간격 상한 (buy_interval 대비 배율)")
+    risk_guard: bool = Field(default=False, description="가격 이상(급변/단시간 변동/시세 끊김) 감지 시 신규 매수 정지 + 매수 대기 주문 일괄 취소")
+    risk_max_jump: float = Field(default=0.05, gt=0, description="직전 가격 대비 한 번에 이 비율 넘게 움직이면 발동")
+    risk_max_move: float = Field(default=0.08, gt=0, description="risk_move_window초 안의 최고/최저 차이가 이 비율을 넘으면 발동")
+    risk_move_window: float = Field(default=60, gt=0, description="변동 폭을 보는 시간 창 (초)")
+    risk_stale_after: float = Field(default=120, gt=0, description="이 시간(초) 넘게 가격이 들어오지 않으면 발동")
+    risk_cooldown: float = Field(default=300, ge=0, description="마지막 이상 이후 이 시간(초) 동안 정상이면 매수 재개")
+    resource_interval: float = Field(default=300, ge=0, description="자원 사용량(RSS/FD/스레드/GC 일시정지) 로그 주기 (초, 0이면 끔)")
+    resource_tracemalloc: bool = Field(default=False, description="자원 로그에 tracemalloc 증가량 상위 위치도 기록 (부하가 있어 누수 조사 때만)")
+    reload_check_interval: float = Field(default=2.0, gt=0, description="설정 파일 변경 확인 주기 (초)")
+
+    class Config:
+        extra = "forbid"
+
+    @model_validator(mode="after")
+    def _check_levels(self):
+        lowest = self.start_buy_price - self.buy_interval * (self.divide_count - 1)
+        if lowest <= 0:
+            raise ValueError(f"최하단 레벨 매수가가 0 이하입니다: {lowest}")
+        if self.venues[0] != "bithumb" or len(set(self.venues)) != len(self.venues):
+            raise ValueError(f"venues는 bithumb으로 시작하고 중복이 없어야 합니다: {self.venues}")
+        if self.spacing_window not in self.spacing_windows or min(self.spacing_windows) < 1:
+            raise ValueError(f"spacing_window({self.spacing_window})는 spacing_windows({self.spacing_windows})에 있어야 합니다")
+        if self.spacing_min_scale > self.spacing_max_scale:
+            raise ValueError(f"spacing_min_scale({self.spacing_min_scale})이 spacing_max_scale보다 큽니다")
+        if self.grid_id is None:
+            self.grid_id = f"{self.ticker}_{TickScale(self.price_unit).format_price(self.start_buy_price)}"
+        return self
+
+
+def load_grid_config(path: str | Path) -> GridConfig:
+    """YAML/TOML 그리드 설정 파일을 읽어 스키마 검증 후 반환"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".yaml", ".yml"):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = yaml.safe_load(f) or {}
+    elif suffix == ".toml":
+        with open(path, "rb") as f:
+            raw = tomllib.load(f)
+    else:
+        raise ValueError(f"지원하지 않는 설정 파일 형식입니다: {path}")
+    return GridConfig.model_validate(raw)
+
+
+def diff_grid_config(old: dict, new: dict) -> tuple[dict, dict]:
+    """두 설정을 비교해 (반영 가능한 변경, 반영 불가 변경) 을 {key: (old, new)} 형태로 반환"""
+    safe, unsafe = {}, {}
+    for key in new.keys() | old.keys():
+        if old.get(key) == new.get(key):
+            continue
+        target = safe if key in HOT_RELOADABLE_KEYS else unsafe
+        target[key] = (old.get(key), new.get(key))
+    return safe, unsafe
+
+
+class GridConfigWatcher:
+    """설정 파일 변경을 별도 스레드에서 감시하고, 검증된 새 설정을 메인 루프에 넘겨줌
+
+    파일 I/O와 검증은 감시 스레드에서 끝내고, 메인 루프는 poll()로 결과만 가져가므로
+    트레이딩 루프에는 추가 I/O가 생기지 않는다.
+    """
+
+    def __init__(self, path: str | Path, interval: float = 2.0):
+        self.path = Path(path)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending: Optional[GridConfig] = None
+        self._stop = threading.Event()
+        self._last_mtime = self._mtime()
+        self._thread = threading.Thread(target=self._run, name="GridConfigWatcher", daemon=True)
+
+    def _mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            mtime = self._mtime()
+            if mtime is None or mtime == self._last_mtime:
+                continue
+            self._last_mtime = mtime
+            try:
+                cfg = load_grid_config(self.path)
+            except (ValidationError, ValueError, OSError, yaml.YAMLError, tomllib.TOMLDecodeError) as e:
+                logger.error("설정 파일 검증 실패, 기존 설정 유지: %s / %s", self.path, e, extra={"event": "config_error"})
+                continue
+            with self._lock:
+                self._pending = cfg
+            logger.info("설정 파일 변경 감지: %s", self.path, extra={"event": "config_changed"})
+
+    def poll(self) -> Optional[GridConfig]:
+        """새로 검증된 설정이 있으면 반환하고 비움 (없으면 None)"""
+        with self._lock:
+            cfg, self._pending = self._pending, None
+        return cfg
@@ -0,0 +1,590 @@
+import os
+import json
+import math
+import time
+import fcntl
+import socket
+import sqlite3
+import logging
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger("SupervisorLogger").getChild("lease")
+
+# 갱신이 이 비율(ttl 대비)만큼 실패하면 다른 노드가 가져가기 전에 스스로 놓은 것으로 봄
+SAFE_FRACTION = 0.6
+
+
+@dataclass
+class Lease:
+    """그리드 1개의 소유권 임대 (expires_at까지 갱신하지 않으면 다른 노드가 가져갈 수 있음)"""
+    grid: str
+    node: str
+    token: int  # 소유자가 바뀔 때마다 증가 (fencing: 이전 소유자의 상태 저장/갱신을 거부)
+    expires_at: float
+
+
+class LeaseStore(ABC):
+    """임대/노드 생존/그리드 상태 저장소 인터페이스 (SQLite, 파일 잠금, Redis)"""
+
+    @abstractmethod
+    def acquire(self, grid: str, node: str, ttl: float) -> Optional[Lease]:
+        """비어 있거나 만료된 임대를 가져옴 (이미 내 것이면 연장). 다른 노드가 가지고 있으면 None"""
+
+    @abstractmethod
+    def renew(self, lease: Lease, ttl: float) -> Optional[Lease]:
+        """내 임대(node/token 일치)면 연장. 다른 노드에 넘어갔으면 None"""
+
+    @abstractmethod
+    def release(self, lease: Lease):
+        """내 임대(node/token 일치)면 즉시 반납"""
+
+    @abstractmethod
+    def leases(self) -> dict[str, Lease]:
+        """만료되지 않은 임대 {grid: Lease}"""
+
+    @abstractmethod
+    def beat(self, node: str, ttl: float, info: dict):
+        """노드 생존 신호 (공평 분배 계산용)"""
+
+    @abstractmethod
+    def nodes(self) -> dict[str, dict]:
+        """살아 있는 노드 {node: info}"""
+
+    @abstractmethod
+    def put_state(self, lease: Lease, data: bytes) -> bool:
+        """그리드 상태(스냅샷) 저장. 임대가 아직 내 것일 때만 (False면 소유권을 잃은 것)"""
+
+    @abstractmethod
+    def get_state(self, grid: str) -> Optional[tuple[int, bytes]]:
+        """(저장한 소유자의 token, 상태). 없으면 None"""
+
+
+# --- SQLite (한 호스트의 여러 프로세스) ---
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (grid TEXT PRIMARY KEY, node TEXT, token INTEGER NOT NULL, expires_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS nodes (node TEXT PRIMARY KEY, expires_at REAL NOT NULL, info TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS states (grid TEXT PRIMARY KEY, token INTEGER NOT NULL, data BLOB NOT NULL,
+                                   saved_at REAL NOT NULL);
+"""
+
+
+class SqliteLeaseStore(LeaseStore):
+    """SQLite 파일 하나로 임대 관리 (BEGIN IMMEDIATE로 읽기-비교-쓰기를 원자적으로)"""
+
+    def __init__(self, path: str | Path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SQLITE_SCHEMA)
+
+    @contextmanager
+    def _txn(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def acquire(self, grid: str, node: str, ttl: float) -> Optional[Lease]:
+        now = time.time()
+        with self._txn() as db:
+            row = db.execute("SELECT node, token, expires_at FROM leases WHERE grid = ?", (grid,)).fetchone()
+            if row is None:
+                token = 1
+                db.execute("INSERT INTO leases VALUES (?, ?, ?, ?)", (grid, node, token, now + ttl))
+            elif row[0] == node and row[2] > now:
+                token = row[1]
+                db.execute("UPDATE leases SET expires_at = ? WHERE grid = ?", (now + ttl, grid))
+            elif row[0] is None or row[2] <= now:
+                token = row[1] + 1
+                db.execute("UPDATE leases SET node = ?, token = ?, expires_at = ? WHERE grid = ?",
+                           (node, token, now + ttl, grid))
+            else:
+                return None
+        return Lease(grid, node, token, now + ttl)
+
+    def renew(self, lease: Lease, ttl: float) -> Optional[Lease]:
+        expires_at = time.time() + ttl
+        cur = self.conn.execute("UPDATE leases SET expires_at = ? WHERE grid = ? AND node = ? AND token = ?",
+                                (expires_at, lease.grid, lease.node, lease.token))
+        return Lease(lease.grid, lease.node, lease.token, expires_at) if cur.rowcount == 1 else None
+
+    def release(self, lease: Lease):
+        self.conn.execute("UPDATE leases SET node = NULL, expires_at = 0 WHERE grid = ? AND node = ? AND token = ?",
+                          (lease.grid, lease.node, lease.token))
+
+    def leases(self) -> dict[str, Lease]:
+        now = time.time()
+        return {grid: Lease(grid, node, token, expires_at) for grid, node, token, expires_at in self.conn.execute(
+            "SELECT grid, node, token, expires_at FROM leases WHERE node IS NOT NULL AND expires_at > ?", (now,))}
+
+    def beat(self, node: str, ttl: float, info: dict):
+        self.conn.execute("INSERT OR REPLACE INTO nodes VALUES (?, ?, ?)", (node, time.time() + ttl, json.dumps(info)))
+
+    def nodes(self) -> dict[str, dict]:
+        return {node: json.loads(info) for node, info in self.conn.execute(
+            "SELECT node, info FROM nodes WHERE expires_at > ?", (time.time(),))}
+
+    def put_state(self, lease: Lease, data: bytes) -> bool:
+        with self._txn() as db:
+            row = db.execute("SELECT node, token FROM leases WHERE grid = ?", (lease.grid,)).fetchone()
+            if row != (lease.node, lease.token):
+                return False
+            db.execute("INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?)", (lease.grid, lease.token, data, time.time()))
+        return True
+
+    def get_state(self, grid: str) -> Optional[tuple[int, bytes]]:
+        row = self.conn.execute("SELECT token, data FROM states WHERE grid = ?", (grid,)).fetchone()
+        return None if row is None else (row[0], bytes(row[1]))
+
+
+# --- 파일 잠금 (한 호스트 또는 flock을 지원하는 공유 디렉터리) ---
+class FileLeaseStore(LeaseStore):
+    """디렉터리 하나로 임대 관리: store.lock을 flock으로 잡고 leases.json을 읽고-고치고-교체"""
+
+    def __init__(self, directory: str | Path):
+        self.dir = Path(directory)
+        (self.dir / "state").mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.dir / "store.lock"
+        self._doc_path = self.dir / "leases.json"
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    doc = json.loads(self._doc_path.read_text(encoding="utf-8"))
+                except FileNotFoundError:
+                    doc = {"leases": {}, "nodes": {}}
+                before = json.dumps(doc, sort_keys=True)
+                yield doc
+                if json.dumps(doc, sort_keys=True) != before:
+                    tmp = self._doc_path.with_suffix(".tmp")
+                    tmp.write_text(json.dumps(doc), encoding="utf-8")
+                    os.replace(tmp, self._doc_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def acquire(self, grid: str, node: str, ttl: float) -> Optional[Lease]:
+        now = time.time()
+        with self._locked() as doc:
+            cur = doc["leases"].get(grid)
+            if cur is None:
+                token = 1
+            elif cur["node"] == node and cur["expires_at"] > now:
+                token = cur["token"]
+            elif cur["node"] is None or cur["expires_at"] <= now:
+                token = cur["token"] + 1
+            else:
+                return None
+            doc["leases"][grid] = {"node": node, "token": token, "expires_at": now + ttl}
+        return Lease(grid, node, token, now + ttl)
+
+    def renew(self, lease: Lease, ttl: float) -> Optional[Lease]:
+        expires_at = time.time() + ttl
+        with self._locked() as doc:
+            cur = doc["leases"].get(lease.grid)
+            if cur is None or (cur["node"], cur["token"]) != (lease.node, lease.token):
+                return None
+            cur["expires_at"] = expires_at
+        return Lease(lease.grid, lease.node, lease.token, expires_at)
+
+    def release(self, lease: Lease):
+        with self._locked() as doc:
+            cur = doc["leases"].get(lease.grid)
+            if cur is not None and (cur["node"], cur["token"]) == (lease.node, lease.token):
+                cur["node"], cur["expires_at"] = None, 0
+
+    def leases(self) -> dict[str, Lease]:
+        now = time.time()
+        with self._locked() as doc:
+            return {grid: Lease(grid, v["node"], v["token"], v["expires_at"]) for grid, v in doc["leases"].items()
+                    if v["node"] is not None and v["expires_at"] > now}
+
+    def beat(self, node: str, ttl: float, info: dict):
+        now = time.time()
+        with self._locked() as doc:
+            doc["nodes"] = {n: v for n, v in doc["nodes"].items() if v["expires_at"] > now}
+            doc["nodes"][node] = {"expires_at": now + ttl, "info": info}
+
+    def nodes(self) -> dict[str, dict]:
+        now = time.time()
+        with self._locked() as doc:
+            return {n: v["info"] for n, v in doc["nodes"].items() if v["expires_at"] > now}
+
+    def _state_path(self, grid: str) -> Path:
+        return self.dir / "state" / f"{grid}.state"
+
+    def put_state(self, lease: Lease, data: bytes) -> bool:
+        with self._locked() as doc:
+            cur = doc["leases"].get(lease.grid)
+            if cur is None or (cur["node"], cur["token"]) != (lease.node, lease.token):
+                return False
+            path = self._state_path(lease.grid)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(f"{lease.token}\n".encode() + data)
+            os.replace(tmp, path)
+        return True
+
+    def get_state(self, grid: str) -> Optional[tuple[int, bytes]]:
+        try:
+            raw = self._state_path(grid).read_bytes()
+        except FileNotFoundError:
+            return None
+        token, _, data = raw.partition(b"\n")
+        return int(token), data
+
+
+# --- Redis (여러 호스트) ---
+_REDIS_ACQUIRE = """
+local cur = redis.call('GET', KEYS[1])
+if cur then
+  local node, token = string.match(cur, '^(.*)|(%d+)$')
+  if node ~= ARGV[1] then return false end
+  redis.call('PEXPIRE', KEYS[1], ARGV[2])
+  return tonumber(token)
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], ARGV[1] .. '|' .. token, 'PX', ARGV[2])
+return token
+"""
+_REDIS_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('PEXPIRE', KEYS[1], ARGV[2]) end
+return 0
+"""
+_REDIS_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+_REDIS_PUT_STATE = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+redis.call('HSET', KEYS[2], 'token', ARGV[2], 'data', ARGV[3])
+return 1
+"""
+
+
+class RedisLeaseStore(LeaseStore):
+    """Redis(호환) 서버로 임대 관리: 만료는 서버의 PX TTL, 비교-후-갱신은 Lua 스크립트로 원자적으로
+
+    키: {prefix}:lease:{grid} = "node|token" (PX ttl), {prefix}:token:{grid} = INCR 카운터,
+    {prefix}:node:{node} = info JSON (PX ttl), {prefix}:state:{grid} = HASH(token, data)
+    """
+
+    def __init__(self, url: str, prefix: str = "grid"):
+        import redis  # 선택 의존성 (store: redis일 때만 필요)
+
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._acquire = self.redis.register_script(_REDIS_ACQUIRE)
+        self._renew = self.redis.register_script(_REDIS_RENEW)
+        self._release = self.redis.register_script(_REDIS_RELEASE)
+        self._put_state = self.redis.register_script(_REDIS_PUT_STATE)
+
+    def _key(self, kind: str, name: str) -> str:
+        return f"{self.prefix}:{kind}:{name}"
+
+    def acquire(self, grid: str, node: str, ttl: float) -> Optional[Lease]:
+        token = self._acquire(keys=[self._key("lease", grid), self._key("token", grid)], args=[node, int(ttl * 1000)])
+        return None if token is None else Lease(grid, node, int(token), time.time() + ttl)
+
+    def renew(self, lease: Lease, ttl: float) -> Optional[Lease]:
+        ok = self._renew(keys=[self._key("lease", lease.grid)], args=[f"{lease.node}|{lease.token}", int(ttl * 1000)])
+        return Lease(lease.grid, lease.node, lease.token, time.time() + ttl) if ok else None
+
+    def release(self, lease: Lease):
+        self._release(keys=[self._key("lease", lease.grid)], args=[f"{lease.node}|{lease.token}"])
+
+    def leases(self) -> dict[str, Lease]:
+        result = {}
+        now = time.time()
+        for key in self.redis.scan_iter(match=self._key("lease", "*")):
+            value, pttl = self.redis.get(key), self.redis.pttl(key)
+            if value is None or pttl <= 0:
+                continue
+            node, _, token = value.decode().rpartition("|")
+            grid = key.decode().split(":", 2)[2]
+            result[grid] = Lease(grid, node, int(token), now + pttl / 1000)
+        return result
+
+    def beat(self, node: str, ttl: float, info: dict):
+        self.redis.set(self._key("node", node), json.dumps(info), px=int(ttl * 1000))
+
+    def nodes(self) -> dict[str, dict]:
+        result = {}
+        for key in self.redis.scan_iter(match=self._key("node", "*")):
+            value = self.redis.get(key)
+            if value is not None:
+                result[key.decode().split(":", 2)[2]] = json.loads(value)
+        return result
+
+    def put_state(self, lease: Lease, data: bytes) -> bool:
+        return bool(self._put_state(keys=[self._key("lease", lease.grid), self._key("state", lease.grid)],
+                                    args=[f"{lease.node}|{lease.token}", lease.token, data]))
+
+    def get_state(self, grid: str) -> Optional[tuple[int, bytes]]:
+        token, data = self.redis.hmget(self._key("state", grid), "token", "data")
+        return None if token is None else (int(token), data)
+
+
+def open_lease_store(kind: str, url: str) -> LeaseStore:
+    """kind: sqlite(url=DB 파일), file(url=디렉터리), redis(url=redis://...)"""
+    if kind == "sqlite":
+        return SqliteLeaseStore(url)
+    if kind == "file":
+        return FileLeaseStore(url)
+    if kind == "redis":
+        return RedisLeaseStore(url)
+    raise ValueError(f"지원하지 않는 임대 저장소입니다: {kind}")
+
+
+def default_node_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class LeasePlan:
+    """GridCoordinator.tick() 결과: 호출하는 쪽(supervisor)이 워커를 시작/중지할 목록"""
+    acquired: list
+    lost: list      # 소유권을 잃음 (다른 노드가 가져갔거나 저장소에 ttl의 SAFE_FRACTION 넘게 갱신 못 함): 바로 중지
+    surplus: list   # 공평 분배 몫을 넘는 그리드: 워커 정리 -> 상태 저장 -> release()로 넘겨줌
+
+
+class GridCoordinator:
+    """노드 1개의 그리드 소유권 관리
+
+    tick()마다 노드 생존 신호, 가진 임대 갱신, 몫(살아 있는 노드 수로 나눈 그리드 수, 올림)만큼 빈/만료된
+    그리드 획득을 한다. 노드가 죽으면 그 임대는 ttl 뒤 만료되고 다른 노드의 다음 tick에서 넘어간다.
+    새 노드가 들어오면 몫을 넘게 가진 노드가 초과분을 surplus로 내놓는다.
+    """
+
+    def __init__(self, store: LeaseStore, node: str, grids: list[str], ttl: float = 10.0,
+                 max_grids: Optional[int] = None):
+        self.store = store
+        self.node = node
+        self.grids = list(grids)
+        self.ttl = ttl
+        self.max_grids = max_grids
+        self.owned: dict[str, Lease] = {}
+        self._renewed_at: dict[str, float] = {}
+        self._releasing: set = set()
+
+    def share(self, live_nodes: int) -> int:
+        share = math.ceil(len(self.grids) / max(live_nodes, 1))
+        return share if self.max_grids is None else min(share, self.max_grids)
+
+    def tick(self) -> LeasePlan:
+        now = time.monotonic()
+        plan = LeasePlan([], [], [])
+        try:
+            self.store.beat(self.node, self.ttl, {"grids": sorted(self.owned)})
+            live = self.store.nodes()
+        except Exception as e:
+            logger.error("임대 저장소 연결 실패: %s", e, extra={"event": "lease_store_error"})
+            live = None
+
+        for grid, lease in list(self.owned.items()):
+            try:
+                renewed = self.store.renew(lease, self.ttl)
+            except Exception as e:
+                logger.warning("임대 갱신 실패: %s / %s", grid, e, extra={"event": "lease_error", "grid": grid})
+                if now - self._renewed_at[grid] < self.ttl * SAFE_FRACTION:
+                    continue
+                renewed = None
+            if renewed is None:
+                self.forget(grid)
+                plan.lost.append(grid)
+                logger.error("그리드 소유권 상실: %s (token=%d)", grid, lease.token,
+                             extra={"event": "lease_lost", "grid": grid, "token": lease.token})
+            else:
+                self.owned[grid], self._renewed_at[grid] = renewed, now
+        if live is None:
+            return plan
+
+        share = self.share(len(live) if self.node in live else len(live) + 1)
+        keep = len(self.owned) - len(self._releasing)
+        for grid in sorted(set(self.owned) - self._releasing, reverse=True):
+            if keep <= share:
+                break
+            self._releasing.add(grid)
+            plan.surplus.append(grid)
+            keep -= 1
+
+        try:
+            held = {g for g, lease in self.store.leases().items() if lease.node != self.node}
+        except Exception as e:
+            logger.error("임대 저장소 연결 실패: %s", e, extra={"event": "lease_store_error"})
+            return plan
+        for grid in self.grids:
+            if len(self.owned) >= share:
+                break
+            if grid in self.owned or grid in held:
+                continue
+            try:
+                lease = self.store.acquire(grid, self.node, self.ttl)
+            except Exception as e:
+                # 획득 여부를 모름: 이번 틱은 건너뛰고 다음 틱에 다시 시도 (이미 내 것이면 acquire가 연장)
+                logger.error("임대 저장소 연결 실패: %s / %s", grid, e, extra={"event": "lease_store_error", "grid": grid})
+                break
+            if lease is None:
+                continue
+            self.owned[grid], self._renewed_at[grid] = lease, now
+            plan.acquired.append(grid)
+            logger.info("그리드 소유권 획득: %s (token=%d)", grid, lease.token,
+                        extra={"event": "lease_acquired", "grid": grid, "token": lease.token})
+        return plan
+
+    def safe_until(self, grid: str) -> Optional[float]:
+        """이 시각(epoch)까지는 소유권이 확실함 (마지막 갱신 + ttl*SAFE_FRACTION). 워커 자체 fencing용"""
+        renewed_at = self._renewed_at.get(grid)
+        if renewed_at is None:
+            return None
+        return time.time() + (renewed_at + self.ttl * SAFE_FRACTION - time.monotonic())
+
+    def forget(self, grid: str):
+        self.owned.pop(grid, None)
+        self._renewed_at.pop(grid, None)
+        self._releasing.discard(grid)
+
+    def release(self, grid: str):
+        """넘겨주기 (워커 정리와 상태 저장을 마친 뒤)"""
+        lease = self.owned.get(grid)
+        self.forget(grid)
+        if lease is not None:
+            self.store.release(lease)
+            logger.info("그리드 소유권 반납: %s (token=%d)", grid, lease.token,
+                        extra={"event": "lease_released", "grid": grid, "token": lease.token})
+
+    def release_all(self):
+        for grid in list(self.owned):
+            self.release(grid)
+
+    def save_state(self, grid: str, data: bytes) -> bool:
+        lease = self.owned.get(grid)
+        return lease is not None and self.store.put_state(lease, data)
+
+    def load_state(self, grid: str) -> Optional[bytes]:
+        state = self.store.get_state(grid)
+        return None if state is None else state[1]
+
+
+# --- 로컬 여러 프로세스로 확인 ---
+def _demo_node(kind: str, url: str, node: str, grids: list, ttl: float, interval: float, claims_path: str):
+    """가짜 워커 노드: 가진 그리드마다 틱 카운터(=상태)를 올리고 저장, 소유 주장(grid, node, token, ts)을 기록"""
+    store = open_lease_store(kind, url)
+    coordinator = GridCoordinator(store, node, grids, ttl)
+    counters: dict[str, int] = {}
+    claims = sqlite3.connect(claims_path, timeout=10, isolation_level=None)
+    while True:
+        plan = coordinator.tick()
+        for grid in plan.lost:
+            counters.pop(grid, None)
+        for grid in plan.surplus:
+            coordinator.save_state(grid, str(counters.pop(grid)).encode())
+            coordinator.release(grid)
+        for grid in plan.acquired:
+            state = coordinator.load_state(grid)
+            counters[grid] = int(state) if state else 0
+            claims.execute("INSERT INTO resumes VALUES (?, ?, ?, ?)", (grid, node, counters[grid], time.time()))
+        now = time.time()
+        for grid, lease in coordinator.owned.items():
+            if grid in coordinator._releasing:
+                continue
+            counters[grid] += 1
+            coordinator.save_state(grid, str(counters[grid]).encode())
+            claims.execute("INSERT INTO claims VALUES (?, ?, ?, ?, ?)", (grid, node, lease.token, counters[grid], now))
+        time.sleep(interval)
+
+
+def run_demo(kind: str = "sqlite", nodes: int = 3, grids: int = 6, ttl: float = 3.0, interval: float = 0.5,
+             duration: float = 20.0, join_at: Optional[float] = None) -> dict:
+    """노드 프로세스 여러 개를 띄우고 하나를 SIGKILL -> 넘겨받는 시간, 이중 소유 여부, 상태 연속성 측정"""
+    import signal
+    import tempfile
+    import multiprocessing
+
+    work = Path(tempfile.mkdtemp())
+    url = str(work / ("leases.db" if kind == "sqlite" else "leases")) if kind != "redis" else os.getenv("REDIS_URL")
+    claims_path = str(work / "claims.db")
+    db = sqlite3.connect(claims_path, isolation_level=None)
+    db.execute("CREATE TABLE claims (grid TEXT, node TEXT, token INTEGER, counter INTEGER, ts REAL)")
+    db.execute("CREATE TABLE resumes (grid TEXT, node TEXT, counter INTEGER, ts REAL)")
+    grid_names = [f"grid{i}" for i in range(grids)]
+    ctx = multiprocessing.get_context("spawn")
+
+    def spawn(i: int):
+        proc = ctx.Process(target=_demo_node, args=(kind, url, f"node{i}", grid_names, ttl, interval, claims_path),
+                           daemon=True)
+        proc.start()
+        return proc
+
+    procs = [spawn(i) for i in range(nodes)]
+    time.sleep(duration / 3)
+    victim_grids = [g for (g,) in db.execute(
+        "SELECT DISTINCT grid FROM claims WHERE node = 'node0' AND ts > ?", (time.time() - ttl,))]
+    os.kill(procs[0].pid, signal.SIGKILL)
+    killed_at = time.time()
+    if join_at is not None:
+        time.sleep(max(join_at - duration / 3, 0))
+        procs.append(spawn(nodes))
+    time.sleep(max(duration - (time.time() - killed_at) - duration / 3, 0))
+    for proc in procs[1:]:
+        proc.kill()
+
+    failover = []
+    for grid in victim_grids:
+        row = db.execute("SELECT MIN(ts) FROM claims WHERE grid = ? AND node != 'node0' AND ts > ?",
+                         (grid, killed_at)).fetchone()
+        failover.append(None if row[0] is None else row[0] - killed_at)
+    # 이중 소유: 같은 그리드에서 시간순으로 token이 줄어드는 주장이 있으면 이전 소유자가 새 소유자와 겹쳐 돌았다는 뜻
+    overlaps = 0
+    for grid in grid_names:
+        tokens = [t for (t,) in db.execute("SELECT token FROM claims WHERE grid = ? ORDER BY ts", (grid,))]
+        overlaps += sum(1 for a, b in zip(tokens, tokens[1:]) if b < a)
+    # 상태 연속성: 넘겨받은 노드가 이어받은 카운터가 이전 소유자의 마지막 카운터보다 얼마나 뒤처졌는지
+    lag = []
+    for grid, node, counter, ts in db.execute("SELECT grid, node, counter, ts FROM resumes"):
+        prev = db.execute("SELECT MAX(counter) FROM claims WHERE grid = ? AND node != ? AND ts < ?",
+                          (grid, node, ts)).fetchone()[0]
+        if prev is not None:
+            lag.append(prev - counter)
+    return {
+        "store": kind, "nodes": nodes, "grids": grids, "ttl": ttl, "interval": interval,
+        "killed_node_grids": victim_grids,
+        "failover_sec": [None if f is None else round(f, 2) for f in failover],
+        "overlapping_claims": overlaps,
+        "resumes": len(lag), "max_resume_lag_ticks": max(lag, default=0),
+        "final_owners": {g: n for g, n in db.execute(
+            "SELECT grid, node FROM claims c WHERE ts = (SELECT MAX(ts) FROM claims WHERE grid = c.grid)")},
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="그리드 임대(소유권) 저장소 조회 / 로컬 다중 프로세스 장애 조치 확인")
+    parser.add_argument("command", choices=["status", "demo"])
+    parser.add_argument("--store", choices=["sqlite", "file", "redis"], default="sqlite")
+    parser.add_argument("--url", default="run/leases.db", help="sqlite: DB 파일, file: 디렉터리, redis: redis://...")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--grids", type=int, default=6)
+    parser.add_argument("--ttl", type=float, default=3.0)
+    parser.add_argument("--interval", type=float, default=0.5, help="demo 노드의 tick 주기 (초)")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--join-at", type=float, default=None, help="demo 시작 후 이 시점(초)에 새 노드 추가 (재분배 확인)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        lease_store = open_lease_store(args.store, args.url)
+        print(json.dumps({"nodes": lease_store.nodes(),
+                          "leases": {g: asdict(lease) for g, lease in sorted(lease_store.leases().items())}},
+                         ensure_ascii=False, indent=2))
+    else:
+        print(json.dumps(run_demo(args.store, args.nodes, args.grids, args.ttl, args.interval, args.duration,
+                                  args.join_at), ensure_ascii=False, indent=2))
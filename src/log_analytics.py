@@ -0,0 +1,435 @@
+import os
+import re
+import json
+import mmap
+import time
+import zlib
+import sqlite3
+import argparse
+import functools
+import multiprocessing
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from statistics import median
+from typing import Iterator, Optional
+
+from order_registry import order_key
+
+KST = timezone(timedelta(hours=9))
+
+# 색인하는 이벤트 (coin_main/adjust_trading이 남기는 주문 제출/체결/취소/루프 현재가)
+EVENTS = ("order_submitted", "fill", "partial_fill", "cancel", "loop")
+LOG_PATTERNS = ("trading_*.log*", "adjust_trading_*.log*")
+HEAD_BYTES = 4096  # 파일 식별용 앞부분 크기 (회전으로 이름이 바뀌어도 같은 파일로 인식)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    source TEXT NOT NULL,
+    head_len INTEGER NOT NULL,
+    head_crc INTEGER NOT NULL,
+    parsed_bytes INTEGER NOT NULL,
+    events INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_files_head ON files (head_len, head_crc);
+
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,
+    file_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    logger TEXT,
+    event TEXT NOT NULL,
+    strategy_id INTEGER,
+    side TEXT,
+    price REAL,
+    qty REAL,
+    order_id TEXT,
+    loop INTEGER,
+    extra TEXT
+);
+-- 루프 이벤트(대부분의 행)는 전략/주문번호가 없으므로 부분 색인으로 삽입 비용 절감
+CREATE INDEX IF NOT EXISTS ix_events_strategy ON events (source, strategy_id, ts) WHERE strategy_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS ix_events_event ON events (event, ts);
+CREATE INDEX IF NOT EXISTS ix_events_order ON events (order_id) WHERE order_id IS NOT NULL;
+"""
+
+_JSON_EVENT = b'"event": "'
+# 가장 많은 루프 이벤트는 json.loads 없이 (JsonLinesFormatter 필드 순서: ts, level, logger, msg, extra...)
+_JSON_LOOP = re.compile(rb'^\{"ts": "([^"]+)", "level": "\w+", "logger": "([^"]+)".*"event": "loop", "loop": (\d+), '
+                        rb'"price": ([\d.]+)')
+_JSON_EVENTS = {e.encode() for e in EVENTS}
+
+# --- 예전 텍스트 형식 ('%(asctime)s - %(levelname)s - %(message)s') ---
+_LEGACY_LINE = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) - (\w+) - (.*)$")
+_NUM = r"([\d,]+(?:\.\d+)?)"
+_ID = r"(\(.*?\)|\S+?)"
+# (이벤트, 정규식, 그룹 이름 순서) — 위에서부터 처음 맞는 것 하나만 사용
+_LEGACY_RULES = [
+    ("loop", re.compile(rf"--- \[Loop (\d+)\] 현재가: {_NUM} KRW"), ("loop", "price")),
+    ("order_submitted", re.compile(rf"\[Strategy (\d+)\] (BUY|SELL) 주문 제출.*?: price={_NUM}, qty={_NUM}, id=(.*)$"),
+     ("strategy_id", "side", "price", "qty", "order_id")),
+    ("fill", re.compile(r"\[Strategy (\d+)\] (매수|매도) 완전 체결! .*?\(id=(.*), qty=([\d.]+)\)"),
+     ("strategy_id", "side", "order_id", "qty")),
+    ("partial_fill", re.compile(r"\[Strategy (\d+)\] 부분 체결 진행 중: filled=([\d.]+), ordered=([\d.]+)"),
+     ("strategy_id", "qty", "ordered")),
+    ("cancel", re.compile(r"\[Strategy (\d+)\] 미체결 주문 취소: id=(.*)$"), ("strategy_id", "order_id")),
+    ("cancel", re.compile(rf"\[Strategy (\d+)\] 매수 대기 주문 취소\(예수금 확보\): buy={_NUM}, 현재가={_NUM}"),
+     ("strategy_id", "price", "current")),
+    # adjust_trading
+    ("order_submitted", re.compile(rf"Inital (Buy) ID: {_ID}, price: {_NUM}, qty: {_NUM}"),
+     ("side", "order_id", "price", "qty")),
+    ("order_submitted", re.compile(rf"Order New (Buy|Sell):{_ID}, (?:buy|sell) price:{_NUM}, (?:buy|sell) qty:{_NUM}"),
+     ("side", "order_id", "price", "qty")),
+    ("fill", re.compile(rf"(Sold|Bought):{_ID}, price: {_NUM}, qty: {_NUM}"), ("side", "order_id", "price", "qty")),
+    ("fill", re.compile(r"(BUY|SELL) order fully filled: ([\d.]+) units"), ("side", "qty")),
+    ("partial_fill", re.compile(r"(BUY|SELL) order partially filled: ([\d.]+) units"), ("side", "qty")),
+    ("cancel", re.compile(rf"(?:Termination: )?Cancel (sell|buy):{_ID}\s*$"), ("side", "order_id")),
+]
+# 정규식을 돌리기 전 바이트 단위 선별 (대부분의 줄은 여기서 걸러짐)
+_LEGACY_MARKERS = re.compile(b"|".join(re.escape(m.encode()) for m in (
+    "[Loop ", "주문 제출", "완전 체결", "부분 체결", "주문 취소", "Inital Buy", "Order New", "Sold:", "Bought:",
+    "order fully", "order partially", "Cancel ",
+)))
+_SIDES = {"BUY": "buy", "SELL": "sell", "Buy": "buy", "Sell": "sell", "buy": "buy", "sell": "sell",
+          "매수": "buy", "매도": "sell", "Bought": "buy", "Sold": "sell", "bid": "buy", "ask": "sell"}
+
+
+@functools.lru_cache(maxsize=4096)
+def _legacy_minute(text: str) -> float:
+    """'YYYY-MM-DD HH:MM' (서버 로컬 시각 = KST) -> epoch 초 (같은 분의 줄이 많아 캐시)"""
+    return datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=KST).timestamp()
+
+
+def _number(text) -> Optional[float]:
+    if text is None:
+        return None
+    try:
+        return float(str(text).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _order_no(raw) -> Optional[str]:
+    """주문 id (빗썸 튜플/JSON 배열/튜플 repr 문자열/업비트 uuid) -> 거래소 주문번호"""
+    if raw is None:
+        return None
+    if isinstance(raw, str) and raw.startswith("("):
+        parts = [p.strip(" '\"") for p in raw.strip("()").split(",")]
+        return parts[2] if len(parts) >= 3 else raw
+    return order_key(raw)
+
+
+def source_of(path: str | Path) -> str:
+    """파일 이름의 접두어 (trading_20250101.log.3 -> trading)"""
+    name = Path(path).name
+    match = re.match(r"(.+?)_\d{8}\.log", name)
+    return match.group(1) if match else name.split(".")[0]
+
+
+def parse_json_line(line: bytes) -> Optional[tuple]:
+    """JSON-lines 한 줄 -> (ts, logger, event, strategy_id, side, price, qty, order_id, loop, extra). 대상 아니면 None"""
+    start = line.find(_JSON_EVENT)
+    if start < 0:
+        return None
+    start += len(_JSON_EVENT)
+    name = line[start:line.find(b'"', start)]
+    if name not in _JSON_EVENTS:
+        return None
+    if name == b"loop":
+        fast = _JSON_LOOP.match(line)
+        if fast is not None:
+            ts, logger_name, loop, price = fast.groups()
+            return (datetime.fromisoformat(ts.decode()).timestamp(), logger_name.decode(), "loop", None, None,
+                    float(price), None, None, int(loop), None)
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return None
+    event = rec.pop("event")
+    ts = datetime.fromisoformat(rec.pop("ts")).timestamp()
+    side = rec.pop("side", None)
+    qty = rec.pop("qty", None)
+    if qty is None and event == "partial_fill":
+        qty = rec.pop("filled", None)
+    extra = {k: v for k, v in rec.items() if k not in ("level", "msg", "logger", "strategy_id", "price",
+                                                          "order_id", "loop")}
+    return (ts, rec.get("logger"), event, rec.get("strategy_id"), _SIDES.get(side, side), _number(rec.get("price")),
+            _number(qty), _order_no(rec.get("order_id")), rec.get("loop"),
+            json.dumps(extra, ensure_ascii=False) if extra else None)
+
+
+def parse_legacy_line(line: bytes) -> Optional[tuple]:
+    """예전 텍스트 로그 한 줄 -> parse_json_line과 같은 형태. 대상 아니면 None"""
+    if _LEGACY_MARKERS.search(line) is None:
+        return None
+    match = _LEGACY_LINE.match(line.decode("utf-8", "replace").rstrip("\r"))
+    if match is None:
+        return None
+    second, millis, _, message = match.groups()
+    ts = _legacy_minute(second[:16]) + int(second[17:]) + int(millis) / 1000
+    for event, rule, names in _LEGACY_RULES:
+        found = rule.search(message)
+        if found is None:
+            continue
+        fields = dict(zip(names, found.groups()))
+        extra = {k: _number(fields.pop(k)) for k in ("ordered", "current") if k in fields}
+        strategy_id = fields.get("strategy_id")
+        loop = fields.get("loop")
+        return (ts, None, event, int(strategy_id) if strategy_id else None, _SIDES.get(fields.get("side")),
+                _number(fields.get("price")), _number(fields.get("qty")), _order_no(fields.get("order_id")),
+                int(loop) if loop else None, json.dumps(extra) if extra else None)
+    return None
+
+
+def iter_lines(mm, start: int, end: int) -> Iterator[bytes]:
+    """mmap에서 [start, end) 안에서 시작하는 줄들 (start가 줄 중간이면 다음 줄부터, 마지막 줄은 end를 넘어도 끝까지)"""
+    if start > 0 and mm[start - 1:start] != b"\n":
+        nl = mm.find(b"\n", start)
+        if nl < 0:
+            return
+        start = nl + 1
+    if start >= end:
+        return
+    stop = mm.find(b"\n", end - 1) if end > 0 else -1
+    stop = len(mm) if stop < 0 else stop + 1
+    lines = mm[start:stop].split(b"\n")
+    yield from lines[:-1] if lines[-1] == b"" else lines
+
+
+def parse_range(task: tuple) -> tuple[int, list]:
+    """워커 1회분: 파일 1개의 바이트 구간을 mmap으로 읽어 이벤트 행 목록 반환"""
+    file_id, path, start, end = task
+    rows = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for line in iter_lines(mm, start, end):
+            row = parse_json_line(line) if line[:1] == b"{" else parse_legacy_line(line)
+            if row is not None:
+                rows.append(row)
+    return file_id, rows
+
+
+def _head(path: Path, length: int) -> tuple[int, int]:
+    with open(path, "rb") as f:
+        head = f.read(length)
+    return len(head), zlib.crc32(head)
+
+
+def _complete_size(path: Path) -> int:
+    """마지막 줄바꿈까지의 크기 (쓰는 중인 마지막 줄은 다음 색인 때)"""
+    size = path.stat().st_size
+    if size == 0:
+        return 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm.rfind(b"\n") + 1
+
+
+class LogIndex:
+    """회전된 로그 파일들의 이벤트 색인 (SQLite)
+
+    파일은 앞 HEAD_BYTES의 CRC로 식별해 회전(trading_X.log -> .log.1)으로 이름이 바뀌어도 다시 읽지 않고,
+    커진 파일은 지난번 읽은 위치 이후만 읽는다. 파싱은 파일을 chunk_bytes 단위 구간으로 나눠
+    프로세스 풀에서 병렬로, 쓰기는 메인 프로세스 하나에서 한다.
+    """
+
+    def __init__(self, db_path: str | Path = "log/analytics.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _match(self, path: Path, size: int, heads: dict) -> Optional[tuple]:
+        """이미 색인한 파일이면 (id, parsed_bytes). 앞부분이 같고 크기가 읽은 위치 이상이어야 같은 파일"""
+        for head_len, by_crc in heads.items():
+            if size < head_len:
+                continue
+            known = by_crc.get(_head(path, head_len)[1])
+            if known is not None and size >= known[1]:
+                return known
+        return None
+
+    def plan(self, paths: list[Path], chunk_bytes: int) -> tuple[list, dict]:
+        """색인할 구간 목록 [(file_id, path, start, end)] 과 파일별 새 읽은 위치 {file_id: size}"""
+        heads: dict[int, dict] = {}
+        for file_id, head_len, head_crc, parsed in self.conn.execute(
+                "SELECT id, head_len, head_crc, parsed_bytes FROM files"):
+            heads.setdefault(head_len, {})[head_crc] = (file_id, parsed)
+        tasks, sizes = [], {}
+        for path in paths:
+            size = _complete_size(path)
+            if size == 0:
+                continue
+            known = self._match(path, size, heads)
+            if known is None:
+                head_len, head_crc = _head(path, HEAD_BYTES)
+                cur = self.conn.execute(
+                    "INSERT INTO files (path, source, head_len, head_crc, parsed_bytes, events, indexed_at) "
+                    "VALUES (?, ?, ?, ?, 0, 0, ?)", (str(path), source_of(path), head_len, head_crc, time.time()))
+                file_id, start = cur.lastrowid, 0
+                heads.setdefault(head_len, {})[head_crc] = (file_id, size)
+            else:
+                file_id, start = known
+                self.conn.execute("UPDATE files SET path = ? WHERE id = ?", (str(path), file_id))
+            if size > start:
+                tasks.extend((file_id, str(path), s, min(s + chunk_bytes, size))
+                             for s in range(start, size, chunk_bytes))
+                sizes[file_id] = size
+        self.conn.commit()
+        # 큰 구간부터 (마지막에 큰 구간 하나가 남아 워커가 노는 일 줄이기)
+        tasks.sort(key=lambda t: t[3] - t[2], reverse=True)
+        return tasks, sizes
+
+    def index(self, paths: list[Path], workers: int = 0, chunk_bytes: int = 32 * 1024 * 1024) -> dict:
+        started = time.perf_counter()
+        tasks, sizes = self.plan(paths, chunk_bytes)
+        sources = dict(self.conn.execute("SELECT id, source FROM files"))
+        counts: dict[int, int] = {}
+        total_bytes = sum(end - start for _, _, start, end in tasks)
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(tasks) > 1:
+            pool = multiprocessing.Pool(min(workers, len(tasks)))
+            results = pool.imap_unordered(parse_range, tasks)
+        else:
+            pool, results = None, map(parse_range, tasks)
+        try:
+            for file_id, rows in results:
+                source = sources[file_id]
+                self.conn.executemany(
+                    "INSERT INTO events (ts, file_id, source, logger, event, strategy_id, side, price, qty, order_id, "
+                    "loop, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((r[0], file_id, source, *r[1:]) for r in rows))
+                counts[file_id] = counts.get(file_id, 0) + len(rows)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        for file_id, size in sizes.items():
+            self.conn.execute("UPDATE files SET parsed_bytes = ?, events = events + ?, indexed_at = ? WHERE id = ?",
+                              (size, counts.get(file_id, 0), time.time(), file_id))
+        self.conn.commit()
+        elapsed = time.perf_counter() - started
+        return {"files": len(sizes), "chunks": len(tasks), "mb": round(total_bytes / 1e6, 1),
+                "events": sum(counts.values()), "sec": round(elapsed, 2),
+                "mb_per_sec": round(total_bytes / 1e6 / elapsed, 1) if elapsed > 0 else None}
+
+    # --- 조회 ---
+    def timeline(self, strategy_id: Optional[int] = None, source: Optional[str] = None, since: Optional[float] = None,
+                 until: Optional[float] = None, events: tuple = EVENTS, limit: int = 1000) -> list[dict]:
+        """전략(레벨) 1개의 이벤트 시간순 목록 (strategy_id 없으면 전체)"""
+        where, params = [f"event IN ({','.join('?' * len(events))})"], list(events)
+        for clause, value in (("strategy_id = ?", strategy_id), ("source = ?", source), ("ts >= ?", since),
+                              ("ts < ?", until)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        rows = self.conn.execute(
+            "SELECT ts, source, event, strategy_id, side, price, qty, order_id, loop, extra FROM events "
+            f"WHERE {' AND '.join(where)} ORDER BY ts LIMIT ?", (*params, limit))
+        keys = ("ts", "source", "event", "strategy_id", "side", "price", "qty", "order_id", "loop", "extra")
+        return [{**dict(zip(keys, r)), "time": datetime.fromtimestamp(r[0], KST).isoformat(timespec="seconds")}
+                for r in rows]
+
+    def fill_stats(self, source: Optional[str] = None, by: str = "strategy") -> list[dict]:
+        """체결 통계 (전략별 또는 일별): 체결 수/수량, 취소 수, 주문 제출 -> 체결 시간 중앙값"""
+        group = _group_sql(by)
+        where, params = "", ()
+        if source is not None:
+            where, params = "WHERE source = ?", (source,)
+        rows = self.conn.execute(f"""
+            SELECT source, {group} AS grp,
+                   SUM(event = 'fill' AND side = 'buy'), SUM(event = 'fill' AND side = 'sell'),
+                   SUM(CASE WHEN event = 'fill' AND side = 'buy' THEN qty END),
+                   SUM(CASE WHEN event = 'fill' AND side = 'sell' THEN qty END),
+                   SUM(event = 'order_submitted'), SUM(event = 'cancel'), MIN(ts), MAX(ts)
+            FROM events {where} GROUP BY source, grp HAVING SUM(event != 'loop') > 0 ORDER BY source, grp
+        """, params).fetchall()
+        waits = self._fill_waits(source, by)
+        return [{"source": r[0], by: r[1], "buy_fills": r[2], "sell_fills": r[3], "buy_qty": r[4], "sell_qty": r[5],
+                 "submitted": r[6], "cancels": r[7],
+                 "median_fill_sec": round(median(waits[(r[0], r[1])]), 1) if waits.get((r[0], r[1])) else None,
+                 "first": datetime.fromtimestamp(r[8], KST).isoformat(timespec="seconds"),
+                 "last": datetime.fromtimestamp(r[9], KST).isoformat(timespec="seconds")} for r in rows]
+
+    def _fill_waits(self, source: Optional[str], by: str) -> dict:
+        """주문번호로 제출/체결을 짝지어 (source, 그룹)별 체결까지 걸린 초 목록"""
+        where, params = "", ()
+        if source is not None:
+            where, params = "AND source = ?", (source,)
+        submitted = {}
+        for src, order_id, grp, ts in self.conn.execute(f"""
+            SELECT source, order_id, {_group_sql(by)}, ts FROM events
+            WHERE event = 'order_submitted' AND order_id IS NOT NULL {where} ORDER BY ts
+        """, params):
+            submitted[(src, order_id)] = (grp, ts)
+        waits: dict[tuple, list] = {}
+        for src, order_id, ts in self.conn.execute(f"""
+            SELECT source, order_id, ts FROM events WHERE event = 'fill' AND order_id IS NOT NULL {where}
+        """, params):
+            sub = submitted.get((src, order_id))
+            if sub is not None and ts >= sub[1]:
+                waits.setdefault((src, sub[0]), []).append(ts - sub[1])
+        return waits
+
+
+def _group_sql(by: str, alias: str = "") -> str:
+    return f"{alias}strategy_id" if by == "strategy" else f"date({alias}ts, 'unixepoch', '+9 hours')"
+
+
+def find_logs(dirs: list[str], patterns: tuple = LOG_PATTERNS) -> list[Path]:
+    paths = set()
+    for d in dirs:
+        target = Path(d)
+        if target.is_file():
+            paths.add(target)
+            continue
+        for pattern in patterns:
+            paths.update(p for p in target.rglob(pattern) if p.is_file())
+    return sorted(paths)
+
+
+def _parse_time(text: Optional[str]) -> Optional[float]:
+    if text is None:
+        return None
+    value = datetime.fromisoformat(text)
+    return (value if value.tzinfo else value.replace(tzinfo=KST)).timestamp()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="회전된 트레이딩 로그(텍스트/JSON-lines)에서 주문/체결/취소/루프 이벤트 색인 및 조회")
+    parser.add_argument("--db", default="log/analytics.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_index = sub.add_parser("index", help="로그 파일 색인 (이미 읽은 부분은 건너뜀)")
+    p_index.add_argument("paths", nargs="*", default=["log"], help="로그 디렉터리 또는 파일")
+    p_index.add_argument("--workers", type=int, default=0, help="파싱 프로세스 수 (기본: CPU 수)")
+    p_index.add_argument("--chunk-mb", type=int, default=32)
+
+    p_timeline = sub.add_parser("timeline", help="전략(레벨) 이벤트 시간순 조회")
+    p_timeline.add_argument("--strategy", type=int, default=None)
+    p_timeline.add_argument("--source", default=None, help="파일 접두어 (trading, adjust_trading)")
+    p_timeline.add_argument("--since", default=None, help="ISO 시각 (시간대 없으면 KST)")
+    p_timeline.add_argument("--until", default=None)
+    p_timeline.add_argument("--no-loops", action="store_true", help="루프 현재가 이벤트 제외")
+    p_timeline.add_argument("--limit", type=int, default=1000)
+
+    p_stats = sub.add_parser("fills", help="체결 통계")
+    p_stats.add_argument("--source", default=None)
+    p_stats.add_argument("--by", choices=["strategy", "day"], default="strategy")
+    args = parser.parse_args()
+
+    index = LogIndex(args.db)
+    if args.command == "index":
+        result = index.index(find_logs(args.paths), args.workers, args.chunk_mb * 1024 * 1024)
+    elif args.command == "timeline":
+        events = tuple(e for e in EVENTS if not (args.no_loops and e == "loop"))
+        result = index.timeline(args.strategy, args.source, _parse_time(args.since), _parse_time(args.until),
+                                events, args.limit)
+    else:
+        result = index.fill_stats(args.source, args.by)
+    index.close()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import atexit
+import logging
+import copy
+import queue
+from datetime import datetime, timezone, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+KST = timezone(timedelta(hours=9))
+
+# LogRecord 기본 속성 (이 외의 속성은 extra로 넘어온 구조화 필드로 취급)
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+# 로거 이름별 설정 결과 (같은 이름으로 두 번 설정해도 핸들러가 중복 등록되지 않도록)
+_configured: dict[str, QueueListener] = {}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """레코드 1건을 JSON 한 줄로 변환 (extra로 넘긴 필드는 최상위 키로 포함)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "ts": datetime.fromtimestamp(record.created, KST).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                event[key] = value
+        if record.exc_info:
+            event["exc"] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class DailyRotatingFileHandler(RotatingFileHandler):
+    """날짜가 바뀌면 새 파일({prefix}_YYYYMMDD.log)로, 같은 날 안에서는 크기 기준으로 회전"""
+
+    def __init__(self, log_dir: str | Path, prefix: str, maxBytes: int, backupCount: int):
+        self.log_dir = Path(log_dir)
+        self.prefix = prefix
+        self._next_day_at = 0.0
+        filename = self._roll_day()
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding="utf-8", delay=True)
+
+    def _roll_day(self) -> str:
+        now = datetime.now()
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self._next_day_at = tomorrow.timestamp()
+        return str(self.log_dir / f"{self.prefix}_{now.strftime('%Y%m%d')}.log")
+
+    def shouldRollover(self, record) -> bool:
+        if time.time() >= self._next_day_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        if time.time() >= self._next_day_at:
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = os.path.abspath(self._roll_day())
+            return
+        super().doRollover()
+
+
+# 나중에 포맷해도 호출 시점과 같은 값 (그대로 큐에 넣어도 되는 인자/extra 값)
+_IMMUTABLE = (str, bytes, int, float, bool, type(None), complex, frozenset)
+
+
+class _Frozen:
+    """가변 객체 인자의 호출 시점 표기 (%s/%r 모두 그때 값으로)"""
+
+    __slots__ = ("_str", "_repr")
+
+    def __init__(self, value):
+        self._str, self._repr = str(value), repr(value)
+
+    def __str__(self) -> str:
+        return self._str
+
+    def __repr__(self) -> str:
+        return self._repr
+
+
+def _snapshot(value):
+    """불변 값은 그대로, dict/list/set/tuple은 깊은 복사, 그 외 객체(Strategy 등)는 호출 시점 문자열로"""
+    if isinstance(value, _IMMUTABLE):
+        return value
+    if isinstance(value, (dict, list, set, tuple)):
+        try:
+            return copy.deepcopy(value)
+        except Exception:
+            return _Frozen(value)
+    return _Frozen(value)
+
+
+class _LazyQueueHandler(QueueHandler):
+    """호출 스레드에서는 메시지를 조립하지 않고 레코드만 큐에 넣음 (문자열 조립은 리스너 스레드에서)
+
+    args/extra 값 중 가변 객체만 호출 시점 값으로 고정한다 (리스너가 포맷할 때쯤 루프가 이미 바꿨을 수 있음).
+    숫자/문자열 인자는 그대로 넘기므로 일반적인 '%s' 인자 로그는 호출 스레드 비용이 거의 없다.
+    """
+
+    def prepare(self, record):
+        args = record.args
+        if isinstance(args, dict):
+            record.args = {k: _snapshot(v) for k, v in args.items()}
+        elif args and not all(isinstance(a, _IMMUTABLE) for a in args):
+            record.args = tuple(_snapshot(a) for a in args)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_") and not isinstance(value, _IMMUTABLE):
+                record.__dict__[key] = _snapshot(value)
+        return record
+
+
+def _parse_levels(spec: str | dict | None) -> dict:
+    """'loop=WARNING,strategy=DEBUG' 형태 또는 dict를 {컴포넌트: 레벨} 로 변환"""
+    if not spec:
+        return {}
+    if isinstance(spec, dict):
+        return spec
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(name: str = "TradingBotLogger", file_prefix: str = "trading", log_dir: str | Path = "log",
+                  level: int | str = logging.INFO, component_levels: str | dict | None = None,
+                  max_bytes: int = 100 * 1024 * 1024, backup_count: int = 5) -> logging.Logger:
+    """QueueHandler/QueueListener 기반 JSON-lines 로거 설정
+
+    - 트레이딩 루프는 큐에 레코드만 넣고, 파일 기록/포맷팅은 리스너 스레드가 담당
+    - 컴포넌트별 레벨은 인자로 주고, 환경변수 LOG_LEVELS (예: "loop=WARNING,strategy=DEBUG")가 있으면 덮어씀
+    - 같은 이름으로 다시 호출하면 기존 로거를 그대로 반환 (핸들러 중복 방지)
+    """
+    logger = logging.getLogger(name)
+    if name in _configured:
+        return logger
+
+    Path(log_dir).mkdir(parents=True, exist_ok=True)
+    file_handler = DailyRotatingFileHandler(log_dir, file_prefix, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.handlers.clear()
+    logger.addHandler(_LazyQueueHandler(log_queue))
+    logger.setLevel(level)
+    logger.propagate = False
+
+    levels = dict(_parse_levels(component_levels))
+    levels.update(_parse_levels(os.getenv("LOG_LEVELS")))
+    for component, component_level in levels.items():
+        logger.getChild(component).setLevel(component_level)
+
+    _configured[name] = listener
+    return logger
+
+
+def queue_backlog(name: str = "TradingBotLogger") -> int:
+    """리스너 스레드가 아직 파일에 쓰지 못한 레코드 수 (계속 늘면 로그 생산이 기록보다 빠름)"""
+    listener = _configured.get(name)
+    return 0 if listener is None else listener.queue.qsize()
@@ -0,0 +1,271 @@
+import os
+import json
+import math
+import time
+import bisect
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Callable, Optional
+
+from price_ticks import TickScale
+
+logger = logging.getLogger("TradingBotLogger").getChild("meta")
+
+# 원화 마켓 호가 단위: (이 가격 이상, 호가 단위) 를 가격 내림차순으로.
+# 빗썸 v1 API는 호가 단위를 내려주지 않으므로 거래소 공지 기준 표를 내장하고, 캐시 파일에서 덮어쓸 수 있다.
+KRW_TICK_TABLE: tuple = (
+    (2_000_000, 1000), (1_000_000, 500), (500_000, 100), (100_000, 50), (10_000, 10), (1_000, 1),
+    (100, 0.1), (10, 0.01), (1, 0.001), (0.1, 0.0001), (0.01, 0.00001), (0.001, 0.000001),
+    (0.0001, 0.0000001), (0, 0.00000001),
+)
+
+# 거래소별 기본값 (API 조회가 실패하고 캐시도 없을 때만 사용)
+DEFAULTS = {
+    "bithumb": {"tick_table": KRW_TICK_TABLE, "min_notional": 500.0, "maker_fee": 0.0025, "taker_fee": 0.0025,
+                "qty_decimals": 4},
+    "upbit": {"tick_table": KRW_TICK_TABLE, "min_notional": 5000.0, "maker_fee": 0.0005, "taker_fee": 0.0005,
+              "qty_decimals": 8},
+}
+
+
+@dataclass
+class MarketMeta:
+    """마켓 1개의 주문 규칙 (호가 단위, 최소 주문 금액, 수수료율, 수량 자릿수)"""
+    exchange: str
+    ticker: str
+    tick_table: tuple
+    min_notional: float
+    maker_fee: float
+    taker_fee: float
+    qty_decimals: int
+    fetched_at: float = 0.0
+    _floors: list = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.tick_table = tuple((float(lo), float(tick)) for lo, tick in self.tick_table)
+        # bisect용 오름차순 하한 목록
+        self._floors = [lo for lo, _ in reversed(self.tick_table)]
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("_floors")
+        return data
+
+    def tick_at(self, price: float) -> float:
+        """price가 속한 구간의 호가 단위"""
+        i = bisect.bisect_right(self._floors, price) - 1
+        return self.tick_table[len(self.tick_table) - 1 - max(i, 0)][1]
+
+    def floor_price(self, price: float) -> float:
+        """price 이하의 가장 가까운 유효 호가 (매수가 보정용)"""
+        scale = TickScale(self.tick_at(price))
+        return float(scale.to_price(scale.floor_ticks(price)))
+
+    def ceil_price(self, price: float) -> float:
+        """price 이상의 가장 가까운 유효 호가 (매도가 보정용)"""
+        tick = self.tick_at(price)
+        scale = TickScale(tick)
+        snapped = float(scale.to_price(scale.ceil_ticks(price)))
+        # 구간 경계 바로 아래 가격이 올림으로 위 구간에 들어가면 위 구간 단위로 다시 맞춤
+        return snapped if self.tick_at(snapped) == tick else self.ceil_price(snapped)
+
+    def round_price(self, price: float) -> float:
+        """가장 가까운 유효 호가"""
+        lo, hi = self.floor_price(price), self.ceil_price(price)
+        return lo if price - lo <= hi - price else hi
+
+    def is_valid_price(self, price: float) -> bool:
+        scale = TickScale(self.tick_at(price))
+        return scale.floor_ticks(price) == scale.ceil_ticks(price)
+
+    # --- 정수 틱 (그리드 엔진용, scale 단위) ---
+    def step_ticks(self, ticks: int, scale: TickScale) -> int:
+        """ticks가 속한 구간의 호가 단위 (틱 수)"""
+        return scale.step(self.tick_at(scale.to_price(ticks)))
+
+    def floor_ticks(self, ticks: int, scale: TickScale) -> int:
+        step = self.step_ticks(ticks, scale)
+        return ticks - ticks % step
+
+    def ceil_ticks(self, ticks: int, scale: TickScale) -> int:
+        step = self.step_ticks(ticks, scale)
+        snapped = -(-ticks // step) * step
+        return snapped if self.step_ticks(snapped, scale) == step else self.ceil_ticks(snapped, scale)
+
+    def floor_qty(self, qty: float) -> float:
+        """거래소가 받는 자릿수로 수량 내림"""
+        scale = TickScale(qty_decimals=self.qty_decimals)
+        return scale.to_qty(scale.floor_lots(qty))
+
+    def meets_min_notional(self, price: float, qty: float) -> bool:
+        return price * qty >= self.min_notional
+
+
+class PriceLadder:
+    """[low, high] 틱 구간의 유효 호가를 정수 틱으로 미리 계산해 둔 사다리
+
+    그리드 레벨 가격 보정/검증이 틱마다 반복되므로, 구간 안은 정렬 배열 bisect와 집합 조회로 끝내고
+    구간 밖(추적 모드로 창이 멀리 옮겨간 경우 등)만 MarketMeta의 정수 틱 계산으로 처리한다.
+    정수라 반올림 없이 그대로 비교/색인한다.
+    """
+
+    def __init__(self, meta: MarketMeta, scale: TickScale, low: int, high: int, max_size: int = 200_000):
+        self.meta = meta
+        self.scale = scale
+        prices = []
+        price = meta.ceil_ticks(max(low, 1), scale)
+        while price <= high and len(prices) < max_size:
+            prices.append(price)
+            price += meta.step_ticks(price, scale)
+        self.prices = prices
+        self._valid = set(prices)
+        self.low = prices[0] if prices else math.inf
+        self.high = prices[-1] if prices else -math.inf
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def floor(self, ticks: int) -> int:
+        if not self.low <= ticks <= self.high:
+            return self.meta.floor_ticks(ticks, self.scale)
+        return self.prices[bisect.bisect_right(self.prices, ticks) - 1]
+
+    def ceil(self, ticks: int) -> int:
+        if not self.low <= ticks <= self.high:
+            return self.meta.ceil_ticks(ticks, self.scale)
+        return self.prices[bisect.bisect_left(self.prices, ticks)]
+
+    def is_valid(self, ticks: int) -> bool:
+        if not self.low <= ticks <= self.high:
+            return self.meta.floor_ticks(ticks, self.scale) == ticks
+        return ticks in self._valid
+
+
+# --- 거래소 조회 (시작 시/TTL 만료 시 1회) ---
+def fetch_bithumb_meta(client, ticker: str) -> dict:
+    """pybithumb: 수수료율은 /info/account (get_trading_fee). 호가 단위/최소 금액은 API가 없어 기본값 사용"""
+    fee = float(client.get_trading_fee(ticker))
+    return {"maker_fee": fee, "taker_fee": fee}
+
+
+def fetch_upbit_meta(client, ticker: str) -> dict:
+    """pyupbit: /v1/orders/chance 로 수수료율과 최소 주문 금액 조회"""
+    chance = client.get_chance(ticker)
+    market = chance["market"]
+    return {
+        "maker_fee": float(chance.get("maker_bid_fee", chance["bid_fee"])),
+        "taker_fee": float(chance["bid_fee"]),
+        "min_notional": float(market["bid"]["min_total"]),
+    }
+
+
+FETCHERS = {"bithumb": fetch_bithumb_meta, "upbit": fetch_upbit_meta}
+
+
+class MarketMetaCache:
+    """마켓 메타데이터 디스크 캐시 ({exchange}:{ticker} -> MarketMeta, JSON 1개 파일)
+
+    get()은 파일 캐시가 ttl 이내면 API를 부르지 않는다. 만료됐으면 1회 조회해 저장하고,
+    조회가 실패하면 만료된 캐시 -> 거래소 기본값 순으로 사용한다 (주문 경로가 멈추지 않도록).
+    캐시 파일에서 tick_table/min_notional을 고쳐 두면 다음 갱신 전까지 그 값을 쓴다.
+    """
+
+    def __init__(self, path: str | Path = "cache/market_meta.json", ttl: float = 86400.0):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = self._load()
+
+    def _load(self) -> dict:
+        if not self.path.is_file():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error("마켓 메타 캐시 로드 실패: %s / %s", self.path, e, extra={"event": "meta_error"})
+            return {}
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def get(self, exchange: str, ticker: str, client=None,
+            fetch: Optional[Callable[[object, str], dict]] = None) -> MarketMeta:
+        key = f"{exchange}:{ticker}"
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and time.time() - cached.get("fetched_at", 0) < self.ttl:
+                return MarketMeta(**cached)
+
+            base = {**DEFAULTS[exchange], **(cached or {}), "exchange": exchange, "ticker": ticker}
+            fetch = fetch or FETCHERS.get(exchange)
+            if client is None or fetch is None:
+                return MarketMeta(**base)
+            try:
+                fetched = fetch(client, ticker)
+            except Exception as e:
+                logger.warning("마켓 메타 조회 실패, %s 값 사용: %s / %s", "캐시" if cached else "기본", key, e,
+                               extra={"event": "meta_fallback", "market": key})
+                return MarketMeta(**base)
+
+            meta = MarketMeta(**{**base, **fetched, "fetched_at": time.time()})
+            self._entries[key] = meta.to_dict()
+            try:
+                self._save()
+            except Exception as e:
+                logger.error("마켓 메타 캐시 저장 실패: %s", e, extra={"event": "meta_error"})
+            logger.info("마켓 메타 갱신: %s (fee=%s/%s, min=%s)", key, meta.maker_fee, meta.taker_fee,
+                        meta.min_notional, extra={"event": "meta_refresh", "market": key})
+            return meta
+
+
+_default_cache: Optional[MarketMetaCache] = None
+
+
+def load_market_meta(exchange: str, ticker: str, client=None, path: str | Path = "cache/market_meta.json",
+                     ttl: float = 86400.0) -> MarketMeta:
+    """프로세스 공용 캐시로 조회 (같은 경로면 파일을 한 번만 읽음)"""
+    global _default_cache
+    if _default_cache is None or _default_cache.path != Path(path):
+        _default_cache = MarketMetaCache(path, ttl)
+    _default_cache.ttl = ttl
+    return _default_cache.get(exchange, ticker, client)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="마켓 메타데이터 캐시 조회/갱신")
+    parser.add_argument("exchange", choices=sorted(DEFAULTS))
+    parser.add_argument("ticker")
+    parser.add_argument("--path", default="cache/market_meta.json")
+    parser.add_argument("--refresh", action="store_true", help="TTL과 상관없이 거래소에서 다시 조회")
+    parser.add_argument("--ladder", nargs=2, type=float, metavar=("LOW", "HIGH"), help="구간의 유효 호가 출력")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    client = None
+    if args.exchange == "bithumb":
+        from pybithumb import Bithumb
+        client = Bithumb(os.getenv("BITHUMB_ACCESS_KEY"), os.getenv("BITHUMB_SECRET_KEY"))
+    else:
+        import pyupbit
+        client = pyupbit.Upbit(os.getenv("UPBIT_ACCESS_KEY"), os.getenv("UPBIT_SECRET_KEY"))
+    cache = MarketMetaCache(args.path, ttl=0 if args.refresh else 86400.0)
+    meta = cache.get(args.exchange, args.ticker, client)
+    print(json.dumps(meta.to_dict(), ensure_ascii=False, indent=2))
+    if args.ladder:
+        # 틱 단위는 구간 최저가의 호가 단위 (구간 안의 모든 호가가 정수 틱)
+        low, high = args.ladder
+        scale = TickScale(meta.tick_at(low))
+        ladder = PriceLadder(meta, scale, scale.ceil_ticks(low), scale.floor_ticks(high))
+        shown = [scale.format_price(t) for t in ladder.prices[:5]], [scale.format_price(t) for t in ladder.prices[-5:]]
+        print(f"{len(ladder)} prices: {shown[0]} ... {shown[1]}")
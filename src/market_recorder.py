@@ -0,0 +1,272 @@
+import os
+import time
+import queue
+import logging
+import threading
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+KST = timezone(timedelta(hours=9))
+
+logger = logging.getLogger("TradingBotLogger").getChild("recorder")
+
+# 종류별 컬럼 스키마 (ts: epoch 초, 모든 파일은 ts 오름차순으로 기록)
+SCHEMAS = {
+    "ticker": pa.schema([("ts", pa.float64()), ("price", pa.float64())]),
+    "trade": pa.schema([("ts", pa.float64()), ("price", pa.float64()), ("units", pa.float64()),
+                        ("side", pa.string())]),
+    "orderbook": pa.schema([("ts", pa.float64()), ("side", pa.string()), ("price", pa.float64()),
+                            ("quantity", pa.float64())]),
+}
+
+
+class MarketRecorder:
+    """봇이 받은 시세(현재가/체결/호가 변경)를 티커·종류별 Parquet 파일로 기록
+
+    - record_*()는 큐에 넣기만 하고, writer 스레드가 flush_interval 초 또는 batch_size 건마다
+      열린 파일에 row group 하나(zstd 압축)로 추가한다.
+    - roll_interval 초마다 새 파일({dir}/{ticker}/{kind}/{YYYYMMDD}/{HHMMSS}-{source}.parquet)로 넘어간다.
+      Parquet는 파일을 닫아야 footer가 쓰이므로, 조회는 닫힌 파일부터 가능하다.
+    - 같은 티커를 여러 프로세스가 기록해도 source(기본: pid)로 파일이 나뉜다.
+    """
+
+    def __init__(self, root: str | Path = "market_data", source: Optional[str] = None,
+                 roll_interval: float = 600, flush_interval: float = 5.0, batch_size: int = 5000):
+        self.root = Path(root)
+        self.source = source or str(os.getpid())
+        self.roll_interval = roll_interval
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writers: dict[tuple[str, str], tuple[pq.ParquetWriter, Path, float]] = {}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="MarketRecorder", daemon=True)
+        self._thread.start()
+
+    # --- 기록 (트레이딩 루프 / 웹소켓 수신 스레드에서 호출) ---
+    def record_ticker(self, ticker: str, price: float, ts: Optional[float] = None):
+        self._queue.put(("ticker", ticker, (ts or time.time(), float(price))))
+
+    def record_trade(self, ticker: str, price: float, units: float, side: str, ts: Optional[float] = None):
+        self._queue.put(("trade", ticker, (ts or time.time(), float(price), float(units), side)))
+
+    def record_orderbook(self, ticker: str, side: str, price: float, quantity: float, ts: Optional[float] = None):
+        self._queue.put(("orderbook", ticker, (ts or time.time(), side, float(price), float(quantity))))
+
+    def record_ws_message(self, msg: dict):
+        """빗썸 공개 웹소켓 메시지 (ticker/transaction/orderbookdepth) 1건 기록"""
+        for kind, ticker, row in parse_ws_message(msg):
+            self._queue.put((kind, ticker, row))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    # --- writer 스레드 ---
+    def _path_for(self, ticker: str, kind: str, ts: float) -> Path:
+        dt = datetime.fromtimestamp(ts, KST)
+        return self.root / ticker / kind / dt.strftime("%Y%m%d") / f"{dt.strftime('%H%M%S')}-{self.source}.parquet"
+
+    def _write(self, kind: str, ticker: str, rows: list[tuple]):
+        key = (ticker, kind)
+        now = rows[0][0]
+        entry = self._writers.get(key)
+        if entry is not None and now - entry[2] >= self.roll_interval:
+            entry[0].close()
+            entry = None
+        if entry is None:
+            path = self._path_for(ticker, kind, now)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            writer = pq.ParquetWriter(path, SCHEMAS[kind], compression="zstd")
+            entry = self._writers[key] = (writer, path, now)
+        schema = SCHEMAS[kind]
+        columns = list(zip(*sorted(rows, key=lambda r: r[0])))
+        entry[0].write_table(pa.Table.from_arrays(
+            [pa.array(col, type=f.type) for col, f in zip(columns, schema)], schema=schema))
+
+    def _flush(self, pending: dict[tuple[str, str], list]):
+        for (kind, ticker), rows in pending.items():
+            if not rows:
+                continue
+            try:
+                self._write(kind, ticker, rows)
+            except Exception as e:
+                logger.error("시세 기록 실패: %s/%s (%d건) %s", ticker, kind, len(rows), e,
+                             extra={"event": "recorder_error"})
+        pending.clear()
+
+    def _run(self):
+        pending: dict[tuple[str, str], list] = {}
+        count = 0
+        next_flush = time.monotonic() + self.flush_interval
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=max(next_flush - time.monotonic(), 0.01))
+                if item is None:
+                    running = False
+                else:
+                    kind, ticker, row = item
+                    pending.setdefault((kind, ticker), []).append(row)
+                    count += 1
+            except queue.Empty:
+                pass
+            if not running or count >= self.batch_size or time.monotonic() >= next_flush:
+                self._flush(pending)
+                count = 0
+                next_flush = time.monotonic() + self.flush_interval
+        for writer, _, _ in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def parse_ws_message(msg: dict) -> Iterator[tuple[str, str, tuple]]:
+    """빗썸 공개 웹소켓 메시지를 (kind, ticker, row) 로 변환
+
+    transaction의 buySellGb: 1 = 매도 체결(ask), 2 = 매수 체결(bid).
+    """
+    msg_type = msg.get("type")
+    content = msg.get("content") or {}
+    now = time.time()
+    if msg_type == "ticker":
+        ticker = content["symbol"].split("_")[0]
+        try:
+            ts = datetime.strptime(content["date"] + content["time"], "%Y%m%d%H%M%S").replace(tzinfo=KST).timestamp()
+        except (KeyError, ValueError):
+            ts = now
+        yield "ticker", ticker, (ts, float(content["closePrice"]))
+    elif msg_type == "transaction":
+        for item in content.get("list", []):
+            try:
+                ts = datetime.strptime(item["contDtm"], "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=KST).timestamp()
+            except (KeyError, ValueError):
+                ts = now
+            side = "ask" if str(item.get("buySellGb")) == "1" else "bid"
+            yield "trade", item["symbol"].split("_")[0], (ts, float(item["contPrice"]), float(item["contQty"]), side)
+    elif msg_type == "orderbookdepth":
+        # datetime: 마이크로초 단위 epoch
+        ts = int(content["datetime"]) / 1_000_000 if content.get("datetime") else now
+        for item in content.get("list", []):
+            yield "orderbook", item["symbol"].split("_")[0], (ts, item["orderType"], float(item["price"]),
+                                                              float(item["quantity"]))
+
+
+class MarketDataReader:
+    """기록된 Parquet 파일에서 시간 구간만 잘라 읽기
+
+    파일은 memory map으로 열고, 파일명(시작 시각)과 row group의 ts 통계로 구간에 걸치지 않는
+    파일/row group은 읽지 않는다. 하루치 전체를 메모리에 올리지 않고 필요한 부분만 읽는다.
+    """
+
+    def __init__(self, root: str | Path = "market_data"):
+        self.root = Path(root)
+
+    def files(self, ticker: str, kind: str, start: float, end: float) -> list[Path]:
+        """[start, end) 구간과 겹칠 수 있는 파일 목록 (시작 시각 순)"""
+        base = self.root / ticker / kind
+        day = datetime.fromtimestamp(start, KST).date() - timedelta(days=1)  # 전날 늦게 열린 파일 포함
+        last_day = datetime.fromtimestamp(end, KST).date()
+        paths = []
+        while day <= last_day:
+            day_dir = base / day.strftime("%Y%m%d")
+            if day_dir.is_dir():
+                for path in sorted(day_dir.glob("*.parquet")):
+                    opened = datetime.strptime(day.strftime("%Y%m%d") + path.name[:6], "%Y%m%d%H%M%S")
+                    if opened.replace(tzinfo=KST).timestamp() < end:
+                        paths.append(path)
+            day += timedelta(days=1)
+        return paths
+
+    def read(self, ticker: str, kind: str, start: float, end: float) -> pa.Table:
+        """[start, end) 구간의 레코드를 ts 순으로 반환 (pyarrow Table, .to_pandas()로 변환 가능)"""
+        tables = []
+        for path in self.files(ticker, kind, start, end):
+            try:
+                pf = pq.ParquetFile(path, memory_map=True)
+            except (pa.ArrowInvalid, OSError):
+                continue  # 아직 기록 중(footer 없음)이거나 손상된 파일
+            ts_idx = pf.schema_arrow.get_field_index("ts")
+            groups = []
+            for i in range(pf.metadata.num_row_groups):
+                stats = pf.metadata.row_group(i).column(ts_idx).statistics
+                if stats is None or not stats.has_min_max or (stats.max >= start and stats.min < end):
+                    groups.append(i)
+            if not groups:
+                continue
+            table = pf.read_row_groups(groups)
+            ts = table.column("ts")
+            mask = pc.and_(pc.greater_equal(ts, start), pc.less(ts, end))
+            tables.append(table.filter(mask))
+        if not tables:
+            return SCHEMAS[kind].empty_table()
+        return pa.concat_tables(tables).sort_by("ts")
+
+
+def record_websocket(root: str, tickers: list[str], kinds: list[str], roll_interval: float):
+    """코인 봇과 별개로 빗썸 공개 웹소켓(ticker/transaction/orderbookdepth)을 그대로 기록"""
+    import signal
+    from pybithumb import WebSocketManager
+    from log_config import setup_logging
+
+    setup_logging("TradingBotLogger", file_prefix="recorder")
+    recorder = MarketRecorder(root, source="ws", roll_interval=roll_interval)
+    symbols = [f"{t}_KRW" for t in tickers]
+    managers = [WebSocketManager(kind, symbols) for kind in kinds]
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    def pump(wm):
+        while not stop.is_set():
+            msg = wm.get()
+            if msg.get("type"):
+                recorder.record_ws_message(msg)
+
+    for wm in managers:
+        threading.Thread(target=pump, args=(wm,), daemon=True).start()
+    logger.info("웹소켓 시세 기록 시작: %s %s -> %s", tickers, kinds, root, extra={"event": "recorder_start"})
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for wm in managers:
+            wm.terminate()
+        recorder.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="시세 기록/조회")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="빗썸 공개 웹소켓 기록")
+    rec.add_argument("--root", default="market_data")
+    rec.add_argument("--tickers", default="DOGE", help="티커 목록 (쉼표 구분)")
+    rec.add_argument("--kinds", default="ticker,transaction,orderbookdepth")
+    rec.add_argument("--roll", type=float, default=600, help="파일 교체 주기 (초)")
+    rd = sub.add_parser("read", help="시간 구간 조회")
+    rd.add_argument("--root", default="market_data")
+    rd.add_argument("ticker")
+    rd.add_argument("kind", choices=list(SCHEMAS))
+    rd.add_argument("start", help="시작 시각 (KST, YYYY-MM-DDTHH:MM[:SS])")
+    rd.add_argument("end", help="종료 시각 (KST, 미포함)")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record_websocket(args.root, [t.strip() for t in args.tickers.split(",") if t.strip()],
+                         [k.strip() for k in args.kinds.split(",") if k.strip()], args.roll)
+    else:
+        def _ts(text: str) -> float:
+            return datetime.fromisoformat(text).replace(tzinfo=KST).timestamp()
+
+        result = MarketDataReader(args.root).read(args.ticker, args.kind, _ts(args.start), _ts(args.end))
+        print(result.to_pandas().to_string(max_rows=50))
@@ -6,6 +6,7 @@ import requests
 
 from pybithumb import Bithumb
 from dotenv import load_dotenv
+from market_meta import load_market_meta
 load_dotenv()
 
 import logging
@@ -60,7 +61,7 @@ def make_strategies(ticker, startBuyPrice, divideCount, dealCount, buyInterval,
 
 def check_my_balance(Bithumb, ticker):
     currentPrice = myBithumb.get_current_price(ticker)
-    tradingFee = myBithumb.get_trading_fee(ticker)
+    tradingFee = load_market_meta("bithumb", ticker, myBithumb).taker_fee  # 디스크 캐시 (TTL 만료 시에만 API 조회)
     myBalance = myBithumb.get_balance(ticker)
 
     # print(f"------------------------------------------")
@@ -68,7 +69,7 @@ def check_my_balance(Bithumb, ticker):
     logger.info(f"### Start Trading ###")
     discord_send_message(f"### Start Trading ###")
 
-    msg = f"{ticker}, Coin: {myBalance[0]}, Trading Coin: {myBalance[1]}, Balance: {myBalance[2]:.1f}, Trading Money: {myBalance[3]}"
+    msg = f"{ticker}, Coin: {myBalance[0]}, Trading Coin: {myBalance[1]}, Balance: {myBalance[2]:.1f}, Trading Money: {myBalance[3]}, Fee: {tradingFee}"
     logger.info(msg)
     discord_send_message(msg)
 
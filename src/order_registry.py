@@ -0,0 +1,273 @@
+import time
+import itertools
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("TradingBotLogger").getChild("orders")
+
+
+def order_key(order_id) -> Optional[str]:
+    """pybithumb 주문 id 튜플 (type, currency, order_id, payment) 에서 거래소 주문번호만 추출"""
+    if order_id is None:
+        return None
+    if isinstance(order_id, (tuple, list)) and len(order_id) >= 3:
+        return str(order_id[2])
+    return str(order_id)
+
+
+def fill_key(side: str, fill: dict) -> tuple:
+    """체결 1건 식별자 (방향, 가격, 수량, 체결 시각). 빗썸 체결에는 주문번호가 없어 내용으로 구분"""
+    return side, float(fill["price"]), float(fill["units"]), str(fill.get("transaction_date"))
+
+
+@dataclass
+class InFlight:
+    """제출했지만 결과(주문번호)를 받지 못한 주문 (네트워크 오류 등으로 실제 접수 여부를 모름)"""
+    tag: str
+    strategy_id: int
+    side: str  # 'buy' / 'sell'
+    price: float
+    qty: float
+    started_at: float
+    reservation: Optional[str] = None
+    child: bool = False  # 부분 체결분 매도 주문인지
+
+
+@dataclass
+class ReconcileResult:
+    adopted: list = field(default_factory=list)      # (InFlight, 거래소 미체결 주문) 접수가 확인된 주문
+    unresolved: list = field(default_factory=list)   # 미체결 목록에 없는 InFlight (즉시 체결됐거나 접수 안 됨)
+    closed: list = field(default_factory=list)       # (전략, 주문 id) 우리 주문인데 미체결 목록에서 사라진 주문
+    unknown: int = 0                                 # 이 그리드가 모르는 미체결 주문 수 (다른 그리드/수동 주문)
+
+
+class OrderRegistry:
+    """그리드의 주문번호 -> 전략 역색인과 제출 중(in-flight) 주문 관리
+
+    - register(): 접수된 주문번호를 전략에 연결 (본 주문/부분 체결분 매도 모두)
+    - begin()/commit()/abort(): 제출 전에 클라이언트 태그로 in-flight 기록 -> 주문번호를 받으면 commit,
+      거래소가 명시적으로 거절하면 abort. 예외/무응답이면 in-flight로 남아 해당 전략은 재주문하지 않는다.
+    - reconcile(): 미체결 주문 목록 1회 조회 결과로 그리드 전체를 O(주문 수)로 대사
+
+    빗썸 v1 API는 클라이언트 주문 태그를 받지 않으므로, 태그는 로컬 식별용이고 in-flight 주문은
+    (방향, 가격, 수량, 제출 시각 이후 접수) 로 미체결 주문과 맞춘다.
+    """
+
+    def __init__(self, grid_id: str, inflight_timeout: float = 30.0, clock_skew: float = 5.0,
+                 max_known_fills: int = 5000):
+        self.grid_id = grid_id
+        self.inflight_timeout = inflight_timeout
+        self.clock_skew = clock_skew
+        self._by_id: dict[str, Any] = {}
+        self._inflight: dict[str, InFlight] = {}
+        self._inflight_by_strategy: dict[int, str] = {}
+        self._seq = itertools.count(1)
+        # 레벨이 이미 반영한 체결 (in-flight 정리 때 다른 주문/지난 사이클의 체결을 다시 붙이지 않도록)
+        self._known_fills: set = set()
+        self._known_order: deque = deque()
+        self._max_known_fills = max_known_fills
+
+    # --- 색인 ---
+    def register(self, order_id, strategy):
+        self._by_id[order_key(order_id)] = strategy
+
+    def lookup(self, order_id):
+        """주문번호로 전략 조회 (전략이 더 이상 그 주문을 들고 있지 않으면 None)"""
+        key = order_key(order_id)
+        strategy = self._by_id.get(key)
+        if strategy is None or key not in _live_keys(strategy):
+            return None
+        return strategy
+
+    def rebuild(self, strategies: list):
+        """스냅샷 복원 후 전략들이 들고 있는 주문번호로 색인 재구성"""
+        self._by_id = {key: s for s in strategies for key in _live_keys(s)}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    # --- 반영한 체결 ---
+    def note_fills(self, side: str, contracts: list):
+        for contract in contracts:
+            try:
+                key = fill_key(side, contract)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if key in self._known_fills:
+                continue
+            self._known_fills.add(key)
+            self._known_order.append(key)
+            if len(self._known_order) > self._max_known_fills:
+                self._known_fills.discard(self._known_order.popleft())
+
+    def known_fills(self) -> set:
+        return self._known_fills
+
+    # --- 제출 중 주문 ---
+    def blocked(self, strategy_id: int) -> bool:
+        """접수 여부를 모르는 주문이 있어 재주문하면 안 되는 전략인지"""
+        return strategy_id in self._inflight_by_strategy
+
+    def begin(self, strategy_id: int, side: str, price: float, qty: float, reservation: Optional[str] = None,
+              child: bool = False) -> str:
+        tag = f"{self.grid_id}-{strategy_id}-{side}-{next(self._seq)}"
+        self._inflight[tag] = InFlight(tag, strategy_id, side, float(price), float(qty), time.time(),
+                                       reservation, child)
+        self._inflight_by_strategy[strategy_id] = tag
+        return tag
+
+    def commit(self, tag: str, order_id, strategy):
+        self._drop_inflight(tag)
+        self.register(order_id, strategy)
+
+    def abort(self, tag: str):
+        """거래소가 명시적으로 거절: 접수되지 않았으므로 재시도해도 안전"""
+        self._drop_inflight(tag)
+
+    def resolve(self, inflight: InFlight):
+        self._drop_inflight(inflight.tag)
+
+    def _drop_inflight(self, tag: str):
+        inflight = self._inflight.pop(tag, None)
+        if inflight is not None and self._inflight_by_strategy.get(inflight.strategy_id) == tag:
+            del self._inflight_by_strategy[inflight.strategy_id]
+
+    def inflight(self) -> list[InFlight]:
+        return list(self._inflight.values())
+
+    # --- 대사 ---
+    def reconcile(self, open_orders: list[dict], now: Optional[float] = None) -> ReconcileResult:
+        """미체결 주문 목록 (fetch_open_orders 결과) 으로 대사
+
+        - 색인에 있는 주문: 그대로 유지
+        - 색인에 있는데 목록에 없는 주문: closed (체결 완료/취소 -> 해당 전략이 바로 체결 조회하도록)
+        - 색인에 없는 주문: 같은 (방향, 가격, 수량) 의 in-flight가 있으면 adopted, 없으면 unknown
+        - 목록에 없고 inflight_timeout이 지난 in-flight: unresolved (즉시 체결 여부를 체결 내역으로 확인)
+        """
+        now = now or time.time()
+        result = ReconcileResult()
+        waiting: dict[tuple, list[InFlight]] = {}
+        for inflight in self._inflight.values():
+            waiting.setdefault((inflight.side, inflight.price, inflight.qty), []).append(inflight)
+
+        open_keys = set()
+        for order in open_orders:
+            key = order["order_id"]
+            open_keys.add(key)
+            if key in self._by_id:
+                continue
+            candidates = waiting.get((order["side"], float(order["price"]), float(order["units"])))
+            match = None
+            if candidates:
+                for inflight in candidates:
+                    if order["placed_at"] >= inflight.started_at - self.clock_skew:
+                        match = inflight
+                        break
+            if match is not None:
+                candidates.remove(match)
+                result.adopted.append((match, order))
+            else:
+                result.unknown += 1
+
+        for key, strategy in list(self._by_id.items()):
+            if key in open_keys:
+                continue
+            if key in _live_keys(strategy):
+                result.closed.append((strategy, key))
+            else:
+                del self._by_id[key]  # 이미 정리된 주문 (전략이 더 이상 참조하지 않음)
+
+        adopted = {inflight.tag for inflight, _ in result.adopted}
+        for inflight in self._inflight.values():
+            if inflight.tag not in adopted and now - inflight.started_at >= self.inflight_timeout:
+                result.unresolved.append(inflight)
+        return result
+
+
+def _live_keys(strategy) -> set:
+    keys = {order_key(c["order_id"]) for c in strategy.child_sells}
+    if strategy.order_id:
+        keys.add(order_key(strategy.order_id))
+    return keys
+
+
+# --- 거래소 조회 (pybithumb / SimulatedExchange) ---
+def fetch_open_orders(client, ticker: str, limit: int = 1000,
+                      observe: Optional[Callable[[Any], Any]] = None) -> list[dict]:
+    """미체결 주문 전체를 한 번에 조회해 [{order_id, side, price, units, remaining, placed_at}] 로 반환
+
+    pybithumb에는 목록 조회 메서드가 없어 /info/orders 를 order_id 없이 직접 호출한다.
+    observe를 주면 해석 전의 응답을 먼저 넘긴다 (키 풀의 요청 한도 초과 감지용).
+    """
+    if hasattr(client, "get_open_orders"):
+        return client.get_open_orders(ticker)
+    resp = client.api.orders(order_currency=ticker, payment_currency="KRW", count=limit)
+    if observe is not None:
+        observe(resp)
+    if resp.get("status") == "5600":
+        return []  # 미체결 주문 없음
+    if resp.get("status") != "0000":
+        raise RuntimeError(f"미체결 주문 조회 실패: {resp}")
+    return [{
+        "order_id": str(o["order_id"]),
+        "side": "buy" if o["type"] == "bid" else "sell",
+        "price": float(o["price"]),
+        "units": float(o["units"]),
+        "remaining": float(o.get("units_remaining", o["units"])),
+        "placed_at": int(o["order_date"]) / 1_000_000,
+    } for o in resp.get("data", [])]
+
+
+def fetch_recent_fills(client, ticker: str, side: str, since: float, limit: int = 50,
+                       observe: Optional[Callable[[Any], Any]] = None) -> list[dict]:
+    """since 이후 내 체결 내역을 contract 형식 [{price, units, fee, fee_currency, transaction_date}] 으로 반환
+
+    빗썸 체결 내역에는 주문번호가 없으므로, 호출하는 쪽에서 가격/수량으로 맞춘다. observe는 fetch_open_orders와 같음.
+    """
+    if hasattr(client, "get_recent_fills"):
+        return client.get_recent_fills(ticker, side, since)
+    resp = client.api.http.post("/info/user_transactions", order_currency=ticker, payment_currency="KRW",
+                                searchGb=1 if side == "buy" else 2, offset=0, count=limit)
+    if observe is not None:
+        observe(resp)
+    if resp.get("status") != "0000":
+        raise RuntimeError(f"체결 내역 조회 실패: {resp}")
+    fills = []
+    for t in resp.get("data", []):
+        ts = int(t["transfer_date"]) / 1_000_000
+        if ts < since:
+            continue
+        fills.append({"price": t["price"], "units": t["units"], "fee": t.get("fee", 0),
+                      "fee_currency": t.get("fee_currency", "KRW"), "transaction_date": t["transfer_date"]})
+    return fills
+
+
+def match_fills(inflight: InFlight, fills: list[dict], clock_skew: float = 5.0, known: set = frozenset()) -> list[dict]:
+    """체결 내역에서 in-flight 주문의 체결로 보이는 것을 수량만큼 꺼내 반환
+
+    제출 시각 이후, 지정가 이하(매수)/이상(매도)에 체결된 것만 보며, 지정가와 같은 가격을 먼저 쓰고
+    모자라면 유리한 가격(즉시 체결된 taker)을 쓴다. 꺼낸 체결은 fills에서 제거하므로 같은 체결이
+    다른 in-flight 주문에 중복으로 붙지 않는다. known(fill_key 집합)에 있는 체결은 이미 다른 주문에
+    반영된 것이므로 제외한다 (clock_skew 구간에 걸친 같은 레벨 지난 사이클 체결 등).
+    """
+    since = inflight.started_at - clock_skew
+
+    def eligible(fill) -> bool:
+        price = float(fill["price"])
+        if int(fill["transaction_date"]) / 1_000_000 < since:
+            return False
+        if fill_key(inflight.side, fill) in known:
+            return False
+        return price <= inflight.price if inflight.side == "buy" else price >= inflight.price
+
+    candidates = sorted((f for f in fills if eligible(f)), key=lambda f: float(f["price"]) != inflight.price)
+    matched, remaining = [], inflight.qty
+    for fill in candidates:
+        if remaining <= 1e-9:
+            break
+        fills.remove(fill)
+        matched.append(fill)
+        remaining -= float(fill["units"])
+    return matched
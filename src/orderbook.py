@@ -0,0 +1,271 @@
+import time
+import heapq
+import logging
+import threading
+from typing import Callable, Optional
+
+from market_recorder import parse_ws_message
+
+logger = logging.getLogger("TradingBotLogger").getChild("book")
+
+
+class BookSide:
+    """호가 한쪽 (가격 -> 잔량 dict + 최우선 호가용 힙)
+
+    갱신은 dict 대입과 새 가격일 때만 heappush (O(log n)), 잔량 0인 가격은 dict에서만 지우고
+    힙에서는 최우선 호가 조회 때 꺼내 버린다 (지연 삭제). 지워진 가격이 힙에 많이 쌓이면 재구성.
+    """
+
+    def __init__(self, descending: bool):
+        self.descending = descending  # 매수 호가: 높은 가격이 최우선
+        self._qty: dict[float, float] = {}
+        self._heap: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self._qty)
+
+    def _key(self, price: float) -> float:
+        return -price if self.descending else price
+
+    def set(self, price: float, qty: float):
+        """price의 잔량을 qty로 (빗썸 orderbookdepth는 가격별 전체 잔량을 보냄). 0이면 삭제"""
+        if qty <= 0:
+            self._qty.pop(price, None)
+            return
+        if price not in self._qty:
+            heapq.heappush(self._heap, self._key(price))
+        self._qty[price] = qty
+        if len(self._heap) > 2 * len(self._qty) + 64:
+            self._heap = [self._key(p) for p in self._qty]
+            heapq.heapify(self._heap)
+
+    def clear(self):
+        self._qty.clear()
+        self._heap.clear()
+
+    def best(self) -> Optional[float]:
+        while self._heap:
+            price = -self._heap[0] if self.descending else self._heap[0]
+            if price in self._qty:
+                return price
+            heapq.heappop(self._heap)
+        return None
+
+    def qty_at(self, price: float) -> float:
+        return self._qty.get(price, 0.0)
+
+    def depth(self, limit: float) -> float:
+        """limit과 같거나 더 좋은 가격에 걸린 잔량 합 (매수: limit 이상, 매도: limit 이하)"""
+        if self.descending:
+            return sum(q for p, q in self._qty.items() if p >= limit)
+        return sum(q for p, q in self._qty.items() if p <= limit)
+
+    def levels(self, n: int) -> list[tuple[float, float]]:
+        """최우선부터 n개 (가격, 잔량)"""
+        prices = heapq.nlargest(n, self._qty) if self.descending else heapq.nsmallest(n, self._qty)
+        return [(p, self._qty[p]) for p in prices]
+
+
+class OrderBook:
+    """티커 1개의 로컬 호가창 (REST 스냅샷 + 웹소켓 증분 반영)
+
+    웹소켓 수신 스레드가 apply()/apply_snapshot()으로 갱신하고, 트레이딩 루프는 quote()/depth()로 읽는다.
+    증분이 누락돼 매수 최우선가 >= 매도 최우선가가 되면 새로 들어온 쪽을 믿고 반대편의 교차된 호가를
+    지운 뒤 needs_resync를 세워, 피드가 다음 스냅샷으로 다시 맞추게 한다.
+    """
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.updated_at = 0.0  # 마지막 반영 시각 (time.time())
+        self.snapshot_at = 0.0
+        self.needs_resync = True
+        self.crossed = 0  # 교차 정리 횟수 (누락 의심)
+        self._lock = threading.Lock()
+
+    def _side(self, side: str) -> BookSide:
+        return self.bids if side in ("bid", "buy") else self.asks
+
+    # --- 갱신 (웹소켓/스냅샷 스레드) ---
+    def apply_snapshot(self, bids: list, asks: list, ts: Optional[float] = None):
+        """[(가격, 잔량)] 목록으로 전체 교체"""
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, qty in bids:
+                self.bids.set(float(price), float(qty))
+            for price, qty in asks:
+                self.asks.set(float(price), float(qty))
+            self.snapshot_at = self.updated_at = ts or time.time()
+            self.needs_resync = False
+
+    def apply(self, side: str, price: float, qty: float, ts: Optional[float] = None):
+        """가격 1개의 잔량 갱신 (qty 0이면 삭제)"""
+        with self._lock:
+            book_side = self._side(side)
+            book_side.set(price, qty)
+            self.updated_at = max(self.updated_at, ts or time.time())
+            if qty > 0:
+                self._uncross(book_side, price)
+
+    def _uncross(self, updated: BookSide, price: float):
+        other = self.asks if updated is self.bids else self.bids
+        best = other.best()
+        removed = False
+        while best is not None and (best <= price if updated is self.bids else best >= price):
+            other.set(best, 0.0)
+            best = other.best()
+            removed = True
+        if removed:
+            self.crossed += 1
+            self.needs_resync = True
+
+    # --- 조회 (트레이딩 루프) ---
+    def quote(self, max_age: Optional[float] = None) -> Optional[tuple[Optional[float], Optional[float]]]:
+        """(매수 최우선가, 매도 최우선가). 한 번도 맞춰지지 않았거나 max_age초 넘게 갱신이 없으면 None"""
+        with self._lock:
+            if self.snapshot_at == 0.0:
+                return None
+            if max_age is not None and time.time() - self.updated_at > max_age:
+                return None
+            return self.bids.best(), self.asks.best()
+
+    def spread(self) -> Optional[float]:
+        quote = self.quote()
+        if quote is None or None in quote:
+            return None
+        return quote[1] - quote[0]
+
+    def depth(self, side: str, limit: float) -> float:
+        """side 쪽에서 limit과 같거나 더 좋은 가격에 걸린 잔량 (매수 주문이면 앞에 줄 선 물량)"""
+        with self._lock:
+            return self._side(side).depth(limit)
+
+    def top(self, n: int = 5) -> dict:
+        with self._lock:
+            return {"bids": self.bids.levels(n), "asks": self.asks.levels(n), "updated_at": self.updated_at}
+
+    def age(self) -> float:
+        return time.time() - self.updated_at if self.updated_at else float("inf")
+
+
+def buy_fill_gap(book: OrderBook, price: float, tick: float, max_age: float) -> Optional[float]:
+    """매수 지정가 price가 매도 최우선가에서 몇 호가 떨어져 있는지 (0 이하면 바로 체결)
+
+    호가창이 없거나 오래됐거나 매도 호가가 비어 있으면 None (호출하는 쪽은 현재가 기준 규칙으로 대체).
+    """
+    quote = book.quote(max_age)
+    if quote is None or quote[1] is None:
+        return None
+    return (quote[1] - price) / tick
+
+
+def fetch_bithumb_orderbook(ticker: str, limit: int = 30) -> tuple[list, list, float]:
+    """pybithumb 공개 API로 호가 스냅샷 (bids, asks, ts) 조회"""
+    from pybithumb import Bithumb
+
+    data = Bithumb.get_orderbook(ticker, limit=limit)
+    if not data:
+        raise RuntimeError(f"호가 조회 실패: {ticker}")
+    bids = [(b["price"], b["quantity"]) for b in data["bids"]]
+    asks = [(a["price"], a["quantity"]) for a in data["asks"]]
+    return bids, asks, int(data["timestamp"]) / 1000
+
+
+class OrderBookFeed:
+    """빗썸 공개 웹소켓(orderbookdepth/transaction)으로 OrderBook을 유지하는 백그라운드 스레드
+
+    - 시작 시와 needs_resync(교차 감지)/resync_interval마다 REST 스냅샷으로 다시 맞춘다.
+      스냅샷을 받는 동안 들어온 증분은 버퍼에 모았다가 스냅샷 시각 이후 것만 다시 반영한다.
+    - transaction 체결가는 watermark에 넣어, 루프 사이에 지정가에 닿은 가격도 체결 조회 판단에 쓴다.
+      guard(RiskGuard)가 있으면 체결가마다 이상 여부도 판정한다 (루프 주기를 기다리지 않음).
+    """
+
+    def __init__(self, book: OrderBook, watermark=None, recorder=None, resync_interval: float = 300.0,
+                 snapshot: Optional[Callable[[str], tuple]] = None, min_resync_gap: float = 5.0, guard=None):
+        self.book = book
+        self.watermark = watermark
+        self.guard = guard
+        self.recorder = recorder
+        self.resync_interval = resync_interval
+        self.min_resync_gap = min_resync_gap
+        self._snapshot = snapshot or fetch_bithumb_orderbook
+        self._stop = threading.Event()
+        self._buffer: Optional[list] = None
+        self._buffer_lock = threading.Lock()
+        self._managers = []
+
+    def start(self) -> "OrderBookFeed":
+        from pybithumb import WebSocketManager
+
+        symbols = [f"{self.book.ticker}_KRW"]
+        self._managers = [WebSocketManager("orderbookdepth", symbols), WebSocketManager("transaction", symbols)]
+        for wm in self._managers:
+            threading.Thread(target=self._pump, args=(wm,), name="OrderBookFeed", daemon=True).start()
+        threading.Thread(target=self._resync_loop, name="OrderBookResync", daemon=True).start()
+        logger.info("호가창 피드 시작: %s", self.book.ticker, extra={"event": "book_start", "ticker": self.book.ticker})
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for wm in self._managers:
+            wm.terminate()
+
+    def _pump(self, wm):
+        while not self._stop.is_set():
+            msg = wm.get()
+            if msg.get("type"):
+                self.on_message(msg)
+
+    def on_message(self, msg: dict):
+        """웹소켓 메시지 1건 반영 (테스트/재생 시 직접 호출 가능)"""
+        if self.recorder is not None:
+            self.recorder.record_ws_message(msg)
+        for kind, ticker, row in parse_ws_message(msg):
+            if ticker != self.book.ticker:
+                continue
+            if kind == "orderbook":
+                ts, side, price, qty = row
+                with self._buffer_lock:
+                    if self._buffer is not None:
+                        self._buffer.append(row)
+                        continue
+                self.book.apply(side, price, qty, ts)
+            elif kind == "trade":
+                if self.watermark is not None:
+                    self.watermark.observe(row[1])
+                if self.guard is not None:
+                    self.guard.observe(row[1], source="trade")
+
+    def resync(self):
+        """REST 스냅샷으로 다시 맞추고, 받는 동안 쌓인 증분 중 스냅샷 이후 것만 반영"""
+        with self._buffer_lock:
+            self._buffer = []
+        try:
+            bids, asks, snap_ts = self._snapshot(self.book.ticker)
+        except Exception as e:
+            with self._buffer_lock:
+                pending, self._buffer = self._buffer, None
+            for ts, side, price, qty in pending:
+                self.book.apply(side, price, qty, ts)
+            logger.warning("호가 스냅샷 실패 (증분만 반영): %s", e, extra={"event": "book_error"})
+            return
+        with self._buffer_lock:
+            pending, self._buffer = self._buffer, None
+            self.book.apply_snapshot(bids, asks, snap_ts)
+            for ts, side, price, qty in pending:
+                if ts >= snap_ts:
+                    self.book.apply(side, price, qty, ts)
+        logger.info("호가창 스냅샷 동기화: bid %d / ask %d, 교차 정리 누적 %d", len(self.book.bids), len(self.book.asks),
+                    self.book.crossed, extra={"event": "book_resync", "crossed": self.book.crossed})
+
+    def _resync_loop(self):
+        next_resync, last_attempt = 0.0, -float("inf")
+        while not self._stop.wait(0.5):
+            now = time.monotonic()
+            # 교차 감지 시 바로 다시 맞추되, 스냅샷 API가 실패하는 동안 연달아 부르지 않도록 최소 간격 유지
+            if (self.book.needs_resync and now - last_attempt >= self.min_resync_gap) or now >= next_resync:
+                last_attempt = now
+                self.resync()
+                next_resync = time.monotonic() + self.resync_interval
@@ -0,0 +1,77 @@
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_EVEN
+
+# 부동소수 입력(거래소 응답, 누적 합)이 정수 틱/lot에서 이 비율 이내로 벗어난 것은 오차로 보고 그 값으로 맞춤
+SNAP_TOLERANCE = Decimal("1e-6")
+
+
+def _dec(value) -> Decimal:
+    """float/int/str를 Decimal로 (float은 repr 문자열 기준이라 0.1 -> Decimal('0.1'))"""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(value) if isinstance(value, int) else Decimal(str(value))
+
+
+class TickScale:
+    """가격/수량 고정소수점 변환
+
+    그리드 엔진 안의 가격(레벨 매수가/매도가, 간격, 현재가)은 price_unit 단위 정수 틱, 수량은
+    10^-qty_decimals 단위 정수 lot으로 다룬다. 비교/색인(dict, set)/간격 계산이 모두 정수라 오차가 없고,
+    원화 값은 거래소에 주문을 내거나 금액을 계산할 때만 to_price()/to_qty()로 바꾼다.
+    price_unit=1이면 틱 = 원이라 기존 정수 가격 설정/스냅샷과 같다. 원 미만 호가 마켓은 0.1, 0.001 등.
+    """
+
+    __slots__ = ("unit", "qty_decimals", "lot", "_integral")
+
+    def __init__(self, price_unit: float | str = 1, qty_decimals: int = 8):
+        self.unit = _dec(price_unit)
+        if self.unit <= 0 or qty_decimals < 0:
+            raise ValueError(f"잘못된 고정소수점 단위: price_unit={price_unit}, qty_decimals={qty_decimals}")
+        self.qty_decimals = qty_decimals
+        self.lot = Decimal(1).scaleb(-qty_decimals)
+        self._integral = self.unit == self.unit.to_integral_value()
+
+    def __repr__(self) -> str:
+        return f"TickScale(price_unit={self.unit}, qty_decimals={self.qty_decimals})"
+
+    @staticmethod
+    def _snap(ratio: Decimal, rounding: str) -> int:
+        nearest = ratio.to_integral_value(ROUND_HALF_EVEN)
+        if abs(ratio - nearest) <= SNAP_TOLERANCE:
+            return int(nearest)
+        return int(ratio.to_integral_value(rounding))
+
+    # --- 가격 ---
+    def to_ticks(self, price) -> int:
+        """가장 가까운 틱 (거래소가 준 가격처럼 이미 틱에 맞는 값 변환용)"""
+        return int((_dec(price) / self.unit).to_integral_value(ROUND_HALF_EVEN))
+
+    def floor_ticks(self, price) -> int:
+        return self._snap(_dec(price) / self.unit, ROUND_FLOOR)
+
+    def ceil_ticks(self, price) -> int:
+        return self._snap(_dec(price) / self.unit, ROUND_CEILING)
+
+    def to_price(self, ticks: int) -> int | float:
+        """주문/금액 계산용 원화 가격 (단위가 정수면 int, 아니면 그 소수에 가장 가까운 float)"""
+        value = ticks * self.unit
+        return int(value) if self._integral else float(value)
+
+    def format_price(self, ticks: int) -> str:
+        """로그/알림용 표기 (지수 표기 없이 단위 자릿수까지)"""
+        return format(ticks * self.unit, "f")
+
+    def step(self, tick_size) -> int:
+        """거래소 호가 단위(원)를 틱 수로. 단위보다 잘면 1틱"""
+        return max(self.to_ticks(tick_size), 1)
+
+    # --- 수량 ---
+    def to_lots(self, qty) -> int:
+        """가장 가까운 lot (체결 수량 누적처럼 lot에 맞아야 하는 값 비교용)"""
+        return int((_dec(qty) / self.lot).to_integral_value(ROUND_HALF_EVEN))
+
+    def floor_lots(self, qty) -> int:
+        """주문 수량: 거래소가 받는 자릿수로 내림"""
+        return self._snap(_dec(qty) / self.lot, ROUND_FLOOR)
+
+    def to_qty(self, lots: int) -> float:
+        return float(lots * self.lot)
@@ -0,0 +1,31 @@
+import math
+import threading
+
+
+class PriceWatermark:
+    """직전 루프 이후 관측된 최저/최고 체결가 추적
+
+    폴링한 현재가와 (있다면) 체결 스트림의 가격을 observe()로 넣고, 루프는 매 틱 drain()으로
+    구간 최저/최고가를 가져간다. 지정가 주문은 이 구간에서 가격이 한 번도 닿지 않았다면
+    체결됐을 수 없으므로 체결 조회를 생략할 수 있다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._low = math.inf
+        self._high = -math.inf
+
+    def observe(self, price: float):
+        """가격 1건 반영 (체결 스트림 스레드에서 호출해도 됨)"""
+        with self._lock:
+            if price < self._low:
+                self._low = price
+            if price > self._high:
+                self._high = price
+
+    def drain(self) -> tuple[float, float]:
+        """지금까지의 (최저가, 최고가)를 반환하고 다음 구간을 위해 초기화"""
+        with self._lock:
+            low, high = self._low, self._high
+            self._low, self._high = math.inf, -math.inf
+        return low, high
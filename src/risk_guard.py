@@ -0,0 +1,141 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger("TradingBotLogger").getChild("risk")
+
+
+class RiskGuard:
+    """가격 이상 감지 시 프로세스 안 모든 그리드의 신규 매수를 멈추는 스위치
+
+    가격이 들어올 때마다 (루프의 현재가 조회, 웹소켓 체결) observe()가 메모리에서만 판정한다.
+    - jump: 직전 가격 대비 한 번에 max_jump 비율 넘게 움직임
+    - move: move_window초 안의 최고/최저 차이가 max_move 비율을 넘음 (단조 deque로 O(1) 분할 상환)
+    - stale: stale_after초 넘게 가격이 들어오지 않음 (check_stale()로 확인)
+    발동하면 halted가 바로 켜져 Strategy._place_order가 매수를 내지 않고, on_trip 콜백(루프 깨우기 등)을
+    부른다. 걸려 있는 매수 취소는 각 그리드 루프가 take_cancel()로 한 번씩 가져가 동시에 처리한다.
+    마지막 이상 이후 cooldown초 동안 정상 가격만 들어오면 maybe_resume()이 다시 연다.
+    시각은 time.monotonic() 기준이고, 지연 측정(ms)은 이상 가격을 받은 시점부터 잰다.
+    """
+
+    def __init__(self, max_jump: float = 0.05, max_move: float = 0.08, move_window: float = 60.0,
+                 stale_after: float = 120.0, cooldown: float = 300.0):
+        self.max_jump = max_jump
+        self.max_move = max_move
+        self.move_window = move_window
+        self.stale_after = stale_after
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._halted = threading.Event()
+        self._listeners: list[Callable[[dict], None]] = []
+        self._last_price: Optional[float] = None
+        self._last_at: Optional[float] = None
+        self._highs: deque = deque()  # (시각, 가격) 가격 내림차순 -> 창 안 최고가가 맨 앞
+        self._lows: deque = deque()   # (시각, 가격) 가격 오름차순 -> 창 안 최저가가 맨 앞
+        self.trips = 0
+        self.last_trip: Optional[dict] = None
+        self._last_anomaly_at: Optional[float] = None
+
+    @property
+    def halted(self) -> bool:
+        return self._halted.is_set()
+
+    def on_trip(self, callback: Callable[[dict], None]):
+        self._listeners.append(callback)
+        return self
+
+    def observe(self, price: float, source: str = "poll", now: Optional[float] = None) -> Optional[dict]:
+        """가격 1건 판정 (어느 스레드에서 불러도 됨). 이번 가격으로 발동했으면 발동 정보 반환"""
+        received = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        if not price or price <= 0:
+            return None
+        with self._lock:
+            reason, detail = None, None
+            last = self._last_price
+            if last is not None and abs(price - last) / last > self.max_jump:
+                reason, detail = "jump", {"from": last, "to": price}
+            self._last_price, self._last_at = price, now
+
+            while self._highs and self._highs[-1][1] <= price:
+                self._highs.pop()
+            self._highs.append((now, price))
+            while self._lows and self._lows[-1][1] >= price:
+                self._lows.pop()
+            self._lows.append((now, price))
+            horizon = now - self.move_window
+            while self._highs[0][0] < horizon:
+                self._highs.popleft()
+            while self._lows[0][0] < horizon:
+                self._lows.popleft()
+            high, low = self._highs[0][1], self._lows[0][1]
+            if reason is None and (high - low) / low > self.max_move:
+                reason, detail = "move", {"high": high, "low": low, "window_sec": self.move_window}
+            if reason is None:
+                return None
+            self._last_anomaly_at = now
+            if self._halted.is_set():
+                return None
+            trip = self._trip_locked(reason, {**detail, "price": price, "source": source}, received)
+        self._notify(trip)
+        return trip
+
+    def check_stale(self, now: Optional[float] = None) -> Optional[dict]:
+        """마지막 가격 이후 stale_after초가 지났으면 발동 (루프 틱마다 호출)"""
+        received = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._last_at is None or now - self._last_at < self.stale_after:
+                return None
+            self._last_anomaly_at = now
+            if self._halted.is_set():
+                return None
+            trip = self._trip_locked("stale", {"age_sec": round(now - self._last_at, 1)}, received)
+        self._notify(trip)
+        return trip
+
+    def _trip_locked(self, reason: str, detail: dict, received: float) -> dict:
+        self._halted.set()
+        self.trips += 1
+        trip = {"seq": self.trips, "reason": reason, **detail, "detected_at": received,
+                "halt_ms": round((time.perf_counter() - received) * 1000, 3), "at": time.time()}
+        self.last_trip = trip
+        return trip
+
+    def _notify(self, trip: dict):
+        logger.critical("리스크 가드 발동 (%s): 신규 매수 정지 (%.3fms) %s", trip["reason"], trip["halt_ms"],
+                        {k: v for k, v in trip.items() if k not in ("detected_at", "at")},
+                        extra={"event": "risk_halt", **{k: v for k, v in trip.items() if k != "detected_at"}})
+        for callback in self._listeners:
+            try:
+                callback(trip)
+            except Exception as e:
+                logger.error("리스크 가드 콜백 오류: %s", e, extra={"event": "risk_error"})
+
+    def take_cancel(self, seen: int) -> Optional[dict]:
+        """그리드가 마지막으로 처리한 발동 번호(seen) 이후 새 발동이 있고 아직 정지 중이면 그 발동 정보"""
+        trip = self.last_trip
+        if trip is None or trip["seq"] <= seen or not self._halted.is_set():
+            return None
+        return trip
+
+    def maybe_resume(self, now: Optional[float] = None) -> bool:
+        """정지 중이고 마지막 이상 이후 cooldown초 동안 새 가격이 계속 정상이면 해제"""
+        if not self._halted.is_set():
+            return False
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            fresh = self._last_at is not None and now - self._last_at < self.stale_after
+            if not fresh or now - self._last_anomaly_at < self.cooldown:
+                return False
+            self._halted.clear()
+        logger.warning("리스크 가드 해제: %.0f초 동안 이상 없음, 매수 재개", self.cooldown,
+                       extra={"event": "risk_resume", "seq": self.trips})
+        return True
+
+    def status(self) -> dict:
+        trip = self.last_trip
+        return {"halted": self.halted, "trips": self.trips,
+                "last_trip": None if trip is None else {k: v for k, v in trip.items() if k != "detected_at"}}
@@ -0,0 +1,199 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+class SimulatedExchange:
+    """pybithumb Bithumb 클라이언트와 같은 인터페이스의 로컬 모의 거래소 (단일 티커)
+
+    실제 거래소를 호출하지 않고, on_price()로 넣어준 체결가로 지정가 주문을 체결한다.
+    - 매수 대기는 가격 내림차순, 매도 대기는 오름차순 힙으로 관리해 on_price()마다
+      체결될 주문만 꺼낸다 (가격 1건당 O(체결 건수 * log 주문 수)).
+    - 주문 시점에 이미 체결 가능한 지정가는 직전 체결가로 바로 체결 (taker),
+      대기 주문은 가격이 닿으면(touch_fills=False면 뚫고 지나가야) 지정가로 체결 (maker).
+    - 수수료는 체결 금액 * fee_rate, KRW로 차감.
+    응답 형태(주문 id 튜플, get_order_completed의 status/data/contract)는 coin_main이 기대하는 빗썸 응답을 따른다.
+    """
+
+    def __init__(self, ticker: str, krw: float = 10_000_000, coin: float = 0.0, fee_rate: float = 0.0004,
+                 touch_fills: bool = True, max_closed_orders: int = 10_000, max_recent_fills: int = 1000):
+        self.ticker = ticker
+        self.fee_rate = fee_rate
+        self.touch_fills = touch_fills
+        self.last_price: Optional[float] = None
+        self._lock = threading.Lock()
+        self._krw = float(krw)
+        self._coin = float(coin)
+        self._krw_in_use = 0.0
+        self._coin_in_use = 0.0
+        self._orders: dict[str, dict] = {}
+        self._bids: list = []  # (-price, seq, order_no)
+        self._asks: list = []  # (price, seq, order_no)
+        self._seq = itertools.count(1)
+        self._closed: deque = deque()
+        self._max_closed = max_closed_orders
+        self._fills: deque = deque(maxlen=max_recent_fills)  # (side, contract) 최근 체결 (user_transactions 대응)
+        self.calls: dict[str, int] = {}
+
+    # --- 시세 입력 ---
+    def on_price(self, price: float, ts: Optional[float] = None) -> int:
+        """체결가 1건 반영: 닿은 대기 주문을 지정가로 체결하고 체결 건수 반환"""
+        ts = ts or time.time()
+        filled = 0
+        with self._lock:
+            self.last_price = price
+            while self._bids and self._crosses(-self._bids[0][0], price, "bid"):
+                _, _, order_no = heapq.heappop(self._bids)
+                filled += self._fill(order_no, None, ts)
+            while self._asks and self._crosses(self._asks[0][0], price, "ask"):
+                _, _, order_no = heapq.heappop(self._asks)
+                filled += self._fill(order_no, None, ts)
+        return filled
+
+    def _crosses(self, limit: float, price: float, side: str) -> bool:
+        if side == "bid":
+            return price <= limit if self.touch_fills else price < limit
+        return price >= limit if self.touch_fills else price > limit
+
+    def _fill(self, order_no: str, price: Optional[float], ts: float, units: Optional[float] = None) -> int:
+        """주문 체결 (units를 주면 그만큼만 부분 체결하고 주문은 대기 상태로 남김)"""
+        order = self._orders.get(order_no)
+        if order is None or order["status"] != "Pending":
+            return 0  # 취소된 주문 (힙에서 지연 삭제)
+        price = order["price"] if price is None else price
+        remaining = order["qty"] - order["filled"]
+        partial = units is not None and units < remaining
+        units = units if partial else remaining
+        amount = price * units
+        fee = amount * self.fee_rate
+        if order["side"] == "bid":
+            self._krw_in_use -= order["price"] * units * (1 + self.fee_rate)
+            self._krw -= amount + fee
+            self._coin += units
+        else:
+            self._coin_in_use -= units
+            self._coin -= units
+            self._krw += amount - fee
+        contract = {"price": str(price), "units": str(units), "fee": str(fee), "fee_currency": "KRW",
+                    "transaction_date": str(int(ts * 1_000_000))}
+        order["contract"].append(contract)
+        self._fills.append((order["side"], contract))
+        if partial:
+            order["filled"] += units
+            return 1
+        order["filled"] = order["qty"]
+        order["status"] = "Completed"
+        self._closed_order(order_no)
+        return 1
+
+    def _closed_order(self, order_no: str):
+        self._closed.append(order_no)
+        while len(self._closed) > self._max_closed:
+            self._orders.pop(self._closed.popleft(), None)
+
+    def _count(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    # --- pybithumb 호환 API ---
+    def get_current_price(self, ticker: str):
+        self._count("get_current_price")
+        return self.last_price
+
+    def get_balance(self, ticker: str):
+        """(보유코인, 거래중코인, 보유원화, 거래중원화)"""
+        self._count("get_balance")
+        with self._lock:
+            return self._coin, self._coin_in_use, self._krw, self._krw_in_use
+
+    def buy_limit_order(self, ticker: str, price: float, unit: float, payment_currency: str = "KRW"):
+        return self._place("bid", ticker, price, unit, payment_currency)
+
+    def sell_limit_order(self, ticker: str, price: float, unit: float, payment_currency: str = "KRW"):
+        return self._place("ask", ticker, price, unit, payment_currency)
+
+    def _place(self, side: str, ticker: str, price: float, unit: float, payment_currency: str):
+        self._count("buy_limit_order" if side == "bid" else "sell_limit_order")
+        price, unit = float(price), float(unit)
+        with self._lock:
+            if side == "bid":
+                need = price * unit * (1 + self.fee_rate)
+                if need > self._krw - self._krw_in_use + 1e-9:
+                    return {"status": "5600", "message": "주문가능 금액이 부족합니다."}
+                self._krw_in_use += need
+            else:
+                if unit > self._coin - self._coin_in_use + 1e-9:
+                    return {"status": "5600", "message": "주문가능 수량이 부족합니다."}
+                self._coin_in_use += unit
+            seq = next(self._seq)
+            order_no = f"SIM{seq}"
+            self._orders[order_no] = {"side": side, "price": price, "qty": unit, "filled": 0.0,
+                                      "status": "Pending", "contract": [], "placed_at": time.time()}
+            # 이미 체결 가능한 가격이면 직전 체결가로 바로 체결
+            last = self.last_price
+            if last is not None and self._crosses(price, last, side):
+                self._fill(order_no, min(price, last) if side == "bid" else max(price, last), time.time())
+            else:
+                heapq.heappush(self._bids if side == "bid" else self._asks,
+                               (-price if side == "bid" else price, seq, order_no))
+        return side, ticker, order_no, payment_currency
+
+    def fill_partial(self, order_desc, units: float, ts: Optional[float] = None) -> int:
+        """대기 주문 1건을 지정가로 units만큼만 체결 (부분 체결 시나리오용, 가격 흐름과 무관)"""
+        with self._lock:
+            return self._fill(order_desc[2], None, ts or time.time(), units)
+
+    def cancel_order(self, order_desc) -> bool:
+        self._count("cancel_order")
+        with self._lock:
+            order = self._orders.get(order_desc[2])
+            if order is None or order["status"] != "Pending":
+                return False
+            remaining = order["qty"] - order["filled"]
+            if order["side"] == "bid":
+                self._krw_in_use -= order["price"] * remaining * (1 + self.fee_rate)
+            else:
+                self._coin_in_use -= remaining
+            order["status"] = "Cancel"
+            self._closed_order(order_desc[2])
+            return True
+
+    def get_order_completed(self, order_desc):
+        self._count("get_order_completed")
+        with self._lock:
+            order = self._orders.get(order_desc[2])
+            if order is None:
+                return {"status": "5600", "message": "거래 체결내역이 존재하지 않습니다."}
+            return {"status": "0000", "data": {
+                "order_status": order["status"], "order_qty": str(order["qty"]),
+                "order_price": str(order["price"]), "type": order["side"], "contract": list(order["contract"]),
+            }}
+
+    def get_open_orders(self, ticker: str) -> list[dict]:
+        """order_registry.fetch_open_orders 형식의 미체결 주문 목록 (빗썸 /info/orders 대응)"""
+        self._count("get_open_orders")
+        with self._lock:
+            return [{"order_id": no, "side": "buy" if o["side"] == "bid" else "sell", "price": o["price"],
+                     "units": o["qty"], "remaining": o["qty"] - o["filled"], "placed_at": o["placed_at"]}
+                    for no, o in self._orders.items() if o["status"] == "Pending"]
+
+    def get_recent_fills(self, ticker: str, side: str, since: float) -> list[dict]:
+        """since 이후 체결 (빗썸 /info/user_transactions 대응, 주문번호 없음, 최신순)"""
+        self._count("get_recent_fills")
+        bithumb_side = "bid" if side == "buy" else "ask"
+        with self._lock:
+            return [dict(c) for s, c in reversed(self._fills)
+                    if s == bithumb_side and int(c["transaction_date"]) / 1_000_000 >= since]
+
+    # --- 조회 ---
+    def open_orders(self) -> list[tuple]:
+        with self._lock:
+            return [(o["side"], self.ticker, no, "KRW") for no, o in self._orders.items() if o["status"] == "Pending"]
+
+    def equity(self, price: Optional[float] = None) -> float:
+        """평가 자산 (KRW + 코인 * 가격)"""
+        price = self.last_price if price is None else price
+        with self._lock:
+            return self._krw + self._coin * (price or 0.0)
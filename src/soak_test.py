@@ -0,0 +1,181 @@
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+
+import coin_main as cm
+from diagnostics import ResourceTracker
+from fault_harness import _grid, grid_health
+from grid_config import GridConfig
+from log_config import queue_backlog
+from sim_exchange import SimulatedExchange
+from status_server import StatusBoard
+from trade_ledger import TradeLedger
+from volatility import CandleAggregator, SpacingPolicy
+
+SIM_LOOP_SEC = 3.0  # 운영 loop_interval (가상 시각 1틱)
+
+# 누수 의심 판정: 가상 하루당 증가량이 이 값을 넘으면 표시 (뒤쪽 절반 샘플의 최소제곱 기울기)
+GROWTH_LIMITS_PER_DAY = {
+    "rss_mb": 2.0,
+    "fds": 0.5,
+    "threads": 0.5,
+    "gc_objects": 2000,
+    "levels": 0.5,
+    "orders_indexed": 0.5,
+    "exchange_open_orders": 0.5,
+    "traced_mb": 1.0,
+    "log_backlog": 100,
+}
+
+
+def soak_prices(ticks: int, start: int, seed: int):
+    """국면(추세/횡보, 변동성)이 바뀌며 start 주변 ±30% 안에서 움직이는 정수 가격 경로 (제너레이터)
+
+    위 레벨 추가/추적 재배치/하단 이탈이 모두 반복해서 일어나도록 국면마다 방향과 폭을 바꾼다.
+    """
+    rng = random.Random(seed)
+    low, high = int(start * 0.7), int(start * 1.3)
+    price, drift, vol, left = float(start), 0.0, 1.0, 0
+    for _ in range(ticks):
+        if left <= 0:
+            left = int(rng.expovariate(1 / 2000)) + 100
+            drift = rng.choice((-0.05, 0.0, 0.0, 0.05))
+            vol = rng.choice((0.3, 0.6, 1.0, 2.0))
+        left -= 1
+        # 범위 가장자리에서는 안쪽으로 당김
+        pull = (start - price) * 0.0005
+        price = min(max(price + drift + pull + rng.gauss(0, vol), low), high)
+        yield int(round(price))
+
+
+def run_soak(days: float = 7.0, speedup: float = 5000.0, trailing: bool = False, shadows: int = 1,
+             sample_every: float = 3600.0, trace: bool = False, seed: int = 0,
+             progress: Optional[Callable] = None) -> dict:
+    """그리드 루프를 가짜 거래소로 가상 days일 동안 가속 실행하며 자원 사용량 추이를 잰다
+
+    가상 시각 1틱 = SIM_LOOP_SEC초이고, 시간 기준 설정(loop_interval, 대사/조회 주기)은 모두 1/speedup로
+    줄여 실제 시각으로 맞춰 돈다 (루프가 그보다 느리면 대기 없이 바로 다음 틱). 운영 루프처럼
+    체결 원장(SQLite), 스냅샷 저장, 상태 API 게시, 변동성 지표, 섀도 그리드를 모두 거친다.
+    ResourceTracker는 가상 시각 sample_every초마다 샘플을 남기고 (event=resources 로그),
+    끝나면 지표별 가상 하루당 증가율과 GROWTH_LIMITS_PER_DAY를 넘은 지표(suspects)를 돌려준다.
+    """
+    scale = 1 / speedup
+    ticks = int(days * 86400 / SIM_LOOP_SEC)
+    work_dir = Path(tempfile.mkdtemp(prefix="soak_"))
+    # 가짜 거래소가 보관하는 닫힌 주문은 작게 (거래소 쪽 보관분이 봇의 증가로 보이지 않도록)
+    exchange = SimulatedExchange("DOGE", krw=50_000_000, fee_rate=0.0004, max_closed_orders=500, max_recent_fills=200)
+    cfg = GridConfig.model_validate({
+        "grid_id": "soak:DOGE", "ticker": "DOGE", "start_buy_price": 300, "divide_count": 20, "order_qty": 100,
+        "sell_interval": 2, "max_up_strategies": 10, "trailing": trailing, "dynamic_spacing": True,
+        "loop_interval": SIM_LOOP_SEC * scale, "order_reconcile_interval": 60 * scale,
+        "status_sweep_interval": 60 * scale, "balance_reconcile_interval": 30 * scale,
+        "error_backoff_max": 60 * scale, "spacing_candle_sec": 60 * scale,
+        "shadows": [{"name": f"soak{i}", "overrides": {"sell_interval": 2 + i}} for i in range(shadows)],
+    }).model_dump()
+    strategies, ctx = _grid(cfg, exchange, inflight_timeout=30 * scale)
+    ctx.ledger = TradeLedger(work_dir / "trades.db")
+    ctx.candles = CandleAggregator(cfg["spacing_candle_sec"], tuple(cfg["spacing_windows"]))
+    ctx.spacing = SpacingPolicy(ctx.candles)
+    if trailing:
+        ctx.anchor = cfg["start_buy_price"]
+    shadow_grids = [cm.ShadowGrid(cfg, shadow, ctx.ledger, candles=ctx.candles) for shadow in cfg["shadows"]]
+    board = StatusBoard()
+    snapshot_path = str(work_dir / "strategies.json")
+
+    tracker = ResourceTracker(sample_every, trace=trace).start()
+    tracker.gauge("levels", lambda: len(strategies)).gauge("orders_indexed", lambda: len(ctx.registry))
+    tracker.gauge("exchange_open_orders", lambda: len(exchange.open_orders()))
+    tracker.gauge("shadow_levels", lambda: sum(len(sg.strategies) for sg in shadow_grids))
+    tracker.gauge("log_backlog", queue_backlog)
+
+    errors = 0
+    began = time.monotonic()
+    backoff = cm.ErrorBackoff(cfg["loop_interval"], cfg["error_backoff_max"])
+    loop_ms_max = 0.0
+    try:
+        for tick, price in enumerate(soak_prices(ticks, cfg["start_buy_price"], seed)):
+            tick_started = time.monotonic()
+            exchange.on_price(price)
+            try:
+                if cm.trade_tick(strategies, cfg, exchange, ctx, tick) is not None:
+                    for shadow in shadow_grids:
+                        shadow.tick(price)
+                    if tick % cfg["save_interval_loops"] == 0:
+                        cm.save_strategies_snapshot(strategies, snapshot_path)
+                    board.record_loop_time(time.monotonic() - tick_started)
+                    cm.publish_status(board, strategies, cfg, ctx, price, tick, shadow_grids)
+                backoff.success()
+            except Exception as e:
+                errors += 1
+                backoff.failure()
+                logging.getLogger("TradingBotLogger").error("soak 틱 오류: %s", e, exc_info=True,
+                                                            extra={"event": "soak_error", "tick": tick})
+            loop_ms_max = max(loop_ms_max, (time.monotonic() - tick_started) * 1000)
+            if tracker.maybe_sample(tick * SIM_LOOP_SEC) is not None and progress is not None:
+                progress(tick, ticks, tracker.history[-1])
+            delay = began + (tick + 1) * cfg["loop_interval"] - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        tracker.sample(ticks * SIM_LOOP_SEC)
+    finally:
+        tracker.stop()
+        ctx.ledger.close()
+
+    elapsed = time.monotonic() - began
+    # 앞쪽은 레벨/주문과 상한이 있는 캐시(체결 중복 확인, SQLite 페이지 등)가 채워지는 워밍업이라
+    # 기울기는 뒤쪽 절반 샘플로만 계산 (상한이 있는 구조는 여기서 평평해져야 함)
+    warmup = max(1, len(tracker.history) // 2)
+    growth = {}
+    suspects = []
+    for key, stats in tracker.growth(skip=warmup).items():
+        per_day = stats["per_hour"] * 24
+        growth[key] = {"first": stats["first"], "last": stats["last"], "max": stats["max"],
+                       "per_day": round(per_day, 4)}
+        limit = GROWTH_LIMITS_PER_DAY.get(key)
+        if limit is not None and per_day > limit:
+            suspects.append(key)
+    return {
+        "sim_days": days,
+        "ticks": ticks,
+        "elapsed_sec": round(elapsed, 1),
+        "achieved_speedup": round(ticks * SIM_LOOP_SEC / elapsed, 1),
+        "loop_ms": {**board.loop_timings(), "max_ms": round(loop_ms_max, 2)},
+        "tick_errors": errors,
+        "round_trips": ctx.round_trips,
+        "health": grid_health(exchange, strategies, ctx),
+        "gc_total": tracker.gc_total,
+        "samples": len(tracker.history),
+        "growth": growth,
+        "suspects": suspects,
+        "work_dir": str(work_dir),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="가짜 거래소로 그리드 루프를 가속 실행하는 장기(soak) 테스트 (실제 주문 없음)")
+    parser.add_argument("--days", type=float, default=7.0, help="가상 실행 기간 (일, 1틱 = 3초)")
+    parser.add_argument("--speedup", type=float, default=5000.0, help="가속 배율 (시간 기준 설정을 이만큼 줄여 실행)")
+    parser.add_argument("--trailing", action="store_true", help="추적 모드 그리드로 실행")
+    parser.add_argument("--shadows", type=int, default=1, help="함께 돌릴 섀도 그리드 수")
+    parser.add_argument("--sample-every", type=float, default=3600.0, help="자원 샘플 주기 (가상 초)")
+    parser.add_argument("--trace", action="store_true", help="tracemalloc 증가량 상위 위치도 기록 (느려짐)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="루프 로그(loop)까지 기록 (기본은 WARNING 이상)")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        cm.loop_logger.setLevel(logging.WARNING)
+
+    def show(tick: int, total: int, sample: dict):
+        print(f"[{tick / total:6.1%}] day {sample['t'] / 86400:5.2f} rss={sample['rss_mb']}MB fds={sample['fds']} "
+              f"threads={sample['threads']} objects={sample['gc_objects']} levels={sample['levels']} "
+              f"gc_max={sample['gc_max_pause_ms']}ms", flush=True)
+
+    result = run_soak(args.days, args.speedup, args.trailing, args.shadows, args.sample_every, args.trace, args.seed,
+                      progress=show)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
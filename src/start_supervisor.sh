@@ -0,0 +1 @@
+nohup python supervisor.py run 1>/dev/null 2>supervisor_error.log &
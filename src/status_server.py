@@ -0,0 +1,117 @@
+import json
+import time
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+logger = logging.getLogger("TradingBotLogger").getChild("status")
+
+
+class StatusBoard:
+    """트레이딩 루프가 틱마다 게시하는 읽기 전용 상태 스냅샷
+
+    publish()는 새로 만든 dict로 참조만 교체하고(copy-on-write), 게시된 dict는 이후 수정하지 않는다.
+    HTTP 스레드는 잠금 없이 현재 참조를 읽고, JSON 직렬화도 HTTP 스레드에서 버전당 한 번만 한다.
+    따라서 대시보드가 아무리 자주 조회해도 루프는 멈추거나 느려지지 않고, 거래소 호출도 생기지 않는다.
+    """
+
+    def __init__(self, timing_window: int = 100):
+        self._snapshot: dict = {"version": 0, "published_at": None}
+        self._encoded: tuple[int, dict[str, bytes]] = (0, {})
+        self._encode_lock = threading.Lock()
+        self._loop_ms: deque = deque(maxlen=timing_window)
+
+    def record_loop_time(self, seconds: float):
+        self._loop_ms.append(seconds * 1000)
+
+    def loop_timings(self) -> dict:
+        """최근 timing_window 루프의 처리 시간 (대기 시간 제외)"""
+        samples = list(self._loop_ms)
+        if not samples:
+            return {"count": 0}
+        ordered = sorted(samples)
+        return {
+            "count": len(samples),
+            "last_ms": round(samples[-1], 2),
+            "avg_ms": round(sum(samples) / len(samples), 2),
+            "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 2),
+            "max_ms": round(ordered[-1], 2),
+        }
+
+    def publish(self, **sections):
+        """루프에서 호출: 섹션(levels, orders, balances 등)으로 새 스냅샷을 만들어 참조 교체"""
+        self._snapshot = {"version": self._snapshot["version"] + 1, "published_at": time.time(),
+                          "timings": self.loop_timings(), **sections}
+
+    def snapshot(self) -> dict:
+        return self._snapshot
+
+    def encoded(self, section: Optional[str]) -> Optional[bytes]:
+        """섹션(None이면 전체)의 JSON 바이트 (같은 버전이면 캐시 재사용)"""
+        snap = self._snapshot
+        with self._encode_lock:
+            version, cache = self._encoded
+            if version != snap["version"]:
+                cache = {}
+                self._encoded = (snap["version"], cache)
+            key = section or ""
+            if key not in cache:
+                if section is not None and section not in snap:
+                    return None
+                body = snap if section is None else {"version": snap["version"], "published_at": snap["published_at"],
+                                                     section: snap[section]}
+                cache[key] = json.dumps(body, ensure_ascii=False, default=str).encode()
+            return cache[key]
+
+
+class _StatusRequestHandler(BaseHTTPRequestHandler):
+    server_version = "GridStatus/1.0"
+
+    def do_GET(self):
+        board: StatusBoard = self.server.board
+        path = self.path.split("?", 1)[0].strip("/")
+        if path == "health":
+            snap = board.snapshot()
+            age = time.time() - snap["published_at"] if snap["published_at"] else None
+            body = json.dumps({"ok": age is not None and age < self.server.stale_after, "age_sec": age}).encode()
+        else:
+            body = board.encoded(None if path in ("", "status") else path)
+        if body is None:
+            self.send_error(404, "unknown section")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.send_error(405, "read-only")
+
+    def log_message(self, fmt, *args):
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+
+class StatusServer(ThreadingHTTPServer):
+    """StatusBoard를 읽기 전용 HTTP/JSON으로 제공 (별도 데몬 스레드)
+
+    GET /status(전체), /levels, /orders, /balances, /timings, /shadows, /health
+    """
+    daemon_threads = True
+
+    def __init__(self, board: StatusBoard, host: str = "127.0.0.1", port: int = 8765, stale_after: float = 60.0):
+        self.board = board
+        self.stale_after = stale_after
+        super().__init__((host, port), _StatusRequestHandler)
+        self._thread = threading.Thread(target=self.serve_forever, name="StatusServer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info("상태 API 시작: http://%s:%d/status", *self.server_address[:2], extra={"event": "status_start"})
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
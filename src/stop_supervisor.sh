@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# supervisor에 SIGTERM -> 각 워커가 주문 취소/스냅샷 저장을 마칠 때까지 대기 (stop_timeout 초과 시 강제 종료)
+python supervisor.py stop
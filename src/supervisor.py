@@ -0,0 +1,568 @@
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal, Optional
+
+import yaml
+from pydantic import BaseModel, Field, model_validator
+
+from log_config import setup_logging
+from grid_config import load_grid_config
+from grid_lease import GridCoordinator, default_node_id, open_lease_store
+
+BASE_DIR = Path(__file__).resolve().parent
+
+logger = setup_logging("SupervisorLogger", file_prefix="supervisor")
+
+
+class WorkerSpec(BaseModel):
+    """그리드 워커 1개 (coin_main.py --config <config>)"""
+    name: str = Field(..., min_length=1, description="워커 이름 (heartbeat/에러 로그 파일명에 사용)")
+    config: str = Field(..., description="그리드 설정 파일 경로 (src 기준 상대경로 가능)")
+
+    class Config:
+        extra = "forbid"
+
+
+class ClusterConfig(BaseModel):
+    """여러 호스트에 그리드 나눠 돌리기: 임대(lease)를 가진 노드만 해당 워커를 실행"""
+    store: Literal["sqlite", "file", "redis"] = Field(default="sqlite", description="임대 저장소 (sqlite/file: 한 호스트, redis: 여러 호스트)")
+    url: str = Field(default="run/leases.db", description="sqlite: DB 파일, file: 디렉터리, redis: redis://... (src 기준 상대경로 가능)")
+    node_id: Optional[str] = Field(default=None, description="노드 이름 (기본: 호스트명:pid)")
+    lease_ttl: float = Field(default=10, gt=0, description="임대 만료 시간 (초). 노드가 죽으면 이 시간 뒤 다른 노드가 넘겨받음")
+    max_grids: Optional[int] = Field(default=None, ge=1, description="이 노드가 맡을 최대 그리드 수 (기본: 공평 분배 몫)")
+    state_sync_interval: float = Field(default=5, gt=0, description="소유한 그리드의 스냅샷을 저장소에 올리는 주기 (초)")
+
+    class Config:
+        extra = "forbid"
+
+
+class SupervisorConfig(BaseModel):
+    """supervisor 설정 스키마 (configs/supervisor.yaml)"""
+    run_dir: str = Field(default="run", description="pid/heartbeat/상태 파일 디렉터리")
+    python: str = Field(default=sys.executable, description="워커 실행에 사용할 파이썬")
+    check_interval: float = Field(default=2, gt=0, description="워커 상태 확인 주기 (초)")
+    heartbeat_timeout: float = Field(default=120, gt=0, description="heartbeat가 이 시간 이상 갱신되지 않으면 재시작 (초)")
+    startup_grace: float = Field(default=60, ge=0, description="시작 직후 heartbeat 검사를 유예할 시간 (초)")
+    stop_timeout: float = Field(default=60, gt=0, description="SIGTERM 후 정리(주문 취소/스냅샷 저장)를 기다릴 최대 시간 (초)")
+    restart_parallel: int = Field(default=2, ge=1, description="롤링 재시작 시 동시에 재시작할 워커 수")
+    restart_stagger: float = Field(default=5, ge=0, description="롤링 재시작 시 워커 간 간격 (초)")
+    min_uptime: float = Field(default=60, gt=0, description="이보다 오래 돌다 죽으면 재시작 backoff 초기화 (초)")
+    max_restart_backoff: float = Field(default=300, gt=0, description="연속 비정상 종료 시 재시작 대기 상한 (초)")
+    allocator: bool = Field(default=True, description="공용 자금 배분 데몬을 워커보다 먼저 띄우고 워커에 소켓을 넘김 (끄면 워커마다 프로세스 내 배분)")
+    allocator_interval: float = Field(default=30, gt=0, description="자금 배분 데몬의 거래소 잔고 대사 주기 (초)")
+    allocator_start_timeout: float = Field(default=15, gt=0, description="자금 배분 데몬 소켓이 생길 때까지 기다릴 최대 시간 (초)")
+    workers: list[WorkerSpec] = Field(default_factory=list)
+    cluster: Optional[ClusterConfig] = Field(default=None, description="다중 노드 분산 (없으면 모든 워커를 이 노드에서 실행)")
+
+    class Config:
+        extra = "forbid"
+
+    @model_validator(mode="after")
+    def _check_cluster(self):
+        if self.cluster is not None and self.cluster.lease_ttl <= 2 * self.check_interval:
+            raise ValueError(f"lease_ttl({self.cluster.lease_ttl})은 check_interval의 2배보다 커야 합니다 "
+                             f"(갱신 1회 실패로 소유권을 잃지 않도록)")
+        return self
+
+
+def load_supervisor_config(path: str | Path) -> SupervisorConfig:
+    with open(path, "r", encoding="utf-8") as f:
+        return SupervisorConfig.model_validate(yaml.safe_load(f) or {})
+
+
+@dataclass
+class Worker:
+    spec: WorkerSpec
+    proc: Optional[subprocess.Popen] = None
+    started_at: float = 0.0
+    next_start_at: float = 0.0
+    backoff: float = 0.0
+    restarts: int = 0
+    last_exit: Optional[int] = None
+    busy: bool = False  # 중지/롤링 재시작 진행 중 (모니터 루프가 건드리지 않음)
+    state_synced: Optional[bytes] = None  # 마지막으로 임대 저장소에 올린 스냅샷 (클러스터 모드)
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+
+class Supervisor:
+    """그리드 워커 실행/감시/재시작
+
+    - 워커가 죽으면 지수 backoff로 재시작 (재시작은 --resume: 스냅샷에서 레벨 상태 이어받기)
+    - 워커 루프가 매 틱 갱신하는 heartbeat 파일이 heartbeat_timeout 이상 멈추면 멈춘 것으로 보고 재시작
+    - 중지는 SIGTERM -> 워커의 GracefulKiller가 주문 취소/스냅샷 저장 후 종료, stop_timeout이 지나면 SIGKILL
+    - SIGHUP을 받으면 restart_parallel개씩 restart_stagger 간격으로 롤링 재시작
+    - allocator가 켜져 있으면 공용 자금 배분 데몬(capital_allocator.py serve)을 워커보다 먼저 띄우고
+      --allocator-socket으로 넘김 (같은 계정 잔고를 여러 워커가 나눠 쓰도록). 데몬은 워커 정리 후 마지막에 종료
+    """
+
+    def __init__(self, cfg: SupervisorConfig):
+        self.cfg = cfg
+        self.run_dir = (BASE_DIR / cfg.run_dir).resolve()
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = {spec.name: Worker(spec) for spec in cfg.workers}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._restart_requested = threading.Event()
+        self.coordinator: Optional[GridCoordinator] = None
+        self._next_state_sync = 0.0
+        self.allocator_proc: Optional[subprocess.Popen] = None
+        self.allocator_restarts = 0
+        if cfg.cluster is not None:
+            url = cfg.cluster.url if cfg.cluster.store == "redis" else str(BASE_DIR / cfg.cluster.url)
+            self.coordinator = GridCoordinator(open_lease_store(cfg.cluster.store, url),
+                                               cfg.cluster.node_id or default_node_id(), list(self.workers),
+                                               cfg.cluster.lease_ttl, cfg.cluster.max_grids)
+
+    # --- 경로 ---
+    def heartbeat_path(self, worker: Worker) -> Path:
+        return self.run_dir / f"{worker.name}.heartbeat"
+
+    def lease_path(self, worker: Worker) -> Path:
+        return self.run_dir / f"{worker.name}.lease"
+
+    @property
+    def allocator_socket(self) -> Optional[Path]:
+        return self.run_dir / "allocator.sock" if self.cfg.allocator else None
+
+    @property
+    def pid_path(self) -> Path:
+        return self.run_dir / "supervisor.pid"
+
+    @property
+    def status_path(self) -> Path:
+        return self.run_dir / "supervisor.status.json"
+
+    @property
+    def restart_request_path(self) -> Path:
+        return self.run_dir / "supervisor.restart"
+
+    # --- 워커 제어 ---
+    def start_worker(self, worker: Worker, resume: bool):
+        hb = self.heartbeat_path(worker)
+        hb.unlink(missing_ok=True)
+        cmd = [self.cfg.python, str(BASE_DIR / "coin_main.py"), "--config", worker.spec.config, "--heartbeat", str(hb)]
+        if resume:
+            cmd.append("--resume")
+        if self.coordinator is not None:
+            # supervisor가 죽어도 워커가 임대 만료 뒤까지 주문하지 않도록 유효 시각 파일을 넘김
+            self.write_lease(worker)
+            cmd += ["--lease-file", str(self.lease_path(worker))]
+        if self.allocator_socket is not None:
+            cmd += ["--allocator-socket", str(self.allocator_socket)]
+        with open(self.run_dir / f"{worker.name}.err", "ab") as err:
+            # 별도 세션으로 실행: 터미널 Ctrl+C가 워커에 직접 전달되지 않고 supervisor가 순서대로 정리
+            worker.proc = subprocess.Popen(cmd, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=err,
+                                           start_new_session=True)
+        worker.started_at = time.time()
+        logger.info("워커 시작: %s (pid=%d, resume=%s)", worker.name, worker.proc.pid, resume,
+                    extra={"event": "worker_start", "worker": worker.name, "pid": worker.proc.pid, "resume": resume})
+
+    def stop_worker(self, worker: Worker) -> Optional[int]:
+        """SIGTERM 후 stop_timeout 동안 정리를 기다리고, 넘기면 SIGKILL"""
+        proc = worker.proc
+        if proc is None or proc.poll() is not None:
+            return None if proc is None else proc.returncode
+        began = time.monotonic()
+        proc.terminate()
+        try:
+            code = proc.wait(self.cfg.stop_timeout)
+            logger.info("워커 종료: %s (pid=%d, code=%s, %.1fs)", worker.name, proc.pid, code, time.monotonic() - began,
+                        extra={"event": "worker_stop", "worker": worker.name, "code": code})
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            code = proc.wait()
+            logger.warning("워커 정리 시간 초과로 강제 종료: %s (pid=%d)", worker.name, proc.pid,
+                           extra={"event": "worker_kill", "worker": worker.name})
+        worker.last_exit = code
+        return code
+
+    # --- 공용 자금 배분 데몬 ---
+    def start_allocator(self):
+        """capital_allocator.py serve 실행 후 소켓이 생길 때까지 대기 (워커들이 같은 잔고를 이중으로 예약하지 않도록)
+
+        대사할 티커는 워커 설정에서 모은다. 소켓이 제때 생기지 않아도 워커는 시작하고 (예약 요청이 실패하면
+        주문을 보류), 데몬이 죽으면 check_allocator()가 다시 띄운다.
+        """
+        sock = self.allocator_socket
+        sock.unlink(missing_ok=True)
+        tickers = sorted({load_grid_config(BASE_DIR / w.spec.config).ticker for w in self.workers.values()})
+        cmd = [self.cfg.python, str(BASE_DIR / "capital_allocator.py"), "serve", "--socket", str(sock),
+               "--tickers", ",".join(tickers), "--interval", str(self.cfg.allocator_interval)]
+        with open(self.run_dir / "allocator.err", "ab") as err:
+            self.allocator_proc = subprocess.Popen(cmd, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=err,
+                                                   start_new_session=True)
+        deadline = time.monotonic() + self.cfg.allocator_start_timeout
+        while not sock.exists() and self.allocator_proc.poll() is None and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if sock.exists():
+            logger.info("자금 배분 데몬 시작: pid=%d, socket=%s, tickers=%s", self.allocator_proc.pid, sock, tickers,
+                        extra={"event": "allocator_start", "pid": self.allocator_proc.pid})
+        else:
+            logger.error("자금 배분 데몬 소켓 없음 (code=%s): %s", self.allocator_proc.poll(), sock,
+                         extra={"event": "allocator_error"})
+
+    def check_allocator(self):
+        if self.allocator_proc is None or self.allocator_proc.poll() is None:
+            return
+        logger.error("자금 배분 데몬 비정상 종료 (code=%s) -> 재시작", self.allocator_proc.returncode,
+                     extra={"event": "allocator_exit", "code": self.allocator_proc.returncode})
+        self.allocator_restarts += 1
+        self.start_allocator()
+
+    def stop_allocator(self):
+        """워커가 모두 정리된 뒤 호출 (워커의 예약 해제 요청이 끝난 다음)"""
+        proc = self.allocator_proc
+        if proc is None or proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(self.cfg.stop_timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        logger.info("자금 배분 데몬 종료 (code=%s)", proc.returncode, extra={"event": "allocator_stop"})
+
+    def heartbeat_age(self, worker: Worker, now: float) -> Optional[float]:
+        if not worker.alive():
+            return None
+        try:
+            return now - os.stat(self.heartbeat_path(worker)).st_mtime
+        except FileNotFoundError:
+            return now - worker.started_at
+
+    def _restart_hung(self, worker: Worker):
+        try:
+            self.stop_worker(worker)
+            with self._lock:
+                worker.restarts += 1
+                self.start_worker(worker, resume=True)
+        finally:
+            worker.busy = False
+
+    def check_workers(self, pool: ThreadPoolExecutor):
+        now = time.time()
+        with self._lock:
+            for worker in self.workers.values():
+                if worker.busy or not self.owns(worker):
+                    continue
+                if worker.proc is None:
+                    if now >= worker.next_start_at:
+                        # 클러스터 모드에서는 다른 노드가 돌리던 그리드일 수 있으므로 항상 이어받기
+                        self.start_worker(worker, resume=worker.restarts > 0 or self.coordinator is not None)
+                    continue
+
+                code = worker.proc.poll()
+                if code is not None:
+                    uptime = now - worker.started_at
+                    worker.backoff = 0 if uptime >= self.cfg.min_uptime else min(
+                        max(worker.backoff * 2, 1), self.cfg.max_restart_backoff)
+                    worker.last_exit = code
+                    worker.proc = None
+                    worker.restarts += 1
+                    worker.next_start_at = now + worker.backoff
+                    logger.error("워커 비정상 종료: %s (code=%s, uptime=%.0fs) -> %.0fs 후 재시작",
+                                 worker.name, code, uptime, worker.backoff,
+                                 extra={"event": "worker_exit", "worker": worker.name, "code": code})
+                    continue
+
+                age = self.heartbeat_age(worker, now)
+                if now - worker.started_at >= self.cfg.startup_grace and age is not None \
+                        and age >= self.cfg.heartbeat_timeout:
+                    logger.error("워커 heartbeat 중단: %s (%.0fs) -> 재시작", worker.name, age,
+                                 extra={"event": "worker_hung", "worker": worker.name, "heartbeat_age": age})
+                    worker.busy = True
+                    pool.submit(self._restart_hung, worker)
+
+    # --- 클러스터 (임대 기반 그리드 소유권) ---
+    def owns(self, worker: Worker) -> bool:
+        return self.coordinator is None or worker.name in self.coordinator.owned
+
+    def snapshot_path(self, worker: Worker) -> Path:
+        return BASE_DIR / load_grid_config(BASE_DIR / worker.spec.config).snapshot_path
+
+    def write_lease(self, worker: Worker):
+        """워커가 루프마다 확인하는 임대 유효 시각(epoch) 기록 (소유권이 없으면 0 = 즉시 중지)"""
+        until = self.coordinator.safe_until(worker.name) or 0
+        path = self.lease_path(worker)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(f"{until:.3f}")
+        os.replace(tmp, path)
+
+    def push_state(self, worker: Worker, force: bool = False):
+        """워커 스냅샷을 임대 저장소에 올림 (바뀌었을 때만, 소유권이 아직 내 것일 때만 저장됨)"""
+        try:
+            data = self.snapshot_path(worker).read_bytes()
+        except FileNotFoundError:
+            return
+        if data == worker.state_synced and not force:
+            return
+        if self.coordinator.save_state(worker.name, data):
+            worker.state_synced = data
+        else:
+            logger.warning("스냅샷 저장 거부 (소유권 없음): %s", worker.name,
+                           extra={"event": "state_rejected", "worker": worker.name})
+
+    def pull_state(self, worker: Worker):
+        """넘겨받은 그리드의 마지막 스냅샷을 로컬 snapshot_path에 복원 (워커는 --resume으로 이어받음)"""
+        data = self.coordinator.load_state(worker.name)
+        if data is None:
+            return
+        path = self.snapshot_path(worker)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".lease.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        worker.state_synced = data
+
+    def _stop_lost(self, worker: Worker):
+        try:
+            self.stop_worker(worker)
+            worker.proc = None
+        finally:
+            worker.busy = False
+
+    def _hand_off(self, worker: Worker):
+        """몫을 넘는 그리드 넘겨주기: 워커 정리(주문 취소/스냅샷 저장) -> 스냅샷 업로드 -> 임대 반납"""
+        try:
+            self.stop_worker(worker)
+            worker.proc = None
+            self.push_state(worker, force=True)
+            self.coordinator.release(worker.name)
+        finally:
+            worker.busy = False
+
+    def sync_leases(self, pool: ThreadPoolExecutor):
+        plan = self.coordinator.tick()
+        with self._lock:
+            for name in plan.lost:
+                # 다른 노드가 넘겨받았거나 곧 넘겨받음: 상태를 올리지 않고 바로 중지 (fencing으로 어차피 거부됨)
+                worker = self.workers[name]
+                worker.busy = True
+                pool.submit(self._stop_lost, worker)
+            for name in plan.surplus:
+                worker = self.workers[name]
+                worker.busy = True
+                pool.submit(self._hand_off, worker)
+            for name in plan.acquired:
+                worker = self.workers[name]
+                try:
+                    self.pull_state(worker)
+                except Exception as e:
+                    logger.error("스냅샷 복원 실패 (스냅샷 없이 시작): %s / %s", name, e,
+                                 extra={"event": "state_error", "worker": name})
+                worker.backoff, worker.next_start_at = 0, 0
+                if not worker.busy and not worker.alive():
+                    worker.proc = None
+                    self.start_worker(worker, resume=True)
+            for worker in self.workers.values():
+                if worker.name in self.coordinator.owned:
+                    self.write_lease(worker)
+        if time.monotonic() >= self._next_state_sync:
+            self._next_state_sync = time.monotonic() + self.cfg.cluster.state_sync_interval
+            for worker in self.workers.values():
+                if self.owns(worker) and not worker.busy:
+                    self.push_state(worker)
+
+    def rolling_restart(self, names: Optional[list[str]] = None):
+        """restart_parallel개씩, 워커 간 restart_stagger 간격을 두고 재시작 (이름을 주면 해당 워커만)"""
+        targets = [w for w in self.workers.values() if (not names or w.name in names) and self.owns(w)]
+        logger.info("롤링 재시작: %s", [w.name for w in targets], extra={"event": "rolling_restart"})
+
+        def restart(idx: int, worker: Worker):
+            time.sleep((idx // self.cfg.restart_parallel) * self.cfg.restart_stagger)
+            if self._stop.is_set():
+                return
+            worker.busy = True
+            try:
+                self.stop_worker(worker)
+                with self._lock:
+                    worker.restarts += 1
+                    worker.backoff = 0
+                    self.start_worker(worker, resume=True)
+            finally:
+                worker.busy = False
+
+        with ThreadPoolExecutor(self.cfg.restart_parallel, thread_name_prefix="restart") as pool:
+            for future in [pool.submit(restart, i, w) for i, w in enumerate(targets)]:
+                future.result()
+
+    def stop_all(self):
+        alive = [w for w in self.workers.values() if w.alive()]
+        for worker in alive:
+            worker.busy = True
+        with ThreadPoolExecutor(max(len(alive), 1), thread_name_prefix="stop") as pool:
+            list(pool.map(self.stop_worker, alive))
+        if self.coordinator is not None:
+            # 정리 후 스냅샷을 올리고 반납: 다른 노드가 임대 만료를 기다리지 않고 바로 넘겨받음
+            for worker in self.workers.values():
+                if self.owns(worker):
+                    self.push_state(worker, force=True)
+            self.coordinator.release_all()
+
+    # --- 상태 ---
+    def status(self) -> dict:
+        now = time.time()
+        workers = {}
+        for worker in self.workers.values():
+            alive = worker.alive()
+            age = self.heartbeat_age(worker, now)
+            lease = self.coordinator.owned.get(worker.name) if self.coordinator is not None else None
+            workers[worker.name] = {
+                "config": worker.spec.config,
+                "state": "restarting" if worker.busy else ("running" if alive else
+                                                           "waiting" if self.owns(worker) else "not_owned"),
+                "lease_token": lease.token if lease is not None else None,
+                "pid": worker.proc.pid if alive else None,
+                "uptime_sec": round(now - worker.started_at) if alive else None,
+                "heartbeat_age_sec": round(age, 1) if age is not None else None,
+                "restarts": worker.restarts,
+                "last_exit": worker.last_exit,
+            }
+        allocator = None
+        if self.allocator_proc is not None:
+            alive = self.allocator_proc.poll() is None
+            allocator = {"pid": self.allocator_proc.pid if alive else None, "socket": str(self.allocator_socket),
+                         "restarts": self.allocator_restarts}
+        return {"pid": os.getpid(), "updated_at": now, "workers": workers, "allocator": allocator,
+                "node": self.coordinator.node if self.coordinator is not None else None}
+
+    def write_status(self):
+        tmp = self.status_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.status(), ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.status_path)
+
+    # --- 실행 ---
+    def _pending_restart_names(self) -> Optional[list[str]]:
+        try:
+            names = [n for n in self.restart_request_path.read_text().split() if n]
+            self.restart_request_path.unlink()
+            return names or None
+        except FileNotFoundError:
+            return None
+
+    def run(self):
+        signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        signal.signal(signal.SIGINT, lambda *_: self._stop.set())
+        signal.signal(signal.SIGHUP, lambda *_: self._restart_requested.set())
+        self.pid_path.write_text(str(os.getpid()))
+        logger.info("supervisor 시작 (workers=%s)", list(self.workers), extra={"event": "supervisor_start"})
+
+        restarter: Optional[threading.Thread] = None
+        try:
+            if self.cfg.allocator:
+                self.start_allocator()
+            with ThreadPoolExecutor(4, thread_name_prefix="hung") as pool:
+                while not self._stop.is_set():
+                    if self._restart_requested.is_set() and (restarter is None or not restarter.is_alive()):
+                        self._restart_requested.clear()
+                        restarter = threading.Thread(target=self.rolling_restart, args=(self._pending_restart_names(),),
+                                                     name="RollingRestart", daemon=True)
+                        restarter.start()
+                    self.check_allocator()
+                    if self.coordinator is not None:
+                        self.sync_leases(pool)
+                    self.check_workers(pool)
+                    self.write_status()
+                    self._stop.wait(self.cfg.check_interval)
+
+                logger.info("supervisor 종료 요청: 워커 정리 중", extra={"event": "supervisor_stopping"})
+                if restarter is not None:
+                    restarter.join()
+                self.stop_all()
+        finally:
+            self.stop_allocator()
+            self.write_status()
+            self.pid_path.unlink(missing_ok=True)
+            logger.info("supervisor 종료", extra={"event": "supervisor_stop"})
+
+
+def _read_pid(run_dir: Path) -> Optional[int]:
+    try:
+        pid = int((run_dir / "supervisor.pid").read_text().strip())
+        os.kill(pid, 0)
+        return pid
+    except (FileNotFoundError, ValueError, ProcessLookupError):
+        return None
+
+
+def print_status(run_dir: Path):
+    pid = _read_pid(run_dir)
+    try:
+        status = json.loads((run_dir / "supervisor.status.json").read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        status = {"workers": {}}
+    print(f"supervisor: {'running (pid=%d)' % pid if pid else 'not running'}")
+    if status.get("updated_at"):
+        print(f"updated: {time.time() - status['updated_at']:.0f}s ago")
+    allocator = status.get("allocator")
+    if allocator:
+        print(f"allocator: {'running (pid=%d)' % allocator['pid'] if allocator['pid'] else 'not running'} "
+              f"{allocator['socket']} (restarts={allocator['restarts']})")
+    else:
+        print("allocator: off (워커마다 프로세스 내 배분)")
+    print(f"{'worker':<12} {'state':<11} {'pid':>7} {'uptime':>8} {'heartbeat':>10} {'restarts':>8} {'last_exit':>9}")
+    for name, w in status["workers"].items():
+        print(f"{name:<12} {w['state']:<11} {w['pid'] or '-':>7} {w['uptime_sec'] if w['uptime_sec'] is not None else '-':>8} "
+              f"{w['heartbeat_age_sec'] if w['heartbeat_age_sec'] is not None else '-':>10} {w['restarts']:>8} "
+              f"{w['last_exit'] if w['last_exit'] is not None else '-':>9}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="그리드 워커 supervisor")
+    parser.add_argument("command", choices=["run", "status", "stop", "restart", "profile", "stacks"])
+    parser.add_argument("workers", nargs="*",
+                        help="restart/profile/stacks 대상 워커 (restart는 생략 시 전체 롤링 재시작)")
+    parser.add_argument("--config", default=str(BASE_DIR / "configs" / "supervisor.yaml"))
+    args = parser.parse_args()
+
+    sup_cfg = load_supervisor_config(args.config)
+    run_dir = (BASE_DIR / sup_cfg.run_dir).resolve()
+    sup_pid = _read_pid(run_dir)
+
+    if args.command == "run":
+        if sup_pid:
+            sys.exit(f"supervisor가 이미 실행 중입니다 (pid={sup_pid})")
+        Supervisor(sup_cfg).run()
+    elif args.command == "status":
+        print_status(run_dir)
+    elif args.command in ("profile", "stacks"):
+        # 워커의 DiagnosticSignals: SIGUSR1 = 프로파일러 켜기/끄기, SIGUSR2 = 스레드 스택 덤프
+        worker_status = json.loads((run_dir / "supervisor.status.json").read_text(encoding="utf-8"))["workers"]
+        sig = signal.SIGUSR1 if args.command == "profile" else signal.SIGUSR2
+        for name in args.workers or list(worker_status):
+            pid = worker_status.get(name, {}).get("pid")
+            if pid:
+                os.kill(pid, sig)
+                print(f"{name} (pid={pid}) <- {sig.name}")
+            else:
+                print(f"{name}: 실행 중이 아님")
+    elif sup_pid is None:
+        sys.exit("실행 중인 supervisor가 없습니다")
+    elif args.command == "restart":
+        if args.workers:
+            (run_dir / "supervisor.restart").write_text("\n".join(args.workers))
+        os.kill(sup_pid, signal.SIGHUP)
+        print(f"롤링 재시작 요청: {args.workers or '전체'}")
+    else:
+        os.kill(sup_pid, signal.SIGTERM)
+        # 워커 정리(stop_timeout) + 여유 시간까지 종료 대기
+        deadline = time.time() + sup_cfg.stop_timeout + 30
+        while time.time() < deadline and _read_pid(run_dir):
+            time.sleep(1)
+        print("supervisor 종료" if not _read_pid(run_dir) else "supervisor가 아직 종료되지 않았습니다")
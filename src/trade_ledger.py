@@ -0,0 +1,263 @@
+import queue
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass, astuple
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Optional
+
+KST = timezone(timedelta(hours=9))
+
+logger = logging.getLogger("TradingBotLogger").getChild("ledger")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY,
+    grid_id TEXT NOT NULL,
+    strategy_id INTEGER NOT NULL,
+    level_price REAL NOT NULL,
+    side TEXT NOT NULL,
+    price REAL NOT NULL,
+    units REAL NOT NULL,
+    fee_krw REAL NOT NULL,
+    order_id TEXT,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_fills_grid_day ON fills (grid_id, day);
+CREATE INDEX IF NOT EXISTS ix_fills_grid_strategy ON fills (grid_id, strategy_id, ts);
+CREATE INDEX IF NOT EXISTS ix_fills_order ON fills (order_id);
+
+CREATE TABLE IF NOT EXISTS round_trips (
+    id INTEGER PRIMARY KEY,
+    grid_id TEXT NOT NULL,
+    strategy_id INTEGER NOT NULL,
+    level_price REAL NOT NULL,
+    units REAL NOT NULL,
+    buy_price REAL NOT NULL,
+    sell_price REAL NOT NULL,
+    fee_krw REAL NOT NULL,
+    pnl_krw REAL NOT NULL,
+    opened_at REAL NOT NULL,
+    closed_at REAL NOT NULL,
+    day TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_rt_grid_day ON round_trips (grid_id, day);
+CREATE INDEX IF NOT EXISTS ix_rt_grid_level ON round_trips (grid_id, level_price);
+"""
+
+
+def _kst_day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, KST).strftime("%Y-%m-%d")
+
+
+@dataclass
+class Fill:
+    """체결 1건 (거래소 contract 1개에 해당)"""
+    grid_id: str
+    strategy_id: int
+    level_price: float
+    side: str
+    price: float
+    units: float
+    fee_krw: float
+    order_id: Optional[str]
+    ts: float
+
+
+@dataclass
+class RoundTrip:
+    """매수 -> 매도 한 사이클 (실현 손익 단위)"""
+    grid_id: str
+    strategy_id: int
+    level_price: float
+    units: float
+    buy_price: float
+    sell_price: float
+    fee_krw: float
+    opened_at: float
+    closed_at: float
+
+    @property
+    def pnl_krw(self) -> float:
+        return (self.sell_price - self.buy_price) * self.units - self.fee_krw
+
+
+class LedgerReader:
+    """거래 원장 조회 (읽기 전용 연결, 인덱스를 타는 집계 쿼리만 사용)"""
+
+    def __init__(self, db_path: str | Path = "ledger/trades.db"):
+        self.db_path = Path(db_path)
+
+    def _query(self, sql: str, params: tuple = ()) -> list[dict]:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _grid_filter(grid_id: Optional[str]) -> tuple[str, tuple]:
+        return ("WHERE grid_id = ?", (grid_id,)) if grid_id else ("", ())
+
+    def realized_pnl_by_level(self, grid_id: Optional[str] = None) -> list[dict]:
+        where, params = self._grid_filter(grid_id)
+        return self._query(
+            f"SELECT grid_id, level_price, COUNT(*) AS round_trips, SUM(units) AS units, "
+            f"SUM(fee_krw) AS fee_krw, SUM(pnl_krw) AS pnl_krw FROM round_trips {where} "
+            f"GROUP BY grid_id, level_price ORDER BY grid_id, level_price DESC", params)
+
+    def realized_pnl_by_grid(self) -> list[dict]:
+        return self._query(
+            "SELECT grid_id, COUNT(*) AS round_trips, SUM(fee_krw) AS fee_krw, SUM(pnl_krw) AS pnl_krw, "
+            "AVG(closed_at - opened_at) AS avg_holding_sec FROM round_trips GROUP BY grid_id ORDER BY grid_id")
+
+    def realized_pnl_by_day(self, grid_id: Optional[str] = None) -> list[dict]:
+        where, params = self._grid_filter(grid_id)
+        return self._query(
+            f"SELECT day, grid_id, COUNT(*) AS round_trips, SUM(fee_krw) AS fee_krw, SUM(pnl_krw) AS pnl_krw "
+            f"FROM round_trips {where} GROUP BY day, grid_id ORDER BY day, grid_id", params)
+
+    def round_trip_stats(self, grid_id: Optional[str] = None) -> dict:
+        where, params = self._grid_filter(grid_id)
+        rows = self._query(
+            f"SELECT COUNT(*) AS round_trips, AVG(closed_at - opened_at) AS avg_holding_sec, "
+            f"SUM(pnl_krw) AS pnl_krw FROM round_trips {where}", params)
+        return rows[0]
+
+
+class TradeLedger(LedgerReader):
+    """체결/왕복거래 기록 저장소 (SQLite WAL)
+
+    record_*()는 큐에 넣기만 하고, 별도 writer 스레드가 batch_size 건 또는 flush_interval 초마다
+    한 트랜잭션으로 묶어 기록한다. 조회는 호출 스레드에서 별도 연결로 수행 (WAL이라 writer와 동시 가능).
+    """
+
+    def __init__(self, db_path: str | Path = "ledger/trades.db", batch_size: int = 200, flush_interval: float = 1.0):
+        super().__init__(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+        self._writer = threading.Thread(target=self._run, name="TradeLedgerWriter", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- 기록 (트레이딩 루프에서 호출) ---
+    def record_fill(self, fill: Fill):
+        self._queue.put(("fill", fill))
+
+    def record_round_trip(self, trip: RoundTrip):
+        self._queue.put(("round_trip", trip))
+
+    def flush(self):
+        """지금까지 넣은 기록이 모두 DB에 반영될 때까지 대기"""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(("close", None))
+        self._writer.join()
+
+    def _run(self):
+        conn = self._connect()
+        fills, trips = [], []
+        running = True
+        while running:
+            waiters = []
+            try:
+                kind, item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if kind == "fill":
+                        fills.append(astuple(item) + (_kst_day(item.ts),))
+                    elif kind == "round_trip":
+                        trips.append(astuple(item) + (item.pnl_krw, _kst_day(item.closed_at)))
+                    elif kind == "flush":
+                        waiters.append(item)
+                    elif kind == "close":
+                        running = False
+                    if len(fills) + len(trips) >= self.batch_size:
+                        break
+                    kind, item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            if fills or trips:
+                try:
+                    with conn:
+                        if fills:
+                            conn.executemany(
+                                "INSERT INTO fills (grid_id, strategy_id, level_price, side, price, units, fee_krw, "
+                                "order_id, ts, day) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", fills)
+                        if trips:
+                            conn.executemany(
+                                "INSERT INTO round_trips (grid_id, strategy_id, level_price, units, buy_price, "
+                                "sell_price, fee_krw, opened_at, closed_at, pnl_krw, day) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", trips)
+                except sqlite3.Error as e:
+                    logger.error("거래 원장 기록 실패: %s (fills=%d, trips=%d)", e, len(fills), len(trips),
+                                 extra={"event": "ledger_error"})
+                fills, trips = [], []
+            for waiter in waiters:
+                waiter.set()
+        conn.close()
+
+
+def parse_contracts(contracts: list, fallback_ts: float) -> list[tuple[float, float, float, float]]:
+    """빗썸 체결 응답의 contract 목록을 (price, units, fee_krw, ts) 목록으로 변환
+
+    수수료가 코인 단위(fee_currency != KRW)로 오면 체결가로 환산한다.
+    """
+    parsed = []
+    for c in contracts:
+        price = float(c.get("price", 0) or 0)
+        units = float(c.get("units", 0) or 0)
+        fee = float(c.get("fee", 0) or 0)
+        if c.get("fee_currency", "KRW") != "KRW":
+            fee *= price
+        try:
+            # transaction_date: 마이크로초 단위 epoch 문자열
+            ts = int(c["transaction_date"]) / 1_000_000
+        except (KeyError, TypeError, ValueError):
+            ts = fallback_ts
+        parsed.append((price, units, fee, ts))
+    return parsed
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="거래 원장 손익 조회")
+    parser.add_argument("--db", default="ledger/trades.db")
+    parser.add_argument("--grid", default=None, help="grid_id로 필터")
+    parser.add_argument("report", choices=["level", "grid", "day", "stats"])
+    args = parser.parse_args()
+
+    ledger_ro = LedgerReader(args.db)
+    if args.report == "level":
+        result = ledger_ro.realized_pnl_by_level(args.grid)
+    elif args.report == "grid":
+        result = ledger_ro.realized_pnl_by_grid()
+    elif args.report == "day":
+        result = ledger_ro.realized_pnl_by_day(args.grid)
+    else:
+        result = ledger_ro.round_trip_stats(args.grid)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,444 @@
+import time
+import random
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+from capital_allocator import KRW
+from market_meta import MarketMeta
+from orderbook import OrderBook
+from order_registry import fetch_open_orders, fetch_recent_fills
+
+logger = logging.getLogger("TradingBotLogger").getChild("router")
+
+ID_SEP = ":"  # 주문번호 앞에 거래소 이름을 붙이는 구분자 (기본 거래소 주문은 접두어 없음: 기존 스냅샷 호환)
+LATENCY_ALPHA = 0.2  # 거래소별 요청 지연 EWMA 가중치
+NO_VENUE = {"status": "5600", "message": "주문 가능한 거래소 없음 (거래소별 잔고/호가 조건 불충족)"}
+
+
+# --- 업비트 어댑터 ---
+def _iso_to_us(text: str) -> str:
+    """업비트 created_at (ISO8601, +09:00) -> 빗썸 contract 형식의 마이크로초 epoch 문자열"""
+    return str(int(datetime.fromisoformat(text).timestamp() * 1_000_000))
+
+
+class UpbitBithumbAdapter:
+    """pyupbit Upbit을 coin_main이 쓰는 pybithumb 형태(주문 id 튜플, status/data/contract 응답)로 감싼 클라이언트
+
+    티커는 빗썸식(DOGE)으로 받아 업비트 마켓 코드(KRW-DOGE)로 바꾼다. 체결 내역 API가 주문번호 없는
+    목록이 아니라 주문 단위이므로, 최근 체결(get_recent_fills)은 완료 주문의 체결 수량/수수료로 근사한다.
+    """
+
+    def __init__(self, pool, order_slot):
+        self.pool = pool  # api_keys.KeyPool: 조회는 풀 전체에 분산, 주문/취소는 order_slot 고정 키
+        self.order_slot = order_slot
+
+    @staticmethod
+    def market(ticker: str) -> str:
+        return ticker if ticker.startswith("KRW-") else f"KRW-{ticker}"
+
+    def _call(self, method: str, *args, order: bool = False, **kwargs):
+        return self.pool.call(method, *args, slot=self.order_slot if order else None, **kwargs)
+
+    def get_current_price(self, ticker: str):
+        import pyupbit
+        return pyupbit.get_current_price(self.market(ticker))
+
+    def get_balance(self, ticker: str):
+        """(총코인, 거래중코인, 총원화, 거래중원화)"""
+        balances = self._call("get_balances") or []
+        by_currency = {b["currency"]: b for b in balances if isinstance(b, dict)}
+        coin = by_currency.get(ticker.replace("KRW-", ""), {})
+        krw = by_currency.get(KRW, {})
+        coin_locked, krw_locked = float(coin.get("locked", 0)), float(krw.get("locked", 0))
+        return (float(coin.get("balance", 0)) + coin_locked, coin_locked,
+                float(krw.get("balance", 0)) + krw_locked, krw_locked)
+
+    def _place(self, side: str, ticker: str, price: float, unit: float):
+        method = "buy_limit_order" if side == "bid" else "sell_limit_order"
+        result = self._call(method, self.market(ticker), price, unit, order=True)
+        if isinstance(result, dict) and "uuid" in result:
+            return side, ticker, result["uuid"], "KRW"
+        return result  # 오류 응답(dict) 또는 None
+
+    def buy_limit_order(self, ticker: str, price: float, unit: float, payment_currency: str = "KRW"):
+        return self._place("bid", ticker, price, unit)
+
+    def sell_limit_order(self, ticker: str, price: float, unit: float, payment_currency: str = "KRW"):
+        return self._place("ask", ticker, price, unit)
+
+    def cancel_order(self, order_desc):
+        result = self._call("cancel_order", order_desc[2], order=True)
+        return isinstance(result, dict) and "uuid" in result
+
+    def get_order_completed(self, order_desc):
+        order = self._call("get_individual_order", order_desc[2])
+        if not isinstance(order, dict) or "uuid" not in order:
+            return order
+        volume = float(order["volume"])
+        trades = order.get("trades") or []
+        executed = sum(float(t["volume"]) for t in trades) or 1.0
+        paid_fee = float(order.get("paid_fee", 0) or 0)
+        contract = [{"price": t["price"], "units": t["volume"],
+                     "fee": str(paid_fee * float(t["volume"]) / executed), "fee_currency": KRW,
+                     "transaction_date": _iso_to_us(t["created_at"])} for t in trades]
+        status = {"wait": "Pending", "watch": "Pending", "done": "Completed", "cancel": "Cancel"}[order["state"]]
+        return {"status": "0000", "data": {"order_status": status, "order_qty": str(volume),
+                                           "order_price": order.get("price"), "type": order["side"],
+                                           "contract": contract}}
+
+    def get_open_orders(self, ticker: str) -> list[dict]:
+        orders = self._call("get_order", self.market(ticker), state="wait") or []
+        return [{"order_id": o["uuid"], "side": "buy" if o["side"] == "bid" else "sell", "price": float(o["price"]),
+                 "units": float(o["volume"]), "remaining": float(o["remaining_volume"]),
+                 "placed_at": int(_iso_to_us(o["created_at"])) / 1_000_000} for o in orders]
+
+    def get_recent_fills(self, ticker: str, side: str, since: float) -> list[dict]:
+        orders = self._call("get_order", self.market(ticker), state="done") or []
+        fills = []
+        for o in orders:
+            ts = _iso_to_us(o["created_at"])
+            if int(ts) / 1_000_000 < since or o["side"] != ("bid" if side == "buy" else "ask"):
+                continue
+            fills.append({"price": o["price"], "units": o["executed_volume"], "fee": o.get("paid_fee", 0),
+                          "fee_currency": KRW, "transaction_date": ts})
+        return fills
+
+    def get_chance(self, ticker: str):
+        """market_meta.fetch_upbit_meta용 (수수료율/최소 주문 금액)"""
+        return self._call("get_chance", self.market(ticker))
+
+
+class UpbitBookFeed:
+    """업비트 orderbook 웹소켓으로 OrderBook 유지 (메시지마다 상위 호가 전체가 오므로 스냅샷으로 교체)"""
+
+    def __init__(self, book: OrderBook):
+        self.book = book
+        self._stop = threading.Event()
+        self._manager = None
+
+    def start(self) -> "UpbitBookFeed":
+        import pyupbit
+
+        self._manager = pyupbit.WebSocketManager("orderbook", [UpbitBithumbAdapter.market(self.book.ticker)])
+        threading.Thread(target=self._pump, name="UpbitBookFeed", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._manager is not None:
+            self._manager.terminate()
+
+    def _pump(self):
+        while not self._stop.is_set():
+            self.on_message(self._manager.get())
+
+    def on_message(self, msg: dict):
+        units = msg.get("orderbook_units")
+        if not units:
+            return
+        ts = msg.get("timestamp", time.time() * 1000) / 1000
+        self.book.apply_snapshot([(u["bid_price"], u["bid_size"]) for u in units],
+                                 [(u["ask_price"], u["ask_size"]) for u in units], ts)
+
+
+def upbit_client(grid_id: str, order_key_name: Optional[str] = None, settings=None) -> UpbitBithumbAdapter:
+    """설정(.env)의 업비트 키 풀로 그리드용 클라이언트 생성"""
+    from api_keys import ApiKeySettings, KeyPool
+
+    pool = KeyPool.for_upbit((settings or ApiKeySettings()).keys("upbit"))
+    return UpbitBithumbAdapter(pool, pool.order_slot(grid_id, order_key_name))
+
+
+# --- 라우팅 ---
+@dataclass
+class Venue:
+    """주문을 보낼 수 있는 거래소 1개 (클라이언트 + 실시간 호가 + 주문 규칙 + 측정 지연 + 잔고)"""
+    name: str
+    client: Any
+    book: Optional[OrderBook] = None
+    meta: Optional[MarketMeta] = None
+    latency: float = 0.0  # 요청 왕복 시간 EWMA (초)
+    # 거래소별 사용 가능 잔고 (get_balance로 갱신, 주문 접수 시 로컬 차감)
+    free_krw: float = 0.0
+    free_coin: float = 0.0
+    orders: int = 0
+    calls: int = 0
+    errors: int = 0
+
+    def timed(self, method: str, *args, **kwargs):
+        """클라이언트 호출 + 지연 측정 (EWMA, 예외도 지연으로 반영)"""
+        started = time.perf_counter()
+        try:
+            return getattr(self.client, method)(*args, **kwargs)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.calls += 1
+            self.latency = elapsed if self.calls == 1 else self.latency + LATENCY_ALPHA * (elapsed - self.latency)
+
+    def fee(self) -> float:
+        return self.meta.taker_fee if self.meta is not None else 0.0
+
+
+class SmartRouter:
+    """그리드 주문 1건을 어느 거래소로 보낼지 결정 (메모리 안의 호가/지연/잔고만 사용, API 호출 없음)
+
+    - 매수 지정가 P: 거래소별 예상 체결가 min(P, 매도 최우선가) x (1 + 수수료) 가 가장 낮은 곳.
+      매도 지정가 P: max(P, 매수 최우선가) x (1 - 수수료) 가 가장 높은 곳.
+    - 예상 금액 차이가 price_tolerance (비율) 이내면 측정 지연이 짧은 거래소.
+    - 원화(매수)/코인(매도) 잔고가 모자라거나 최소 주문 금액/호가 단위가 맞지 않는 거래소는 제외.
+      호가가 없거나 max_age초 넘게 갱신되지 않은 거래소는 지정가 그대로 체결된다고 보고 비교한다.
+    """
+
+    def __init__(self, venues: list[Venue], price_tolerance: float = 0.0002, max_age: float = 5.0):
+        self.venues = venues
+        self.price_tolerance = price_tolerance
+        self.max_age = max_age
+        self.decisions: dict[str, int] = {v.name: 0 for v in venues}
+
+    def _eligible(self, venue: Venue, side: str, price: float, qty: float) -> bool:
+        if venue.meta is not None:
+            if not venue.meta.is_valid_price(price) or not venue.meta.meets_min_notional(price, qty):
+                return False
+        if side == "buy":
+            return venue.free_krw >= price * qty * (1 + venue.fee())
+        return venue.free_coin >= qty
+
+    def _expected(self, venue: Venue, side: str, price: float) -> float:
+        """1단위당 예상 비용(매수)/수령액(매도). 호가가 없거나 오래됐으면 지정가 그대로 체결된다고 봄"""
+        quote = venue.book.quote(self.max_age) if venue.book is not None else None
+        bid, ask = quote if quote is not None else (None, None)
+        if side == "buy":
+            fill = price if ask is None else min(price, ask)
+            return fill * (1 + venue.fee())
+        fill = price if bid is None else max(price, bid)
+        return fill * (1 - venue.fee())
+
+    def route(self, side: str, price: float, qty: float) -> Optional[Venue]:
+        """주문 1건의 거래소 (보낼 수 있는 곳이 없으면 None)"""
+        scored = [(v, self._expected(v, side, price)) for v in self.venues if self._eligible(v, side, price, qty)]
+        if not scored:
+            return None
+        best = min(e for _, e in scored) if side == "buy" else max(e for _, e in scored)
+        choice = min((v for v, e in scored if abs(e - best) <= best * self.price_tolerance), key=lambda v: v.latency)
+        self.decisions[choice.name] += 1
+        return choice
+
+
+class RoutedClient:
+    """여러 거래소를 pybithumb Bithumb 하나처럼 쓰게 하는 클라이언트 (Strategy/reconcile_orders 그대로 사용)
+
+    - 주문: SmartRouter가 고른 거래소로 보내고, 주문번호에 '{거래소}:' 접두어를 붙여 돌려준다
+      (기본 거래소 venues[0] 주문은 접두어 없음). 조회/취소는 접두어로 해당 거래소에 보낸다.
+    - get_balance: 거래소별 잔고를 갱신하고 합계를 반환 (그리드의 잔고 대사 주기마다 호출됨).
+    - 미체결/최근 체결 목록은 모든 거래소 것을 합친다.
+    """
+
+    def __init__(self, router: SmartRouter):
+        self.router = router
+        self.venues = {v.name: v for v in router.venues}
+        self.primary = router.venues[0]
+
+    # --- 주문번호 <-> 거래소 ---
+    def _wrap(self, venue: Venue, order_id):
+        if not isinstance(order_id, tuple) or venue is self.primary:
+            return order_id
+        return order_id[0], order_id[1], f"{venue.name}{ID_SEP}{order_id[2]}", order_id[3]
+
+    def _unwrap(self, order_desc) -> tuple[Venue, tuple]:
+        venue_name, sep, raw = str(order_desc[2]).partition(ID_SEP)
+        if not sep or venue_name not in self.venues:
+            return self.primary, order_desc
+        return self.venues[venue_name], (order_desc[0], order_desc[1], raw, order_desc[3])
+
+    # --- 시세/잔고 ---
+    def get_current_price(self, ticker: str):
+        return self.primary.timed("get_current_price", ticker)
+
+    def get_balance(self, ticker: str):
+        total = [0.0, 0.0, 0.0, 0.0]
+        for venue in self.router.venues:
+            try:
+                bal = venue.timed("get_balance", ticker)
+            except Exception as e:
+                logger.warning("%s 잔고 조회 실패: %s", venue.name, e, extra={"event": "venue_error", "venue": venue.name})
+                bal = None
+            if not bal:
+                bal = (venue.free_coin, 0.0, venue.free_krw, 0.0)  # 마지막 값 유지
+            venue.free_coin, venue.free_krw = float(bal[0]) - float(bal[1]), float(bal[2]) - float(bal[3])
+            for i in range(4):
+                total[i] += float(bal[i])
+        return tuple(total)
+
+    # --- 주문 ---
+    def _place(self, side: str, ticker: str, price: float, unit: float):
+        venue = self.router.route(side, float(price), float(unit))
+        if venue is None:
+            # 로컬 잔고는 잔고 대사 주기에만 갱신되므로, 다른 거래소에서 막 체결된 코인/원화일 수 있어 1회 갱신 후 재시도
+            self.get_balance(ticker)
+            venue = self.router.route(side, float(price), float(unit))
+        if venue is None:
+            return dict(NO_VENUE)
+        method = "buy_limit_order" if side == "buy" else "sell_limit_order"
+        order_id = venue.timed(method, ticker, price, unit)
+        if isinstance(order_id, tuple):
+            venue.orders += 1
+            if side == "buy":
+                venue.free_krw -= float(price) * float(unit) * (1 + venue.fee())
+            else:
+                venue.free_coin -= float(unit)
+        return self._wrap(venue, order_id)
+
+    def buy_limit_order(self, ticker: str, price: float, unit: float, payment_currency: str = "KRW"):
+        return self._place("buy", ticker, price, unit)
+
+    def sell_limit_order(self, ticker: str, price: float, unit: float, payment_currency: str = "KRW"):
+        return self._place("sell", ticker, price, unit)
+
+    def cancel_order(self, order_desc):
+        venue, raw = self._unwrap(order_desc)
+        return venue.timed("cancel_order", raw)
+
+    def get_order_completed(self, order_desc):
+        venue, raw = self._unwrap(order_desc)
+        return venue.timed("get_order_completed", raw)
+
+    def get_open_orders(self, ticker: str) -> list[dict]:
+        orders = []
+        for venue in self.router.venues:
+            for order in fetch_open_orders(venue.client, ticker):
+                if venue is not self.primary:
+                    order = {**order, "order_id": f"{venue.name}{ID_SEP}{order['order_id']}"}
+                orders.append(order)
+        return orders
+
+    def get_recent_fills(self, ticker: str, side: str, since: float) -> list[dict]:
+        return [fill for venue in self.router.venues for fill in fetch_recent_fills(venue.client, ticker, side, since)]
+
+    def stats(self) -> list[dict]:
+        return [{"venue": v.name, "orders": v.orders, "routed": self.router.decisions[v.name],
+                 "latency_ms": round(v.latency * 1000, 3), "errors": v.errors,
+                 "free_krw": round(v.free_krw), "free_coin": v.free_coin} for v in self.router.venues]
+
+
+def build_routed_client(cfg: dict, primary_client, ctx) -> tuple[RoutedClient, list]:
+    """cfg["venues"] 거래소들로 RoutedClient 생성. 기본 거래소(빗썸)는 이미 만든 클라이언트/호가창/메타 사용
+
+    반환: (클라이언트, 시작한 호가 피드 목록). 업비트 호가 피드 시작에 실패하면 호가 없이 지정가 기준으로 비교한다.
+    """
+    from market_meta import load_market_meta
+
+    venues = [Venue(cfg["venues"][0], primary_client, ctx.book, ctx.meta)]
+    feeds = []
+    for name in cfg["venues"][1:]:
+        client = upbit_client(cfg["grid_id"])
+        meta = load_market_meta(name, cfg["ticker"], client, cfg["market_meta_path"], cfg["market_meta_ttl"])
+        book = OrderBook(cfg["ticker"])
+        try:
+            feeds.append(UpbitBookFeed(book).start())
+        except Exception as e:
+            logger.error("%s 호가창 피드 시작 실패: %s", name, e, extra={"event": "venue_error", "venue": name})
+            book = None
+        venues.append(Venue(name, client, book, meta))
+    routed = RoutedClient(SmartRouter(venues, cfg["route_price_tolerance"], cfg["book_max_age"]))
+    routed.get_balance(cfg["ticker"])
+    logger.info("거래소 라우팅: %s", [v.name for v in venues], extra={"event": "router_start", "venues": cfg["venues"]})
+    return routed, feeds
+
+
+# --- 모의 거래소 2개로 확인 ---
+def simulate_routing(ticks: int = 2000, seed: int = 0, spread_noise: int = 2, upbit_delay: float = 0.0) -> dict:
+    """같은 그리드를 빗썸 단독 vs 두 모의 거래소(가격이 서로 조금씩 어긋남) 라우팅으로 돌려 비교
+
+    주문 판단 기준가는 빗썸 현재가, 업비트 체결가 = 빗썸 + 틱마다 무작위 차이(±spread_noise).
+    두 경우 모두 거래소별 원화 100만 원씩 (빗썸 단독이면 업비트 자금은 놀고 있음).
+    """
+    import coin_main as cm
+    from capital_allocator import CapitalAllocator, bithumb_balances
+    from grid_config import GridConfig
+    from market_meta import DEFAULTS
+    from order_registry import OrderRegistry
+    from price_watermark import PriceWatermark
+    from sim_exchange import SimulatedExchange
+
+    class SlowExchange(SimulatedExchange):
+        def _place(self, *args):
+            time.sleep(upbit_delay)
+            return super()._place(*args)
+
+    rng = random.Random(seed)
+    path, price = [], 300
+    for _ in range(ticks):
+        price = min(max(price + rng.choice((-1, 0, 1)), 285), 305)
+        path.append(price)
+    offsets = [rng.randint(-spread_noise, spread_noise) for _ in path]
+
+    def run(routed: bool) -> dict:
+        cfg = GridConfig.model_validate({
+            "ticker": "DOGE", "start_buy_price": 300, "divide_count": 15, "order_qty": 20, "buy_margin": 1,
+            "max_up_strategies": 3, "order_reconcile_interval": 0.5, "balance_reconcile_interval": 0.2,
+        }).model_dump()
+        exchanges = {"bithumb": SimulatedExchange("DOGE", krw=1_000_000, fee_rate=DEFAULTS["bithumb"]["taker_fee"]),
+                     "upbit": SlowExchange("DOGE", krw=1_000_000, fee_rate=DEFAULTS["upbit"]["taker_fee"])}
+        metas = {name: MarketMeta(exchange=name, ticker="DOGE", **{**DEFAULTS[name], "min_notional": 1000})
+                 for name in exchanges}
+        venues = [Venue(name, exchanges[name], OrderBook("DOGE"), metas[name])
+                  for name in (("bithumb", "upbit") if routed else ("bithumb",))]
+        router = SmartRouter(venues)
+        client = RoutedClient(router)
+        route_ns = []
+        route = router.route
+
+        def timed_route(*args):
+            started = time.perf_counter_ns()
+            try:
+                return route(*args)
+            finally:
+                route_ns.append(time.perf_counter_ns() - started)
+
+        router.route = timed_route
+        allocator = CapitalAllocator(cfg["balance_reconcile_interval"])
+        allocator.reconcile(bithumb_balances(client, "DOGE"))
+        ctx = cm.GridContext(grid_id=cfg["grid_id"], ticker="DOGE", allocator=allocator,
+                             registry=OrderRegistry(cfg["grid_id"]), meta=metas["bithumb"],
+                             watermark=PriceWatermark(), notify_discord=False)
+        strategies = cm.build_levels(cfg, ctx)
+        ctx.registry.rebuild(strategies)
+        for i, p in enumerate(path):
+            for venue in venues:
+                last = p + (offsets[i] if venue.name == "upbit" else 0)
+                venue.client.on_price(last)
+                venue.book.apply_snapshot([(last - 1, 1000.0)], [(last + 1, 1000.0)])
+            cm.trade_tick(strategies, cfg, client, ctx, i)
+            time.sleep(0.001)
+        route_ns.sort()
+        last = {"bithumb": path[-1], "upbit": path[-1] + offsets[-1]}
+        equity = sum(ex.equity(last[name]) for name, ex in exchanges.items())
+        return {"routed": routed, "round_trips": ctx.round_trips, "realized_pnl": round(ctx.realized_pnl),
+                "equity_pnl": round(equity - 2_000_000), "venues": client.stats(),
+                "route_us_p50": route_ns[len(route_ns) // 2] / 1000 if route_ns else None,
+                "route_us_p99": route_ns[int(len(route_ns) * 0.99)] / 1000 if route_ns else None}
+
+    return {"bithumb_only": run(False), "routed": run(True)}
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description="거래소 라우팅 모의 비교 (모의 거래소 2개, 실제 주문 없음)")
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spread-noise", type=int, default=2, help="두 거래소 가격 차이 최대 (호가 수)")
+    parser.add_argument("--upbit-delay", type=float, default=0.0, help="모의 업비트 주문 지연 (초)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+    print(json.dumps(simulate_routing(args.ticks, args.seed, args.spread_noise, args.upbit_delay),
+                     ensure_ascii=False, indent=2))
@@ -0,0 +1,157 @@
+import math
+import time
+from typing import Optional
+
+
+class RollingWindow:
+    """최근 n개 값의 합을 값 1개 추가마다 O(1)로 유지 (링 버퍼는 CandleAggregator와 공유)"""
+
+    __slots__ = ("size", "total", "count")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.total = 0.0
+        self.count = 0
+
+    def push(self, value: float, evicted: Optional[float]):
+        self.total += value
+        if evicted is None:
+            self.count += 1
+        else:
+            self.total -= evicted
+
+    def mean(self) -> Optional[float]:
+        if self.count < self.size:
+            return None
+        return max(self.total, 0.0) / self.size
+
+
+class CandleAggregator:
+    """틱 가격으로 OHLC 캔들과 ATR/실현 변동성을 증분 계산
+
+    - update(): 틱마다 진행 중 캔들의 고가/저가/종가만 갱신 (O(1))
+    - 캔들이 닫힐 때 true range와 로그 수익률 제곱을 링 버퍼에 넣고, 창(window)마다 빠지는 값을 빼서
+      이동 합을 유지 (창 수만큼, pandas 재계산 없음)
+    - 거래가 없어 건너뛴 캔들은 만들지 않는다 (거래소 캔들과 같이 빈 구간은 생략)
+    - 부동소수 누적 오차는 링 버퍼가 한 바퀴 돌 때마다 합을 다시 계산해 없앤다 (분할 상환 O(1))
+
+    지표는 닫힌 캔들만으로 계산하며, 창이 다 차기 전에는 None.
+    """
+
+    def __init__(self, period: float = 60.0, windows: tuple = (14, 60)):
+        if period <= 0 or not windows or min(windows) < 1:
+            raise ValueError(f"잘못된 캔들 설정: period={period}, windows={windows}")
+        self.period = period
+        self.windows = tuple(sorted(set(windows)))
+        self.capacity = self.windows[-1]
+        self._tr = [0.0] * self.capacity
+        self._r2 = [0.0] * self.capacity
+        self._pos = 0
+        self._filled = 0
+        self._atr = {n: RollingWindow(n) for n in self.windows}
+        self._rv = {n: RollingWindow(n) for n in self.windows}
+        # 진행 중 캔들 [시작 시각, 시가, 고가, 저가, 종가] / 직전 닫힌 캔들 종가
+        self.open_at: Optional[float] = None
+        self.o = self.hi = self.lo = self.c = 0.0
+        self.prev_close: Optional[float] = None
+        self.candles = 0
+
+    def update(self, price: float, low: Optional[float] = None, high: Optional[float] = None,
+               now: Optional[float] = None):
+        """틱 1건 반영. low/high는 직전 틱 이후 체결 구간 (PriceWatermark.drain 값, 없으면 price)"""
+        now = time.time() if now is None else now
+        low = price if low is None or not math.isfinite(low) else min(low, price)
+        high = price if high is None or not math.isfinite(high) else max(high, price)
+        if self.open_at is None or now - self.open_at >= self.period:
+            if self.open_at is not None:
+                self._close()
+            self.open_at = now - now % self.period
+            self.o, self.hi, self.lo = price, high, low
+        else:
+            if high > self.hi:
+                self.hi = high
+            if low < self.lo:
+                self.lo = low
+        self.c = price
+
+    def _close(self):
+        prev = self.prev_close
+        if prev is None:
+            tr, r2 = self.hi - self.lo, 0.0
+        else:
+            tr = max(self.hi, prev) - min(self.lo, prev)
+            r2 = math.log(self.c / prev) ** 2 if prev > 0 and self.c > 0 else 0.0
+        pos = self._pos
+        for n in self.windows:
+            # 창 n에서 빠지는 값: n개 전에 넣은 값 (창이 아직 안 찼으면 없음)
+            evicted = None
+            if self._filled >= n:
+                j = (pos - n) % self.capacity
+                evicted = (self._tr[j], self._r2[j])
+            self._atr[n].push(tr, None if evicted is None else evicted[0])
+            self._rv[n].push(r2, None if evicted is None else evicted[1])
+        self._tr[pos], self._r2[pos] = tr, r2
+        self._pos = (pos + 1) % self.capacity
+        self._filled = min(self._filled + 1, self.capacity)
+        if self._pos == 0:
+            self._resum()
+        self.prev_close = self.c
+        self.candles += 1
+
+    def _resum(self):
+        for n in self.windows:
+            if self._filled < n:
+                continue
+            idx = [(self._pos - k) % self.capacity for k in range(1, n + 1)]
+            self._atr[n].total = sum(self._tr[j] for j in idx)
+            self._rv[n].total = sum(self._r2[j] for j in idx)
+
+    def atr(self, window: Optional[int] = None) -> Optional[float]:
+        """최근 window개 캔들 true range 평균 (가격 단위)"""
+        rolling = self._atr.get(window or self.windows[0])
+        return None if rolling is None else rolling.mean()
+
+    def realized_vol(self, window: Optional[int] = None) -> Optional[float]:
+        """최근 window개 캔들 로그 수익률의 RMS (캔들 1개 기준 비율)"""
+        rolling = self._rv.get(window or self.windows[0])
+        mean = None if rolling is None else rolling.mean()
+        return None if mean is None else math.sqrt(mean)
+
+    def snapshot(self) -> dict:
+        return {
+            "period": self.period,
+            "candles": self.candles,
+            "candle": None if self.open_at is None else {"open_at": self.open_at, "o": self.o, "h": self.hi,
+                                                         "l": self.lo, "c": self.c},
+            "atr": {n: self.atr(n) for n in self.windows},
+            "realized_vol": {n: self.realized_vol(n) for n in self.windows},
+        }
+
+
+class SpacingPolicy:
+    """변동성(ATR)에 맞춰 새로 만드는 레벨의 간격을 넓히거나 좁힘
+
+    목표 매수 간격 = ATR(spacing_window) * spacing_atr_mult 를 틱으로 바꿔 호가 단위로 맞추고,
+    설정의 buy_interval 대비 [spacing_min_scale, spacing_max_scale] 배로 제한한다.
+    매도 간격은 같은 배율로 sell_interval을 조정한다. 이미 있는 레벨/주문은 건드리지 않는다.
+    ATR 창이 다 차기 전이나 dynamic_spacing이 꺼져 있으면 설정값 그대로.
+    """
+
+    def __init__(self, candles: CandleAggregator):
+        self.candles = candles
+        self.last: Optional[tuple[int, int]] = None  # 마지막으로 적용한 간격 (변경 로그용)
+
+    def intervals(self, cfg: dict, tick: int = 1, unit: float = 1) -> tuple[int, int]:
+        """(매수 간격, 매도 간격) 틱. tick은 레벨 가격대의 호가 단위(틱 수), unit은 1틱의 원화 값 (ATR은 원화)"""
+        base_buy, base_sell = cfg["buy_interval"], cfg["sell_interval"]
+        if not cfg["dynamic_spacing"]:
+            return base_buy, base_sell
+        atr = self.candles.atr(cfg["spacing_window"])
+        if atr is None:
+            return base_buy, base_sell
+        target = atr * cfg["spacing_atr_mult"] / unit
+        target = min(max(target, base_buy * cfg["spacing_min_scale"]), base_buy * cfg["spacing_max_scale"])
+        tick = max(tick, 1)
+        buy = max(int(round(target / tick) * tick), int(tick))
+        sell = max(int(round(base_sell * buy / base_buy / tick) * tick), int(tick))
+        return buy, sell